@@ -159,7 +159,10 @@ export const templateApi = {
 
 export const runApi = {
   list: async (templateId?: string): Promise<Run[]> => {
-    const params = templateId ? { template_id: templateId } : {};
+    // The results view renders and searches input/output, so ask for payloads
+    const params = templateId
+      ? { template_id: templateId, include_payloads: true }
+      : { include_payloads: true };
     const response = await api.get('/api/runs', { params });
     return response.data;
   },
@@ -0,0 +1,38 @@
+"""Add background task status table
+
+Revision ID: 20261018_background_tasks
+Revises: 20261018_run_leak_findings
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261018_background_tasks'
+down_revision = '20261018_run_leak_findings'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create background_tasks"""
+    op.create_table(
+        'background_tasks',
+        sa.Column('task_id', sa.String(36), primary_key=True),
+        sa.Column('run_id', sa.BigInteger(), nullable=True),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('record', postgresql.JSONB(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        # NULL while pending/running; set when the task finishes
+        sa.Column('expires_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('idx_background_tasks_expires_at', 'background_tasks', ['expires_at'])
+
+
+def downgrade():
+    """Drop background_tasks"""
+    op.drop_index('idx_background_tasks_expires_at', table_name='background_tasks')
+    op.drop_table('background_tasks')
@@ -0,0 +1,25 @@
+"""Add cell_summary to batches for adaptive replicate allocation
+
+Revision ID: 20261018_batch_cell_summary
+Revises: 20250901_analytics_view_check
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_batch_cell_summary'
+down_revision = '20250901_analytics_view_check'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add per-cell replicate counts and stopping reasons to batches"""
+    op.add_column('batches', sa.Column('cell_summary', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    """Remove cell_summary from batches"""
+    op.drop_column('batches', 'cell_summary')
@@ -0,0 +1,34 @@
+"""Add export_watermarks for incremental bulk exports
+
+Revision ID: 20261018_export_watermarks
+Revises: 20261018_run_blobs
+Create Date: 2026-10-18
+
+One row per export target (app.services.exports): the (created_at, key)
+of the last row exported, so the next export continues after it.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_export_watermarks'
+down_revision = '20261018_run_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create export_watermarks"""
+    op.create_table(
+        'export_watermarks',
+        sa.Column('target', sa.String(100), primary_key=True),
+        sa.Column('last_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_key', sa.String(64), nullable=False),
+        sa.Column('rows_exported', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp())
+    )
+
+
+def downgrade():
+    """Drop export_watermarks"""
+    op.drop_table('export_watermarks')
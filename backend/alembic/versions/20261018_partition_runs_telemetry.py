@@ -0,0 +1,198 @@
+"""Partition runs and llm_telemetry by month on created_at
+
+Revision ID: 20261018_partition_runs_telemetry
+Revises: 20261018_run_keyset_indexes
+Create Date: 2026-10-18
+
+Existing rows are not copied. Each table is renamed to <table>_legacy and
+attached as the first partition of a new partitioned <table>, covering
+everything before the first day of next month:
+
+1. (autocommit) a CHECK matching the legacy range is added NOT VALID and
+   validated, and a unique (key, created_at) index is built CONCURRENTLY,
+   so attaching needs neither a scan nor an index build under lock;
+2. (one short transaction) rename, create the partitioned parent with the
+   same columns, primary key, checks and outgoing foreign keys, attach the
+   legacy table, recreate the indexes on the parent (the renamed legacy
+   indexes are attached, not rebuilt) and create the next monthly
+   partitions.
+
+Partitioned tables cannot be referenced by a foreign key on run_id alone,
+so the run_id foreign keys of run_brand_ranks, run_leak_scans and
+run_leak_findings are dropped; app.services.partitions deletes those rows
+when it detaches a runs partition, and 20261018_run_dependents_cleanup adds
+a delete trigger on runs for every other run delete.
+
+Also creates the runs_daily and llm_telemetry_daily rollup tables.
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261018_partition_runs_telemetry'
+down_revision = '20261018_run_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+TABLES = {'runs': 'run_id', 'llm_telemetry': 'id'}
+RUN_DEPENDENTS = ('run_brand_ranks', 'run_leak_scans', 'run_leak_findings')
+MONTHS_AHEAD = 3
+
+
+def _month(start, months):
+    index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def _legacy_name(name):
+    return f"{name[:56]}_legacy"
+
+
+def _catalog(table):
+    """Index definitions (without the primary key) and check/foreign key constraints of table"""
+    bind = op.get_bind()
+    indexes = bind.execute(sa.text("""
+        SELECT i.relname AS name, pg_get_indexdef(i.oid) AS definition
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = CAST(:table AS regclass) AND NOT x.indisprimary
+    """), {'table': table}).fetchall()
+    constraints = bind.execute(sa.text("""
+        SELECT conname AS name, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype IN ('c', 'f')
+    """), {'table': table}).fetchall()
+    pkey = bind.execute(sa.text("""
+        SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'
+    """), {'table': table}).scalar()
+    return indexes, constraints, pkey
+
+
+def upgrade():
+    """Convert runs and llm_telemetry to monthly range partitions"""
+    op.create_table(
+        'runs_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('template_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('vendor', sa.Text(), nullable=False),
+        sa.Column('model', sa.Text(), nullable=False),
+        sa.Column('status', sa.Text(), nullable=False),
+        sa.Column('runs', sa.Integer(), nullable=False),
+        sa.Column('grounded_effective', sa.Integer(), nullable=False),
+        sa.Column('latency_ms_sum', sa.BigInteger(), nullable=False),
+        sa.Column('tokens_input', sa.BigInteger(), nullable=False),
+        sa.Column('tokens_output', sa.BigInteger(), nullable=False),
+        sa.Column('tokens_reasoning', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'template_id', 'vendor', 'model', 'status')
+    )
+    op.create_table(
+        'llm_telemetry_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('vendor', sa.String(50), nullable=False),
+        sa.Column('model', sa.String(100), nullable=False),
+        sa.Column('grounded_effective', sa.Boolean(), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=False),
+        sa.Column('failures', sa.Integer(), nullable=False),
+        sa.Column('latency_ms_sum', sa.BigInteger(), nullable=False),
+        sa.Column('latency_ms_max', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('total_tokens', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'vendor', 'model', 'grounded_effective')
+    )
+
+    for dependent in RUN_DEPENDENTS:
+        op.drop_constraint(f'{dependent}_run_id_fkey', dependent, type_='foreignkey')
+
+    now = datetime.now(timezone.utc)
+    boundary = _month(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), 1)
+
+    with op.get_context().autocommit_block():
+        for table, key in TABLES.items():
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_legacy_range "
+                f"CHECK (created_at IS NOT NULL AND created_at < '{boundary.isoformat()}') NOT VALID"
+            )
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_legacy_range")
+            op.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {table}_legacy_key_created "
+                f"ON {table} ({key}, created_at)"
+            )
+
+    for table, key in TABLES.items():
+        legacy = f'{table}_legacy'
+        indexes, constraints, pkey = _catalog(table)
+        indexes = [i for i in indexes if i.name != f'{table}_legacy_key_created']
+        constraints = [c for c in constraints if c.name != f'{table}_legacy_range']
+
+        if table == 'runs':
+            op.execute("DROP TRIGGER IF EXISTS runs_output_tsv ON runs")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        op.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {pkey} TO {_legacy_name(pkey)}")
+        for index in indexes:
+            op.execute(f"ALTER INDEX {index.name} RENAME TO {_legacy_name(index.name)}")
+
+        op.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING COMMENTS) PARTITION BY RANGE (created_at)")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {pkey} PRIMARY KEY ({key}, created_at)")
+        for constraint in constraints:
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {constraint.name} {constraint.definition}")
+        op.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')")
+        for index in indexes:
+            # The parent index adopts the matching (renamed) legacy index
+            op.execute(index.definition)
+        op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_legacy_range")
+
+        start = boundary
+        for _ in range(MONTHS_AHEAD):
+            upper = _month(start, 1)
+            op.execute(
+                f"CREATE TABLE {table}_p{start:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            start = upper
+
+    op.execute("""
+        CREATE TRIGGER runs_output_tsv
+        BEFORE INSERT OR UPDATE OF output_text, locale_selected ON runs
+        FOR EACH ROW EXECUTE FUNCTION runs_output_tsv_update()
+    """)
+
+
+def downgrade():
+    """Move every partition's rows back into the legacy table and make it the plain table again"""
+    for table in TABLES:
+        legacy = f'{table}_legacy'
+        bind = op.get_bind()
+        partitions = [row.relname for row in bind.execute(sa.text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+        """), {'table': table}).fetchall()]
+        indexes, _, pkey = _catalog(legacy)
+
+        if table == 'runs':
+            op.execute("DROP TRIGGER IF EXISTS runs_output_tsv ON runs")
+        op.execute(f"ALTER TABLE {table} DETACH PARTITION {legacy}")
+        for partition in partitions:
+            if partition != legacy:
+                op.execute(f"INSERT INTO {legacy} SELECT * FROM {partition}")
+        op.execute(f"DROP TABLE {table}")
+        op.execute(f"ALTER TABLE {legacy} RENAME TO {table}")
+        op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {pkey} TO {pkey[:-len('_legacy')]}")
+        for index in indexes:
+            if index.name.endswith('_legacy'):
+                op.execute(f"ALTER INDEX {index.name} RENAME TO {index.name[:-len('_legacy')]}")
+        op.execute(f"DROP INDEX IF EXISTS {table}_legacy_key_created")
+
+    op.execute("""
+        CREATE TRIGGER runs_output_tsv
+        BEFORE INSERT OR UPDATE OF output_text, locale_selected ON runs
+        FOR EACH ROW EXECUTE FUNCTION runs_output_tsv_update()
+    """)
+    for dependent in RUN_DEPENDENTS:
+        op.create_foreign_key(f'{dependent}_run_id_fkey', dependent, 'runs', ['run_id'], ['run_id'], ondelete='CASCADE')
+
+    op.drop_table('llm_telemetry_daily')
+    op.drop_table('runs_daily')
@@ -0,0 +1,56 @@
+"""Add incremental rollup tables for prompt tracking analytics
+
+Revision ID: 20261018_prompt_analytics_rollup
+Revises: 20261018_batch_cell_summary
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_prompt_analytics_rollup'
+down_revision = '20261018_batch_cell_summary'
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    'runs_total', 'runs_completed', 'runs_failed',
+    'join_rows', 'mentioned_rows',
+    'mention_count_sum', 'mention_count_n',
+    'confidence_n', 'completed_rows', 'completed_mentioned_rows',
+)
+
+
+def upgrade():
+    """Create daily rollups, the per-run ledger and the catch-up watermark"""
+    op.create_table(
+        'prompt_analytics_daily',
+        sa.Column('brand_name', sa.String(255), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('country_code', sa.String(16), nullable=False),
+        sa.Column('grounding_mode', sa.String(32), nullable=False),
+        sa.Column('model_name', sa.String(100), nullable=False),
+        *[sa.Column(name, sa.BigInteger(), nullable=False, server_default='0') for name in COUNTERS],
+        sa.Column('confidence_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.PrimaryKeyConstraint('brand_name', 'day', 'country_code', 'grounding_mode', 'model_name')
+    )
+    op.create_table(
+        'prompt_rollup_ledger',
+        sa.Column('run_id', sa.BigInteger(), primary_key=True),
+        sa.Column('rolled_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+    op.create_table(
+        'prompt_rollup_state',
+        sa.Column('name', sa.String(64), primary_key=True),
+        sa.Column('watermark', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+
+
+def downgrade():
+    """Drop the rollup tables"""
+    op.drop_table('prompt_rollup_state')
+    op.drop_table('prompt_rollup_ledger')
+    op.drop_table('prompt_analytics_daily')
@@ -0,0 +1,42 @@
+"""Add MinHash/LSH near-duplicate index for prompt templates
+
+Revision ID: 20261018_prompt_template_minhash
+Revises: 20261018_run_output_search
+Create Date: 2026-10-18
+
+Populate with scripts/reindex_template_minhash.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_prompt_template_minhash'
+down_revision = '20261018_run_output_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create per-template signatures and the (brand, bucket) LSH table"""
+    op.create_table(
+        'prompt_template_minhash',
+        sa.Column('template_id', sa.BigInteger(), primary_key=True),
+        sa.Column('brand_name', sa.String(255), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+    op.create_table(
+        'prompt_template_lsh',
+        sa.Column('brand_name', sa.String(255), nullable=False),
+        sa.Column('bucket', sa.BigInteger(), nullable=False),
+        sa.Column('template_id', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('brand_name', 'bucket', 'template_id')
+    )
+    op.create_index('idx_prompt_template_lsh_template', 'prompt_template_lsh', ['template_id'])
+
+
+def downgrade():
+    """Drop the near-duplicate index tables"""
+    op.drop_index('idx_prompt_template_lsh_template', table_name='prompt_template_lsh')
+    op.drop_table('prompt_template_lsh')
+    op.drop_table('prompt_template_minhash')
@@ -0,0 +1,88 @@
+"""Store run payloads in a content-addressed blob table
+
+Revision ID: 20261018_run_blobs
+Revises: 20261018_partition_runs_telemetry
+Create Date: 2026-10-18
+
+run_blobs holds compressed payloads keyed by SHA-256 with a reference
+count; runs gains request_sha256 and response_sha256 (the output already
+has response_output_sha256) and its payload columns become nullable, NULL
+meaning "in run_blobs". Adding nullable columns and dropping NOT NULL do
+not rewrite runs.
+
+The output_tsv trigger no longer overwrites the vector when output_text
+is NULL, since the writer computes it from the text before externalizing.
+
+Existing rows are moved by scripts/dedup_run_payloads.py in short
+batches, which reports the bytes saved.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_run_blobs'
+down_revision = '20261018_partition_runs_telemetry'
+branch_labels = None
+depends_on = None
+
+PAYLOADS = ('request_json', 'response_json', 'output_text')
+
+
+def upgrade():
+    """Create run_blobs, add the hash columns and let payload columns be NULL"""
+    op.create_table(
+        'run_blobs',
+        sa.Column('sha256', sa.String(64), primary_key=True),
+        sa.Column('codec', sa.String(10), nullable=False),
+        sa.Column('raw_bytes', sa.Integer(), nullable=False),
+        sa.Column('stored_bytes', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp())
+    )
+    # Compressed already; keep it out of TOAST compression
+    op.execute("ALTER TABLE run_blobs ALTER COLUMN data SET STORAGE EXTERNAL")
+    op.execute("CREATE INDEX idx_run_blobs_unreferenced ON run_blobs (sha256) WHERE refcount <= 0")
+
+    op.add_column('runs', sa.Column('request_sha256', sa.String(64), nullable=True))
+    op.add_column('runs', sa.Column('response_sha256', sa.String(64), nullable=True))
+    for column in PAYLOADS:
+        op.alter_column('runs', column, nullable=True)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION runs_output_tsv_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF NEW.output_text IS NOT NULL THEN
+                NEW.output_tsv := to_tsvector(run_search_config(NEW.locale_selected), NEW.output_text);
+            END IF;
+            RETURN NEW;
+        END
+        $$
+    """)
+
+
+def downgrade():
+    """Inline every externalized payload again, then drop run_blobs and the hash columns"""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION runs_output_tsv_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.output_tsv := to_tsvector(run_search_config(NEW.locale_selected), coalesce(NEW.output_text, ''));
+            RETURN NEW;
+        END
+        $$
+    """)
+    remaining = op.get_bind().execute(sa.text(
+        "SELECT count(*) FROM runs WHERE request_json IS NULL OR response_json IS NULL OR output_text IS NULL"
+    )).scalar()
+    if remaining:
+        # Blobs may be zstd-compressed, which Postgres cannot read
+        raise RuntimeError(
+            f"{remaining} runs still reference run_blobs; inline them before downgrading"
+        )
+    for column in PAYLOADS:
+        op.alter_column('runs', column, nullable=False)
+    op.drop_column('runs', 'response_sha256')
+    op.drop_column('runs', 'request_sha256')
+    op.drop_table('run_blobs')
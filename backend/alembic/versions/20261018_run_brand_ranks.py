@@ -0,0 +1,42 @@
+"""Add run_brand_ranks for ranked-brand extraction
+
+Revision ID: 20261018_run_brand_ranks
+Revises: 20261018_prompt_analytics_rollup
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261018_run_brand_ranks'
+down_revision = '20261018_prompt_analytics_rollup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create run_brand_ranks with the (brand, locale, model, created_at) lookup index"""
+    op.create_table(
+        'run_brand_ranks',
+        sa.Column('run_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('runs.run_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('position', sa.SmallInteger(), nullable=False),
+        sa.Column('brand', sa.String(255), nullable=False),
+        sa.Column('alias', sa.String(255), nullable=False),
+        sa.Column('source', sa.String(8), nullable=False),
+        sa.Column('locale', sa.String(10), nullable=True),
+        sa.Column('model', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('run_id', 'position')
+    )
+    op.create_index(
+        'idx_run_brand_ranks_lookup', 'run_brand_ranks',
+        ['brand', 'locale', 'model', 'created_at']
+    )
+
+
+def downgrade():
+    """Drop run_brand_ranks"""
+    op.drop_index('idx_run_brand_ranks_lookup', table_name='run_brand_ranks')
+    op.drop_table('run_brand_ranks')
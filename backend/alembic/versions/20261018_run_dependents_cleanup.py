@@ -0,0 +1,59 @@
+"""Delete run ranks and leak findings with their run
+
+Revision ID: 20261018_run_dependents_cleanup
+Revises: 20261018_telemetry_meta_columns
+Create Date: 2026-10-18
+
+20261018_partition_runs_telemetry dropped the ON DELETE CASCADE foreign
+keys from run_brand_ranks, run_leak_scans and run_leak_findings to runs
+(a partitioned table cannot be referenced on run_id alone). This revision
+puts the cascade back as an AFTER DELETE row trigger on runs, which
+partitions inherit, and deletes the rows already orphaned by earlier run
+deletes. Detaching a partition fires no trigger; app.services.partitions
+still deletes those rows itself.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20261018_run_dependents_cleanup'
+down_revision = '20261018_telemetry_meta_columns'
+branch_labels = None
+depends_on = None
+
+RUN_DEPENDENTS = ('run_brand_ranks', 'run_leak_scans', 'run_leak_findings')
+
+
+def _deletes():
+    return "\n".join(
+        f"                DELETE FROM {table} WHERE run_id = OLD.run_id;" for table in RUN_DEPENDENTS
+    )
+
+
+def upgrade():
+    """Install the delete trigger on runs and remove existing orphans"""
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION runs_delete_dependents() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+{_deletes()}
+            RETURN OLD;
+        END
+        $$
+    """)
+    op.execute("DROP TRIGGER IF EXISTS runs_delete_dependents ON runs")
+    op.execute("""
+        CREATE TRIGGER runs_delete_dependents
+        AFTER DELETE ON runs
+        FOR EACH ROW EXECUTE FUNCTION runs_delete_dependents()
+    """)
+    for table in RUN_DEPENDENTS:
+        op.execute(f"""
+            DELETE FROM {table} d
+            WHERE NOT EXISTS (SELECT 1 FROM runs r WHERE r.run_id = d.run_id)
+        """)
+
+
+def downgrade():
+    """Drop the delete trigger and its function"""
+    op.execute("DROP TRIGGER IF EXISTS runs_delete_dependents ON runs")
+    op.execute("DROP FUNCTION IF EXISTS runs_delete_dependents()")
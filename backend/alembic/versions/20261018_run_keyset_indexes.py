@@ -0,0 +1,36 @@
+"""Add keyset pagination indexes on runs
+
+Revision ID: 20261018_run_keyset_indexes
+Revises: 20261018_background_tasks
+Create Date: 2026-10-18
+
+Run listings page on (created_at, run_id); idx_template_runs_keyset
+supersedes idx_template_runs (template_id, created_at). Indexes are built
+and dropped CONCURRENTLY so writes to runs are not blocked.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20261018_run_keyset_indexes'
+down_revision = '20261018_background_tasks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the keyset indexes and drop the index they replace"""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_template_runs_keyset "
+            "ON runs (template_id, created_at, run_id)"
+        )
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_runs_created_keyset ON runs (created_at, run_id)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_template_runs")
+
+
+def downgrade():
+    """Restore idx_template_runs and drop the keyset indexes"""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_template_runs ON runs (template_id, created_at)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_runs_created_keyset")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_template_runs_keyset")
@@ -0,0 +1,45 @@
+"""Add ALS leakage audit tables
+
+Revision ID: 20261018_run_leak_findings
+Revises: 20261018_prompt_template_minhash
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261018_run_leak_findings'
+down_revision = '20261018_prompt_template_minhash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create run_leak_scans and run_leak_findings"""
+    op.create_table(
+        'run_leak_scans',
+        sa.Column('run_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('runs.run_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('als_block_sha256', sa.String(64), nullable=True),
+        sa.Column('country', sa.String(8), nullable=True),
+        sa.Column('finding_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('scanned_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+    op.create_table(
+        'run_leak_findings',
+        sa.Column('run_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('runs.run_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('kind', sa.String(16), nullable=False),
+        sa.Column('phrase', sa.String(255), nullable=False),
+        sa.Column('occurrences', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('first_offset', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('run_id', 'kind', 'phrase')
+    )
+    op.create_index('idx_run_leak_findings_phrase', 'run_leak_findings', ['kind', 'phrase'])
+
+
+def downgrade():
+    """Drop the leakage audit tables"""
+    op.drop_index('idx_run_leak_findings_phrase', table_name='run_leak_findings')
+    op.drop_table('run_leak_findings')
+    op.drop_table('run_leak_scans')
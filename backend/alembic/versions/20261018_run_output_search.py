@@ -0,0 +1,69 @@
+"""Add full-text search over runs.output_text
+
+Revision ID: 20261018_run_output_search
+Revises: 20261018_run_brand_ranks
+Create Date: 2026-10-18
+
+The column is added nullable (no table rewrite) and kept current by a
+trigger; existing rows are filled by scripts/backfill_run_search.py in
+short batches, and the GIN index is built CONCURRENTLY.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261018_run_output_search'
+down_revision = '20261018_run_brand_ranks'
+branch_labels = None
+depends_on = None
+
+# Mirrors app.services.run_search.SEARCH_CONFIGS at the time of this revision
+LANGUAGE_CONFIGS = {
+    'da': 'danish', 'de': 'german', 'en': 'english', 'es': 'spanish', 'fi': 'finnish',
+    'fr': 'french', 'it': 'italian', 'nl': 'dutch', 'no': 'norwegian', 'pt': 'portuguese',
+    'ru': 'russian', 'sv': 'swedish', 'tr': 'turkish',
+}
+
+
+def upgrade():
+    """Add runs.output_tsv, its locale-aware trigger and GIN index"""
+    cases = "\n".join(
+        f"        WHEN '{language}' THEN '{config}'::regconfig" for language, config in LANGUAGE_CONFIGS.items()
+    )
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION run_search_config(locale text) RETURNS regconfig
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE lower(split_part(replace(coalesce(locale, ''), '_', '-'), '-', 1))
+{cases}
+                ELSE 'simple'::regconfig
+            END
+        $$
+    """)
+    op.add_column('runs', sa.Column('output_tsv', postgresql.TSVECTOR(), nullable=True))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION runs_output_tsv_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.output_tsv := to_tsvector(run_search_config(NEW.locale_selected), coalesce(NEW.output_text, ''));
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER runs_output_tsv
+        BEFORE INSERT OR UPDATE OF output_text, locale_selected ON runs
+        FOR EACH ROW EXECUTE FUNCTION runs_output_tsv_update()
+    """)
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_runs_output_tsv ON runs USING gin (output_tsv)")
+
+
+def downgrade():
+    """Drop the search index, trigger, column and config function"""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_runs_output_tsv")
+    op.execute("DROP TRIGGER IF EXISTS runs_output_tsv ON runs")
+    op.execute("DROP FUNCTION IF EXISTS runs_output_tsv_update()")
+    op.drop_column('runs', 'output_tsv')
+    op.execute("DROP FUNCTION IF EXISTS run_search_config(text)")
@@ -0,0 +1,203 @@
+"""Typed columns for hot llm_telemetry.meta fields, with targeted indexes
+
+Revision ID: 20261018_telemetry_meta_columns
+Revises: 20261018_export_watermarks
+Create Date: 2026-10-18
+
+Dashboard and contract queries (sql/query_telemetry_meta.sql,
+sql/check_telemetry_contracts.sql) filter and group on a few meta keys;
+reading them from meta parses the JSON of every row. This revision:
+
+1. converts meta to JSONB where it is still JSON (databases created from
+   the ORM models; add_telemetry_meta_20250901 already created JSONB):
+   meta_jsonb is added, kept in sync by a trigger, backfilled in batches
+   and swapped in by one short, catalog-only transaction;
+2. adds als_country, grounding_mode_requested, response_api,
+   finish_reason, why_not_grounded, citations_count and tool_call_count.
+   They behave like stored generated columns, but ADD COLUMN ... GENERATED
+   ALWAYS AS ... STORED rewrites every partition under an ACCESS
+   EXCLUSIVE lock, so they are computed by a BEFORE INSERT OR UPDATE OF
+   meta trigger instead and backfilled in batches;
+3. builds the partial/composite indexes online: the partitioned index is
+   created ON ONLY the parent, each partition's index CONCURRENTLY, then
+   attached. The expression indexes on meta->>'response_api' and
+   meta->>'grounding_mode_requested' are superseded and dropped.
+
+Every batch is its own transaction (autocommit), keyed on (created_at, id).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_telemetry_meta_columns'
+down_revision = '20261018_export_watermarks'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+TEXT_FIELDS = ('als_country', 'grounding_mode_requested', 'response_api', 'finish_reason', 'why_not_grounded')
+INT_FIELDS = ('citations_count', 'tool_call_count')
+
+# name -> (columns, INCLUDE columns, WHERE)
+INDEXES = {
+    # Contract checks and API distribution: vendor + response_api over a time
+    # range; grounded is included so query 4 is index-only
+    'idx_llm_telemetry_vendor_api_created': ('vendor, response_api, created_at', 'grounded', None),
+    # ALS geo split, only rows that carried an ALS block
+    'idx_llm_telemetry_als_country_created': ('als_country, created_at', None, 'als_country IS NOT NULL'),
+    # Finish reason breakdown per vendor
+    'idx_llm_telemetry_finish_reason_created': ('vendor, finish_reason, created_at', None, 'finish_reason IS NOT NULL'),
+    # REQUIRED mode failure analysis (query 9), index-only
+    'idx_llm_telemetry_required_failures': (
+        'created_at', 'vendor, why_not_grounded',
+        "grounded AND NOT grounded_effective AND grounding_mode_requested = 'REQUIRED'"
+    ),
+    # Citation effectiveness (query 8) over grounded calls
+    'idx_llm_telemetry_grounded_citations': (
+        'created_at', 'vendor, tool_call_count, citations_count', 'grounded_effective'
+    ),
+}
+SUPERSEDED = {
+    'idx_llm_telemetry_meta_response_api': "(meta->>'response_api')",
+    'idx_llm_telemetry_meta_grounding_mode': "(meta->>'grounding_mode_requested')",
+}
+
+
+def _int(field):
+    # A malformed value becomes NULL instead of failing the insert
+    return (
+        f"CASE WHEN NEW.meta->>'{field}' ~ '^-?[0-9]{{1,9}}$' "
+        f"THEN (NEW.meta->>'{field}')::integer END"
+    )
+
+
+def _in_batches(bind, assignments):
+    """UPDATE llm_telemetry SET assignments, BATCH_SIZE rows per transaction"""
+    after = (None, None)
+    while True:
+        last = bind.execute(sa.text(f"""
+            WITH batch AS (
+                SELECT id, created_at FROM llm_telemetry
+                WHERE CAST(:after_created_at AS timestamptz) IS NULL
+                   OR (created_at, id) > (CAST(:after_created_at AS timestamptz), CAST(:after_id AS uuid))
+                ORDER BY created_at, id
+                LIMIT :batch_size
+            ), updated AS (
+                UPDATE llm_telemetry t SET {assignments}
+                FROM batch b
+                WHERE t.id = b.id AND t.created_at = b.created_at
+                RETURNING t.created_at, t.id
+            )
+            SELECT created_at, id FROM updated ORDER BY created_at DESC, id DESC LIMIT 1
+        """), {'after_created_at': after[0], 'after_id': after[1], 'batch_size': BATCH_SIZE}).first()
+        if last is None:
+            return
+        after = (last.created_at, last.id)
+
+
+def _partitions(bind):
+    return [row.relname for row in bind.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'llm_telemetry'::regclass
+    """)).fetchall()]
+
+
+def _is_partitioned(bind):
+    return bind.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = 'llm_telemetry'::regclass")).scalar() == 'p'
+
+
+def _create_index(bind, name, columns, include=None, where=None):
+    """CREATE INDEX without blocking writes, on a partitioned or plain llm_telemetry"""
+    tail = (f" INCLUDE ({include})" if include else "") + (f" WHERE {where}" if where else "")
+    if not _is_partitioned(bind):
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON llm_telemetry ({columns}){tail}")
+        return
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY llm_telemetry ({columns}){tail}")
+    for partition in _partitions(bind):
+        child = f"{name}_{partition[len('llm_telemetry_'):]}"
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} ({columns}){tail}")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def upgrade():
+    """Convert meta to JSONB if needed, add the typed columns and their indexes"""
+    bind = op.get_bind()
+    meta_type = bind.execute(sa.text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'llm_telemetry' AND column_name = 'meta'
+    """)).scalar()
+
+    if meta_type == 'json':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TABLE llm_telemetry ADD COLUMN IF NOT EXISTS meta_jsonb jsonb")
+            op.execute("""
+                CREATE OR REPLACE FUNCTION llm_telemetry_meta_jsonb() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    NEW.meta_jsonb := NEW.meta::jsonb;
+                    RETURN NEW;
+                END
+                $$
+            """)
+            op.execute("""
+                CREATE TRIGGER llm_telemetry_meta_jsonb
+                BEFORE INSERT OR UPDATE OF meta ON llm_telemetry
+                FOR EACH ROW EXECUTE FUNCTION llm_telemetry_meta_jsonb()
+            """)
+            _in_batches(bind, "meta_jsonb = t.meta::jsonb")
+        # Every row is converted and the trigger covers new ones: swap in one
+        # short transaction (catalog changes only)
+        for name in SUPERSEDED:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute("DROP TRIGGER llm_telemetry_meta_jsonb ON llm_telemetry")
+        op.execute("DROP FUNCTION llm_telemetry_meta_jsonb()")
+        op.execute("ALTER TABLE llm_telemetry DROP COLUMN meta")
+        op.execute("ALTER TABLE llm_telemetry RENAME COLUMN meta_jsonb TO meta")
+
+    with op.get_context().autocommit_block():
+        for name in SUPERSEDED:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        for field in TEXT_FIELDS:
+            op.execute(f"ALTER TABLE llm_telemetry ADD COLUMN IF NOT EXISTS {field} text")
+        for field in INT_FIELDS:
+            op.execute(f"ALTER TABLE llm_telemetry ADD COLUMN IF NOT EXISTS {field} integer")
+        assignments = ";\n".join(
+            [f"            NEW.{field} := NULLIF(NEW.meta->>'{field}', '')" for field in TEXT_FIELDS]
+            + [f"            NEW.{field} := {_int(field)}" for field in INT_FIELDS]
+        )
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION llm_telemetry_meta_columns() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+{assignments};
+                RETURN NEW;
+            END
+            $$
+        """)
+        op.execute("DROP TRIGGER IF EXISTS llm_telemetry_meta_columns ON llm_telemetry")
+        op.execute("""
+            CREATE TRIGGER llm_telemetry_meta_columns
+            BEFORE INSERT OR UPDATE OF meta ON llm_telemetry
+            FOR EACH ROW EXECUTE FUNCTION llm_telemetry_meta_columns()
+        """)
+        # Assigning meta to itself fires the trigger for existing rows
+        _in_batches(bind, "meta = t.meta")
+
+        for name, (columns, include, where) in INDEXES.items():
+            _create_index(bind, name, columns, include, where)
+        op.execute("ANALYZE llm_telemetry")
+
+
+def downgrade():
+    """Drop the typed columns, their trigger and indexes; restore the meta expression indexes (meta stays JSONB)"""
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute("DROP TRIGGER IF EXISTS llm_telemetry_meta_columns ON llm_telemetry")
+        op.execute("DROP FUNCTION IF EXISTS llm_telemetry_meta_columns()")
+        for field in TEXT_FIELDS + INT_FIELDS:
+            op.execute(f"ALTER TABLE llm_telemetry DROP COLUMN IF EXISTS {field}")
+        for name, expression in SUPERSEDED.items():
+            _create_index(bind, name, expression)
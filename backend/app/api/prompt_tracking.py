@@ -6,18 +6,16 @@ from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from sqlalchemy.orm import Session
 import json
 import asyncio
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
-from app.database import get_db, engine
-from app.models import prompt_tracking as prompt_models  # Import models to ensure tables are created
-from app.llm.langchain_adapter import LangChainAdapter
-from app.config import settings
-from app.services.evidence_pack_builder import evidence_pack_builder
+from app.db.database import engine
 from app.services.als import als_service
 from app.services.als.country_codes import country_to_num, num_to_country
+from app.services.analytics_rollup import brand_analytics, record_run, refolding
+from app.services.mention_engine import COMPETITOR, COMPETITOR_CUES, CUE, MentionReport, engine_for
+from app.services.near_duplicates import DEFAULT_THRESHOLD, find_near_duplicates, index_template, unindex_template
 from app.services.prompt_hasher import (
     calculate_prompt_hash, 
     verify_prompt_integrity,
@@ -27,6 +25,29 @@ from app.services.prompt_hasher import (
 
 router = APIRouter(prefix="/api/prompt-tracking", tags=["prompt-tracking"])
 
+def _mention_engine(brand_name: str, brand_aliases: List[str], competitors: Dict[str, List[str]]):
+    """Compiled mention engine for a brand; competitor cue phrases stand in when no competitors are tracked"""
+    return engine_for(
+        brand_name,
+        {brand_name: brand_aliases},
+        competitors,
+        cues=() if competitors else COMPETITOR_CUES
+    )
+
+def _score_mentions(report: MentionReport, response: str, brand_name: str, tracks_competitors: bool) -> Dict[str, Any]:
+    """prompt_results mention columns from one scan"""
+    if tracks_competitors:
+        competitors = report.entities(COMPETITOR)
+    else:
+        competitors = report.sentence_texts(response, CUE)
+    brand_mentioned = report.mentioned(brand_name)
+    return {
+        "mentioned": brand_mentioned,
+        "count": report.counts.get(brand_name, 0),
+        "competitors": json.dumps(competitors[:5]),
+        "confidence": 0.8 if brand_mentioned else 0.3
+    }
+
 # Pydantic models
 class PromptTemplate(BaseModel):
     brand_name: str
@@ -44,6 +65,15 @@ class PromptRunRequest(BaseModel):
     model_name: str = "gemini"  # Default to Gemini since GPT-5 returns empty
     countries: Optional[List[str]] = None
     grounding_modes: Optional[List[str]] = None
+    brand_aliases: List[str] = []
+    competitors: Dict[str, List[str]] = {}  # competitor name -> aliases
+
+class RescoreRequest(BaseModel):
+    brand_name: str
+    brand_aliases: List[str] = []
+    competitors: Dict[str, List[str]] = {}
+    run_ids: Optional[List[int]] = None  # default: all runs of the brand
+    batch_size: int = 500
 
 class PromptSchedule(BaseModel):
     template_id: int
@@ -59,11 +89,13 @@ class DuplicateCheckRequest(BaseModel):
     countries: Optional[List[str]] = None
     grounding_modes: Optional[List[str]] = None
     prompt_type: Optional[str] = "custom"
+    similarity_threshold: float = DEFAULT_THRESHOLD
+    max_results: int = 5
 
 @router.get("/templates")
 async def get_templates(brand_name: Optional[str] = None):
     """Get all prompt templates, optionally filtered by brand"""
-    with engine.connect() as conn:
+    async with engine.connect() as conn:
         if brand_name:
             query = text("""
                 SELECT id, brand_name, template_name, prompt_text, prompt_type, 
@@ -72,7 +104,7 @@ async def get_templates(brand_name: Optional[str] = None):
                 WHERE brand_name = :brand OR brand_name = 'DEFAULT'
                 ORDER BY created_at DESC
             """)
-            result = conn.execute(query, {"brand": brand_name})
+            result = await conn.execute(query, {"brand": brand_name})
         else:
             query = text("""
                 SELECT id, brand_name, template_name, prompt_text, prompt_type, 
@@ -80,7 +112,7 @@ async def get_templates(brand_name: Optional[str] = None):
                 FROM prompt_templates 
                 ORDER BY created_at DESC
             """)
-            result = conn.execute(query)
+            result = await conn.execute(query)
         
         templates = []
         for row in result:
@@ -127,7 +159,7 @@ async def get_templates(brand_name: Optional[str] = None):
 @router.post("/templates/check-duplicate")
 async def check_duplicate(request: DuplicateCheckRequest):
     """Check if a template bundle already exists, with detailed similarity info"""
-    with engine.connect() as conn:
+    async with engine.connect() as conn:
         # Calculate bundle hash for exact match
         bundle_hash = calculate_prompt_hash(
             request.prompt_text,
@@ -143,38 +175,37 @@ async def check_duplicate(request: DuplicateCheckRequest):
             FROM prompt_templates 
             WHERE brand_name = :brand 
               AND prompt_hash = :hash 
-              AND is_active = 1
+              AND is_active = TRUE
             LIMIT 1
         """)
         
-        exact_match = conn.execute(exact_query, {
+        exact_match = (await conn.execute(exact_query, {
             "brand": request.brand_name,
             "hash": bundle_hash
-        }).fetchone()
-        
-        # Check for same text but different config
-        text_only_hash = calculate_prompt_hash(request.prompt_text)  # Legacy text-only hash
-        similar_query = text("""
-            SELECT id, template_name, model_name, countries, grounding_modes
-            FROM prompt_templates 
-            WHERE brand_name = :brand 
-              AND prompt_text = :text
-              AND is_active = 1
-              AND prompt_hash != :bundle_hash
-            LIMIT 5
-        """)
-        
-        similar_templates = conn.execute(similar_query, {
-            "brand": request.brand_name,
-            "text": request.prompt_text,
-            "bundle_hash": bundle_hash
-        }).fetchall()
+        })).fetchone()
+        
+        # Same or reworded prompt text, via the MinHash/LSH index
+        exact_id = exact_match[0] if exact_match else None
+        near_duplicates = [
+            match for match in await find_near_duplicates(
+                conn, request.brand_name, request.prompt_text,
+                k=request.max_results + 1, threshold=request.similarity_threshold
+            )
+            if match["row"].id != exact_id
+        ][:request.max_results]
+        # A Jaccard estimate of 1.0 does not mean identical text (shingle sets
+        # ignore repetition); same text means the same prompt hash
+        prompt_only_hash = calculate_prompt_hash(request.prompt_text)
+        for match in near_duplicates:
+            match["same_text"] = calculate_prompt_hash(match["row"].prompt_text) == prompt_only_hash
+        same_text = [m for m in near_duplicates if m["same_text"]]
         
         # Build response
         response = {
             "exact_match": exact_match is not None,
             "duplicate_template_id": exact_match[0] if exact_match else None,
-            "same_text_diff_config": len(similar_templates) > 0,
+            "same_text_diff_config": len(same_text) > 0,
+            "near_duplicate": len(near_duplicates) > 0,
             "prompt_hash": bundle_hash[:8] + "...",
             "closest": []
         }
@@ -197,7 +228,8 @@ async def check_duplicate(request: DuplicateCheckRequest):
             response["message"] = "This configuration is unique"
             
             # Add similar templates info
-            for similar in similar_templates:
+            for match in near_duplicates:
+                similar = match["row"]
                 countries = similar[3]
                 if isinstance(countries, str):
                     import json as json_lib
@@ -220,7 +252,8 @@ async def check_duplicate(request: DuplicateCheckRequest):
                     "model_id": similar[2],
                     "countries": countries,
                     "grounding_modes": modes,
-                    "similarity": "same_prompt"
+                    "similarity": "same_prompt" if match["same_text"] else "near_duplicate",
+                    "jaccard": match["jaccard"]
                 })
         
         return response
@@ -228,7 +261,7 @@ async def check_duplicate(request: DuplicateCheckRequest):
 @router.post("/templates")
 async def create_template(template: PromptTemplate):
     """Create a new prompt template with bundle-aware deduplication"""
-    with engine.begin() as conn:
+    async with engine.begin() as conn:
         # Calculate bundle hash (prompt + model + countries + modes + type)
         prompt_hash = calculate_prompt_hash(
             template.prompt_text,
@@ -244,14 +277,14 @@ async def create_template(template: PromptTemplate):
             FROM prompt_templates 
             WHERE brand_name = :brand 
               AND prompt_hash = :hash 
-              AND is_active = 1
+              AND is_active = TRUE
             LIMIT 1
         """)
         
-        existing = conn.execute(duplicate_check, {
+        existing = (await conn.execute(duplicate_check, {
             "brand": template.brand_name,
             "hash": prompt_hash
-        }).fetchone()
+        })).fetchone()
         
         if existing:
             # Duplicate bundle found - return a 409 Conflict
@@ -288,7 +321,7 @@ async def create_template(template: PromptTemplate):
         countries_json = json_lib.dumps(template.countries)
         modes_json = json_lib.dumps(template.grounding_modes)
         
-        result = conn.execute(query, {
+        result = await conn.execute(query, {
             "brand": template.brand_name,
             "name": template.template_name,
             "text": template.prompt_text,
@@ -301,6 +334,7 @@ async def create_template(template: PromptTemplate):
         })
         
         template_id = result.fetchone()[0]
+        await index_template(conn, template_id, template.brand_name, template.prompt_text)
         
         return {
             "id": template_id, 
@@ -311,10 +345,10 @@ async def create_template(template: PromptTemplate):
 @router.put("/templates/{template_id}")
 async def update_template(template_id: int, template: PromptTemplate):
     """Update an existing prompt template"""
-    with engine.begin() as conn:
+    async with engine.begin() as conn:
         # Check if template exists
         check_query = text("SELECT id FROM prompt_templates WHERE id = :id")
-        result = conn.execute(check_query, {"id": template_id}).fetchone()
+        result = (await conn.execute(check_query, {"id": template_id})).fetchone()
         
         if not result:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -345,7 +379,7 @@ async def update_template(template_id: int, template: PromptTemplate):
         countries_json = json_lib.dumps(template.countries)
         modes_json = json_lib.dumps(template.grounding_modes)
         
-        conn.execute(update_query, {
+        await conn.execute(update_query, {
             "id": template_id,
             "name": template.template_name,
             "text": template.prompt_text,
@@ -355,23 +389,25 @@ async def update_template(template_id: int, template: PromptTemplate):
             "countries": countries_json,
             "modes": modes_json
         })
+        await index_template(conn, template_id, template.brand_name, template.prompt_text)
         
         return {"message": "Template updated successfully"}
 
 @router.delete("/templates/{template_id}")
 async def delete_template(template_id: int):
     """Delete a prompt template"""
-    with engine.begin() as conn:
+    async with engine.begin() as conn:
         # Check if template exists
         check_query = text("SELECT id FROM prompt_templates WHERE id = :id")
-        result = conn.execute(check_query, {"id": template_id}).fetchone()
+        result = (await conn.execute(check_query, {"id": template_id})).fetchone()
         
         if not result:
             raise HTTPException(status_code=404, detail="Template not found")
         
         # Delete template (cascade will delete related runs and results)
         delete_query = text("DELETE FROM prompt_templates WHERE id = :id")
-        conn.execute(delete_query, {"id": template_id})
+        await conn.execute(delete_query, {"id": template_id})
+        await unindex_template(conn, template_id)
         
         return {"message": "Template deleted successfully"}
 
@@ -379,13 +415,15 @@ async def delete_template(template_id: int):
 async def run_prompt(request: PromptRunRequest):
     """Execute a prompt template and get results - now with parallel execution!"""
     
-    # Import parallel execution helper
+    # Import parallel execution helper and LLM dependencies
     from app.api.prompt_tracking_parallel import run_parallel_tests
+    from app.llm.langchain_adapter import LangChainAdapter
+    from app.services.evidence_pack_builder import evidence_pack_builder
     
     # Get the template
-    with engine.connect() as conn:
+    async with engine.connect() as conn:
         template_query = text("SELECT * FROM prompt_templates WHERE id = :id")
-        template = conn.execute(template_query, {"id": request.template_id}).fetchone()
+        template = (await conn.execute(template_query, {"id": request.template_id})).fetchone()
         
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -424,6 +462,7 @@ async def run_prompt(request: PromptRunRequest):
     else:
         # Use sequential execution for 1-2 tests
         results = []
+        mention_engine = _mention_engine(request.brand_name, request.brand_aliases, request.competitors)
         
         for country_orig in countries:
             # Immediately convert to numeric to avoid any "DE" leakage
@@ -436,15 +475,15 @@ async def run_prompt(request: PromptRunRequest):
                 # Create NEW adapter instance for each test to avoid state pollution
                 adapter = LangChainAdapter()
                 # Create a run record
-                with engine.begin() as conn:
+                async with engine.begin() as conn:
                     run_query = text("""
                     INSERT INTO prompt_runs 
                     (template_id, brand_name, model_name, country_code, grounding_mode, status, started_at)
-                    VALUES (:template_id, :brand, :model, :country, :grounding, 'running', datetime('now'))
+                    VALUES (:template_id, :brand, :model, :country, :grounding, 'running', CURRENT_TIMESTAMP)
                     RETURNING id
                 """)
                 
-                    run_result = conn.execute(run_query, {
+                    run_result = await conn.execute(run_query, {
                         "template_id": request.template_id,
                         "brand": request.brand_name,
                         "model": request.model_name,
@@ -567,26 +606,17 @@ async def run_prompt(request: PromptRunRequest):
                     finish_reason = response_data.get("finish_reason", None) if isinstance(response_data, dict) else None
                     content_filtered = response_data.get("content_filtered", False) if isinstance(response_data, dict) else False
                     
-                    # Analyze the response for brand mentions
-                    brand_mentioned = request.brand_name.lower() in response.lower()
-                    mention_count = response.lower().count(request.brand_name.lower())
-                    
-                    # Extract competitor mentions (simple approach)
-                    competitors = []
-                    competitor_keywords = ["competitor", "alternative", "rival", "competes with", "similar to"]
-                    for keyword in competitor_keywords:
-                        if keyword in response.lower():
-                            # Extract sentence containing the keyword
-                            sentences = response.split('.')
-                            for sentence in sentences:
-                                if keyword in sentence.lower():
-                                    competitors.append(sentence.strip())
+                    # Brand, alias and competitor mentions in one pass
+                    report = mention_engine.scan(response)
+                    scores = _score_mentions(report, response, request.brand_name, bool(request.competitors))
+                    brand_mentioned = scores["mentioned"]
+                    mention_count = scores["count"]
                     
                     # Calculate hash of the actual prompt sent to the model
                     execution_hash = calculate_prompt_hash(full_prompt)
                     
                     # Save the result (simplified schema)
-                    with engine.begin() as conn:
+                    async with engine.begin() as conn:
                         result_query = text("""
                             INSERT INTO prompt_results 
                             (run_id, prompt_text, prompt_hash, model_response, brand_mentioned, mention_count, 
@@ -598,19 +628,12 @@ async def run_prompt(request: PromptRunRequest):
                             RETURNING id
                         """)
                         
-                        # Convert list to JSON string for SQLite
-                        import json as json_lib
-                        competitors_json = json_lib.dumps(competitors[:5] if competitors else [])
-                        
-                        conn.execute(result_query, {
+                        await conn.execute(result_query, {
                             "run_id": run_id,
                             "prompt": full_prompt,  # Save the full prompt with evidence pack
                             "hash": execution_hash,  # Hash of the prompt for integrity checking
                             "response": response,
-                            "mentioned": brand_mentioned,
-                            "count": mention_count,
-                            "competitors": competitors_json,
-                            "confidence": 0.8 if brand_mentioned else 0.3,
+                            **scores,
                             "tool_calls": tool_call_count,
                             "grounded": grounded_effective,
                             "json_ok": json_valid,
@@ -621,10 +644,11 @@ async def run_prompt(request: PromptRunRequest):
                         # Update run status
                         update_query = text("""
                             UPDATE prompt_runs 
-                            SET status = 'completed', completed_at = datetime('now')
+                            SET status = 'completed', completed_at = CURRENT_TIMESTAMP
                             WHERE id = :id
                         """)
-                        conn.execute(update_query, {"id": run_id})
+                        await conn.execute(update_query, {"id": run_id})
+                        await record_run(conn, run_id)
                     
                     results.append({
                         "run_id": run_id,
@@ -637,13 +661,14 @@ async def run_prompt(request: PromptRunRequest):
                     
                 except Exception as e:
                     # Update run with error
-                    with engine.begin() as conn:
+                    async with engine.begin() as conn:
                         error_query = text("""
                             UPDATE prompt_runs 
-                            SET status = 'failed', error_message = :error, completed_at = datetime('now')
+                            SET status = 'failed', error_message = :error, completed_at = CURRENT_TIMESTAMP
                             WHERE id = :id
                         """)
-                        conn.execute(error_query, {"id": run_id, "error": str(e)})
+                        await conn.execute(error_query, {"id": run_id, "error": str(e)})
+                        await record_run(conn, run_id)
                     
                     results.append({
                         "run_id": run_id,
@@ -665,7 +690,7 @@ async def get_runs(
     limit: int = Query(default=50, le=200)
 ):
     """Get prompt run history with metadata"""
-    with engine.connect() as conn:
+    async with engine.connect() as conn:
         # Use simpler query without fingerprint columns for compatibility
         query_parts = ["""
             SELECT r.*, res.prompt_hash
@@ -688,7 +713,7 @@ async def get_runs(
         params["limit"] = limit
         
         query = text(" ".join(query_parts))
-        result = conn.execute(query, params)
+        result = await conn.execute(query, params)
         
         runs = []
         for row in result:
@@ -716,17 +741,17 @@ async def get_runs(
 @router.get("/results/{run_id}")
 async def get_run_results(run_id: int):
     """Get detailed results for a specific run"""
-    with engine.connect() as conn:
+    async with engine.connect() as conn:
         # Get run info
         run_query = text("SELECT * FROM prompt_runs WHERE id = :id")
-        run = conn.execute(run_query, {"id": run_id}).fetchone()
+        run = (await conn.execute(run_query, {"id": run_id})).fetchone()
         
         if not run:
             raise HTTPException(status_code=404, detail="Run not found")
         
         # Get results
         results_query = text("SELECT * FROM prompt_results WHERE run_id = :id")
-        result = conn.execute(results_query, {"id": run_id}).fetchone()
+        result = (await conn.execute(results_query, {"id": run_id})).fetchone()
         
         if not result:
             return {
@@ -781,76 +806,58 @@ async def get_run_results(run_id: int):
             }
         }
 
+@router.post("/results/rescore")
+async def rescore_results(request: RescoreRequest):
+    """Re-score stored responses with the current brand, alias and competitor lists"""
+    mention_engine = _mention_engine(request.brand_name, request.brand_aliases, request.competitors)
+    tracks_competitors = bool(request.competitors)
+    batch_size = max(1, min(request.batch_size, 5000))
+    
+    filters = "pr.brand_name = :brand"
+    params: Dict[str, Any] = {"brand": request.brand_name, "limit": batch_size}
+    if request.run_ids is not None:
+        filters += " AND pr.id IN :run_ids"
+        params["run_ids"] = request.run_ids or [-1]
+    select_query = text(f"""
+        SELECT res.id, res.run_id, res.model_response
+        FROM prompt_results res
+        JOIN prompt_runs pr ON pr.id = res.run_id
+        WHERE {filters} AND res.id > :after
+        ORDER BY res.id
+        LIMIT :limit
+    """)
+    if request.run_ids is not None:
+        select_query = select_query.bindparams(bindparam("run_ids", expanding=True))
+    update_query = text("""
+        UPDATE prompt_results
+        SET brand_mentioned = :mentioned, mention_count = :count,
+            competitors_mentioned = :competitors, confidence_score = :confidence
+        WHERE id = :id
+    """)
+    
+    rescored = 0
+    after = 0
+    while True:
+        # One short transaction per batch keeps locks brief on large histories
+        async with engine.begin() as conn:
+            rows = (await conn.execute(select_query, {**params, "after": after})).fetchall()
+            if not rows:
+                break
+            outputs = ((row, row.model_response or "") for row in rows)
+            updates = [
+                {"id": row.id, **_score_mentions(report, row.model_response or "", request.brand_name, tracks_competitors)}
+                for row, report in mention_engine.rescore(outputs)
+            ]
+            # Dashboards read the rollups: take these runs out and fold them back in
+            async with refolding(conn, (row.run_id for row in rows)):
+                await conn.execute(update_query, updates)
+        rescored += len(rows)
+        after = rows[-1].id
+    
+    return {"brand_name": request.brand_name, "rescored": rescored}
+
 @router.get("/analytics/{brand_name}")
-async def get_brand_analytics(brand_name: str):
-    """Get analytics for a brand's prompt tracking"""
-    with engine.connect() as conn:
-        # Get summary statistics
-        stats_query = text("""
-            SELECT 
-                COUNT(DISTINCT pr.id) as total_runs,
-                COUNT(DISTINCT pr.id) FILTER (WHERE pr.status = 'completed') as successful_runs,
-                COUNT(DISTINCT pr.id) FILTER (WHERE pr.status = 'failed') as failed_runs,
-                AVG(CASE WHEN res.brand_mentioned THEN 1 ELSE 0 END) * 100 as mention_rate,
-                AVG(res.mention_count) as avg_mentions,
-                AVG(res.confidence_score) * 100 as avg_confidence
-            FROM prompt_runs pr
-            LEFT JOIN prompt_results res ON pr.id = res.run_id
-            WHERE pr.brand_name = :brand
-        """)
-        
-        stats = conn.execute(stats_query, {"brand": brand_name}).fetchone()
-        
-        # Get grounding mode comparison
-        grounding_query = text("""
-            SELECT 
-                pr.grounding_mode,
-                COUNT(*) as run_count,
-                AVG(CASE WHEN res.brand_mentioned THEN 1 ELSE 0 END) * 100 as mention_rate
-            FROM prompt_runs pr
-            LEFT JOIN prompt_results res ON pr.id = res.run_id
-            WHERE pr.brand_name = :brand AND pr.status = 'completed'
-            GROUP BY pr.grounding_mode
-        """)
-        
-        grounding_results = conn.execute(grounding_query, {"brand": brand_name})
-        grounding_comparison = {}
-        for row in grounding_results:
-            grounding_comparison[row.grounding_mode] = {
-                "run_count": row.run_count,
-                "mention_rate": float(row.mention_rate) if row.mention_rate else 0
-            }
-        
-        # Get country comparison
-        country_query = text("""
-            SELECT 
-                pr.country_code,
-                COUNT(*) as run_count,
-                AVG(CASE WHEN res.brand_mentioned THEN 1 ELSE 0 END) * 100 as mention_rate
-            FROM prompt_runs pr
-            LEFT JOIN prompt_results res ON pr.id = res.run_id
-            WHERE pr.brand_name = :brand AND pr.status = 'completed'
-            GROUP BY pr.country_code
-        """)
-        
-        country_results = conn.execute(country_query, {"brand": brand_name})
-        country_comparison = {}
-        for row in country_results:
-            country_comparison[row.country_code] = {
-                "run_count": row.run_count,
-                "mention_rate": float(row.mention_rate) if row.mention_rate else 0
-            }
-        
-        return {
-            "brand_name": brand_name,
-            "statistics": {
-                "total_runs": stats.total_runs,
-                "successful_runs": stats.successful_runs,
-                "failed_runs": stats.failed_runs,
-                "mention_rate": float(stats.mention_rate) if stats.mention_rate else 0,
-                "avg_mentions_per_response": float(stats.avg_mentions) if stats.avg_mentions else 0,
-                "avg_confidence": float(stats.avg_confidence) if stats.avg_confidence else 0
-            },
-            "grounding_comparison": grounding_comparison,
-            "country_comparison": country_comparison
-        }
\ No newline at end of file
+async def get_brand_analytics(brand_name: str, days: Optional[int] = Query(default=None, ge=1)):
+    """Get analytics for a brand's prompt tracking (served from the daily rollups)"""
+    async with engine.connect() as conn:
+        return await brand_analytics(conn, brand_name, days)
@@ -9,6 +9,7 @@ from .providers import router as providers_router
 from .ops import router as ops_router
 from .runs import router as runs_router
 from .countries import router as countries_router
+from .exports import router as exports_router
 
 
 # Create main API router
@@ -20,6 +21,7 @@ api_router.include_router(providers_router)
 api_router.include_router(ops_router)
 api_router.include_router(runs_router)
 api_router.include_router(countries_router)
+api_router.include_router(exports_router)
 
 
 __all__ = ['api_router']
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Bulk export API endpoints
+"""
+
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.api.errors import bad_request, conflict
+from app.db.database import engine
+from app.services.exports import CONTENT_TYPES, acknowledge_export, plan_export, stream_export
+
+router = APIRouter(prefix="/api", tags=["exports"])
+
+
+class ExportMark(BaseModel):
+    """Position of one exported row: its created_at and key column"""
+    created_at: datetime
+    key: str
+
+
+class ExportAck(BaseModel):
+    """Confirms that an export was stored, up to and including row `to`"""
+    to: ExportMark = Field(..., description="created_at and key of the last row stored")
+    target: Optional[str] = Field(None, description="Watermark name (defaults to the table)")
+    rows: int = Field(0, ge=0, description="Rows stored, for the watermark's running count")
+
+
+@router.get("/exports/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("ndjson", description="ndjson or parquet"),
+    target: Optional[str] = Query(None, description="Watermark name (defaults to the table)"),
+    full: bool = Query(False, description="Export everything, ignoring the stored watermark"),
+    commit: Optional[bool] = Query(None, deprecated=True, description="Removed; POST /api/exports/{table}/ack"),
+    chunk_size: Optional[int] = Query(None, ge=100, le=50000)
+):
+    """
+    Stream runs or llm_telemetry rows after the target's watermark, oldest first.
+
+    The body is produced chunk by chunk from a server-side cursor. Reading
+    an export has no side effects: once the data is stored, the client
+    advances the watermark with POST /api/exports/{table}/ack, passing the
+    created_at and key (X-Export-Key names the column) of the last row.
+    """
+    if commit:
+        bad_request("INVALID_EXPORT", "commit was removed; acknowledge stored exports with POST /api/exports/{table}/ack")
+    try:
+        plan = await plan_export(
+            engine, table, fmt=format, target=target, full=full, commit=False, chunk_size=chunk_size
+        )
+    except ValueError as e:
+        bad_request("INVALID_EXPORT", str(e))
+
+    return StreamingResponse(
+        stream_export(engine, plan),
+        media_type=CONTENT_TYPES[plan.format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{plan.target}.{plan.format}"',
+            "X-Export-From": plan.after[0].isoformat() if plan.after else "",
+            "X-Export-Key": plan.source.key,
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@router.post("/exports/{table}/ack")
+async def acknowledge_table_export(table: str, ack: ExportAck):
+    """
+    Advance the target's watermark to the last row the client stored, so
+    the next export continues after it. Repeating an acknowledgement is
+    harmless; one older than the stored watermark is rejected with 409.
+    """
+    mark = (ack.to.created_at, ack.to.key)
+    try:
+        committed = await acknowledge_export(engine, table, mark, rows=ack.rows, target=ack.target)
+    except ValueError as e:
+        bad_request("INVALID_EXPORT", str(e))
+    if not committed:
+        conflict("STALE_EXPORT_ACK", "The watermark is already past this row")
+    return {"target": ack.target or table, "to": ack.to.model_dump(mode="json"), "committed": True}
@@ -5,58 +5,153 @@ Run API endpoints
 from typing import Optional
 from uuid import UUID
 from datetime import datetime
-from fastapi import APIRouter, Depends, Header, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
 
+from app.api.errors import bad_request
 from app.db.database import get_session
 from app.models.models import Run
+from app.services.leak_audit import audit_runs_in_background, run_findings
+from app.services.rank_extraction import rank_trend
+from app.services.run_blobs import hydrate_runs
+from app.services.run_listing import TotalMode, count_runs, fetch_page, list_query, check_page_param
+from app.services.run_search import search_runs
 
 router = APIRouter(prefix="/api", tags=["runs"])
 
 
 @router.get("/runs")
 async def list_runs(
+    response: Response,
     session: AsyncSession = Depends(get_session),
     template_id: Optional[str] = Query(None),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(50, ge=1, le=100)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    page_size: int = Query(50, ge=1, le=100),
+    include_payloads: bool = Query(False, description="Include input_data/output_data (the large columns)"),
+    total: TotalMode = Query("none", description="exact, approximate or none; sent back in X-Total-Count"),
+    page: Optional[int] = Query(None, deprecated=True, description="Removed; use cursor")
 ):
     """
-    List all runs, optionally filtered by template_id.
+    List all runs newest first, optionally filtered by template_id.
+
+    The body is the list of runs; the cursor for the next page is in the
+    X-Next-Cursor header (absent on the last page). Payloads are left out
+    unless include_payloads=true.
     """
-    query = select(Run)
-    
-    if template_id:
-        query = query.where(Run.template_id == UUID(template_id))
-    
-    query = query.order_by(desc(Run.created_at))
+    criteria = [Run.template_id == UUID(template_id)] if template_id else []
     
-    # Apply pagination
-    offset = (page - 1) * page_size
-    query = query.offset(offset).limit(page_size)
+    try:
+        check_page_param(page, cursor)
+        runs, next_cursor = await fetch_page(
+            session, list_query(*criteria, include_payloads=include_payloads), cursor, page_size
+        )
+        total_count = await count_runs(session, *criteria, mode=total)
+        if include_payloads:
+            await hydrate_runs(session, runs)
+    except ValueError as e:
+        bad_request("INVALID_PAGINATION", str(e))
     
-    # Execute query
-    result = await session.execute(query)
-    runs = result.scalars().all()
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total_count is not None:
+        response.headers["X-Total-Count"] = str(total_count)
+        response.headers["X-Total-Count-Estimated"] = "true" if total == "approximate" else "false"
     
     # Convert to response format
     run_list = []
     for run in runs:
-        run_list.append({
+        item = {
             "id": str(run.run_id),
             "template_id": str(run.template_id),
             "status": run.status or "completed",
-            "input_data": run.request_json,
-            "output_data": run.output_text or run.response_json,
             "error": run.error_message,
             "created_at": run.created_at.isoformat() if run.created_at else None,
             "completed_at": run.completed_at.isoformat() if run.completed_at else None,
-        })
+        }
+        if include_payloads:
+            item["input_data"] = run.request_json
+            item["output_data"] = run.output_text or run.response_json
+        run_list.append(item)
     
     return run_list
 
 
+@router.get("/runs/search")
+async def search_run_outputs(
+    q: str = Query(..., min_length=1, max_length=500, description="Web search syntax: \"phrase\", or, -word"),
+    session: AsyncSession = Depends(get_session),
+    template_id: Optional[UUID] = Query(None),
+    batch_id: Optional[UUID] = Query(None),
+    model: Optional[str] = Query(None),
+    locale: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Full-text search over run outputs, newest first, with highlighted snippets.
+    """
+    try:
+        return await search_runs(
+            session, q, limit=limit, template_id=template_id, batch_id=batch_id,
+            model=model, locale=locale, since=since, until=until, cursor=cursor
+        )
+    except ValueError as e:
+        bad_request("INVALID_CURSOR", str(e))
+
+
+@router.post("/runs/leak-audit", status_code=202)
+async def audit_run_leaks(
+    background_tasks: BackgroundTasks,
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    template_id: Optional[UUID] = Query(None),
+    limit: int = Query(2000, ge=1, le=10000),
+    rescan: bool = Query(False)
+):
+    """
+    Queue a leak audit of up to limit stored runs; findings appear under
+    /runs/{run_id}/leaks. It scans in a thread of the API process, so bulk
+    audits of the full history belong in scripts/audit_als_leaks.py.
+    """
+    background_tasks.add_task(audit_runs_in_background, since, until, template_id, limit, rescan)
+    return {"status": "queued", "limit": limit}
+
+
+@router.get("/runs/{run_id}/leaks")
+async def get_run_leaks(
+    run_id: UUID,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Leak findings recorded for a run by the leakage audit.
+    """
+    return {"run_id": str(run_id), "findings": await run_findings(session, run_id)}
+
+
+@router.get("/brands/{brand}/rank-trend")
+async def get_brand_rank_trend(
+    brand: str,
+    session: AsyncSession = Depends(get_session),
+    locale: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    bucket: str = Query("day", pattern="^(day|week|month)$")
+):
+    """
+    Rank of a brand over time from run_brand_ranks (e.g. brand X in de-DE last week).
+    """
+    return {
+        "brand": brand,
+        "locale": locale,
+        "model": model,
+        "bucket": bucket,
+        "points": await rank_trend(session, brand, locale, model, since, until, bucket)
+    }
+
+
 @router.get("/runs/{run_id}")
 async def get_run(
     run_id: UUID,
@@ -69,6 +164,7 @@ async def get_run(
     
     if not run:
         return {"error": "Run not found"}
+    await hydrate_runs(session, [run])
     
     return {
         "id": str(run.run_id),
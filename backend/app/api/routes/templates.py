@@ -19,11 +19,14 @@ from app.schemas.templates import (
     RunTemplateResponse,
     BatchRunRequest,
     BatchRunResponse,
+    BatchDryRunResponse,
+    BatchPlanResponse,
     RunListResponse
 )
 from app.services.template_service_v2 import TemplateService
 from app.services import idempotency
 from app.services.providers import ProviderVersionService
+from app.services.run_listing import TotalMode
 from app.api import errors
 from app.core.jsondiff import generate_rfc6902_diff
 
@@ -82,7 +85,6 @@ async def list_templates(
 @router.post("/templates", response_model=TemplateResponse)
 async def create_template(
     request: TemplateCreate,
-    response: Response,
     session: AsyncSession = Depends(get_session),
     x_organization_id: str = Header(..., alias="X-Organization-Id"),
     x_idempotency_key: Optional[str] = Header(None, alias="X-Idempotency-Key"),
@@ -104,10 +106,11 @@ async def create_template(
         "template_name": request.template_name
     }
     
-    # Check idempotency if key provided
+    # Reserve the idempotency key if provided; a completed retry is replayed
+    reservation = None
     if x_idempotency_key:
         try:
-            await idempotency.reserve_idempotency(
+            reservation = await idempotency.reserve_idempotency(
                 session, x_organization_id, x_idempotency_key, body_for_key
             )
         except ValueError as e:
@@ -115,6 +118,12 @@ async def create_template(
                 code="IDEMPOTENCY_CONFLICT",
                 detail=str(e)
             )
+        if reservation.replay:
+            return Response(
+                content=reservation.replay["body"],
+                status_code=reservation.replay["status_code"],
+                media_type="application/json"
+            )
     
     # Create or get template
     try:
@@ -131,14 +140,9 @@ async def create_template(
             detail=f"Failed to process template: {str(e)}"
         )
     
-    # Commit the transaction
-    await session.commit()
-    
-    # Set correct status code
-    response.status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
-    
-    # Return response
-    return TemplateResponse(
+    # Serialize once so a replay sends the same bytes
+    status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    body = TemplateResponse(
         template_id=template.template_id,
         template_sha256=template.template_sha256,
         template_name=template.template_name,
@@ -147,7 +151,16 @@ async def create_template(
         created_at=template.created_at,
         created_by=template.created_by,
         is_new=created
-    )
+    ).model_dump_json()
+    if reservation:
+        await idempotency.record_result(session, reservation, status_code, body)
+    
+    # Commit the transaction
+    await session.commit()
+    if reservation:
+        idempotency.remember(reservation)
+    
+    return Response(content=body, status_code=status_code, media_type="application/json")
 
 
 @router.get("/templates/{template_id}", response_model=TemplateResponse)
@@ -285,6 +298,7 @@ async def run_template(
         grounded=bool(canonical.get("grounded", False)),
         json_mode=json_mode_requested,
         tools=canonical.get("tools"),
+        meta={"json_schema": canonical["json_schema"]} if canonical.get("json_schema") else None,
         template_id=str(template_id),
         run_id=run_id
     )
@@ -321,7 +335,7 @@ async def run_template(
         model_version_effective=llm_response.model_version,
         model_fingerprint=llm_response.model_fingerprint,
         output=llm_response.content,
-        output_json_valid=True if json_mode_requested else None,
+        output_json_valid=(llm_response.metadata or {}).get("output_json_valid"),
         usage=llm_response.usage,
         latency_ms=llm_response.latency_ms,
         created_at=datetime.utcnow(),
@@ -346,54 +360,66 @@ async def batch_run_template(
     - Configurable drift policy (hard|fail|warn)
     - Rate limiting and parallel execution control
     - ALS template rotation per locale
+    - Resume mode: only missing or failed cells of an earlier batch are executed
     """
-    from app.services.batch_runner import BatchRunner
+    from app.services.batch_runner import BatchRunner, BatchResumeError
+    from app.services.batch_planner import BatchPlanner
+    from app.services.batch_progress import WebhookURLError, check_webhook_url
     from app.core.config import get_settings
     import json
     
+    s = get_settings()
+    
+    if request.webhook_url:
+        try:
+            await check_webhook_url(str(request.webhook_url))
+        except WebhookURLError as e:
+            errors.bad_request(code="INVALID_WEBHOOK_URL", detail=str(e))
+    
+    batch_runner = BatchRunner()
+    
     # === Preflight TPM/parallelism guard (OpenAI) ===
     try:
-        s = get_settings()
-        # Build configurations just to count OpenAI runs
-        batch_runner_preview = BatchRunner()
-        _configs = batch_runner_preview._generate_run_configurations(request)
-        openai_runs = sum(1 for c in _configs if isinstance(c.get("model"), str) and c["model"].lower().startswith("gpt-"))
+        # Plan from telemetry percentiles; no expansion is built
+        plan = await BatchPlanner(batch_runner).plan(session, str(template_id), request)
         
-        if openai_runs > 0:
-            est_tokens = openai_runs * int(s.openai_est_tokens_per_run)
-            per_min_budget = int(s.openai_tpm_limit * (1.0 - float(s.openai_tpm_headroom)))
+        if not plan.feasible:
+            # A single run can never fit one minute of budget - reject
+            import time as _t
+            retry_after = int(max(1.0, 60.0 - (_t.time() % 60.0)))
+            
+            # Return 503 with Retry-After header
+            from fastapi import Response
+            from fastapi import status as http_status
             
-            if est_tokens > per_min_budget:
-                # Calculate Retry-After until next minute boundary
-                import time as _t
-                retry_after = int(max(1.0, 60.0 - (_t.time() % 60.0)))
-                
-                # Return 503 with Retry-After header
-                from fastapi import Response
-                from fastapi import status as http_status
-                import json
-                
-                return Response(
-                    status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
-                    content=json.dumps({
-                        'code': 'BATCH_RATE_LIMITED',
-                        'detail': f'Projected OpenAI token usage ({est_tokens}) exceeds per-minute budget ({per_min_budget})',
-                        'extra': {
-                            'openai_runs': openai_runs,
-                            'est_tokens_per_run': int(s.openai_est_tokens_per_run),
-                            'est_total_tokens': est_tokens,
-                            'per_min_budget': per_min_budget,
-                            'tpm_limit': int(s.openai_tpm_limit),
-                            'headroom': float(s.openai_tpm_headroom),
-                            'retry_after': retry_after
-                        }
-                    }),
-                    headers={'Retry-After': str(retry_after)},
-                    media_type='application/json'
-                )
+            return Response(
+                status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+                content=json.dumps({
+                    'code': 'BATCH_RATE_LIMITED',
+                    'detail': f'Projected OpenAI tokens per run ({plan.openai_max_tokens_per_run}) exceed per-minute budget ({plan.tpm_budget})',
+                    'extra': {
+                        'openai_runs': plan.openai_runs,
+                        'est_tokens_per_run': plan.openai_max_tokens_per_run,
+                        'est_total_tokens': plan.openai_est_tokens,
+                        'per_min_budget': plan.tpm_budget,
+                        'tpm_limit': int(s.openai_tpm_limit),
+                        'headroom': float(s.openai_tpm_headroom),
+                        'retry_after': retry_after
+                    }
+                }),
+                headers={'Retry-After': str(retry_after)},
+                media_type='application/json'
+            )
+        
+        if plan.spread_over_time:
+            # Over budget: pace OpenAI launches across minute windows instead of rejecting
+            batch_runner.pace_openai(plan.openai_max_tokens_per_run)
+            print(f"Batch exceeds OpenAI TPM budget ({plan.openai_est_tokens} > {plan.tpm_budget}); "
+                  f"pacing launches, est. makespan {plan.est_makespan_seconds}s")
     except Exception as _e:
         # Preflight is best-effort; continue if anything goes wrong
         print(f"Preflight guard warning: {_e}")
+        await session.rollback()
     
     # Log the incoming request for debugging
     print(f"=== BATCH RUN REQUEST DEBUG ===")
@@ -414,8 +440,6 @@ async def batch_run_template(
         print(f"Inputs: {req_dict.get('inputs')}")
     
     try:
-        batch_runner = BatchRunner()
-        
         # Execute the batch with ALS integration
         result = await batch_runner.execute_batch(
             session=session,
@@ -431,6 +455,12 @@ async def batch_run_template(
         
         return result
         
+    except BatchResumeError as e:
+        errors.conflict(
+            code="BATCH_RESUME_CONFLICT",
+            detail=str(e),
+            extra={"template_id": str(template_id)}
+        )
     except ValueError as e:
         print(f"=== BATCH RUN ERROR: ValueError ===")
         print(f"Error: {str(e)}")
@@ -457,57 +487,158 @@ async def batch_run_template(
         )
 
 
+@router.post("/templates/{template_id}/batch-plan", response_model=BatchPlanResponse)
+async def batch_plan(
+    template_id: UUID,
+    request: BatchRunRequest,
+    session: AsyncSession = Depends(get_session),
+    x_organization_id: str = Header(..., alias="X-Organization-Id")
+):
+    """
+    Estimate a batch from historical llm_telemetry before running it.
+    
+    Per-cell input/output tokens and latency come from p50/p90 percentiles
+    grouped by vendor, model and grounded (this template first, then all
+    templates, then configured defaults). The schedule is simulated under
+    the per-vendor bulkheads and the OpenAI TPM budget to give expected
+    makespan, peak TPM and cost.
+    """
+    from app.services.batch_planner import BatchPlanner
+    
+    template = await TemplateService().get_template(session, template_id, x_organization_id)
+    if not template:
+        errors.not_found(
+            code="TEMPLATE_NOT_FOUND",
+            detail=f"Template {template_id} not found",
+            extra={"template_id": str(template_id)}
+        )
+    
+    return await BatchPlanner().plan(session, str(template_id), request)
+
+
+@router.post("/templates/{template_id}/batch-run/dry-run", response_model=BatchDryRunResponse)
+async def batch_run_dry_run(
+    template_id: UUID,
+    request: BatchRunRequest,
+    session: AsyncSession = Depends(get_session),
+    x_organization_id: str = Header(..., alias="X-Organization-Id")
+):
+    """
+    Report which cells a batch-run request would execute, without executing it.
+    
+    With resume=true, cells that already have a succeeded run in the resumed
+    batch (keyed by batch_sha256 + run_index) are excluded.
+    """
+    from app.services.batch_runner import BatchRunner, BatchResumeError
+    
+    try:
+        return await BatchRunner().plan_batch(
+            session=session,
+            template_id=str(template_id),
+            request=request,
+            org_id=x_organization_id
+        )
+    except BatchResumeError as e:
+        errors.conflict(
+            code="BATCH_RESUME_CONFLICT",
+            detail=str(e),
+            extra={"template_id": str(template_id)}
+        )
+    except ValueError as e:
+        errors.not_found(
+            code="TEMPLATE_NOT_FOUND",
+            detail=str(e),
+            extra={"template_id": str(template_id)}
+        )
+
+
+@router.get("/templates/{template_id}/batches/{batch_id}/events")
+async def batch_events(
+    template_id: UUID,
+    batch_id: UUID,
+    session: AsyncSession = Depends(get_session),
+    x_organization_id: str = Header(..., alias="X-Organization-Id")
+):
+    """
+    Server-sent event stream of batch progress.
+    
+    Sends a snapshot from the runs table, then progress events pushed by the
+    batch worker over Postgres LISTEN/NOTIFY (completed, failed, in_flight,
+    eta_seconds) until the batch completes. Replaces polling /runs?batch_id=.
+    """
+    from fastapi.responses import StreamingResponse
+    from app.models.models import Batch, PromptTemplate
+    from app.db.database import async_session
+    from app.services.batch_progress import batch_snapshot, stream_batch_events
+    from sqlalchemy import select
+    
+    result = await session.execute(
+        select(Batch).join(PromptTemplate, Batch.template_id == PromptTemplate.template_id).where(
+            Batch.batch_id == batch_id,
+            Batch.template_id == template_id,
+            PromptTemplate.org_id == x_organization_id
+        )
+    )
+    batch = result.scalar_one_or_none()
+    if not batch:
+        errors.not_found(
+            code="BATCH_NOT_FOUND",
+            detail=f"Batch {batch_id} not found",
+            extra={"template_id": str(template_id), "batch_id": str(batch_id)}
+        )
+    
+    # Release the pooled connection; the stream reads its snapshot with a
+    # short session of its own, after subscribing to progress events
+    await session.close()
+    
+    async def load_snapshot():
+        async with async_session() as snapshot_session:
+            current = await snapshot_session.get(Batch, batch_id)
+            return await batch_snapshot(snapshot_session, current)
+    
+    return StreamingResponse(
+        stream_batch_events(batch_id, load_snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/templates/{template_id}/runs", response_model=RunListResponse)
 async def list_runs(
     template_id: UUID,
     session: AsyncSession = Depends(get_session),
     x_organization_id: str = Header(..., alias="X-Organization-Id"),
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     page_size: int = Query(50, ge=1, le=100),
     batch_id: Optional[UUID] = Query(None),
-    locale: Optional[str] = Query(None)
+    locale: Optional[str] = Query(None),
+    total: TotalMode = Query("exact", description="exact, approximate (opt-in planner estimate) or none"),
+    page: Optional[int] = Query(None, deprecated=True, description="Removed; use cursor")
 ):
     """
-    List runs for a template with filtering.
+    List runs for a template with filtering, newest first.
     
     Filters:
     - batch_id: Show only runs from a specific batch
     - locale: Filter by locale
-    - Pagination via page/page_size
+    - Pagination via cursor/page_size (keyset on created_at, run_id)
     """
     from app.models.models import Run
-    from sqlalchemy import select, func
-    
-    # Build query
-    query = select(Run).where(
-        Run.template_id == template_id
-    )
+    from app.services.run_listing import count_runs, fetch_page, list_query, check_page_param
     
-    # Apply filters
+    # Build filters
+    criteria = [Run.template_id == template_id]
     if batch_id:
-        query = query.where(Run.batch_id == batch_id)
+        criteria.append(Run.batch_id == batch_id)
     if locale:
-        query = query.where(Run.locale_selected == locale)
+        criteria.append(Run.locale_selected == locale)
     
-    # Count total
-    count_query = select(func.count()).select_from(Run).where(
-        Run.template_id == template_id
-    )
-    if batch_id:
-        count_query = count_query.where(Run.batch_id == batch_id)
-    if locale:
-        count_query = count_query.where(Run.locale_selected == locale)
-    
-    total_result = await session.execute(count_query)
-    total = total_result.scalar() or 0
-    
-    # Apply pagination
-    offset = (page - 1) * page_size
-    query = query.order_by(Run.created_at.desc()).limit(page_size).offset(offset)
-    
-    # Execute query
-    result = await session.execute(query)
-    runs = result.scalars().all()
+    try:
+        check_page_param(page, cursor)
+        runs, next_cursor = await fetch_page(session, list_query(*criteria), cursor, page_size)
+        total_count = await count_runs(session, *criteria, mode=total)
+    except ValueError as e:
+        errors.bad_request(code="INVALID_PAGINATION", detail=str(e))
     
     # Convert to response
     run_items = []
@@ -539,7 +670,8 @@ async def list_runs(
     
     return RunListResponse(
         runs=run_items,
-        total=total,
-        page=page,
-        page_size=page_size
+        total=total_count,
+        total_is_estimate=total == "approximate",
+        page_size=page_size,
+        next_cursor=next_cursor
     )
\ No newline at end of file
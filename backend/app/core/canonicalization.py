@@ -9,8 +9,27 @@ import math
 import re
 import unicodedata
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
-from typing import Any, Dict, List, Optional, Union
-from collections import OrderedDict
+from functools import lru_cache
+from json.encoder import encode_basestring
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Optional C-accelerated JSON backend; output is byte-identical either way
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+# Integers below this magnitude survive quantize() at the default 28-digit
+# decimal precision, so their canonical form is the integer itself
+_MAX_EXACT_INT = 10 ** 22
+
+_first = itemgetter(0)
+
+# Digit runs that may be integers outside orjson's 64-bit range
+_LONG_DIGITS = re.compile(r"\d{19}")
 
 
 class CanonicalizeError(ValueError):
@@ -26,15 +45,9 @@ def _is_real_number(x: Any) -> bool:
     return isinstance(x, (int, float, Decimal)) and not isinstance(x, bool)
 
 
-def canonicalize_number(value: Union[int, float, Decimal, str]) -> Union[int, float]:
+def _canonicalize_decimal(value: Union[int, float, Decimal, str]) -> Union[int, float]:
     """
-    Canonicalize numeric values per PRD §5:
-    - ≤6 fractional digits
-    - ROUND_HALF_UP rounding
-    - Trim trailing zeros
-    - No scientific notation
-    - Reject non-finite values
-    - Convert -0 to 0
+    Decimal-based canonicalization; the reference path behind canonicalize_number.
     """
     try:
         # Convert to Decimal for precise handling
@@ -75,6 +88,28 @@ def canonicalize_number(value: Union[int, float, Decimal, str]) -> Union[int, fl
         raise CanonicalizeError(f"Invalid number: {value}") from e
 
 
+# Repeated float values (scores, prices, coordinates) are common in outputs
+_canonicalize_float = lru_cache(maxsize=8192, typed=True)(_canonicalize_decimal)
+
+
+def canonicalize_number(value: Union[int, float, Decimal, str]) -> Union[int, float]:
+    """
+    Canonicalize numeric values per PRD §5:
+    - ≤6 fractional digits
+    - ROUND_HALF_UP rounding
+    - Trim trailing zeros
+    - No scientific notation
+    - Reject non-finite values
+    - Convert -0 to 0
+    """
+    t = type(value)
+    if t is int and -_MAX_EXACT_INT < value < _MAX_EXACT_INT:
+        return value
+    if t is float:
+        return _canonicalize_float(value)
+    return _canonicalize_decimal(value)
+
+
 def canonicalize_string(value: str, for_array: bool = False) -> str:
     """
     Canonicalize string values per PRD §5:
@@ -96,7 +131,8 @@ def canonicalize_string(value: str, for_array: bool = False) -> str:
         value = value[1:]
     
     # CRLF → LF
-    value = value.replace('\r\n', '\n').replace('\r', '\n')
+    if '\r' in value:
+        value = value.replace('\r\n', '\n').replace('\r', '\n')
     
     # Trim edges only (preserve internal whitespace)
     value = value.strip()
@@ -105,8 +141,9 @@ def canonicalize_string(value: str, for_array: bool = False) -> str:
     if for_array:
         value = value.rstrip()
     
-    # NFC normalization for Unicode consistency
-    value = unicodedata.normalize('NFC', value)
+    # NFC normalization for Unicode consistency (ASCII is always NFC)
+    if not value.isascii() and not unicodedata.is_normalized('NFC', value):
+        value = unicodedata.normalize('NFC', value)
     
     return value
 
@@ -150,10 +187,10 @@ def normalize_country_code(code: str) -> str:
     return code
 
 
-def _format_number_for_sorting(value) -> str:
+def _format_decimal(value) -> str:
     """
-    Format a number for sorting per PRD normalization rules.
-    Returns the canonical string representation.
+    Decimal-based number formatting; the reference path behind
+    _format_number_for_sorting.
     """
     try:
         d = Decimal(str(value))
@@ -169,6 +206,22 @@ def _format_number_for_sorting(value) -> str:
         raise CanonicalizeError(f"Invalid number for sorting: {value}")
 
 
+_format_float = lru_cache(maxsize=8192, typed=True)(_format_decimal)
+
+
+def _format_number_for_sorting(value) -> str:
+    """
+    Format a number for sorting per PRD normalization rules.
+    Returns the canonical string representation.
+    """
+    t = type(value)
+    if t is int and -_MAX_EXACT_INT < value < _MAX_EXACT_INT:
+        return int.__repr__(value)
+    if t is float:
+        return _format_float(value)
+    return _format_decimal(value)
+
+
 def _scalar_sort_key(v):
     """
     Generate a sort key for scalar values per PRD.
@@ -188,12 +241,8 @@ def _scalar_sort_key(v):
         raise CanonicalizeError(f"Non-scalar in scalar array: {type(v)}")
 
 
-def _canonical_dump_str(v) -> str:
-    """
-    Generate a canonical string representation of a value.
-    Uses our numeric normalization to avoid scientific notation.
-    This is used for sorting and deduplication keys.
-    """
+def _dump_scalar(v) -> str:
+    """Canonical text of a non-container value"""
     if v is None:
         return "null"
     elif isinstance(v, bool):
@@ -202,18 +251,96 @@ def _canonical_dump_str(v) -> str:
     elif _is_real_number(v):
         return _format_number_for_sorting(v)  # No scientific notation
     elif isinstance(v, str):
-        return json.dumps(v, ensure_ascii=False, separators=(',', ':'))
-    elif isinstance(v, list):
-        return "[" + ",".join(_canonical_dump_str(x) for x in v) + "]"
-    elif isinstance(v, dict):
-        return "{" + ",".join(
-            f"{json.dumps(k, ensure_ascii=False, separators=(',', ':'))}:{_canonical_dump_str(v2)}"
-            for k, v2 in sorted(v.items(), key=lambda kv: kv[0])
-        ) + "}"
+        return encode_basestring(v)
     else:
         raise CanonicalizeError(f"Unsupported type in canonical dump: {type(v)}")
 
 
+def _dump_key(k) -> str:
+    if isinstance(k, str):
+        return encode_basestring(k)
+    return json.dumps(k, ensure_ascii=False, separators=(',', ':'))
+
+
+# Exact-type dispatch for the hot path; anything else goes through _dump_scalar
+_SCALAR_DUMPERS = {
+    str: encode_basestring,
+    int: _format_number_for_sorting,
+    float: _format_number_for_sorting,
+    bool: lambda v: "true" if v else "false",
+    type(None): lambda v: "null",
+}
+
+_END = object()
+
+
+def _canonical_dump_str(v) -> str:
+    """
+    Generate a canonical string representation of a value.
+    Uses our numeric normalization to avoid scientific notation.
+    This is used for sorting and deduplication keys.
+
+    Iterative, so nesting depth is not bounded by the recursion limit.
+    Strings are escaped exactly as json.dumps(ensure_ascii=False) does.
+    """
+    out: List[str] = []
+    emit = out.append
+    # Frames: [iterator, closing bracket, first item, is_object]
+    stack: List[list] = []
+
+    while True:
+        dumper = _SCALAR_DUMPERS.get(type(v))
+        if dumper is not None:
+            emit(dumper(v))
+        elif isinstance(v, list):
+            emit("[")
+            stack.append([iter(v), "]", True, False])
+        elif isinstance(v, dict):
+            emit("{")
+            stack.append([iter(sorted(v.items(), key=_first)), "}", True, True])
+        else:
+            emit(_dump_scalar(v))
+
+        # Advance to the next value, closing finished containers
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], _END)
+            if item is _END:
+                emit(frame[1])
+                stack.pop()
+                continue
+            if frame[2]:
+                frame[2] = False
+            else:
+                emit(",")
+            if frame[3]:
+                emit(_dump_key(item[0]))
+                emit(":")
+                v = item[1]
+            else:
+                v = item
+            break
+        else:
+            return "".join(out)
+
+
+def _dump_canonical_bytes(canonical: Any, plain: bool) -> bytes:
+    """
+    UTF-8 canonical dump of an already-canonicalized value.
+
+    Trees without floats and with only string keys ("plain") serialize
+    identically under orjson with sorted keys, so they take the C path when
+    orjson is installed.
+    """
+    if plain and orjson is not None:
+        try:
+            return orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            # Integers beyond 64 bits, lone surrogates
+            pass
+    return _canonical_dump_str(canonical).encode('utf-8')
+
+
 def _sort_and_dedupe_scalar_array(arr: List[Any]) -> List[Any]:
     """
     Sort and deduplicate a scalar array using canonical JSON representation.
@@ -296,25 +423,132 @@ def canonicalize_array(
     if preserve_order:
         return canonicalized
     
+    return _sort_and_dedupe_canonical(canonicalized, element_type)
+
+
+def _sort_and_dedupe_canonical(canonicalized: List[Any], element_type: str = 'auto') -> List[Any]:
+    """Sort and deduplicate an array whose elements are already canonical"""
     # Sort and deduplicate based on type
     if element_type == 'object' or (element_type == 'auto' and canonicalized and isinstance(canonicalized[0], dict)):
-        # For objects, sort/dedupe by canonical dump (no sci-notation, stable across Python)
-        seen = set()
-        unique = []
+        # For objects, sort/dedupe by canonical dump (no sci-notation, stable across Python).
+        # Each element is dumped once; the first occurrence of a key wins.
+        unique: Dict[str, Any] = {}
         for item in canonicalized:
-            key = _canonical_dump_str(item)
-            if key in seen:
-                continue
-            seen.add(key)
-            unique.append(item)
-        # Sort by canonical dump
-        unique.sort(key=_canonical_dump_str)
-        return unique
+            unique.setdefault(_canonical_dump_str(item), item)
+        return [unique[key] for key in sorted(unique)]
     else:
         # For scalars, use the canonical sort and dedupe
         return _sort_and_dedupe_scalar_array(canonicalized)
 
 
+_SORT_ARRAY = object()
+
+
+def _canonicalize_tree(obj: Any, sort_arrays: bool, exact: bool = False) -> Tuple[Any, bool, bool]:
+    """
+    Iterative core of canonicalize_json.
+
+    Values are visited depth-first in sorted key order, exactly as the
+    recursive definition would, and written into pre-allocated containers.
+    With sort_arrays, each array is sorted/deduplicated once its elements
+    are done.
+
+    canonicalize_array re-canonicalizes elements that are already canonical.
+    That is a no-op except for canonical strings that still start with a BOM
+    (canonicalize_string removes one per pass) and mixed object arrays
+    (sorting moves a non-object first, so a second pass rejects them).
+    Elements are only re-canonicalized in exact mode, which the walk
+    restarts in when it meets either case.
+
+    Returns (canonical, plain, idempotent): plain means the result holds no
+    floats and only string keys (see _dump_canonical_bytes); idempotent
+    means canonicalizing the result again would not change it.
+    """
+    plain = True
+    root: List[Any] = [None]
+    stack: List[Tuple[Any, Any, Any]] = [(obj, root, 0)]
+    pop = stack.pop
+    push = stack.append
+
+    while stack:
+        value, parent, key = pop()
+        t = type(value)
+
+        # Exact JSON types first; subclasses fall through to the isinstance checks
+        if t is str:
+            text = canonicalize_string(value)
+            if sort_arrays and not exact and text.startswith('\ufeff'):
+                return _canonicalize_tree(obj, sort_arrays, exact=True)
+            parent[key] = text
+            continue
+        if t is int or t is float:
+            number = canonicalize_number(value)
+            if type(number) is not int:
+                plain = False
+            parent[key] = number
+            continue
+        if value is None or t is bool:
+            parent[key] = value  # Booleans pass through unchanged
+            continue
+        if value is _SORT_ARRAY:
+            if exact:
+                parent[key] = canonicalize_array(parent[key], preserve_order=False)
+                continue
+            elements = parent[key]
+            array = _sort_and_dedupe_canonical(elements)
+            if elements and isinstance(elements[0], dict) and not isinstance(array[0], dict):
+                # Mixed object array: a second pass would take the scalar path and reject it
+                return _canonicalize_tree(obj, sort_arrays, exact=True)
+            parent[key] = array
+            continue
+
+        if t is dict:
+            is_dict = True
+        elif t is list:
+            is_dict = False
+        elif isinstance(value, bool):
+            parent[key] = value
+            continue
+        elif _is_real_number(value):
+            number = canonicalize_number(value)
+            if type(number) is not int:
+                plain = False
+            parent[key] = number
+            continue
+        elif isinstance(value, str):
+            text = canonicalize_string(value)
+            if sort_arrays and not exact and text.startswith('\ufeff'):
+                return _canonicalize_tree(obj, sort_arrays, exact=True)
+            parent[key] = text
+            continue
+        elif isinstance(value, list):
+            is_dict = False
+        elif isinstance(value, dict):
+            is_dict = True
+        else:
+            raise CanonicalizeError(f"Non-JSON-serializable type: {type(value)}")
+
+        if is_dict:
+            # Always sort keys deterministically for both template and output hashing
+            items = sorted(value.items(), key=_first)
+            new = dict.fromkeys([k for k, _ in items])
+            parent[key] = new
+            for k, child in reversed(items):
+                if type(k) is not str:
+                    plain = False
+                push((child, new, k))
+        else:
+            new = [None] * len(value)
+            parent[key] = new
+            if sort_arrays:
+                # Template hashing: sort and deduplicate once elements are canonical
+                push((_SORT_ARRAY, parent, key))
+            for i in range(len(value) - 1, -1, -1):
+                push((value[i], new, i))
+
+    return root[0], plain, not exact
+
+
 def canonicalize_json(obj: Any, for_hashing: bool = True) -> Any:
     """
     Recursively canonicalize a JSON object per PRD §5.
@@ -324,44 +558,56 @@ def canonicalize_json(obj: Any, for_hashing: bool = True) -> Any:
         for_hashing: If True, apply template canonicalization (sort arrays).
                     If False, preserve array order (for output hashing).
     """
-    if obj is None:
-        return None
-    elif isinstance(obj, bool):
-        return obj  # Booleans pass through unchanged
-    elif _is_real_number(obj):
-        return canonicalize_number(obj)
-    elif isinstance(obj, str):
-        return canonicalize_string(obj)
-    elif isinstance(obj, list):
-        if for_hashing:
-            # Template hashing: sort and deduplicate arrays
-            return canonicalize_array(
-                [canonicalize_json(item, for_hashing) for item in obj],
-                preserve_order=False
-            )
-        else:
-            # Output hashing: preserve array order, just canonicalize elements
-            return [canonicalize_json(item, for_hashing) for item in obj]
-    elif isinstance(obj, dict):
-        # Always sort keys deterministically for both template and output hashing
-        items = sorted(obj.items(), key=lambda kv: kv[0])
-        result = OrderedDict(
-            (k, canonicalize_json(v, for_hashing)) for k, v in items
-        )
-        return dict(result)
-    else:
-        raise CanonicalizeError(f"Non-JSON-serializable type: {type(obj)}")
+    return _canonicalize_tree(obj, for_hashing)[0]
 
 
-def canonicalize_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+def _scan_schema(schema: Any) -> Tuple[bool, Optional[CanonicalizeError]]:
     """
-    Canonicalize JSON Schema per PRD §5:
-    - Draft 2020-12 support
-    - Resolve local $ref
-    - Sort 'required' array
-    - Forbid remote $ref
-    - Minimize then hash
+    Read-only pass over a schema in $ref check order.
+
+    Returns (plain, remote_ref_error): plain means exact JSON types, string
+    keys, no shared containers, string '$ref' values and all-string
+    'required' lists; the error is the first remote $ref found.
     """
+    seen = set()
+    ref_error = None
+    stack: List[Tuple[Any, str]] = [(schema, "")]
+
+    while stack:
+        obj, path = stack.pop()
+        t = type(obj)
+        if t is dict:
+            if id(obj) in seen:
+                return False, None
+            seen.add(id(obj))
+            if '$ref' in obj:
+                ref = obj['$ref']
+                if type(ref) is not str:
+                    return False, None
+                if ref_error is None and (ref.startswith('http://') or ref.startswith('https://')):
+                    ref_error = CanonicalizeError(f"Remote $ref not allowed at {path}: {ref}")
+            required = obj.get('required')
+            if type(required) is list and any(type(r) is not str for r in required):
+                return False, None
+            children = []
+            for key, value in obj.items():
+                if type(key) is not str:
+                    return False, None
+                children.append((value, f"{path}.{key}"))
+            stack.extend(reversed(children))
+        elif t is list:
+            if id(obj) in seen:
+                return False, None
+            seen.add(id(obj))
+            stack.extend(reversed([(item, f"{path}[{i}]") for i, item in enumerate(obj)]))
+        elif obj is not None and t not in (str, int, float, bool):
+            return False, None
+
+    return True, ref_error
+
+
+def _canonicalize_json_schema_copy(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Reference path: JSON round-trip copy, check refs, sort 'required', canonicalize"""
     # Deep copy to avoid modifying original
     schema = json.loads(json.dumps(schema))
     
@@ -398,6 +644,27 @@ def canonicalize_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
     return canonicalize_json(schema)
 
 
+def canonicalize_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Canonicalize JSON Schema per PRD §5:
+    - Draft 2020-12 support
+    - Resolve local $ref
+    - Sort 'required' array
+    - Forbid remote $ref
+    - Minimize then hash
+    
+    Plain JSON schemas skip the deep copy: canonicalize_json never mutates
+    its input, and array canonicalization re-sorts string 'required' lists
+    anyway. Anything else takes the reference path.
+    """
+    plain, ref_error = _scan_schema(schema)
+    if not plain:
+        return _canonicalize_json_schema_copy(schema)
+    if ref_error is not None:
+        raise ref_error
+    return canonicalize_json(schema)
+
+
 def compute_sha256(data: Union[str, bytes, Dict[str, Any], List[Any]]) -> str:
     """
     Compute SHA-256 hash of data for TEMPLATE hashing.
@@ -411,8 +678,8 @@ def compute_sha256(data: Union[str, bytes, Dict[str, Any], List[Any]]) -> str:
     """
     if isinstance(data, dict):
         # Canonicalize and serialize using our canonical dump to avoid scientific notation
-        canonical = canonicalize_json(data, for_hashing=True)  # Arrays sorted for templates
-        payload = _canonical_dump_str(canonical)
+        canonical, plain, _ = _canonicalize_tree(data, sort_arrays=True)  # Arrays sorted for templates
+        return hashlib.sha256(_dump_canonical_bytes(canonical, plain)).hexdigest()
     elif isinstance(data, list):
         # If a top-level list arrives, canonicalize it too
         canonical = canonicalize_array(data)
@@ -439,7 +706,10 @@ def compute_template_hash(template_config: Dict[str, Any]) -> str:
     Returns:
         SHA-256 hash of canonical template
     """
-    canonical = canonicalize_json(template_config, for_hashing=True)
+    canonical, plain, idempotent = _canonicalize_tree(template_config, sort_arrays=True)
+    if idempotent and isinstance(canonical, dict):
+        # compute_sha256 would canonicalize again to the same value
+        return hashlib.sha256(_dump_canonical_bytes(canonical, plain)).hexdigest()
     return compute_sha256(canonical)
 
 
@@ -460,6 +730,30 @@ def _normalize_text_for_hash(s: str) -> str:
     return unicodedata.normalize('NFC', s)
 
 
+def _loads(s: str) -> Any:
+    """
+    Parse JSON text, preferring orjson.
+
+    orjson is stricter than the json module (NaN/Infinity literals,
+    out-of-range numbers, escaped lone surrogates), so anything it rejects is
+    re-parsed with json to keep results identical. It also silently reads
+    integers beyond 64 bits as floats, so text with long digit runs goes
+    straight to json.
+    """
+    if orjson is not None and not _LONG_DIGITS.search(s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(s)
+
+
+def _hash_json_output(obj: Any) -> str:
+    """SHA-256 of a parsed JSON output with array order preserved"""
+    canonical, plain, _ = _canonicalize_tree(obj, sort_arrays=False)
+    return hashlib.sha256(_dump_canonical_bytes(canonical, plain)).hexdigest()
+
+
 def compute_output_hash(output: Union[str, bytes, bytearray, dict, list, Any], 
                        output_type: Optional[str] = None) -> str:
     """
@@ -477,9 +771,7 @@ def compute_output_hash(output: Union[str, bytes, bytearray, dict, list, Any],
     # Fast-path: JSON objects/arrays passed directly
     if isinstance(output, (dict, list)):
         # Direct JSON object - canonicalize with array order preserved
-        canonical = canonicalize_json(output, for_hashing=False)
-        payload = _canonical_dump_str(canonical)
-        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return _hash_json_output(output)
     
     # Bytes → decode to string
     if isinstance(output, (bytes, bytearray, memoryview)):
@@ -491,25 +783,18 @@ def compute_output_hash(output: Union[str, bytes, bytearray, dict, list, Any],
     
     # Handle string input
     if isinstance(output, str):
-        # Auto-detect type if not specified
-        if output_type is None:
-            # Try to parse as JSON
+        # Parse once: auto-detect and JSON hashing share the result
+        if output_type is None or output_type == 'json':
             try:
-                json.loads(output)
-                output_type = 'json'
-            except (json.JSONDecodeError, ValueError):
+                obj = _loads(output)
+            except ValueError:
+                # Fall back to text if JSON parsing fails. ValueError covers
+                # json's and orjson's decode errors and the int digit limit
+                # (a bare run of >4300 digits is valid JSON but not parseable)
                 output_type = 'text'
-        
-        if output_type == 'json':
-            try:
-                obj = json.loads(output)
+            else:
                 # Canonicalize with array order preserved recursively
-                canonical = canonicalize_json(obj, for_hashing=False)
-                payload = _canonical_dump_str(canonical)
-                return hashlib.sha256(payload.encode('utf-8')).hexdigest()
-            except json.JSONDecodeError:
-                # Fall back to text if JSON parsing fails
-                output_type = 'text'
+                return _hash_json_output(obj)
         
         if output_type == 'text':
             text = _normalize_text_for_hash(output)
@@ -23,6 +23,15 @@ class Settings(BaseSettings):
         None,
         description="Sync PostgreSQL URL for migrations"
     )
+    db_pool_mode: str = Field(
+        "null",
+        description="null (new connection per session, Neon serverless), queue (bounded pool) "
+                    "or pgbouncer (bounded pool, no prepared statement caching)"
+    )
+    db_pool_size: int = Field(5, description="Idle connections kept by the queue/pgbouncer pools")
+    db_max_overflow: int = Field(10, description="Extra connections allowed beyond db_pool_size")
+    db_pool_timeout: float = Field(30.0, description="Seconds to wait for a pooled connection")
+    db_pool_recycle: int = Field(1800, description="Replace pooled connections older than this (seconds)")
     
     # Phase-1 Configuration (No Redis/Celery)
     execution_mode: str = Field("sync", description="sync or celery")
@@ -66,18 +75,63 @@ class Settings(BaseSettings):
         description="ALS seed keys for HMAC"
     )
     default_seed_key_id: str = Field("k1", description="Default ALS seed key ID")
+    exa_api_key: Optional[str] = Field(None, description="Exa API key for the offline ALS harvester")
+    als_harvest_concurrency: int = Field(4, description="Concurrent searches during an ALS harvest")
+    als_harvest_cache_dir: str = Field(".cache/als_harvest", description="On-disk cache of raw harvest search results")
     
     # Batch Execution
     batch_max_size: int = Field(100, description="Maximum batch size")
     batch_rate_limit: int = Field(10, description="Requests per second")
     batch_retry_max: int = Field(3, description="Maximum retries")
     batch_drift_policy: str = Field("fail", description="hard|fail|warn")
+    batch_progress_min_interval_seconds: float = Field(0.5, description="Minimum seconds between batch progress NOTIFYs")
+    batch_progress_heartbeat_seconds: float = Field(15.0, description="SSE keep-alive interval for batch progress streams")
+    batch_webhook_max_attempts: int = Field(5, description="Delivery attempts for batch completion webhooks")
+    batch_webhook_backoff_base_seconds: float = Field(2.0, description="Base backoff seconds for webhook retries (exponential)")
+    batch_webhook_timeout_seconds: float = Field(10.0, description="HTTP timeout per webhook attempt")
+    batch_webhook_allowed_hosts: list = Field(
+        default_factory=list,
+        description="If set, the only hosts batch webhooks may target (they must still resolve to public addresses)"
+    )
+    batch_vendor_max_parallel: dict = Field(
+        default_factory=lambda: {"openai": 3, "vertex": 8, "gemini_direct": 8},
+        description="Per-vendor bulkhead concurrency for batch runs (capped by max_parallel)"
+    )
+    
+    # Structured output validation
+    json_validator_cache_size: int = Field(256, description="Compiled JSON schema validators kept in the LRU")
+    json_validation_offload_bytes: int = Field(
+        262144,
+        description="Outputs at least this large are validated in a worker thread"
+    )
+    
+    # Background task pool
+    background_workers: int = Field(4, description="Worker tasks in the background task pool")
+    background_queue_size: int = Field(100, description="Queued background tasks before submissions are rejected")
+    background_task_ttl_seconds: int = Field(3600, description="How long finished task statuses are kept")
+    
+    # Partitioning of runs and llm_telemetry
+    partition_months_ahead: int = Field(3, description="Monthly partitions created ahead of the current month")
+    runs_retention_months: int = Field(12, description="Months of runs kept attached before detaching")
+    telemetry_retention_months: int = Field(6, description="Months of llm_telemetry kept attached before detaching")
+    partition_detach_action: str = Field("archive", description="archive (move to partition_archive_schema) or drop")
+    partition_archive_schema: str = Field("archive", description="Schema that detached partitions are moved to")
+    
+    # Run payload blobs
+    run_blob_min_bytes: int = Field(256, description="Payloads smaller than this stay inline in runs")
+    run_blob_zstd_level: int = Field(9, description="zstd compression level for run blobs")
+    
+    # Bulk export (NDJSON/Parquet)
+    export_chunk_size: int = Field(5000, description="Rows fetched from the export cursor and written per chunk")
+    export_lag_seconds: int = Field(60, description="Rows younger than this are left for the next incremental export")
     
     # Idempotency
     idempotency_ttl_seconds: int = Field(
         86400,  # 24 hours
         description="Idempotency key TTL"
     )
+    idempotency_cache_size: int = Field(10000, description="Recently used idempotency keys remembered in-process (0 = off)")
+    idempotency_sweep_interval_seconds: int = Field(300, description="How often expired idempotency keys are deleted")
     
     # ------------------------------
     # OpenAI Rate Limit & Concurrency
@@ -90,6 +144,15 @@ class Settings(BaseSettings):
     openai_retry_max_attempts: int = Field(5, description="Max attempts on 429 rate limit")
     openai_backoff_base_seconds: int = Field(2, description="Base backoff seconds for 429 (exponential)")
     
+    # ------------------------------
+    # Batch Planner (telemetry-based estimates)
+    # ------------------------------
+    batch_planner_lookback_days: int = Field(30, description="Telemetry window used for batch planning")
+    batch_planner_min_samples: int = Field(5, description="Minimum telemetry rows before a group's percentiles are trusted")
+    batch_planner_default_input_tokens: int = Field(1000, description="Fallback input tokens per run without telemetry")
+    batch_planner_default_output_tokens: int = Field(6000, description="Fallback output tokens per run without telemetry")
+    batch_planner_default_latency_ms: int = Field(30000, description="Fallback latency per run without telemetry")
+    
     # ------------------------------
     # OpenAI Gating Location
     # ------------------------------
@@ -0,0 +1,232 @@
+"""
+Structured output validation against JSON Schema
+
+Validators are compiled once per canonical schema hash (the same
+canonicalization used for template hashing) and kept in a bounded LRU,
+so a batch of runs against one template compiles its schema once.
+Callers' schemas are never mutated: the strict form sent to providers and
+used for validation is a copy.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.core.canonicalization import (
+    CanonicalizeError,
+    _loads,
+    canonicalize_json_schema,
+    compute_output_hash,
+)
+from app.core.config import get_settings
+
+try:
+    import jsonschema
+    from jsonschema.validators import validator_for
+    HAS_JSONSCHEMA = True
+except ImportError:
+    jsonschema = None
+    validator_for = None
+    HAS_JSONSCHEMA = False
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 5
+
+
+def strict_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Schema with root additionalProperties defaulted to false (provider
+    strict mode). Returns a shallow copy; the input is left untouched.
+    """
+    effective = dict(schema)
+    effective.setdefault("additionalProperties", False)
+    return effective
+
+
+def schema_from_envelope(json_schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Accept either the request.meta envelope {"name": ..., "schema": {...}}
+    or a bare schema.
+    """
+    if not isinstance(json_schema, dict) or not json_schema:
+        return None
+    inner = json_schema.get("schema")
+    if isinstance(inner, dict):
+        return inner
+    return json_schema
+
+
+@dataclass
+class ValidationResult:
+    """Outcome of validating one output; valid is None when not checked"""
+    valid: Optional[bool]
+    outcome: str                      # valid|invalid|unparseable|schema_error|skipped
+    schema_sha256: Optional[str] = None
+    errors: List[str] = field(default_factory=list)
+    duration_ms: float = 0.0
+
+    def as_metadata(self) -> Dict[str, Any]:
+        return {
+            "output_json_valid": self.valid,
+            "json_validation_outcome": self.outcome,
+            "json_schema_sha256": self.schema_sha256,
+            "json_validation_errors": self.errors,
+            "json_validation_ms": round(self.duration_ms, 3),
+        }
+
+
+class ValidatorCache:
+    """
+    Thread-safe LRU of compiled validators keyed by schema hash.
+
+    The hash sorts object keys but keeps every array in order, so schemas
+    differing only in key order share one validator while prefixItems,
+    tuple-form items or enum order still tell schemas apart.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._validators: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._validators)
+
+    def get(self, schema: Dict[str, Any]) -> Tuple[str, Any]:
+        """
+        Return (schema_sha256, validator), compiling on a miss.
+
+        Raises CanonicalizeError for remote $ref and
+        jsonschema.exceptions.SchemaError for invalid schemas.
+        """
+        key = compute_output_hash(schema)
+        with self._lock:
+            validator = self._validators.get(key)
+            if validator is not None:
+                self._validators.move_to_end(key)
+                self.hits += 1
+                _record_cache_event("hit")
+                return key, validator
+
+        # Compile outside the lock; a concurrent miss on the same key just
+        # compiles twice and keeps one
+        canonicalize_json_schema(schema)  # rejects remote $ref
+        cls = validator_for(schema, default=jsonschema.Draft202012Validator)
+        cls.check_schema(schema)
+        validator = cls(schema, format_checker=cls.FORMAT_CHECKER)
+
+        with self._lock:
+            self.misses += 1
+            _record_cache_event("miss")
+            existing = self._validators.get(key)
+            if existing is not None:
+                self._validators.move_to_end(key)
+                return key, existing
+            self._validators[key] = validator
+            while len(self._validators) > self.maxsize:
+                self._validators.popitem(last=False)
+                self.evictions += 1
+                _record_cache_event("evict")
+        return key, validator
+
+    def clear(self) -> None:
+        with self._lock:
+            self._validators.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+validator_cache = ValidatorCache(get_settings().json_validator_cache_size)
+
+
+def _record_cache_event(event: str) -> None:
+    try:
+        from app.prometheus_metrics import inc_json_validator_cache
+        inc_json_validator_cache(event)
+    except Exception:
+        pass
+
+
+def _format_error(error) -> str:
+    path = "$" + "".join(f"[{p}]" if isinstance(p, int) else f".{p}" for p in error.absolute_path)
+    return f"{path}: {error.message}"
+
+
+def validate_output(
+    output: Union[str, Any],
+    schema: Optional[Dict[str, Any]] = None,
+    strict: bool = True
+) -> ValidationResult:
+    """
+    Validate an output synchronously.
+
+    Without a schema the output only has to parse as JSON. With a schema it
+    is validated against the (strict, by default) schema; if jsonschema is
+    not installed the schema check is skipped and valid is None.
+    """
+    t0 = time.perf_counter()
+
+    def done(valid, outcome, schema_sha256=None, errors=None) -> ValidationResult:
+        result = ValidationResult(
+            valid=valid,
+            outcome=outcome,
+            schema_sha256=schema_sha256,
+            errors=errors or [],
+            duration_ms=(time.perf_counter() - t0) * 1000
+        )
+        try:
+            from app.prometheus_metrics import inc_json_validation
+            inc_json_validation(outcome)
+        except Exception:
+            pass
+        return result
+
+    if isinstance(output, (str, bytes)):
+        try:
+            instance = _loads(output.decode("utf-8") if isinstance(output, bytes) else output)
+        except ValueError as e:
+            return done(False, "unparseable", errors=[f"$: invalid JSON: {e}"])
+    else:
+        instance = output
+
+    if schema is None:
+        return done(True, "valid")
+    if not HAS_JSONSCHEMA:
+        return done(None, "skipped")
+
+    try:
+        schema_sha256, validator = validator_cache.get(strict_schema(schema) if strict else schema)
+    except (CanonicalizeError, jsonschema.exceptions.SchemaError) as e:
+        logger.warning(f"JSON schema rejected for output validation: {e}")
+        return done(None, "schema_error", errors=[str(e).splitlines()[0]])
+
+    errors = []
+    for error in validator.iter_errors(instance):
+        errors.append(_format_error(error))
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+    if errors:
+        return done(False, "invalid", schema_sha256, sorted(errors))
+    return done(True, "valid", schema_sha256)
+
+
+async def validate_output_async(
+    output: Union[str, Any],
+    schema: Optional[Dict[str, Any]] = None,
+    strict: bool = True
+) -> ValidationResult:
+    """
+    validate_output, moved to a worker thread for outputs of at least
+    json_validation_offload_bytes so large documents don't stall the loop.
+    """
+    threshold = get_settings().json_validation_offload_bytes
+    if isinstance(output, (str, bytes)) and len(output) >= threshold:
+        return await asyncio.to_thread(validate_output, output, schema, strict)
+    return validate_output(output, schema, strict)
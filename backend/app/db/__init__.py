@@ -7,6 +7,7 @@ from .database import (
     get_session_context,
     init_db,
     health_check,
+    get_pool_status,
     close_db
 )
 
@@ -15,5 +16,6 @@ __all__ = [
     'get_session_context',
     'init_db',
     'health_check',
+    'get_pool_status',
     'close_db'
 ]
\ No newline at end of file
@@ -2,32 +2,25 @@
 Database connection and session management for AI Ranker V2
 Uses async SQLAlchemy with Neon PostgreSQL
 Per PRD v2.7 Phase-1
+
+The engine's pool mode comes from settings.db_pool_mode (see app.db.engine).
 """
 
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine
-)
-from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import text
 
 from app.models.base import Base
 from app.core.config import get_settings
+from app.db.engine import create_engine, pool_status
 
 
 settings = get_settings()
 
 # Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    poolclass=NullPool,  # Recommended for Neon
-    future=True
-)
+engine = create_engine(settings.database_url)
 
 # Create async session factory
 async_session = async_sessionmaker(
@@ -99,6 +92,28 @@ async def health_check() -> bool:
         return False
 
 
+async def get_table_counts() -> dict:
+    """
+    Get row counts for the main tables.
+    Useful for monitoring and debugging.
+    """
+    tables = {
+        'templates': "SELECT COUNT(*) FROM prompt_templates",
+        'runs': "SELECT COUNT(*) FROM runs",
+        'batches': "SELECT COUNT(*) FROM batches",
+        'countries': "SELECT COUNT(*) FROM countries",
+        'provider_cache': "SELECT COUNT(*) FROM provider_version_cache",
+        'idempotency_keys': "SELECT COUNT(*) FROM idempotency_keys"
+    }
+    async with async_session() as session:
+        return {name: (await session.execute(text(query))).scalar() for name, query in tables.items()}
+
+
+def get_pool_status() -> dict:
+    """Connection pool occupancy of the application engine"""
+    return pool_status(engine)
+
+
 async def close_db() -> None:
     """
     Close database connections.
@@ -0,0 +1,140 @@
+"""
+Async engine factory
+
+db_pool_mode selects how connections are managed:
+
+- null: NullPool, a new connection (and TLS handshake) per session. Suits
+  Neon's serverless endpoint and short-lived scripts.
+- queue: a bounded pool of db_pool_size connections plus db_max_overflow,
+  pinged before use and replaced after db_pool_recycle seconds.
+- pgbouncer: the queue pool in front of PgBouncer in transaction mode.
+  Consecutive statements may land on different server connections, so
+  asyncpg's statement cache is off and prepared statements get unique
+  names.
+
+Every mode reports checked-out connections, overflow and the time spent
+acquiring a connection to Prometheus.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app.core.config import get_settings
+from app.prometheus_metrics import observe_db_pool_wait, set_db_pool_usage
+
+POOL_MODES = ("null", "queue", "pgbouncer")
+
+
+class _TimedAcquire:
+    """Pool mixin observing how long each connection checkout takes"""
+
+    metrics_mode = "null"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observe_db_pool_wait(self.metrics_mode, time.perf_counter() - start)
+
+
+class TimedNullPool(_TimedAcquire, NullPool):
+    metrics_mode = "null"
+
+
+class TimedQueuePool(_TimedAcquire, AsyncAdaptedQueuePool):
+    metrics_mode = "queue"
+
+
+class PgBouncerPool(TimedQueuePool):
+    metrics_mode = "pgbouncer"
+
+
+_POOL_CLASSES = {"null": TimedNullPool, "queue": TimedQueuePool, "pgbouncer": PgBouncerPool}
+
+
+def _track_usage(engine: AsyncEngine, mode: str) -> None:
+    lock = threading.Lock()
+    checked_out = [0]
+
+    def report(delta: int) -> None:
+        with lock:
+            checked_out[0] += delta
+            count = checked_out[0]
+        pool = engine.sync_engine.pool
+        set_db_pool_usage(mode, count, pool.overflow() if isinstance(pool, AsyncAdaptedQueuePool) else None)
+
+    event.listen(engine.sync_engine, "checkout", lambda *args: report(1))
+    event.listen(engine.sync_engine, "checkin", lambda *args: report(-1))
+
+
+def engine_options(mode: Optional[str] = None, echo: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    create_async_engine keyword arguments for a pool mode (default: settings.db_pool_mode).
+
+    Raises:
+        ValueError: If mode is not one of POOL_MODES
+    """
+    settings = get_settings()
+    mode = (mode or settings.db_pool_mode).lower()
+    if mode not in POOL_MODES:
+        raise ValueError(f"Unknown db_pool_mode {mode!r}; expected one of {', '.join(POOL_MODES)}")
+
+    options: Dict[str, Any] = {
+        "echo": settings.debug if echo is None else echo,
+        "poolclass": _POOL_CLASSES[mode],
+        "future": True
+    }
+    if mode != "null":
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True
+        )
+    if mode == "pgbouncer":
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"
+        }
+    return options
+
+
+def create_engine(
+    url: Optional[str] = None,
+    mode: Optional[str] = None,
+    echo: Optional[bool] = None,
+    **overrides: Any
+) -> AsyncEngine:
+    """
+    Async engine for the configured (or given) pool mode.
+
+    Keyword overrides are passed to create_async_engine as is.
+    """
+    options = engine_options(mode, echo)
+    options.update(overrides)
+    engine = create_async_engine(url or get_settings().database_url, **options)
+    _track_usage(engine, getattr(options["poolclass"], "metrics_mode", "custom"))
+    return engine
+
+
+def pool_status(engine: AsyncEngine) -> Dict[str, Any]:
+    """Current pool occupancy, for health endpoints"""
+    pool = engine.sync_engine.pool
+    status: Dict[str, Any] = {"pool": type(pool).__name__, "mode": getattr(pool, "metrics_mode", None)}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow()
+        )
+    return status
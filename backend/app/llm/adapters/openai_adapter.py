@@ -14,6 +14,7 @@ from typing import Any, Dict, List, Optional, Tuple
 from openai import AsyncOpenAI
 
 from app.core.config import get_settings
+from app.core.json_validation import schema_from_envelope, strict_schema
 # GroundingRequiredFailedError removed - REQUIRED enforcement now in router only
 from app.llm.models import OPENAI_ALLOWED_MODELS, validate_model
 from app.llm.als_config import ALSConfig
@@ -148,14 +149,16 @@ class OpenAIAdapter:
         
         # Add JSON schema if requested
         json_schema = request.meta.get("json_schema") if request.meta else None
-        if json_schema:
-            schema = json_schema.get("schema", {})
-            if "additionalProperties" not in schema:
-                schema["additionalProperties"] = False
+        inner_schema = schema_from_envelope(json_schema)
+        if inner_schema is not None:
+            # Strict copy of the same schema the output is validated against
+            # (envelope or bare); the caller's schema is left untouched
+            schema = strict_schema(inner_schema)
+            name = json_schema.get("name") if inner_schema is not json_schema else None
             payload["text"] = {
                 "format": {
                     "type": "json_schema",
-                    "name": json_schema.get("name", "Output"),
+                    "name": name or "Output",
                     "schema": schema,
                     "strict": True
                 }
@@ -8,6 +8,9 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from app.llm.sketches import DDSketch
+from app.prometheus_metrics import inc_llm_metric
+
 logger = logging.getLogger(__name__)
 
 class LLMMetrics:
@@ -36,25 +39,26 @@ class LLMMetrics:
             "errors.rate_limit": 0,
         }
         
+        # Fixed-size quantile sketches: memory stays flat however long the
+        # worker lives, and sketches from several workers can be merged
         self.histograms = {
-            "latency.total_ms": [],
-            "latency.grounding_ms": [],
-            "citations.count": [],
-            "tokens.prompt": [],
-            "tokens.completion": [],
+            "latency.total_ms": DDSketch(),
+            "latency.grounding_ms": DDSketch(),
+            "citations.count": DDSketch(),
+            "tokens.prompt": DDSketch(),
+            "tokens.completion": DDSketch(),
         }
     
     def increment(self, metric: str, value: int = 1):
         """Increment a counter metric"""
         if metric in self.counters:
             self.counters[metric] += value
-            self._emit_metric("counter", metric, self.counters[metric])
+            self._emit_metric("counter", metric, value)
     
     def record(self, metric: str, value: float):
         """Record a histogram/gauge metric"""
         if metric in self.histograms:
-            self.histograms[metric].append(value)
-            self._emit_metric("histogram", metric, value)
+            self.histograms[metric].add(value)
     
     def emit_structured_log(self, 
                            event: str,
@@ -73,10 +77,34 @@ class LLMMetrics:
         logger.info(f"[METRICS] {json.dumps(log_entry)}")
         
     def _emit_metric(self, metric_type: str, name: str, value: Any):
-        """Emit metric to monitoring system (stub for integration)"""
-        # This would integrate with your monitoring system
-        # (Prometheus, Datadog, CloudWatch, etc.)
-        pass
+        """Export a counter increment through the Prometheus registry"""
+        if metric_type == "counter":
+            inc_llm_metric(name, value)
+    
+    def merge(self, other: "LLMMetrics"):
+        """Fold another worker's metrics into this instance"""
+        for name, value in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for name, sketch in other.histograms.items():
+            if name in self.histograms:
+                self.histograms[name].merge(sketch)
+            else:
+                self.histograms[name] = DDSketch.from_dict(sketch.to_dict())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialisable state, for merging across workers with from_dict/merge"""
+        return {
+            "counters": self.counters.copy(),
+            "histograms": {k: v.to_dict() for k, v in self.histograms.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LLMMetrics":
+        instance = cls()
+        instance.counters.update(data.get("counters", {}))
+        for name, sketch in data.get("histograms", {}).items():
+            instance.histograms[name] = DDSketch.from_dict(sketch)
+        return instance
     
     def get_summary(self) -> Dict[str, Any]:
         """Get summary of metrics for dashboard/reporting"""
@@ -84,10 +112,13 @@ class LLMMetrics:
             "counters": self.counters.copy(),
             "histograms": {
                 k: {
-                    "count": len(v),
-                    "min": min(v) if v else 0,
-                    "max": max(v) if v else 0,
-                    "avg": sum(v) / len(v) if v else 0
+                    "count": v.count,
+                    "min": v.min if v.count else 0,
+                    "max": v.max if v.count else 0,
+                    "avg": v.sum / v.count if v.count else 0,
+                    "p50": v.quantile(0.5) if v.count else 0,
+                    "p90": v.quantile(0.9) if v.count else 0,
+                    "p99": v.quantile(0.99) if v.count else 0
                 }
                 for k, v in self.histograms.items()
             }
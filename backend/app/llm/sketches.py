@@ -0,0 +1,151 @@
+"""
+Fixed-size, mergeable quantile sketches for in-process LLM metrics.
+
+DDSketch (Masson et al., VLDB 2019): values are counted in logarithmic
+buckets, so any quantile is returned within a relative error of
+``relative_accuracy`` of an actual observation, memory is bounded by
+``max_bins`` whatever the number of observations, and two sketches built
+with the same accuracy merge exactly by adding bucket counts. Workers
+ship ``to_dict()`` and an aggregator folds them in with ``merge``.
+"""
+
+import math
+from typing import Any, Dict, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# At 1% accuracy, 2048 buckets span ~18 decades (1e-3 .. 1e15) before any
+# collapsing happens
+DEFAULT_MAX_BINS = 2048
+# Values closer to zero than this are counted in the zero bucket
+MIN_INDEXABLE = 1e-9
+
+
+class DDSketch:
+    """Relative-error quantile sketch with a bounded number of buckets"""
+
+    __slots__ = (
+        "relative_accuracy", "max_bins", "_gamma", "_multiplier",
+        "_positive", "_negative", "zero_count", "count", "sum", "min", "max"
+    )
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_bins: int = DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        if max_bins < 1:
+            raise ValueError("max_bins must be positive")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._multiplier = 1 / math.log(self._gamma)
+        # bucket key -> count; key k holds (gamma^(k-1), gamma^k]
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        """Number of occupied buckets (bounded by max_bins per sign)"""
+        return len(self._positive) + len(self._negative)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Record value, count times"""
+        if value > MIN_INDEXABLE:
+            bins = self._positive
+            key = math.ceil(math.log(value) * self._multiplier)
+        elif value < -MIN_INDEXABLE:
+            bins = self._negative
+            key = math.ceil(math.log(-value) * self._multiplier)
+        else:
+            bins = None
+            self.zero_count += count
+        if bins is not None:
+            if key in bins:
+                bins[key] += count
+            else:
+                bins[key] = count
+                if len(bins) > self.max_bins:
+                    self._collapse(bins)
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _collapse(self, bins: Dict[int, int]) -> None:
+        """Fold the buckets nearest zero into one, keeping max_bins buckets"""
+        keys = sorted(bins)
+        excess = len(keys) - self.max_bins
+        if excess <= 0:
+            return
+        target = keys[excess]
+        bins[target] += sum(bins.pop(key) for key in keys[:excess])
+
+    def _value(self, key: int) -> float:
+        # Midpoint in relative terms of (gamma^(k-1), gamma^k]
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0..1), or None when empty"""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def merge(self, other: "DDSketch") -> None:
+        """Add other's observations to this sketch"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for mine, theirs in ((self._positive, other._positive), (self._negative, other._negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+            self._collapse(mine)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable state, for shipping to another process"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_bins": self.max_bins,
+            "positive": {str(k): v for k, v in self._positive.items()},
+            "negative": {str(k): v for k, v in self._negative.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(data["relative_accuracy"], data["max_bins"])
+        sketch._positive = {int(k): v for k, v in data["positive"].items()}
+        sketch._negative = {int(k): v for k, v in data["negative"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
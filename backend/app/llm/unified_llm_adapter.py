@@ -20,6 +20,7 @@ from app.llm.als_config import ALSConfig
 from app.models.models import LLMTelemetry
 from app.services.als.als_builder import ALSBuilder
 from app.core.config import get_settings
+from app.core.json_validation import schema_from_envelope, validate_output_async
 
 
 settings = get_settings()
@@ -733,6 +734,17 @@ class UnifiedLLMAdapter:
         except Exception as e:
             logger.warning(f"[ALS_HARDENING] Failed to propagate ALS metadata: {e}")
         
+        # Step 3b: Structured output validation (json_mode or meta.json_schema)
+        json_schema = schema_from_envelope(request.meta.get('json_schema') if request.meta else None)
+        if response.success and (request.json_mode or json_schema is not None):
+            try:
+                validation = await validate_output_async(response.content or "", json_schema)
+                if response.metadata is None:
+                    response.metadata = {}
+                response.metadata.update(validation.as_metadata())
+            except Exception as e:
+                logger.warning(f"[JSON_VALIDATION] Output validation failed: {e}")
+        
         # Step 4: Emit telemetry if session provided
         if session:
             await self._emit_telemetry(request, response, session)
@@ -978,7 +990,13 @@ class UnifiedLLMAdapter:
                 'finish_reason': response.metadata.get('finish_reason') if hasattr(response, 'metadata') else None,
                 
                 # Thinking budget telemetry
-                'thinking_budget_tokens': request.metadata.get('thinking_budget_tokens') if hasattr(request, 'metadata') else None
+                'thinking_budget_tokens': request.metadata.get('thinking_budget_tokens') if hasattr(request, 'metadata') else None,
+                
+                # Structured output validation
+                'output_json_valid': response.metadata.get('output_json_valid') if hasattr(response, 'metadata') else None,
+                'json_validation_outcome': response.metadata.get('json_validation_outcome') if hasattr(response, 'metadata') else None,
+                'json_schema_sha256': response.metadata.get('json_schema_sha256') if hasattr(response, 'metadata') else None,
+                'json_validation_ms': response.metadata.get('json_validation_ms') if hasattr(response, 'metadata') else None
             }
             
             # Cheap derived metric for dashboards - citations count
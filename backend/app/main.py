@@ -6,6 +6,7 @@ Phase-1: FastAPI + Neon (no Redis/Celery)
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
@@ -14,7 +15,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import our database and models
-from app.db.database import init_db
+from app.db.database import init_db, get_pool_status
 from app.api.routes import api_router
 from app.api.errors import APIError
 from app.core.config import get_settings
@@ -44,9 +45,23 @@ async def lifespan(app: FastAPI):
         logger.error(f"Database initialization failed: {e}")
         raise
     
+    # Expired idempotency keys are swept here, not on the request path
+    from app.db.database import engine
+    from app.services.idempotency import run_sweeper
+    idempotency_sweeper = asyncio.create_task(run_sweeper(engine))
+    
     yield
     
     logger.info("Shutting down AI Ranker V2")
+    idempotency_sweeper.cancel()
+    
+    # Release the batch progress LISTEN connection
+    from app.services.batch_progress import listener as batch_progress_listener
+    await batch_progress_listener.close()
+
+    # Let queued background runs finish before the event loop goes away
+    from app.services.background_runner import background_runner
+    await background_runner.shutdown()
 
 # Create app
 app = FastAPI(
@@ -130,5 +145,6 @@ async def health_check():
             "database": "operational",
             "canonicalization": "operational",
             "provider_cache": "operational"
-        }
+        },
+        "database_pool": get_pool_status()
     }
\ No newline at end of file
@@ -9,11 +9,11 @@ from typing import Optional
 from uuid import uuid4
 
 from sqlalchemy import (
-    Boolean, Column, DateTime, ForeignKey, Integer,
-    String, Text, UniqueConstraint, Index, JSON, Numeric
+    DDL, BigInteger, Boolean, Column, DateTime, ForeignKey, Integer, LargeBinary, SmallInteger,
+    String, Text, UniqueConstraint, Index, JSON, Numeric, event, text
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 
 from .base import Base
@@ -81,12 +81,16 @@ class Run(Base):
     grounded_effective = Column(Boolean, nullable=False, default=False)
     json_mode = Column(Boolean, nullable=False, default=False)
     
-    # Request/Response tracking
-    request_json = Column(JSON, nullable=False, default={})
-    output_text = Column(Text, nullable=False, default='')
-    response_json = Column(JSON, nullable=False, default={})
+    # Request/Response tracking; a NULL payload is stored in run_blobs under its hash
+    request_json = Column(JSON, default={})
+    request_sha256 = Column(String(64))
+    output_text = Column(Text, default='')
+    response_json = Column(JSON, default={})
+    response_sha256 = Column(String(64))
     response_output_sha256 = Column(String(64), index=True)
     output_json_valid = Column(Boolean)
+    # Full-text search vector, maintained by the runs_output_tsv trigger
+    output_tsv = deferred(Column(TSVECTOR))
     
     # Performance metrics
     latency_ms = Column(Integer, nullable=False, default=0)
@@ -127,14 +131,105 @@ class Run(Base):
     
     # Indexes
     __table_args__ = (
-        Index('idx_template_runs', 'template_id', 'created_at'),
+        # Keyset pagination on (created_at, run_id), scanned backwards for newest first
+        Index('idx_template_runs_keyset', 'template_id', 'created_at', 'run_id'),
+        Index('idx_runs_created_keyset', 'created_at', 'run_id'),
         Index('idx_batch_runs', 'batch_id', 'batch_run_index'),
+        Index('idx_runs_output_tsv', 'output_tsv', postgresql_using='gin'),
     )
     
     def __repr__(self):
         return f"<Run(id={self.run_id}, template={self.template_id})>"
 
 
+class RunBlob(Base):
+    """
+    Compressed run payload shared by every run with the same content (app.services.run_blobs)
+    """
+    __tablename__ = 'run_blobs'
+    
+    sha256 = Column(String(64), primary_key=True)
+    codec = Column(String(10), nullable=False)
+    raw_bytes = Column(Integer, nullable=False)
+    stored_bytes = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    refcount = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.current_timestamp())
+
+
+class ExportWatermark(Base):
+    """
+    Last row exported to a target by app.services.exports, per target name
+    """
+    __tablename__ = 'export_watermarks'
+    
+    target = Column(String(100), primary_key=True)
+    last_created_at = Column(DateTime(timezone=True), nullable=False)
+    last_key = Column(String(64), nullable=False)
+    rows_exported = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.current_timestamp())
+
+
+class RunBrandRank(Base):
+    """
+    Ordered brands extracted from a run's output, one row per position.
+    locale/model/created_at are copied from the run for rank-trend queries.
+    """
+    __tablename__ = 'run_brand_ranks'
+    
+    run_id = Column(UUID(as_uuid=True), primary_key=True)  # runs is partitioned: no FK on run_id alone
+    position = Column(SmallInteger, primary_key=True)
+    brand = Column(String(255), nullable=False)
+    alias = Column(String(255), nullable=False)
+    source = Column(String(8), nullable=False)  # list|prose
+    locale = Column(String(10))
+    model = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index('idx_run_brand_ranks_lookup', 'brand', 'locale', 'model', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<RunBrandRank(run={self.run_id}, position={self.position}, brand={self.brand})>"
+
+
+class RunLeakScan(Base):
+    """
+    One row per run checked by the ALS leakage audit (with or without findings)
+    """
+    __tablename__ = 'run_leak_scans'
+    
+    run_id = Column(UUID(as_uuid=True), primary_key=True)  # runs is partitioned: no FK on run_id alone
+    als_block_sha256 = Column(String(64))
+    country = Column(String(8))
+    finding_count = Column(Integer, nullable=False, default=0)
+    scanned_at = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+    
+    def __repr__(self):
+        return f"<RunLeakScan(run={self.run_id}, findings={self.finding_count})>"
+
+
+class RunLeakFinding(Base):
+    """
+    A leaked ALS phrase, country term or context cue found in a run's output
+    """
+    __tablename__ = 'run_leak_findings'
+    
+    run_id = Column(UUID(as_uuid=True), primary_key=True)  # runs is partitioned: no FK on run_id alone
+    kind = Column(String(16), primary_key=True)  # als_phrase|country_term|context_cue
+    phrase = Column(String(255), primary_key=True)
+    occurrences = Column(Integer, nullable=False, default=1)
+    first_offset = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_run_leak_findings_phrase', 'kind', 'phrase'),
+    )
+    
+    def __repr__(self):
+        return f"<RunLeakFinding(run={self.run_id}, kind={self.kind}, phrase={self.phrase})>"
+
+
 class Batch(Base):
     """
     Batches table for batch execution tracking
@@ -160,6 +255,9 @@ class Batch(Base):
     # Status
     status = Column(String(20), default='pending')
     
+    # Adaptive mode: per-cell replicate counts and stopping reasons
+    cell_summary = Column(JSON)
+    
     # Metadata
     created_by = Column(String(255))
     created_at = Column(DateTime(timezone=True), server_default=func.current_timestamp())
@@ -279,15 +377,100 @@ class LLMTelemetry(Base):
     error_type = Column(String(100))
     template_id = Column(UUID(as_uuid=True))  # Optional link to template
     run_id = Column(String(255))  # Optional run identifier
-    meta = Column(JSON)  # Rich metadata: ALS, grounding, citations, feature flags
+    meta = Column(JSONB)  # Rich metadata: ALS, grounding, citations, feature flags
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
+    # Hot meta fields, set from meta by the llm_telemetry_meta_columns trigger
+    # (created by alembic 20261018_telemetry_meta_columns, or by create_all below)
+    als_country = Column(Text)
+    grounding_mode_requested = Column(Text)
+    response_api = Column(Text)
+    finish_reason = Column(Text)
+    why_not_grounded = Column(Text)
+    citations_count = Column(Integer)
+    tool_call_count = Column(Integer)
+    
     # Indexes for analysis
     __table_args__ = (
         Index('idx_llm_telemetry_vendor_model', 'vendor', 'model'),
         Index('idx_llm_telemetry_created_at', 'created_at'),
         Index('idx_llm_telemetry_template_id', 'template_id'),
+        Index(
+            'idx_llm_telemetry_vendor_api_created', 'vendor', 'response_api', 'created_at',
+            postgresql_include=['grounded']
+        ),
+        Index(
+            'idx_llm_telemetry_als_country_created', 'als_country', 'created_at',
+            postgresql_where=text('als_country IS NOT NULL')
+        ),
+        Index(
+            'idx_llm_telemetry_finish_reason_created', 'vendor', 'finish_reason', 'created_at',
+            postgresql_where=text('finish_reason IS NOT NULL')
+        ),
+        Index(
+            'idx_llm_telemetry_required_failures', 'created_at',
+            postgresql_include=['vendor', 'why_not_grounded'],
+            postgresql_where=text("grounded AND NOT grounded_effective AND grounding_mode_requested = 'REQUIRED'")
+        ),
+        Index(
+            'idx_llm_telemetry_grounded_citations', 'created_at',
+            postgresql_include=['vendor', 'tool_call_count', 'citations_count'],
+            postgresql_where=text('grounded_effective')
+        ),
     )
     
     def __repr__(self):
-        return f"<LLMTelemetry(id={self.id}, vendor={self.vendor}, model={self.model})>"
\ No newline at end of file
+        return f"<LLMTelemetry(id={self.id}, vendor={self.vendor}, model={self.model})>"
+
+
+# Same trigger as alembic 20261018_telemetry_meta_columns, so databases built
+# with Base.metadata.create_all (init_db) fill the hot meta columns too
+TELEMETRY_META_TEXT_FIELDS = ('als_country', 'grounding_mode_requested', 'response_api', 'finish_reason', 'why_not_grounded')
+TELEMETRY_META_INT_FIELDS = ('citations_count', 'tool_call_count')
+
+_telemetry_meta_assignments = ";\n".join(
+    [f"    NEW.{field} := NULLIF(NEW.meta->>'{field}', '')" for field in TELEMETRY_META_TEXT_FIELDS]
+    + [
+        f"    NEW.{field} := CASE WHEN NEW.meta->>'{field}' ~ '^-?[0-9]{{1,9}}$' "
+        f"THEN (NEW.meta->>'{field}')::integer END"
+        for field in TELEMETRY_META_INT_FIELDS
+    ]
+)
+event.listen(LLMTelemetry.__table__, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION llm_telemetry_meta_columns() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+{_telemetry_meta_assignments};
+    RETURN NEW;
+END
+$$
+""").execute_if(dialect="postgresql"))
+event.listen(LLMTelemetry.__table__, "after_create", DDL("""
+CREATE TRIGGER llm_telemetry_meta_columns
+BEFORE INSERT OR UPDATE OF meta ON llm_telemetry
+FOR EACH ROW EXECUTE FUNCTION llm_telemetry_meta_columns()
+""").execute_if(dialect="postgresql"))
+
+# Same trigger as alembic 20261018_run_dependents_cleanup. runs is partitioned,
+# so these tables have no foreign key to cascade from; deleting a run deletes
+# their rows instead (detaching a partition fires no trigger, see
+# app.services.partitions)
+RUN_DEPENDENT_TABLES = ('run_brand_ranks', 'run_leak_scans', 'run_leak_findings')
+
+_run_dependent_deletes = "\n".join(
+    f"    DELETE FROM {table} WHERE run_id = OLD.run_id;" for table in RUN_DEPENDENT_TABLES
+)
+event.listen(Run.__table__, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION runs_delete_dependents() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+{_run_dependent_deletes}
+    RETURN OLD;
+END
+$$
+""").execute_if(dialect="postgresql"))
+event.listen(Run.__table__, "after_create", DDL("""
+CREATE TRIGGER runs_delete_dependents
+AFTER DELETE ON runs
+FOR EACH ROW EXECUTE FUNCTION runs_delete_dependents()
+""").execute_if(dialect="postgresql"))
@@ -95,6 +95,73 @@ OPENAI_TPM_WINDOW_DEFERRALS = Counter(
     [],
     registry=REGISTRY,
 )
+
+# Batch scheduling
+BATCH_VENDOR_INFLIGHT = Gauge(
+    "contestra_batch_vendor_inflight",
+    "Number of in-flight batch runs per vendor bulkhead",
+    ["vendor"],
+    registry=REGISTRY,
+)
+
+# Structured output validation
+JSON_OUTPUT_VALIDATIONS = Counter(
+    "contestra_json_output_validations_total",
+    "JSON output validation results",
+    ["outcome"],  # valid|invalid|unparseable|schema_error|skipped
+    registry=REGISTRY,
+)
+JSON_VALIDATOR_CACHE_EVENTS = Counter(
+    "contestra_json_validator_cache_events_total",
+    "Compiled JSON schema validator cache events",
+    ["event"],  # hit|miss|evict
+    registry=REGISTRY,
+)
+# Background task pool
+BACKGROUND_TASKS_SUBMITTED = Counter(
+    "contestra_background_tasks_submitted_total",
+    "Background task submissions",
+    ["outcome"],  # accepted|rejected
+    registry=REGISTRY,
+)
+BACKGROUND_TASKS_FINISHED = Counter(
+    "contestra_background_tasks_finished_total",
+    "Background tasks finished by the worker pool",
+    ["status"],  # completed|failed
+    registry=REGISTRY,
+)
+BACKGROUND_QUEUE_DEPTH = Gauge(
+    "contestra_background_queue_depth",
+    "Background tasks waiting for a worker",
+    registry=REGISTRY,
+)
+# Database connection pool
+DB_POOL_CHECKED_OUT = Gauge(
+    "contestra_db_pool_checked_out",
+    "Database connections currently checked out",
+    ["mode"],  # null|queue|pgbouncer
+    registry=REGISTRY,
+)
+DB_POOL_OVERFLOW = Gauge(
+    "contestra_db_pool_overflow",
+    "Connections open beyond pool_size (negative while the pool is not full)",
+    ["mode"],
+    registry=REGISTRY,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "contestra_db_pool_wait_seconds",
+    "Time to get a connection from the pool (includes connecting when none is idle)",
+    ["mode"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    registry=REGISTRY,
+)
+# LLM adapter/router counters (app.llm.observability)
+LLM_METRIC_EVENTS = Counter(
+    "contestra_llm_metric_events_total",
+    "LLM adapter and router counters from app.llm.observability",
+    ["metric"],  # fixed set of LLMMetrics counter names
+    registry=REGISTRY,
+)
 # --- Update helpers ---
 
 _STATUS_VALUES = {"ok": 0, "warn": 1, "error": 2}
@@ -197,6 +264,64 @@ def inc_tpm_deferrals() -> None:
         OPENAI_TPM_WINDOW_DEFERRALS.inc()
     except Exception:
         pass
+
+# --- Batch scheduling helpers ---
+def set_batch_vendor_inflight(vendor: str, n: int) -> None:
+    try:
+        BATCH_VENDOR_INFLIGHT.labels(vendor=vendor).set(float(n))
+    except Exception:
+        pass
+
+# --- Structured output validation helpers ---
+def inc_json_validation(outcome: str) -> None:
+    try:
+        JSON_OUTPUT_VALIDATIONS.labels(outcome=outcome).inc()
+    except Exception:
+        pass
+
+def inc_json_validator_cache(event: str) -> None:
+    try:
+        JSON_VALIDATOR_CACHE_EVENTS.labels(event=event).inc()
+    except Exception:
+        pass
+# --- Background task pool helpers ---
+def inc_background_submission(outcome: str) -> None:
+    try:
+        BACKGROUND_TASKS_SUBMITTED.labels(outcome=outcome).inc()
+    except Exception:
+        pass
+
+def inc_background_finished(status: str) -> None:
+    try:
+        BACKGROUND_TASKS_FINISHED.labels(status=status).inc()
+    except Exception:
+        pass
+
+def set_background_queue_depth(n: int) -> None:
+    try:
+        BACKGROUND_QUEUE_DEPTH.set(float(n))
+    except Exception:
+        pass
+# --- Database pool helpers ---
+def set_db_pool_usage(mode: str, checked_out: int, overflow: Optional[int] = None) -> None:
+    try:
+        DB_POOL_CHECKED_OUT.labels(mode=mode).set(float(checked_out))
+        if overflow is not None:
+            DB_POOL_OVERFLOW.labels(mode=mode).set(float(overflow))
+    except Exception:
+        pass
+
+def observe_db_pool_wait(mode: str, seconds: float) -> None:
+    try:
+        DB_POOL_WAIT_SECONDS.labels(mode=mode).observe(seconds)
+    except Exception:
+        pass
+# --- LLM observability helpers ---
+def inc_llm_metric(metric: str, value: float = 1) -> None:
+    try:
+        LLM_METRIC_EVENTS.labels(metric=metric).inc(value)
+    except Exception:
+        pass
 # --- FastAPI route ---
 
 if APIRouter is not None:
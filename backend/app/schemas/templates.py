@@ -4,14 +4,15 @@ Per PRD v2.7 Section 6
 """
 
 from datetime import datetime
-from typing import Any, Dict, Optional, List, Literal
+from typing import Annotated, Any, Dict, Optional, List, Literal
 from uuid import UUID
-from pydantic import BaseModel, Field, AliasChoices
+from pydantic import BaseModel, Field, AliasChoices, HttpUrl, UrlConstraints
 
 # Enums
 GroundingMode = Literal["UNGROUNDED", "PREFERRED", "REQUIRED"]
 DriftPolicy = Literal["hard", "fail", "warn"]
 ProviderType = Literal["openai", "vertex", "gemini"]
+HttpsUrl = Annotated[HttpUrl, UrlConstraints(allowed_schemes=["https"])]
 
 
 class TemplateCreate(BaseModel):
@@ -78,6 +79,7 @@ class RunTemplateResponse(BaseModel):
     run_id: str
     template_id: str
     output_text: str
+    response_output_sha256: Optional[str] = None
     grounded_requested: bool
     grounded_effective: bool
     vendor: str
@@ -196,6 +198,44 @@ class BatchRunRequest(BaseModel):
         default_factory=dict,
         description="Template input variables"
     )
+    resume: bool = Field(
+        False,
+        description="Resume an earlier batch with the same configuration, executing only missing or failed cells"
+    )
+    resume_batch_id: Optional[UUID] = Field(
+        None,
+        description="Batch to resume (defaults to the latest batch with the same batch_sha256)"
+    )
+    adaptive: bool = Field(
+        False,
+        description="Run replicates in rounds and stop cells early once their outputs are stable"
+    )
+    adaptive_min_replicates: int = Field(
+        2,
+        ge=1,
+        le=10,
+        description="Replicates every cell gets before early stopping is considered"
+    )
+    adaptive_max_replicates: int = Field(
+        10,
+        ge=1,
+        le=50,
+        description="Upper bound of replicates for an unstable cell"
+    )
+    adaptive_confidence: float = Field(
+        0.9,
+        gt=0.0,
+        le=1.0,
+        description="Share of replicates that must agree before a cell stops"
+    )
+    brands: Optional[List[str]] = Field(
+        None,
+        description="Brands whose mention agreement also counts as stability in adaptive mode"
+    )
+    webhook_url: Optional[HttpsUrl] = Field(
+        None,
+        description="https URL on a public host that receives the batch result (POST, HMAC-signed) when the batch finishes"
+    )
 
 
 class BatchRunResponse(BaseModel):
@@ -212,11 +252,85 @@ class BatchRunResponse(BaseModel):
     failed_runs: Optional[int] = None
     created_at: datetime
     run_ids: Optional[List[str]] = None
+    cell_summary: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description="Adaptive mode: replicates and stopping reason per model×locale×grounding cell"
+    )
     
     class Config:
         from_attributes = True
 
 
+class BatchCell(BaseModel):
+    """One cell of a batch expansion"""
+    
+    run_index: int
+    model: str
+    vendor: str
+    locale: str
+    grounding_mode: str
+    replicate: int
+
+
+class BatchDryRunResponse(BaseModel):
+    """Response for POST /v1/templates/{id}/batch-run/dry-run"""
+    
+    template_id: UUID
+    batch_sha256: str
+    resume_batch_id: Optional[UUID] = None
+    total_runs: int
+    skipped_runs: int
+    pending_runs: int
+    cells: List[BatchCell]
+
+
+class BatchPlanGroup(BaseModel):
+    """Per (vendor, model, grounded) estimate within a batch plan"""
+    
+    vendor: str
+    model: str
+    grounded: bool
+    runs: int
+    source: Literal["template", "global", "default"] = Field(
+        ..., description="Where the percentiles came from"
+    )
+    samples: int
+    input_tokens_p50: float
+    input_tokens_p90: float
+    output_tokens_p50: float
+    output_tokens_p90: float
+    latency_ms_p50: float
+    latency_ms_p90: float
+    est_cost_cents: float
+    est_cost_cents_p90: float
+
+
+class BatchPlanResponse(BaseModel):
+    """Response for POST /v1/templates/{id}/batch-plan"""
+    
+    template_id: UUID
+    total_runs: int
+    groups: List[BatchPlanGroup]
+    est_input_tokens: float
+    est_output_tokens: float
+    est_cost_cents: float
+    est_cost_cents_p90: float
+    est_makespan_seconds: float
+    est_makespan_seconds_p90: float
+    vendor_makespan_seconds: Dict[str, float]
+    peak_tpm: int
+    openai_runs: int
+    openai_est_tokens: int
+    openai_max_tokens_per_run: int
+    tpm_budget: int
+    spread_over_time: bool = Field(
+        ..., description="OpenAI tokens exceed one minute of TPM budget; launches will be paced"
+    )
+    feasible: bool = Field(
+        ..., description="False if a single OpenAI run exceeds the per-minute TPM budget"
+    )
+
+
 class ProviderVersionsResponse(BaseModel):
     """Response for GET /v1/providers/{provider}/versions"""
     
@@ -250,9 +364,10 @@ class RunListResponse(BaseModel):
     """Response for GET /v1/templates/{id}/runs"""
     
     runs: List[RunResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     page_size: int
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor for the next page; None on the last page")
     
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -1,17 +1,161 @@
 """
 ALS Harvester - Uses Exa to bootstrap/refresh civic terms
 Run quarterly or when adding new countries
+
+Searches for all countries and queries run concurrently, bounded by a
+shared semaphore. Raw search results are cached on disk per
+(query, country, date), so a re-run on the same day (or a run that failed
+half way) does not repeat searches. dry_run swaps Exa for a local stub
+backend so the pipeline can be exercised without network or API key.
 """
 
 import asyncio
-import httpx
+import hashlib
 import json
-from typing import Dict, List, Set
-from datetime import datetime
+import os
+import re
+import tempfile
+from datetime import date, datetime
+from typing import Dict, List, Optional, Protocol
+from urllib.parse import urlparse
+
+import httpx
+
 from app.core.config import get_settings
 
 settings = get_settings()
 
+# Words that mark the start of a civic phrase (matched inside words, any case)
+CIVIC_KEYWORDS = (
+    'ausweis', 'führerschein', 'passport', 'license',
+    'termin', 'antrag', 'application', 'renewal',
+    'steuer', 'tax', 'registration', 'permit'
+)
+_CIVIC_KEYWORD = re.compile('|'.join(map(re.escape, CIVIC_KEYWORDS)), re.IGNORECASE)
+
+# Country-specific formatting patterns: postal, phone, currency
+FORMAT_PATTERNS = {
+    'DE': {
+        'postal': re.compile(r'\b\d{5}\s+[A-Z][a-zäöüß]+\b'),  # 5 digits + city
+        'phone': re.compile(r'\+49\s+\d{2,3}\s+[\d\s]+'),
+        'currency': re.compile(r'\d+[,\.]\d{2}\s*€'),
+    },
+    'CH': {
+        'postal': re.compile(r'\b\d{4}\s+[A-Z][a-zäöü]+\b'),  # 4 digits + city
+        'phone': re.compile(r'\+41\s+\d{2}\s+[\d\s]+'),
+        'currency': re.compile(r'CHF\s*\d+[\.]\d{2}'),
+    },
+    'US': {
+        'postal': re.compile(r'[A-Z][a-z]+,\s+[A-Z]{2}\s+\d{5}'),  # City, State ZIP
+        'phone': re.compile(r'\(\d{3}\)\s*\d{3}-\d{4}'),
+        'currency': re.compile(r'\$\d+\.\d{2}'),
+    },
+    'GB': {
+        'postal': re.compile(r'[A-Z]{1,2}\d{1,2}[A-Z]?\s+\d[A-Z]{2}'),  # UK postcodes
+        'phone': re.compile(r'0\d{2,4}\s+\d{3,4}\s+\d{4}'),
+        'currency': re.compile(r'£\d+\.\d{2}'),
+    },
+}
+# Samples kept per text, as before
+_FORMAT_SAMPLES_PER_TEXT = {'postal': 3, 'phone': 2, 'currency': 3}
+
+
+class SearchBackend(Protocol):
+    async def search(self, query: str, country: str, include_domains: List[str]) -> List[Dict]:
+        ...
+
+
+class ExaSearchBackend:
+    """Exa neural search restricted to a country's civic domains"""
+
+    def __init__(self, api_key: str, timeout: float = 30.0):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    async def search(self, query: str, country: str, include_domains: List[str]) -> List[Dict]:
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(
+                    'https://api.exa.ai/search',
+                    headers={'x-api-key': self.api_key},
+                    json={
+                        'query': query,
+                        'num_results': 5,
+                        'include_domains': include_domains,
+                        'use_autoprompt': False,  # Keep query exact
+                        'type': 'neural',
+                        'contents': {
+                            'text': True,
+                            'highlights': True
+                        }
+                    },
+                    timeout=self.timeout
+                )
+                
+                if response.status_code == 200:
+                    return response.json().get('results', [])
+                print(f"Exa error: {response.status_code}")
+                return []
+                    
+            except Exception as e:
+                print(f"Search failed: {e}")
+                return []
+
+
+class StubSearchBackend:
+    """
+    Local search backend for dry runs and tests.
+
+    Serves results from a JSON fixture ({"<COUNTRY>|<query>": [results]})
+    when given, otherwise one synthetic result per query on the country's
+    first civic domain.
+    """
+
+    def __init__(self, fixtures: Optional[Dict[str, List[Dict]]] = None, fixtures_path: Optional[str] = None):
+        if fixtures_path:
+            with open(fixtures_path, encoding='utf-8') as f:
+                fixtures = json.load(f)
+        self.fixtures = fixtures
+        self.calls: List[tuple] = []
+
+    async def search(self, query: str, country: str, include_domains: List[str]) -> List[Dict]:
+        self.calls.append((query, country))
+        if self.fixtures is not None:
+            return self.fixtures.get(f"{country}|{query}", [])
+        domain = include_domains[0] if include_domains else 'example.org'
+        return [{
+            'url': f'https://www.{domain}/{"-".join(query.lower().split())}',
+            'highlights': [f'{query}: application and renewal guidance from {domain}.']
+        }]
+
+
+class SearchCache:
+    """Raw search results on disk, one JSON file per (query, country, date)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, query: str, country: str, day: date) -> str:
+        key = hashlib.sha256(f"{country}\n{query}".encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.directory, day.isoformat(), country, f"{key}.json")
+
+    def get(self, query: str, country: str, day: date) -> Optional[List[Dict]]:
+        try:
+            with open(self._path(query, country, day), encoding='utf-8') as f:
+                return json.load(f)['results']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, query: str, country: str, day: date, results: List[Dict]) -> None:
+        path = self._path(query, country, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so a crashed run never leaves a truncated entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'query': query, 'country': country, 'results': results}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
 class ALSHarvester:
     """
     Harvests authentic civic terms and patterns using Exa.
@@ -116,8 +260,29 @@ class ALSHarvester:
         ]
     }
     
-    def __init__(self):
-        self.exa_api_key = getattr(settings, 'exa_api_key', None)
+    def __init__(
+        self,
+        backend: Optional[SearchBackend] = None,
+        cache_dir: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        dry_run: bool = False,
+        today: Optional[date] = None
+    ):
+        self.exa_api_key = settings.exa_api_key
+        self.dry_run = dry_run
+        if backend is None:
+            if dry_run:
+                backend = StubSearchBackend()
+            elif self.exa_api_key:
+                backend = ExaSearchBackend(self.exa_api_key)
+        self.backend = backend
+        # Dry runs never read or write the shared cache
+        if cache_dir is None and not dry_run:
+            cache_dir = settings.als_harvest_cache_dir
+        self.cache = SearchCache(cache_dir) if cache_dir else None
+        self.max_concurrency = max_concurrency or settings.als_harvest_concurrency
+        self.today = today
+        self._semaphore: Optional[asyncio.Semaphore] = None
         
     async def harvest_country(self, country: str) -> Dict:
         """
@@ -125,7 +290,7 @@ class ALSHarvester:
         Returns structured data to update templates.
         """
         
-        if not self.exa_api_key:
+        if self.backend is None:
             print(f"No Exa API key configured, using existing templates")
             return {}
         
@@ -133,100 +298,55 @@ class ALSHarvester:
             print(f"Country {country} not configured for harvesting")
             return {}
         
-        print(f"\n{'='*60}")
-        print(f"Harvesting civic terms for {country}")
-        print(f"{'='*60}")
+        queries = self.HARVEST_QUERIES.get(country, [])
+        print(f"Harvesting civic terms for {country} ({len(queries)} queries)")
         
-        # Collect all civic terms found
-        civic_terms = set()
-        agencies = set()
-        formatting_samples = {
-            'postal': set(),
-            'phone': set(),
-            'currency': set()
-        }
+        result_sets = await asyncio.gather(*(self._search_civic_sites(q, country) for q in queries))
+        extracted = self._extract_civic_data([r for results in result_sets for r in results], country)
         
-        # Run searches
-        for query in self.HARVEST_QUERIES.get(country, []):
-            print(f"\nSearching: {query}")
-            
-            results = await self._search_civic_sites(query, country)
-            
-            # Extract terms from results
-            extracted = self._extract_civic_data(results, country)
-            
-            civic_terms.update(extracted['terms'])
-            agencies.update(extracted['agencies'])
-            formatting_samples['postal'].update(extracted['postal'])
-            formatting_samples['phone'].update(extracted['phone'])
-            formatting_samples['currency'].update(extracted['currency'])
-        
-        # Convert sets to lists for JSON serialization
         harvested_data = {
             'country': country,
             'harvest_date': datetime.now().isoformat(),
-            'civic_terms': list(civic_terms)[:20],  # Keep top 20
-            'agencies': list(agencies)[:10],
+            'civic_terms': extracted['terms'][:20],  # Keep top 20
+            'agencies': extracted['agencies'][:10],
             'formatting': {
-                'postal': list(formatting_samples['postal'])[:5],
-                'phone': list(formatting_samples['phone'])[:3],
-                'currency': list(formatting_samples['currency'])[:5]
+                'postal': extracted['postal'][:5],
+                'phone': extracted['phone'][:3],
+                'currency': extracted['currency'][:5]
             }
         }
         
-        print(f"\n{'='*60}")
-        print(f"Harvested {len(civic_terms)} civic terms for {country}")
-        print(f"Top terms: {list(civic_terms)[:5]}")
-        print(f"{'='*60}\n")
+        print(f"Harvested {len(extracted['terms'])} civic terms for {country}; top terms: {extracted['terms'][:5]}")
         
         return harvested_data
     
     async def _search_civic_sites(self, query: str, country: str) -> List[Dict]:
-        """Search only civic/government sites using Exa."""
+        """Search only civic/government sites, through the day's cache and the concurrency bound."""
+        day = self.today or date.today()
+        if self.cache is not None:
+            cached = self.cache.get(query, country, day)
+            if cached is not None:
+                return cached
         
-        async with httpx.AsyncClient() as client:
-            # Use only civic domains for this country
-            include_domains = self.CIVIC_DOMAINS.get(country, [])
-            
-            try:
-                response = await client.post(
-                    'https://api.exa.ai/search',
-                    headers={'x-api-key': self.exa_api_key},
-                    json={
-                        'query': query,
-                        'num_results': 5,
-                        'include_domains': include_domains,
-                        'use_autoprompt': False,  # Keep query exact
-                        'type': 'neural',
-                        'contents': {
-                            'text': True,
-                            'highlights': True
-                        }
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get('results', [])
-                else:
-                    print(f"Exa error: {response.status_code}")
-                    return []
-                    
-            except Exception as e:
-                print(f"Search failed: {e}")
-                return []
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            results = await self.backend.search(query, country, self.CIVIC_DOMAINS.get(country, []))
+        
+        # Empty results are usually errors; retry them next run
+        if self.cache is not None and results:
+            self.cache.put(query, country, day, results)
+        return results
     
     def _extract_civic_data(self, results: List[Dict], country: str) -> Dict:
-        """Extract civic terms and patterns from search results."""
+        """
+        Extract civic terms and patterns from search results in one pass.
+        Values keep first-seen order.
+        """
         
-        extracted = {
-            'terms': set(),
-            'agencies': set(),
-            'postal': set(),
-            'phone': set(),
-            'currency': set()
-        }
+        extracted = {key: {} for key in ('terms', 'agencies', 'postal', 'phone', 'currency')}
+        civic_domains = set(self.CIVIC_DOMAINS.get(country, []))
+        patterns = FORMAT_PATTERNS.get(country, {})
         
         for result in results:
             # Get text content
@@ -236,109 +356,43 @@ class ALSHarvester:
             elif result.get('text'):
                 text = result['text'][:1000]
             
+            # Extract domain as agency
+            if result.get('url'):
+                domain = urlparse(result['url']).netloc.replace('www.', '')
+                if domain in civic_domains:
+                    extracted['agencies'][domain] = None
+            
             if not text:
                 continue
             
-            # Extract civic terms (2-4 word phrases)
+            # Civic terms: 2-4 word phrases starting at a word containing a civic keyword
             words = text.split()
             for i in range(len(words) - 1):
-                # Look for civic keywords
-                if any(civic in words[i].lower() for civic in 
-                      ['ausweis', 'führerschein', 'passport', 'license', 
-                       'termin', 'antrag', 'application', 'renewal',
-                       'steuer', 'tax', 'registration', 'permit']):
-                    
-                    # Extract 2-4 word phrase
-                    phrase = ' '.join(words[i:min(i+4, len(words))])
-                    # Clean up
-                    phrase = phrase.strip('.,;:!?')[:50]
-                    
-                    if len(phrase) > 5 and len(phrase) < 50:
-                        extracted['terms'].add(phrase)
-            
-            # Extract domain as agency
-            if result.get('url'):
-                from urllib.parse import urlparse
-                domain = urlparse(result['url']).netloc
-                domain = domain.replace('www.', '')
-                if domain in self.CIVIC_DOMAINS.get(country, []):
-                    extracted['agencies'].add(domain)
-            
-            # Look for formatting patterns
-            extracted.update(self._extract_formatting(text, country))
-        
-        return extracted
-    
-    def _extract_formatting(self, text: str, country: str) -> Dict:
-        """Extract postal codes, phone numbers, currency from text."""
-        
-        import re
-        
-        formatting = {
-            'postal': set(),
-            'phone': set(),
-            'currency': set()
-        }
-        
-        # Country-specific patterns
-        if country == 'DE':
-            # German postal: 5 digits + city
-            postal_pattern = r'\b\d{5}\s+[A-Z][a-zäöüß]+\b'
-            phone_pattern = r'\+49\s+\d{2,3}\s+[\d\s]+'
-            currency_pattern = r'\d+[,\.]\d{2}\s*€'
-            
-        elif country == 'CH':
-            # Swiss postal: 4 digits + city
-            postal_pattern = r'\b\d{4}\s+[A-Z][a-zäöü]+\b'
-            phone_pattern = r'\+41\s+\d{2}\s+[\d\s]+'
-            currency_pattern = r'CHF\s*\d+[\.]\d{2}'
-            
-        elif country == 'US':
-            # US: City, State ZIP
-            postal_pattern = r'[A-Z][a-z]+,\s+[A-Z]{2}\s+\d{5}'
-            phone_pattern = r'\(\d{3}\)\s*\d{3}-\d{4}'
-            currency_pattern = r'\$\d+\.\d{2}'
+                if _CIVIC_KEYWORD.search(words[i]):
+                    phrase = ' '.join(words[i:i + 4]).strip('.,;:!?')[:50]
+                    if 5 < len(phrase) < 50:
+                        extracted['terms'][phrase] = None
             
-        elif country == 'GB':
-            # UK postcodes
-            postal_pattern = r'[A-Z]{1,2}\d{1,2}[A-Z]?\s+\d[A-Z]{2}'
-            phone_pattern = r'0\d{2,4}\s+\d{3,4}\s+\d{4}'
-            currency_pattern = r'£\d+\.\d{2}'
-            
-        else:
-            return formatting
-        
-        # Find patterns
-        postals = re.findall(postal_pattern, text)
-        formatting['postal'].update(postals[:3])
-        
-        phones = re.findall(phone_pattern, text)
-        formatting['phone'].update(phones[:2])
+            # Formatting patterns
+            for kind, pattern in patterns.items():
+                for sample in pattern.findall(text)[:_FORMAT_SAMPLES_PER_TEXT[kind]]:
+                    extracted[kind][sample] = None
         
-        currencies = re.findall(currency_pattern, text)
-        formatting['currency'].update(currencies[:3])
-        
-        return formatting
+        return {key: list(values) for key, values in extracted.items()}
     
-    async def refresh_all_templates(self, save_to_file: str = None):
+    async def refresh_all_templates(self, save_to_file: str = None, countries: Optional[List[str]] = None):
         """
-        Refresh templates for all countries.
+        Refresh templates for all (or the given) countries concurrently.
         Optionally save to file for manual review.
         """
         
-        all_harvested = {}
-        
-        for country in self.CIVIC_DOMAINS.keys():
-            harvested = await self.harvest_country(country)
-            if harvested:
-                all_harvested[country] = harvested
-            
-            # Rate limit
-            await asyncio.sleep(2)
+        countries = countries or list(self.CIVIC_DOMAINS.keys())
+        results = await asyncio.gather(*(self.harvest_country(country) for country in countries))
+        all_harvested = {country: harvested for country, harvested in zip(countries, results) if harvested}
         
         if save_to_file:
             with open(save_to_file, 'w', encoding='utf-8') as f:
                 json.dump(all_harvested, f, indent=2, ensure_ascii=False)
             print(f"\nHarvested data saved to {save_to_file}")
         
-        return all_harvested
\ No newline at end of file
+        return all_harvested
@@ -0,0 +1,177 @@
+"""
+ALS leakage scanner
+
+Checks a model response for signs that the ambient block was echoed or
+that the model named the country it was steered towards:
+
+- als_phrase: 2- and 3-word phrases of the ALS block appearing verbatim
+  (case and punctuation ignored),
+- country_term: the country's ISO code (case-sensitive, whole token) or
+  its English/native name,
+- context_cue: the model talking about the hidden context itself.
+
+Patterns are compiled once per (ALS block sha256, country) into a token
+trie and cached; a response is tokenized in one pass and every position is
+matched against the trie, so scanning cost grows with the response, not
+with the number of patterns.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.canonicalization import compute_sha256
+
+ALS_PHRASE = "als_phrase"
+COUNTRY_TERM = "country_term"
+CONTEXT_CUE = "context_cue"
+
+# Expected wording of the ALS scaffolding itself, not leaks
+SKIP_PHRASES = frozenset({
+    "do not", "not cite", "ambient context",
+    "localization only", "national weather",
+    "lokaler kontext", "contexte local", "contesto locale",
+})
+MIN_PHRASE_CHARS = 6
+
+COUNTRY_NAMES: Dict[str, Tuple[str, ...]] = {
+    "DE": ("Germany", "Deutschland"),
+    "CH": ("Switzerland", "Schweiz", "Suisse", "Svizzera"),
+    "US": ("United States", "USA"),
+    "GB": ("United Kingdom", "Great Britain", "England"),
+    "AE": ("United Arab Emirates", "UAE"),
+    "SG": ("Singapore",),
+    "IT": ("Italy", "Italia"),
+    "FR": ("France",),
+}
+CONTEXT_CUES = ("location context", "ambient context", "ambient block", "your location")
+
+_TOKEN = re.compile(r"\w+")
+_END = ""  # trie key marking a complete pattern; tokens are never empty
+
+
+@dataclass(frozen=True)
+class LeakFinding:
+    phrase: str
+    kind: str
+    occurrences: int
+    first_offset: int
+
+
+def tokens(text: str) -> List[str]:
+    return [t.casefold() for t in _TOKEN.findall(text or "")]
+
+
+def country_from_locale(locale: Optional[str]) -> Optional[str]:
+    """'de-DE' -> 'DE'; None when the locale has no known region"""
+    if not locale:
+        return None
+    region = locale.replace("_", "-").split("-")[-1].upper()
+    return region if region in COUNTRY_NAMES else None
+
+
+class LeakScanner:
+    """Compiled leak patterns for one ALS block and/or country"""
+
+    def __init__(self, als_block: str = "", country: Optional[str] = None):
+        self.country = country.upper() if country else None
+        self._trie: Dict[str, dict] = {}
+        self._depth = 1
+
+        words = tokens(als_block)
+        for n in (2, 3):
+            for i in range(len(words) - n + 1):
+                phrase = " ".join(words[i:i + n])
+                # Purely numeric runs ('10 2026') come from dates and prices
+                if (phrase not in SKIP_PHRASES and len(phrase) >= MIN_PHRASE_CHARS
+                        and any(c.isalpha() for c in phrase)):
+                    self._add(words[i:i + n], ALS_PHRASE)
+        for name in COUNTRY_NAMES.get(self.country, ()):
+            self._add(tokens(name), COUNTRY_TERM, name)
+        for cue in CONTEXT_CUES:
+            self._add(tokens(cue), CONTEXT_CUE)
+
+    def _add(self, words: List[str], kind: str, phrase: Optional[str] = None) -> None:
+        node = self._trie
+        for word in words:
+            node = node.setdefault(word, {})
+        # Country and cue patterns win over the same words as an ALS phrase
+        if _END not in node or kind != ALS_PHRASE:
+            node[_END] = (phrase or " ".join(words), kind)
+        self._depth = max(self._depth, len(words))
+
+    def scan(self, response: str) -> List[LeakFinding]:
+        """All leaks in a response, in order of first appearance"""
+        matches = list(_TOKEN.finditer(response or ""))
+        folded = [m.group().casefold() for m in matches]
+        found: Dict[Tuple[str, str], List[int]] = {}
+
+        def hit(phrase: str, kind: str, offset: int) -> None:
+            entry = found.setdefault((phrase, kind), [0, offset])
+            entry[0] += 1
+
+        for i, match in enumerate(matches):
+            if self.country and match.group() == self.country:
+                hit(self.country, COUNTRY_TERM, match.start())
+            node = self._trie
+            for word in folded[i:i + self._depth]:
+                node = node.get(word)
+                if node is None:
+                    break
+                if _END in node:
+                    hit(*node[_END], match.start())
+
+        return sorted(
+            (LeakFinding(phrase, kind, count, offset) for (phrase, kind), (count, offset) in found.items()),
+            key=lambda f: f.first_offset
+        )
+
+
+_scanners: "OrderedDict[Tuple[str, Optional[str]], LeakScanner]" = OrderedDict()
+_scanners_lock = threading.Lock()
+_MAX_SCANNERS = 512
+
+
+def scanner_for(
+    als_block: Optional[str],
+    country: Optional[str] = None,
+    als_block_sha256: Optional[str] = None
+) -> LeakScanner:
+    """Compiled scanner, cached by the block's sha256 (pass it when known) and country"""
+    als_block = als_block or ""
+    key = (als_block_sha256 or compute_sha256(als_block), country)
+    with _scanners_lock:
+        scanner = _scanners.get(key)
+        if scanner is not None:
+            _scanners.move_to_end(key)
+            return scanner
+    scanner = LeakScanner(als_block, country)
+    with _scanners_lock:
+        _scanners[key] = scanner
+        while len(_scanners) > _MAX_SCANNERS:
+            _scanners.popitem(last=False)
+    return scanner
+
+
+def scan_leaks(
+    response: str,
+    als_block: Optional[str] = None,
+    country: Optional[str] = None,
+    als_block_sha256: Optional[str] = None
+) -> List[LeakFinding]:
+    return scanner_for(als_block, country, als_block_sha256).scan(response)
+
+
+def scan_rows(rows: Iterable[Tuple[Any, str, Optional[str], Optional[str], Optional[str]]]) -> List[Tuple[Any, List[LeakFinding]]]:
+    """
+    Scan (key, response, als_block, als_block_sha256, country) rows.
+
+    Top-level and picklable so bulk audits can fan chunks out to worker
+    processes; each process keeps its own scanner cache.
+    """
+    return [
+        (key, scan_leaks(response, als_block, country, als_block_sha256 if als_block else None))
+        for key, response, als_block, als_block_sha256, country in rows
+    ]
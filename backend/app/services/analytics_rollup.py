@@ -0,0 +1,241 @@
+"""
+Incremental rollups for prompt tracking analytics
+
+prompt_analytics_daily holds additive counters per
+(brand, day, country, grounding_mode, model). A finished run is folded in
+exactly once: prompt_rollup_ledger records every run already counted, and
+both writers go through the same ledger-guarded upsert:
+
+- record_run() inside the transaction that stores a result, and
+- catch_up() as a periodic job that sweeps finished runs above a
+  watermark (backfill, runs written by other code paths).
+
+Runs still in flight are not counted until they finish. Code that rewrites
+the results of runs already counted (rescoring) wraps the rewrite in
+refolding(), which takes the runs out of the rollups and folds them back in.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "prompt_analytics_daily"
+
+_COUNTERS = (
+    "runs_total", "runs_completed", "runs_failed",
+    "join_rows", "mentioned_rows",
+    "mention_count_sum", "mention_count_n",
+    "confidence_sum", "confidence_n",
+    "completed_rows", "completed_mentioned_rows",
+)
+
+# Counters mirror the original live queries over prompt_runs LEFT JOIN
+# prompt_results: join_rows/mentioned_rows feed the overall mention rate,
+# completed_* the per-country and per-grounding-mode comparisons.
+_FOLD_SQL = """
+    WITH new_runs AS ({source}),
+    folded AS (
+        SELECT
+            pr.brand_name,
+            CAST(COALESCE(pr.started_at, pr.created_at) AS DATE) AS day,
+            COALESCE(pr.country_code, '') AS country_code,
+            COALESCE(pr.grounding_mode, '') AS grounding_mode,
+            COALESCE(pr.model_name, '') AS model_name,
+            COUNT(DISTINCT pr.id) AS runs_total,
+            COUNT(DISTINCT pr.id) FILTER (WHERE pr.status = 'completed') AS runs_completed,
+            COUNT(DISTINCT pr.id) FILTER (WHERE pr.status = 'failed') AS runs_failed,
+            COUNT(*) AS join_rows,
+            COUNT(*) FILTER (WHERE res.brand_mentioned) AS mentioned_rows,
+            COALESCE(SUM(res.mention_count), 0) AS mention_count_sum,
+            COUNT(res.mention_count) AS mention_count_n,
+            COALESCE(SUM(res.confidence_score), 0) AS confidence_sum,
+            COUNT(res.confidence_score) AS confidence_n,
+            COUNT(*) FILTER (WHERE pr.status = 'completed') AS completed_rows,
+            COUNT(*) FILTER (WHERE pr.status = 'completed' AND res.brand_mentioned) AS completed_mentioned_rows
+        FROM new_runs n
+        JOIN prompt_runs pr ON pr.id = n.run_id
+        LEFT JOIN prompt_results res ON res.run_id = pr.id
+        GROUP BY 1, 2, 3, 4, 5
+    )
+    INSERT INTO prompt_analytics_daily
+        (brand_name, day, country_code, grounding_mode, model_name, {columns})
+    SELECT brand_name, day, country_code, grounding_mode, model_name, {values}
+    FROM folded
+    ON CONFLICT (brand_name, day, country_code, grounding_mode, model_name) DO UPDATE SET
+        {updates}, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _fold_statement(source: str, sign: str = ""):
+    """Upsert the counters of the runs returned by source; sign="-" takes them out"""
+    return text(_FOLD_SQL.format(
+        source=source,
+        columns=", ".join(_COUNTERS),
+        values=", ".join(f"{sign}{c}" for c in _COUNTERS),
+        updates=", ".join(f"{c} = prompt_analytics_daily.{c} + EXCLUDED.{c}" for c in _COUNTERS)
+    ))
+
+
+_RECORD_RUN = _fold_statement("""
+    INSERT INTO prompt_rollup_ledger (run_id)
+    SELECT id FROM prompt_runs WHERE id = :run_id AND status IN ('completed', 'failed')
+    ON CONFLICT DO NOTHING
+    RETURNING run_id
+""")
+
+_CATCH_UP_RANGE = _fold_statement("""
+    INSERT INTO prompt_rollup_ledger (run_id)
+    SELECT id FROM prompt_runs
+    WHERE id > :after AND id <= :upto AND status IN ('completed', 'failed')
+    ON CONFLICT DO NOTHING
+    RETURNING run_id
+""")
+
+
+# Only runs already in the ledger are in the rollups
+_COUNTED_RUNS = "SELECT run_id FROM prompt_rollup_ledger WHERE run_id IN :run_ids"
+_UNFOLD_RUNS = _fold_statement(_COUNTED_RUNS, sign="-").bindparams(bindparam("run_ids", expanding=True))
+_REFOLD_RUNS = _fold_statement(_COUNTED_RUNS).bindparams(bindparam("run_ids", expanding=True))
+
+
+async def record_run(conn: AsyncConnection, run_id: int) -> None:
+    """
+    Fold one finished run into the rollups.
+
+    Call in the transaction that writes the run's final status and result,
+    after both writes. Repeated calls for the same run are no-ops.
+    """
+    await conn.execute(_RECORD_RUN, {"run_id": run_id})
+
+
+@asynccontextmanager
+async def refolding(conn: AsyncConnection, run_ids: Iterable[int]) -> AsyncIterator[None]:
+    """
+    Keep the rollups in step while the results of counted runs are rewritten.
+
+    Use inside the transaction that rewrites them: the runs' counters are
+    subtracted before the block and added back from the new rows after it.
+    Runs not yet counted are left to record_run()/catch_up().
+    """
+    ids = sorted(set(run_ids))
+    if not ids:
+        yield
+        return
+    await conn.execute(_UNFOLD_RUNS, {"run_ids": ids})
+    yield
+    await conn.execute(_REFOLD_RUNS, {"run_ids": ids})
+
+
+async def catch_up(
+    engine: AsyncEngine,
+    batch_size: int = 5000,
+    stale_after_hours: int = 24
+) -> int:
+    """
+    Sweep finished runs above the watermark into the rollups.
+
+    The watermark only advances past runs that are finished (or have been
+    'running' for longer than stale_after_hours), so a run completing later
+    is still picked up by the next sweep. Returns the number of run ids
+    scanned.
+    """
+    scanned = 0
+    while True:
+        async with engine.begin() as conn:
+            row = (await conn.execute(
+                text("SELECT watermark FROM prompt_rollup_state WHERE name = :name FOR UPDATE"),
+                {"name": WATERMARK_NAME}
+            )).fetchone()
+            after = row.watermark if row else 0
+
+            bounds = (await conn.execute(text("""
+                SELECT
+                    (SELECT MAX(id) FROM prompt_runs) AS max_id,
+                    (SELECT MIN(id) FROM prompt_runs
+                     WHERE id > :after AND status NOT IN ('completed', 'failed')
+                       AND COALESCE(started_at, created_at) > CURRENT_TIMESTAMP - make_interval(hours => :stale)
+                    ) AS first_open
+            """), {"after": after, "stale": stale_after_hours})).fetchone()
+
+            ceiling = bounds.max_id or 0
+            if bounds.first_open is not None:
+                ceiling = bounds.first_open - 1
+            upto = min(after + batch_size, ceiling)
+            if upto <= after:
+                return scanned
+
+            await conn.execute(_CATCH_UP_RANGE, {"after": after, "upto": upto})
+            await conn.execute(text("""
+                INSERT INTO prompt_rollup_state (name, watermark) VALUES (:name, :upto)
+                ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = CURRENT_TIMESTAMP
+            """), {"name": WATERMARK_NAME, "upto": upto})
+            scanned += upto - after
+            logger.info(f"Analytics rollup caught up to run {upto}")
+
+
+def _rate(numerator, denominator) -> float:
+    return float(numerator) * 100 / denominator if denominator else 0
+
+
+async def brand_analytics(conn: AsyncConnection, brand_name: str, days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Dashboard analytics for a brand from the rollups only.
+
+    Cost depends on the number of (day, country, mode, model) rollup rows,
+    not on the number of runs; days limits the window.
+    """
+    window = ""
+    params: Dict[str, Any] = {"brand": brand_name}
+    if days is not None:
+        # date - integer is a date; an untyped parameter would resolve as
+        # date - date (an integer) and reject the Python int
+        window = "AND day > CURRENT_DATE - CAST(:days AS integer)"
+        params["days"] = int(days)
+    sums = ", ".join(f"SUM({c}) AS {c}" for c in _COUNTERS)
+    statement = text(f"""
+        SELECT country_code, grounding_mode, {sums}
+        FROM prompt_analytics_daily
+        WHERE brand_name = :brand {window}
+        GROUP BY country_code, grounding_mode
+    """)
+    if days is not None:
+        statement = statement.bindparams(bindparam("days", type_=Integer))
+    rows = (await conn.execute(statement, params)).fetchall()
+
+    totals = {c: 0 for c in _COUNTERS}
+    grounding: Dict[str, Dict[str, int]] = {}
+    country: Dict[str, Dict[str, int]] = {}
+    for row in rows:
+        for c in _COUNTERS:
+            totals[c] += getattr(row, c) or 0
+        for key, bucket in ((row.grounding_mode, grounding), (row.country_code, country)):
+            entry = bucket.setdefault(key, {"rows": 0, "mentioned": 0})
+            entry["rows"] += row.completed_rows or 0
+            entry["mentioned"] += row.completed_mentioned_rows or 0
+
+    def comparison(bucket):
+        return {
+            key: {"run_count": v["rows"], "mention_rate": _rate(v["mentioned"], v["rows"])}
+            for key, v in bucket.items() if v["rows"]
+        }
+
+    return {
+        "brand_name": brand_name,
+        "statistics": {
+            "total_runs": totals["runs_total"],
+            "successful_runs": totals["runs_completed"],
+            "failed_runs": totals["runs_failed"],
+            "mention_rate": _rate(totals["mentioned_rows"], totals["join_rows"]),
+            "avg_mentions_per_response": (
+                float(totals["mention_count_sum"]) / totals["mention_count_n"] if totals["mention_count_n"] else 0
+            ),
+            "avg_confidence": _rate(totals["confidence_sum"], totals["confidence_n"])
+        },
+        "grounding_comparison": comparison(grounding),
+        "country_comparison": comparison(country)
+    }
@@ -1,69 +1,145 @@
 """
-Background task runner that bypasses HTTP context to fix DE leak.
-Uses threading to run prompts outside of FastAPI's request context.
+Background task runner for prompt tracking runs.
+
+A fixed pool of worker tasks on the application's event loop drains a
+bounded queue: a full queue rejects new submissions (counted in
+contestra_background_tasks_submitted_total) instead of starting more
+threads. Each run still gets its own adapter instance, so nothing from
+the HTTP request context leaks into the prompt.
+
+Task statuses are kept in memory until background_task_ttl_seconds after
+they finish and are persisted to background_tasks, so any process can
+answer get_task_status.
 """
 
 import asyncio
-import threading
-import uuid
-from typing import Dict, Any, List
-from datetime import datetime
-from sqlalchemy import text
 import json
+import logging
 import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
 
-from app.database import engine
-from app.llm.langchain_adapter import LangChainAdapter
+from sqlalchemy import text
+
+from app.core.config import get_settings
+from app.db.database import engine
+from app.prometheus_metrics import (
+    inc_background_finished,
+    inc_background_submission,
+    set_background_queue_depth,
+)
 from app.services.als import als_service
 from app.services.als.country_codes import country_to_num
-from app.cache.upstash_cache import cache
+from app.services.als.leakage import scan_leaks
+from app.services.analytics_rollup import record_run
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("completed", "failed")
+
+
+class TaskRejected(Exception):
+    """The task queue is full"""
+
+
+class TaskStatusStore:
+    """Task statuses in the background_tasks table"""
+
+    def __init__(self, db_engine=None):
+        self.engine = db_engine or engine
+
+    async def save(self, task_id: str, record: Dict[str, Any], ttl_seconds: int) -> None:
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds) if record["status"] in FINISHED else None
+        async with self.engine.begin() as conn:
+            await conn.execute(text("""
+                INSERT INTO background_tasks (task_id, run_id, status, record, expires_at)
+                VALUES (:task_id, :run_id, :status, :record, :expires_at)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    status = EXCLUDED.status, record = EXCLUDED.record,
+                    expires_at = EXCLUDED.expires_at, updated_at = CURRENT_TIMESTAMP
+            """), {
+                "task_id": task_id,
+                "run_id": record.get("run_id"),
+                "status": record["status"],
+                "record": json.dumps(record, default=str),
+                "expires_at": expires_at
+            })
+
+    async def load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(text("""
+                SELECT record FROM background_tasks
+                WHERE task_id = :task_id AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+            """), {"task_id": task_id})).fetchone()
+        if row is None:
+            return None
+        return json.loads(row.record) if isinstance(row.record, str) else dict(row.record)
+
+    async def delete_expired(self) -> int:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(text("DELETE FROM background_tasks WHERE expires_at <= CURRENT_TIMESTAMP"))
+        return result.rowcount or 0
 
 
 class BackgroundTaskRunner:
-    """Runs prompt tasks in background threads to bypass HTTP context"""
-    
-    def __init__(self):
-        self.tasks = {}  # Store task status in memory
-        self.lock = threading.Lock()
-    
-    def submit_task(
+    """Bounded worker pool for prompt runs that must execute outside the request"""
+
+    def __init__(
         self,
-        run_id: int,
-        template_id: int,
-        brand_name: str,
-        model_name: str,
-        country_iso: str,
-        grounding_mode: str,
-        prompt_text: str
-    ) -> str:
-        """Submit a task to run in the background"""
-        
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        status_ttl_seconds: Optional[int] = None,
+        store: Optional[TaskStatusStore] = None
+    ):
+        settings = get_settings()
+        self.workers = workers or settings.background_workers
+        self.queue_size = queue_size or settings.background_queue_size
+        self.status_ttl_seconds = status_ttl_seconds or settings.background_task_ttl_seconds
+        self.store = store if store is not None else TaskStatusStore()
+        self.tasks: Dict[str, Dict[str, Any]] = {}  # task_id -> status record
+        self._expiry: Dict[str, float] = {}  # finished task_id -> monotonic eviction time
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pool: list = []
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._pool:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._pool = [loop.create_task(self._worker(), name=f"background-worker-{i}") for i in range(self.workers)]
+        self._pool.append(loop.create_task(self._sweeper(), name="background-sweeper"))
+
+    async def submit(self, fn: Callable[..., Awaitable[Any]], *args, run_id: Optional[int] = None) -> str:
+        """
+        Queue fn(*args) for a worker and return its task id.
+
+        Raises TaskRejected when the queue is full.
+        """
+        self._ensure_started()
+        self._evict_expired()
+        if self._queue.full():
+            inc_background_submission("rejected")
+            raise TaskRejected(f"Background queue is full ({self.queue_size} tasks waiting)")
+
         task_id = str(uuid.uuid4())
-        
-        # Store initial task status
-        with self.lock:
-            self.tasks[task_id] = {
-                'status': 'pending',
-                'run_id': run_id,
-                'started_at': datetime.utcnow().isoformat(),
-                'result': None,
-                'error': None
-            }
-        
-        # Start background thread
-        thread = threading.Thread(
-            target=self._run_task_in_thread,
-            args=(task_id, run_id, template_id, brand_name, model_name, 
-                  country_iso, grounding_mode, prompt_text),
-            daemon=True
-        )
-        thread.start()
-        
+        self.tasks[task_id] = {
+            'status': 'pending',
+            'run_id': run_id,
+            'started_at': datetime.utcnow().isoformat(),
+            'result': None,
+            'error': None
+        }
+        self._queue.put_nowait((task_id, fn, args))
+        inc_background_submission("accepted")
+        set_background_queue_depth(self._queue.qsize())
+        await self._persist(task_id)
         return task_id
-    
-    def _run_task_in_thread(
+
+    async def submit_task(
         self,
-        task_id: str,
         run_id: int,
         template_id: int,
         brand_name: str,
@@ -71,56 +147,62 @@ class BackgroundTaskRunner:
         country_iso: str,
         grounding_mode: str,
         prompt_text: str
-    ):
-        """Run task in separate thread with new event loop"""
-        
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
+    ) -> str:
+        """Submit a prompt run to the pool"""
+        return await self.submit(
+            self._execute_prompt_async,
+            run_id, template_id, brand_name, model_name, country_iso, grounding_mode, prompt_text,
+            run_id=run_id
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            task_id, fn, args = await self._queue.get()
+            set_background_queue_depth(self._queue.qsize())
+            try:
+                await self._update(task_id, status='running')
+                result = await fn(*args)
+                await self._update(task_id, status='completed', result=result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._update(task_id, status='failed', error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _update(self, task_id: str, **fields) -> None:
+        record = self.tasks.setdefault(task_id, {'status': 'pending'})
+        record.update(fields)
+        if record['status'] in FINISHED:
+            record['completed_at'] = datetime.utcnow().isoformat()
+            self._expiry[task_id] = time.monotonic() + self.status_ttl_seconds
+            inc_background_finished(record['status'])
+        await self._persist(task_id)
+
+    async def _persist(self, task_id: str) -> None:
         try:
-            # Update status to running
-            with self.lock:
-                self.tasks[task_id]['status'] = 'running'
-            
-            # Run the async task
-            result = loop.run_until_complete(
-                self._execute_prompt_async(
-                    run_id, template_id, brand_name, model_name,
-                    country_iso, grounding_mode, prompt_text
-                )
-            )
-            
-            # Update task with result
-            with self.lock:
-                self.tasks[task_id]['status'] = 'completed'
-                self.tasks[task_id]['result'] = result
-                self.tasks[task_id]['completed_at'] = datetime.utcnow().isoformat()
-            
-            # Also store in cache for persistence  
-            # Use the existing loop instead of creating a new one
-            loop.run_until_complete(cache.set(f"task:{task_id}", {
-                'status': 'completed',
-                'result': result
-            }, ttl=3600))
-            
+            await self.store.save(task_id, self.tasks[task_id], self.status_ttl_seconds)
         except Exception as e:
-            # Update task with error
-            with self.lock:
-                self.tasks[task_id]['status'] = 'failed'
-                self.tasks[task_id]['error'] = str(e)
-                self.tasks[task_id]['completed_at'] = datetime.utcnow().isoformat()
-            
-            # Store error in cache
-            # Use the existing loop instead of creating a new one
-            loop.run_until_complete(cache.set(f"task:{task_id}", {
-                'status': 'failed',
-                'error': str(e)
-            }, ttl=3600))
-            
-        finally:
-            loop.close()
-    
+            logger.warning(f"Could not persist background task {task_id}: {e}")
+
+    def _evict_expired(self) -> int:
+        now = time.monotonic()
+        expired = [task_id for task_id, at in self._expiry.items() if at <= now]
+        for task_id in expired:
+            self._expiry.pop(task_id, None)
+            self.tasks.pop(task_id, None)
+        return len(expired)
+
+    async def _sweeper(self) -> None:
+        interval = max(1.0, self.status_ttl_seconds / 4)
+        while True:
+            await asyncio.sleep(interval)
+            self._evict_expired()
+            try:
+                await self.store.delete_expired()
+            except Exception as e:
+                logger.warning(f"Could not sweep background task statuses: {e}")
+
     async def _execute_prompt_async(
         self,
         run_id: int,
@@ -132,21 +214,17 @@ class BackgroundTaskRunner:
         prompt_text: str
     ) -> Dict[str, Any]:
         """Execute the prompt outside HTTP context"""
-        
-        print(f"\n{'='*60}")
-        print(f"BACKGROUND TASK - EXECUTING PROMPT")
-        print(f"Thread: {threading.current_thread().name}")
-        print(f"Run ID: {run_id}")
-        print(f"Country: {country_iso}")
-        print(f"{'='*60}\n")
-        
+        from app.llm.langchain_adapter import LangChainAdapter
+
+        logger.info(f"Background task executing run {run_id} (country {country_iso})")
+
         try:
             # Convert country code to numeric to prevent leaks
             country_num = country_to_num(country_iso)
-            
+
             # Create NEW adapter instance for complete isolation
             adapter = LangChainAdapter()
-            
+
             # Build Ambient Block
             ambient_block = ""
             if country_num != 0:
@@ -154,8 +232,8 @@ class BackgroundTaskRunner:
                     try:
                         ambient_block = als_service.build_als_block(country_iso)
                     except Exception as e:
-                        print(f"Failed to build Ambient Block: {e}")
-            
+                        logger.warning(f"Failed to build Ambient Block: {e}")
+
             # Prepare prompt
             if country_num == 0:  # NONE
                 if grounding_mode == "web":
@@ -173,11 +251,11 @@ class BackgroundTaskRunner:
                     else:
                         full_prompt = f"Based only on your training data (do not search the web):\n\n{prompt_text}"
                     context_message = None
-            
+
             # Fixed parameters
             temperature = 0.0
             seed = 42
-            
+
             # Get model response
             if model_name in ["gemini", "gemini-flash"]:
                 response_data = await adapter.analyze_with_gemini(
@@ -196,48 +274,30 @@ class BackgroundTaskRunner:
                     seed=seed,
                     context=context_message
                 )
-            
+
             # Extract response
             response = response_data.get("content", "") if isinstance(response_data, dict) else str(response_data) if response_data else ""
-            
+
             # Check for leaks
-            leak_detected = False
-            leak_terms = []
-            
-            if response and 'DE' in response:
-                leak_detected = True
-                leak_terms.append('DE')
-                print(f"[BACKGROUND] Leak detected: DE found in response")
-            
-            if response and 'Germany' in response:
-                leak_detected = True
-                leak_terms.append('Germany')
-                print(f"[BACKGROUND] Leak detected: Germany found in response")
-            
-            if response and 'Deutschland' in response:
-                leak_detected = True
-                leak_terms.append('Deutschland')
-            
-            if response and 'location context' in response.lower():
-                leak_detected = True
-                leak_terms.append('location context')
-                print(f"[BACKGROUND] Leak detected: 'location context' found")
-            
+            leak_terms = [
+                finding.phrase
+                for finding in scan_leaks(response, ambient_block, country_iso if country_num != 0 else None)
+            ]
+            leak_detected = bool(leak_terms)
+
             # Analyze response
             brand_mentioned = brand_name.lower() in response.lower()
             mention_count = response.lower().count(brand_name.lower())
-            
+
             # Save to database (simplified schema)
-            with engine.begin() as conn:
-                result_query = text("""
-                    INSERT INTO prompt_results 
-                    (run_id, prompt_text, model_response, brand_mentioned, mention_count, 
+            async with engine.begin() as conn:
+                await conn.execute(text("""
+                    INSERT INTO prompt_results
+                    (run_id, prompt_text, model_response, brand_mentioned, mention_count,
                      competitors_mentioned, confidence_score)
-                    VALUES (:run_id, :prompt, :response, :mentioned, :count, 
+                    VALUES (:run_id, :prompt, :response, :mentioned, :count,
                             :competitors, :confidence)
-                """)
-                
-                conn.execute(result_query, {
+                """), {
                     "run_id": run_id,
                     "prompt": full_prompt,
                     "response": response,
@@ -246,19 +306,18 @@ class BackgroundTaskRunner:
                     "competitors": json.dumps([]),
                     "confidence": 0.8 if brand_mentioned else 0.3
                 })
-                
+
                 # Update run status
-                update_query = text("""
-                    UPDATE prompt_runs 
-                    SET status = 'completed', completed_at = datetime('now')
+                await conn.execute(text("""
+                    UPDATE prompt_runs
+                    SET status = 'completed', completed_at = CURRENT_TIMESTAMP
                     WHERE id = :id
-                """)
-                conn.execute(update_query, {"id": run_id})
-            
-            print(f"\n[BACKGROUND] Task completed. Leak detected: {leak_detected}")
+                """), {"id": run_id})
+                await record_run(conn, run_id)
+
             if leak_detected:
-                print(f"[BACKGROUND] Leak terms: {', '.join(leak_terms)}")
-            
+                logger.warning(f"Run {run_id} leak terms: {', '.join(leak_terms)}")
+
             return {
                 "run_id": run_id,
                 "country": country_iso,
@@ -270,39 +329,61 @@ class BackgroundTaskRunner:
                 "leak_detected": leak_detected,
                 "leak_terms": leak_terms
             }
-            
+
         except Exception as e:
-            print(f"[BACKGROUND] Error: {e}")
-            
+            logger.error(f"Background run {run_id} failed: {e}")
+
             # Update database with error
-            with engine.begin() as conn:
-                error_query = text("""
-                    UPDATE prompt_runs 
-                    SET status = 'failed', error_message = :error, completed_at = datetime('now')
+            async with engine.begin() as conn:
+                await conn.execute(text("""
+                    UPDATE prompt_runs
+                    SET status = 'failed', error_message = :error, completed_at = CURRENT_TIMESTAMP
                     WHERE id = :id
-                """)
-                conn.execute(error_query, {"id": run_id, "error": str(e)})
-            
+                """), {"id": run_id, "error": str(e)})
+                await record_run(conn, run_id)
+
             raise
-    
-    def get_task_status(self, task_id: str) -> Dict[str, Any]:
-        """Get the status of a task"""
-        
-        # Check memory first
-        with self.lock:
-            if task_id in self.tasks:
-                return self.tasks[task_id].copy()
-        
-        # Skip cache check for now - was causing async errors
-        # TODO: Make this method async or use sync cache client
-        
+
+    async def get_task_status(self, task_id: str) -> Dict[str, Any]:
+        """Get the status of a task, from memory or from the persisted record"""
+        self._evict_expired()
+        if task_id in self.tasks:
+            return dict(self.tasks[task_id])
+
+        try:
+            record = await self.store.load(task_id)
+        except Exception as e:
+            logger.warning(f"Could not load background task {task_id}: {e}")
+            record = None
+        if record is not None:
+            return record
+
         return {'status': 'not_found', 'error': 'Task not found'}
-    
+
     def get_all_tasks(self) -> Dict[str, Any]:
-        """Get status of all tasks"""
-        with self.lock:
-            return self.tasks.copy()
+        """Get status of all tasks known to this process"""
+        self._evict_expired()
+        return {task_id: dict(record) for task_id, record in self.tasks.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "tracked_statuses": len(self.tasks)
+        }
+
+    async def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool; with wait, let queued tasks finish first"""
+        if not self._pool:
+            return
+        if wait and self._queue is not None:
+            await self._queue.join()
+        for task in self._pool:
+            task.cancel()
+        await asyncio.gather(*self._pool, return_exceptions=True)
+        self._pool = []
 
 
 # Global instance
-background_runner = BackgroundTaskRunner()
\ No newline at end of file
+background_runner = BackgroundTaskRunner()
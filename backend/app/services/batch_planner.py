@@ -0,0 +1,309 @@
+"""
+Batch planner: cost, token and makespan estimates from historical telemetry
+Replaces the single est_tokens_per_run multiplication in the batch preflight
+"""
+
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.db.telemetry import estimate_cost_cents
+from app.models.models import LLMTelemetry
+from app.schemas.templates import BatchRunRequest, BatchPlanGroup, BatchPlanResponse
+
+# (vendor, model, grounded)
+CellKey = Tuple[str, str, bool]
+
+
+@dataclass
+class CellStats:
+    """Per-cell token and latency percentiles for one (vendor, model, grounded) group"""
+    vendor: str
+    model: str
+    grounded: bool
+    source: str                # "template" | "global" | "default"
+    samples: int
+    input_tokens_p50: float
+    input_tokens_p90: float
+    output_tokens_p50: float
+    output_tokens_p90: float
+    latency_ms_p50: float
+    latency_ms_p90: float
+
+
+@dataclass
+class ScheduleEstimate:
+    """Result of simulating a batch under concurrency and TPM limits"""
+    makespan_seconds: float
+    vendor_makespan_seconds: Dict[str, float]
+    peak_tpm: int
+    tpm_deferrals: int
+
+
+def simulate_schedule(
+    cells_by_vendor: Dict[str, List[Tuple[int, float]]],
+    concurrency: Dict[str, int],
+    tpm_budget: Optional[Dict[str, int]] = None,
+    launch_spacing: Optional[Dict[str, float]] = None
+) -> ScheduleEstimate:
+    """
+    Simulate per-vendor bulkheads draining their cells.
+
+    Args:
+        cells_by_vendor: vendor -> [(tokens, latency_seconds)] in launch order
+        concurrency: vendor -> bulkhead size
+        tpm_budget: vendor -> tokens allowed per minute window (absent = unlimited)
+        launch_spacing: vendor -> minimum seconds between launches (absent = none)
+
+    A cell launches on the first free worker, no sooner than launch_spacing
+    after the vendor's previous launch (BatchRunner's launch stagger); if its
+    tokens would exceed the vendor's budget for the current minute it is
+    deferred to the next minute boundary, mirroring BatchRunner's TPM gate.
+    """
+    tpm_budget = tpm_budget or {}
+    launch_spacing = launch_spacing or {}
+    minute_tokens: Dict[int, int] = defaultdict(int)
+    vendor_makespan: Dict[str, float] = {}
+    deferrals = 0
+
+    for vendor, cells in cells_by_vendor.items():
+        workers = [0.0] * max(1, concurrency.get(vendor, 1))
+        heapq.heapify(workers)
+        budget = tpm_budget.get(vendor)
+        spacing = launch_spacing.get(vendor, 0.0)
+        vendor_minutes: Dict[int, int] = defaultdict(int)
+        finish = 0.0
+        last_launch: Optional[float] = None
+
+        for tokens, latency_s in cells:
+            start = heapq.heappop(workers)
+            if spacing and last_launch is not None:
+                start = max(start, last_launch + spacing)
+            if budget:
+                # An empty window always admits one cell, so oversized cells cannot stall
+                while vendor_minutes[int(start // 60)] and vendor_minutes[int(start // 60)] + tokens > budget:
+                    start = (int(start // 60) + 1) * 60.0
+                    deferrals += 1
+            last_launch = start
+            minute = int(start // 60)
+            vendor_minutes[minute] += tokens
+            minute_tokens[minute] += tokens
+            end = start + latency_s
+            finish = max(finish, end)
+            heapq.heappush(workers, end)
+
+        vendor_makespan[vendor] = finish
+
+    return ScheduleEstimate(
+        makespan_seconds=max(vendor_makespan.values(), default=0.0),
+        vendor_makespan_seconds=vendor_makespan,
+        peak_tpm=max(minute_tokens.values(), default=0),
+        tpm_deferrals=deferrals
+    )
+
+
+class BatchPlanner:
+    """Estimate tokens, cost and makespan of a batch before running it"""
+
+    def __init__(self, runner=None):
+        if runner is None:
+            from app.services.batch_runner import BatchRunner
+            runner = BatchRunner()
+        self.runner = runner
+        self.settings = get_settings()
+
+    def _cell_keys(self, request: BatchRunRequest) -> Dict[CellKey, int]:
+        """Closed-form run count per (vendor, model, grounded) group"""
+        runs_per_mode = len(request.locales) * request.replicates
+        counts: Dict[CellKey, int] = defaultdict(int)
+        for model in request.models:
+            vendor = self.runner._vendor_for_model(model)
+            for grounding_mode in request.grounding_modes:
+                grounded = grounding_mode in ["GROUNDED", "REQUIRED"]
+                counts[(vendor, model, grounded)] += runs_per_mode
+        return dict(counts)
+
+    async def _query_stats(
+        self,
+        session: AsyncSession,
+        keys: Iterable[CellKey],
+        template_id: Optional[str]
+    ) -> Dict[CellKey, Tuple[int, List[float]]]:
+        """Percentiles of successful calls grouped by vendor, model and grounded"""
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        since = datetime.utcnow() - timedelta(days=self.settings.batch_planner_lookback_days)
+        percentiles = []
+        for column in (LLMTelemetry.prompt_tokens, LLMTelemetry.completion_tokens, LLMTelemetry.latency_ms):
+            for q in (0.5, 0.9):
+                percentiles.append(func.percentile_cont(q).within_group(column.asc()))
+
+        query = select(
+            LLMTelemetry.vendor,
+            LLMTelemetry.model,
+            LLMTelemetry.grounded,
+            func.count(),
+            *percentiles
+        ).where(
+            LLMTelemetry.success.is_(True),
+            LLMTelemetry.created_at >= since,
+            LLMTelemetry.model.in_({model for _, model, _ in keys})
+        ).group_by(
+            LLMTelemetry.vendor, LLMTelemetry.model, LLMTelemetry.grounded
+        )
+        if template_id is not None:
+            query = query.where(LLMTelemetry.template_id == template_id)
+
+        wanted = set(keys)
+        stats = {}
+        for vendor, model, grounded, samples, *values in (await session.execute(query)).all():
+            key = (vendor, model, bool(grounded))
+            if key in wanted and samples >= self.settings.batch_planner_min_samples:
+                stats[key] = (samples, [float(v or 0) for v in values])
+        return stats
+
+    def _default_stats(self, key: CellKey) -> CellStats:
+        s = self.settings
+        vendor, model, grounded = key
+        return CellStats(
+            vendor=vendor, model=model, grounded=grounded, source="default", samples=0,
+            input_tokens_p50=s.batch_planner_default_input_tokens,
+            input_tokens_p90=s.batch_planner_default_input_tokens,
+            output_tokens_p50=s.batch_planner_default_output_tokens,
+            output_tokens_p90=s.batch_planner_default_output_tokens,
+            latency_ms_p50=s.batch_planner_default_latency_ms,
+            latency_ms_p90=s.batch_planner_default_latency_ms
+        )
+
+    async def load_cell_stats(
+        self,
+        session: AsyncSession,
+        template_id: str,
+        keys: Iterable[CellKey]
+    ) -> Dict[CellKey, CellStats]:
+        """
+        Resolve stats per group: this template's history first, then all
+        templates, then configured defaults.
+        """
+        keys = set(keys)
+        resolved: Dict[CellKey, CellStats] = {}
+
+        for source, scope in (("template", template_id), ("global", None)):
+            missing = keys - resolved.keys()
+            if not missing:
+                break
+            for key, (samples, v) in (await self._query_stats(session, missing, scope)).items():
+                resolved[key] = CellStats(
+                    *key, source=source, samples=samples,
+                    input_tokens_p50=v[0], input_tokens_p90=v[1],
+                    output_tokens_p50=v[2], output_tokens_p90=v[3],
+                    latency_ms_p50=v[4], latency_ms_p90=v[5]
+                )
+
+        for key in keys - resolved.keys():
+            resolved[key] = self._default_stats(key)
+        return resolved
+
+    def _tpm_budget(self) -> int:
+        s = self.settings
+        return int(s.openai_tpm_limit * (1.0 - float(s.openai_tpm_headroom)))
+
+    def _simulate(
+        self,
+        request: BatchRunRequest,
+        counts: Dict[CellKey, int],
+        stats: Dict[CellKey, CellStats],
+        percentile: str,
+        openai_gated: bool
+    ) -> ScheduleEstimate:
+        max_parallel = min(request.max_parallel or 10, 20)
+        cells_by_vendor: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        # Expansion order within a vendor bulkhead is model-major
+        for (vendor, model, grounded), runs in counts.items():
+            st = stats[(vendor, model, grounded)]
+            tokens = int(getattr(st, f"input_tokens_{percentile}") + getattr(st, f"output_tokens_{percentile}"))
+            latency_s = getattr(st, f"latency_ms_{percentile}") / 1000.0
+            cells_by_vendor[vendor].extend([(tokens, latency_s)] * runs)
+
+        concurrency = {v: self.runner._bulkhead_size(v, max_parallel) for v in cells_by_vendor}
+        if not openai_gated:
+            return simulate_schedule(cells_by_vendor, concurrency)
+        # The in-batch gate spaces OpenAI launches and holds them to the TPM budget
+        spacing = self.runner.openai_launch_spacing(0.9 if percentile == "p90" else 0.5)
+        return simulate_schedule(
+            cells_by_vendor, concurrency, {"openai": self._tpm_budget()}, {"openai": spacing}
+        )
+
+    async def plan(
+        self,
+        session: AsyncSession,
+        template_id: str,
+        request: BatchRunRequest
+    ) -> BatchPlanResponse:
+        """Build the full batch plan from telemetry percentiles"""
+        counts = self._cell_keys(request)
+        stats = await self.load_cell_stats(session, template_id, counts.keys())
+
+        groups = []
+        for key, runs in counts.items():
+            st = stats[key]
+            groups.append(BatchPlanGroup(
+                vendor=st.vendor,
+                model=st.model,
+                grounded=st.grounded,
+                runs=runs,
+                source=st.source,
+                samples=st.samples,
+                input_tokens_p50=st.input_tokens_p50,
+                input_tokens_p90=st.input_tokens_p90,
+                output_tokens_p50=st.output_tokens_p50,
+                output_tokens_p90=st.output_tokens_p90,
+                latency_ms_p50=st.latency_ms_p50,
+                latency_ms_p90=st.latency_ms_p90,
+                est_cost_cents=runs * estimate_cost_cents(st.vendor, st.model, st.input_tokens_p50, st.output_tokens_p50),
+                est_cost_cents_p90=runs * estimate_cost_cents(st.vendor, st.model, st.input_tokens_p90, st.output_tokens_p90)
+            ))
+
+        openai_runs = sum(g.runs for g in groups if g.vendor == "openai")
+        openai_tokens = sum(g.runs * (g.input_tokens_p50 + g.output_tokens_p50) for g in groups if g.vendor == "openai")
+        openai_tokens_per_run = max(
+            (g.input_tokens_p90 + g.output_tokens_p90 for g in groups if g.vendor == "openai"),
+            default=0
+        )
+        budget = self._tpm_budget()
+
+        # Same condition as BatchRunner: gated when configured, or paced
+        # because the batch is over budget (the batch route calls pace_openai)
+        openai_gated = bool(
+            self.settings.openai_gate_in_batch or self.runner._openai_paced or openai_tokens > budget
+        )
+        expected = self._simulate(request, counts, stats, "p50", openai_gated)
+        pessimistic = self._simulate(request, counts, stats, "p90", openai_gated)
+
+        return BatchPlanResponse(
+            template_id=template_id,
+            total_runs=sum(counts.values()),
+            groups=groups,
+            est_input_tokens=sum(g.runs * g.input_tokens_p50 for g in groups),
+            est_output_tokens=sum(g.runs * g.output_tokens_p50 for g in groups),
+            est_cost_cents=round(sum(g.est_cost_cents for g in groups), 4),
+            est_cost_cents_p90=round(sum(g.est_cost_cents_p90 for g in groups), 4),
+            est_makespan_seconds=round(expected.makespan_seconds, 3),
+            est_makespan_seconds_p90=round(pessimistic.makespan_seconds, 3),
+            vendor_makespan_seconds={v: round(t, 3) for v, t in expected.vendor_makespan_seconds.items()},
+            peak_tpm=expected.peak_tpm,
+            openai_runs=openai_runs,
+            openai_est_tokens=int(openai_tokens),
+            openai_max_tokens_per_run=int(openai_tokens_per_run),
+            tpm_budget=budget,
+            spread_over_time=openai_tokens > budget,
+            feasible=openai_tokens_per_run <= budget
+        )
@@ -0,0 +1,402 @@
+"""
+Batch progress events: Postgres LISTEN/NOTIFY fan-out, SSE framing and completion webhooks
+Replaces client polling of /v1/templates/{id}/runs?batch_id=...
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+import httpx
+from sqlalchemy import func, not_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.models import Batch, Run
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_CHANNEL = "batch_progress"
+TERMINAL_STATUSES = ("completed", "partial")
+
+
+class BatchProgress:
+    """
+    Per-batch progress counters kept by the batch worker.
+
+    Events are published with pg_notify on the shared session, so they are
+    delivered when the run they describe is committed. Each NOTIFY runs in a
+    savepoint: a failed one is rolled back alone instead of aborting the
+    batch's transaction. Intermediate events are throttled to one per
+    batch_progress_min_interval_seconds.
+    """
+
+    def __init__(self, batch_id, total: int, completed: int = 0):
+        self.batch_id = str(batch_id)
+        self.total = total
+        self.completed = completed
+        self.failed = 0
+        self.in_flight = 0
+        self.status = "running"
+        self._resumed = completed
+        self._started_at = time.monotonic()
+        self._last_published = 0.0
+        self._min_interval = get_settings().batch_progress_min_interval_seconds
+
+    def started(self) -> None:
+        self.in_flight += 1
+
+    def finished(self, succeeded: bool) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        if succeeded:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining runs at the observed completion rate of this execution"""
+        done = self.completed + self.failed - self._resumed
+        remaining = max(0, self.total - self.completed - self.failed)
+        if remaining == 0:
+            return 0.0
+        if done <= 0:
+            return None
+        return round(remaining * (time.monotonic() - self._started_at) / done, 1)
+
+    def event(self) -> Dict[str, Any]:
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "eta_seconds": self.eta_seconds()
+        }
+
+    async def publish(self, session: AsyncSession, force: bool = False) -> None:
+        """NOTIFY listeners; never raises into the batch"""
+        now = time.monotonic()
+        if not force and now - self._last_published < self._min_interval:
+            return
+        self._last_published = now
+        try:
+            async with session.begin_nested():
+                await session.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": PROGRESS_CHANNEL, "payload": json.dumps(self.event())}
+                )
+        except Exception as e:
+            logger.debug(f"Batch progress notify failed: {e}")
+
+
+class BatchProgressListener:
+    """
+    One LISTEN connection per process, fanned out to per-batch subscribers.
+
+    The connection is opened lazily on the first subscription and reuses
+    the application engine's asyncpg driver. When it is terminated it is
+    dropped and, if anyone is subscribed, re-established; streams also probe
+    it on their heartbeat. ``generation`` counts (re)connections, so a
+    stream can tell that events may have been missed in between.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._connection = None
+        self._driver = None
+        self._lock = asyncio.Lock()
+        self._checked_at = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        self.generation = 0
+
+    async def _ensure_listening(self, probe_after: Optional[float] = None) -> None:
+        """
+        Connect and LISTEN unless a live connection exists. With probe_after,
+        a connection not checked for that many seconds is probed first.
+        """
+        async with self._lock:
+            if self._connection is not None and not await self._healthy(probe_after):
+                await self._reset()
+            if self._connection is not None:
+                return
+            from app.db.database import engine
+            conn = await engine.connect()
+            try:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+                await driver.add_listener(PROGRESS_CHANNEL, self._on_notify)
+                driver.add_termination_listener(self._on_terminated)
+            except Exception:
+                await conn.close()
+                raise
+            self._connection, self._driver = conn, driver
+            self._checked_at = time.monotonic()
+            self.generation += 1
+
+    async def _healthy(self, probe_after: Optional[float]) -> bool:
+        if self._driver.is_closed():
+            return False
+        if probe_after is None or time.monotonic() - self._checked_at < probe_after:
+            return True
+        try:
+            await asyncio.wait_for(self._driver.execute("SELECT 1"), timeout=5.0)
+        except Exception as e:
+            logger.info(f"Batch progress LISTEN connection failed its probe: {e}")
+            return False
+        self._checked_at = time.monotonic()
+        return True
+
+    async def _reset(self) -> None:
+        conn, self._connection, self._driver = self._connection, None, None
+        try:
+            await conn.invalidate()
+        except Exception:
+            pass
+
+    def _on_terminated(self, connection) -> None:
+        if connection is not self._driver or not self._subscribers:
+            return
+        logger.warning("Batch progress LISTEN connection lost; reconnecting")
+        task = asyncio.get_running_loop().create_task(self._resubscribe())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resubscribe(self) -> None:
+        try:
+            await self._ensure_listening()
+        except Exception as e:
+            # Streams retry on their next heartbeat
+            logger.warning(f"Batch progress LISTEN reconnect failed: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self.dispatch(event)
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(event.get("batch_id"), ()):
+            # Slow consumers only need the latest counts
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def subscribe(self, batch_id) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        self._subscribers.setdefault(str(batch_id), set()).add(queue)
+        try:
+            await self._ensure_listening()
+        except Exception:
+            self.unsubscribe(batch_id, queue)
+            raise
+        return queue
+
+    def unsubscribe(self, batch_id, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(str(batch_id))
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[str(batch_id)]
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._connection is not None:
+                await self._connection.close()
+                self._connection = self._driver = None
+
+
+listener = BatchProgressListener()
+
+
+async def batch_snapshot(session: AsyncSession, batch: Batch) -> Dict[str, Any]:
+    """
+    Current counts for a batch from the runs table.
+
+    A cell counts as completed if any of its runs succeeded (resume may
+    leave earlier failed attempts behind) and as failed otherwise.
+    """
+    per_cell = select(
+        Run.batch_run_index,
+        func.bool_or(Run.status == "succeeded").label("ok")
+    ).where(Run.batch_id == batch.batch_id).group_by(Run.batch_run_index).subquery()
+
+    row = (await session.execute(
+        select(
+            func.count().filter(per_cell.c.ok),
+            func.count().filter(not_(per_cell.c.ok))
+        )
+    )).one()
+
+    if batch.cell_summary:
+        total = sum(cell["replicates"] for cell in batch.cell_summary)
+    else:
+        p = batch.parameters or {}
+        total = (
+            len(p.get("models", [])) * len(p.get("locales", []))
+            * len(p.get("grounding_modes", [])) * int(p.get("replicates", 1))
+        )
+
+    completed, failed = row[0] or 0, row[1] or 0
+    return {
+        "batch_id": str(batch.batch_id),
+        "status": batch.status,
+        "total": total,
+        "completed": completed,
+        "failed": failed,
+        "in_flight": 0,
+        "eta_seconds": 0.0 if batch.status in TERMINAL_STATUSES else None
+    }
+
+
+def format_sse(event: Dict[str, Any], event_type: str = "progress") -> str:
+    """Frame one server-sent event"""
+    return f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_batch_events(
+    batch_id,
+    load_snapshot: Callable[[], Awaitable[Dict[str, Any]]],
+    heartbeat_seconds: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    Yield SSE frames for one batch: the DB snapshot first, then pushed
+    events until the batch reaches a terminal status.
+
+    The subscription is taken before the snapshot is read, so a NOTIFY sent
+    in between (including the terminal one) waits in the queue instead of
+    being lost. Each heartbeat also checks the LISTEN connection; after a
+    reconnect the snapshot is sent again, since events may have been missed.
+    """
+    heartbeat = heartbeat_seconds or get_settings().batch_progress_heartbeat_seconds
+    queue = await listener.subscribe(batch_id)
+    try:
+        generation = listener.generation
+        snapshot = await load_snapshot()
+        yield format_sse(snapshot)
+        if snapshot.get("status") in TERMINAL_STATUSES:
+            return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                try:
+                    await listener._ensure_listening(probe_after=heartbeat)
+                except Exception as e:
+                    logger.info(f"Batch progress LISTEN reconnect failed: {e}")
+                if listener.generation != generation:
+                    generation = listener.generation
+                    event = await load_snapshot()
+                else:
+                    # Comment frame keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+            yield format_sse(event)
+            if event.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        listener.unsubscribe(batch_id, queue)
+
+
+def sign_webhook(body: bytes) -> str:
+    """HMAC-SHA256 of the webhook body with the server secret"""
+    return hmac.new(get_settings().secret_key.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookURLError(ValueError):
+    """Webhook URL the server must not POST to"""
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+async def check_webhook_url(url: str) -> None:
+    """
+    Raise WebhookURLError unless url is https, on an allowed host, and every
+    address the host resolves to is public. Loopback, private, link-local
+    (cloud metadata) and other reserved targets are refused.
+    """
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL as e:
+        raise WebhookURLError(f"Invalid webhook URL: {e}") from None
+    if parsed.scheme != "https" or not parsed.host:
+        raise WebhookURLError("Webhook URL must be an https URL with a host")
+
+    host = parsed.host.lower()
+    allowed = [h.lower() for h in get_settings().batch_webhook_allowed_hosts]
+    if allowed and host not in allowed:
+        raise WebhookURLError(f"Webhook host {host} is not in the allowed hosts")
+
+    try:
+        addresses = await _resolve(host, parsed.port or 443)
+    except socket.gaierror:
+        raise WebhookURLError(f"Webhook host {host} does not resolve") from None
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global:
+            raise WebhookURLError(f"Webhook host {host} resolves to non-public address {ip}")
+
+
+async def deliver_webhook(url: str, payload: Dict[str, Any], client: Optional[httpx.AsyncClient] = None) -> bool:
+    """
+    POST the batch result to a completion webhook with exponential backoff.
+
+    2xx is success; 4xx other than 408/429 is not retried. The target is
+    re-checked with check_webhook_url before every attempt, so a host that
+    starts resolving to an internal address is not posted to; redirects are
+    not followed. Returns True on delivery.
+    """
+    s = get_settings()
+    body = json.dumps(payload, default=str).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "X-Contestra-Event": "batch.completed",
+        "X-Contestra-Signature": f"sha256={sign_webhook(body)}"
+    }
+
+    owns_client = client is None
+    client = client or httpx.AsyncClient(timeout=s.batch_webhook_timeout_seconds)
+    try:
+        for attempt in range(1, s.batch_webhook_max_attempts + 1):
+            try:
+                await check_webhook_url(url)
+            except WebhookURLError as e:
+                logger.warning(f"Batch webhook refused for {payload.get('batch_id')}: {e}")
+                return False
+            try:
+                response = await client.post(url, content=body, headers=headers, follow_redirects=False)
+                if response.is_success:
+                    return True
+                if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                    logger.warning(f"Batch webhook rejected ({response.status_code}) for {payload.get('batch_id')}")
+                    return False
+            except httpx.HTTPError as e:
+                logger.info(f"Batch webhook attempt {attempt} failed: {e}")
+            if attempt < s.batch_webhook_max_attempts:
+                await asyncio.sleep(s.batch_webhook_backoff_base_seconds * 2 ** (attempt - 1))
+        logger.warning(f"Batch webhook gave up after {s.batch_webhook_max_attempts} attempts for {payload.get('batch_id')}")
+        return False
+    finally:
+        if owns_client:
+            await client.aclose()
+
+
+_webhook_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_webhook(url: str, payload: Dict[str, Any]) -> asyncio.Task:
+    """Deliver a webhook in the background without blocking the batch response"""
+    task = asyncio.create_task(deliver_webhook(url, payload))
+    _webhook_tasks.add(task)
+    task.add_done_callback(_webhook_tasks.discard)
+    return task
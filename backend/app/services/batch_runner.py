@@ -9,20 +9,56 @@ import time
 import random
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from itertools import chain
+from collections import Counter
+from typing import AbstractSet, Callable, Dict, FrozenSet, Iterator, List, Any, Optional, Tuple
 from uuid import uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.models.models import PromptTemplate, Batch, Run
-from app.schemas.templates import BatchRunRequest, BatchRunResponse, RunTemplateRequest
-from app.services.template_runner import execute_template_run
+from app.schemas.templates import BatchRunRequest, BatchRunResponse, BatchCell, BatchDryRunResponse, RunTemplateRequest, RunTemplateResponse
+from app.services.template_runner import execute_template_run, adapter as llm_adapter
 from app.services.als.als_builder import ALSBuilder
+from app.services.batch_progress import BatchProgress, schedule_webhook
+from app.services.mention_engine import MentionEngine
 from app.services.als.country_codes import is_valid_country, get_all_countries
 from app.core.canonicalization import compute_sha256
 from app.core.config import get_settings
-from app.prometheus_metrics import set_openai_active_concurrency, set_openai_next_slot_epoch, inc_stagger_delays, inc_tpm_deferrals
+from app.prometheus_metrics import set_openai_active_concurrency, set_openai_next_slot_epoch, inc_stagger_delays, inc_tpm_deferrals, set_batch_vendor_inflight
+
+
+def _mentioned_brands(text: str, engine: MentionEngine) -> FrozenSet[str]:
+    """Set of brands mentioned in an output (case-insensitive, whole words)"""
+    return frozenset(engine.scan(text).counts)
+
+
+def _agreement(counts: Counter) -> float:
+    """Share of observations equal to the modal value (0.0 when empty)"""
+    total = sum(counts.values())
+    return max(counts.values()) / total if total else 0.0
+
+
+def _cell_stability(cell: Dict[str, Any]) -> float:
+    return max(_agreement(cell["hashes"]), _agreement(cell["brand_sets"]))
+
+
+def _stopping_reason(cell: Dict[str, Any], min_reps: int, max_reps: int, confidence: float) -> Optional[str]:
+    """Why an adaptive cell should stop after this round, or None to keep sampling"""
+    if sum(cell["hashes"].values()) >= min_reps:
+        hash_agreement = _agreement(cell["hashes"])
+        if hash_agreement >= confidence:
+            return "identical_outputs" if len(cell["hashes"]) == 1 else "hash_agreement"
+        if cell["brand_sets"] and _agreement(cell["brand_sets"]) >= confidence:
+            return "brand_agreement"
+    if cell["replicates"] >= max_reps:
+        return "max_replicates"
+    return None
+
+
+class BatchResumeError(ValueError):
+    """Raised when a resume request cannot be merged into the requested batch"""
 
 
 class BatchRunner:
@@ -44,6 +80,9 @@ class BatchRunner:
         self._tpm_lock = asyncio.Lock()
         self._tpm_window_minute = int(time.time() // 60)
         self._tpm_used = 0
+        self._openai_paced = False
+        # Per-vendor bulkhead in-flight counters
+        self._vendor_active: Dict[str, int] = {}
     
     def _extract_country_from_locale(self, locale: str) -> str:
         """Extract country code from locale (e.g., 'en-US' -> 'US')"""
@@ -73,37 +112,135 @@ class BatchRunner:
             "als_enabled": bool(als_block)
         }
     
-    def _generate_run_configurations(self, request: BatchRunRequest) -> List[Dict[str, Any]]:
-        """Generate all model×locale×grounding×replicate combinations"""
-        configurations = []
-        run_index = 0
+    def _build_configuration(
+        self,
+        request: BatchRunRequest,
+        model: str,
+        locale: str,
+        grounding_mode: str,
+        replicate: int,
+        run_index: int
+    ) -> Dict[str, Any]:
+        """Build one run configuration, including a freshly rotated ALS context"""
+        return {
+            "run_index": run_index,
+            "model": model,
+            "locale": locale,
+            "grounding_mode": grounding_mode,
+            # Determine grounding
+            "grounded": grounding_mode in ["GROUNDED", "REQUIRED"],
+            "replicate": replicate,
+            # Build ALS context for this locale (rotates per run)
+            "als_context": self._build_als_context(locale),
+            "inputs": request.inputs or {}
+        }
+    
+    def _iter_model_configurations(
+        self,
+        request: BatchRunRequest,
+        model_position: int,
+        skip: AbstractSet[int] = frozenset()
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield locale×grounding×replicate combinations for one model.
         
-        for model in request.models:
-            for locale in request.locales:
-                for grounding_mode in request.grounding_modes:
-                    for replicate in range(request.replicates):
-                        
-                        # Build ALS context for this locale
-                        als_context = self._build_als_context(locale)
-                        
-                        # Determine grounding
-                        grounded = grounding_mode in ["GROUNDED", "REQUIRED"]
-                        
-                        config = {
-                            "run_index": run_index,
-                            "model": model,
-                            "locale": locale,
-                            "grounding_mode": grounding_mode,
-                            "grounded": grounded,
-                            "replicate": replicate + 1,
-                            "als_context": als_context,
-                            "inputs": request.inputs or {}
-                        }
-                        
-                        configurations.append(config)
-                        run_index += 1
+        run_index is the configuration's position in the full model-major
+        expansion, so any subset of models can be streamed independently
+        without changing run indices. The ALS context is only built when a
+        configuration is actually pulled by a worker; cells whose run_index
+        is in ``skip`` are never built.
+        """
+        model = request.models[model_position]
+        run_index = model_position * self._configurations_per_model(request)
         
-        return configurations
+        for locale in request.locales:
+            for grounding_mode in request.grounding_modes:
+                for replicate in range(request.replicates):
+                    if run_index not in skip:
+                        yield self._build_configuration(
+                            request, model, locale, grounding_mode, replicate + 1, run_index
+                        )
+                    run_index += 1
+    
+    def _iter_run_configurations(
+        self,
+        request: BatchRunRequest,
+        skip: AbstractSet[int] = frozenset()
+    ) -> Iterator[Dict[str, Any]]:
+        """Lazily yield model×locale×grounding×replicate combinations (model-major)"""
+        for model_position in range(len(request.models)):
+            yield from self._iter_model_configurations(request, model_position, skip)
+    
+    def _vendor_for_model(self, model: str) -> str:
+        """Resolve the vendor bulkhead a model belongs to"""
+        try:
+            return llm_adapter.get_vendor_for_model(model)
+        except ValueError:
+            return "unknown"
+    
+    def _iter_vendor_streams(
+        self,
+        request: BatchRunRequest,
+        skip: AbstractSet[int] = frozenset()
+    ) -> Dict[str, Tuple[int, Iterator[Dict[str, Any]]]]:
+        """
+        Split the expansion into one lazy stream per vendor.
+        
+        Returns a mapping of vendor -> (pending run count, configuration iterator).
+        Each stream is drained by its own bulkhead, so configurations are
+        interleaved across vendors instead of flooding one provider at a time.
+        """
+        positions: Dict[str, List[int]] = {}
+        for model_position, model in enumerate(request.models):
+            positions.setdefault(self._vendor_for_model(model), []).append(model_position)
+        
+        per_model = self._configurations_per_model(request)
+        streams = {}
+        for vendor, model_positions in positions.items():
+            pending = sum(
+                per_model - sum(1 for i in skip if p * per_model <= i < (p + 1) * per_model)
+                for p in model_positions
+            )
+            if pending:
+                streams[vendor] = (
+                    pending,
+                    chain.from_iterable(
+                        self._iter_model_configurations(request, p, skip) for p in model_positions
+                    )
+                )
+        return streams
+    
+    def _bulkhead_size(self, vendor: str, max_parallel: int) -> int:
+        """Concurrency of a vendor's bulkhead, capped by the request's max_parallel"""
+        limits = get_settings().batch_vendor_max_parallel or {}
+        return max(1, min(max_parallel, int(limits.get(vendor, max_parallel))))
+    
+    @asynccontextmanager
+    async def _vendor_inflight(self, vendor: str):
+        """Track in-flight runs per vendor bulkhead"""
+        self._vendor_active[vendor] = self._vendor_active.get(vendor, 0) + 1
+        set_batch_vendor_inflight(vendor, self._vendor_active[vendor])
+        try:
+            yield
+        finally:
+            self._vendor_active[vendor] -= 1
+            set_batch_vendor_inflight(vendor, self._vendor_active[vendor])
+    
+    def _generate_run_configurations(self, request: BatchRunRequest) -> List[Dict[str, Any]]:
+        """Generate all model×locale×grounding×replicate combinations"""
+        return list(self._iter_run_configurations(request))
+    
+    def _configurations_per_model(self, request: BatchRunRequest) -> int:
+        return len(request.locales) * len(request.grounding_modes) * request.replicates
+    
+    def count_run_configurations(self, request: BatchRunRequest) -> int:
+        """Closed-form size of the batch expansion (no configurations built)"""
+        return len(request.models) * self._configurations_per_model(request)
+    
+    def count_openai_runs(self, request: BatchRunRequest) -> int:
+        """Closed-form count of OpenAI runs in the batch expansion"""
+        openai_models = sum(1 for m in request.models if isinstance(m, str) and self._is_openai_model(m))
+        return openai_models * self._configurations_per_model(request)
 
     # --- OpenAI gating helpers ---
     def _is_openai_model(self, model: str) -> bool:
@@ -154,6 +291,17 @@ class BatchRunner:
                 set_openai_active_concurrency(self._openai_active)
             self._openai_sem.release()
     
+    def pace_openai(self, tokens_per_run: int) -> None:
+        """
+        Force the in-batch OpenAI TPM gate on for this runner.
+        
+        Used when the planner finds a batch exceeds one minute of TPM budget:
+        launches are spread over successive minute windows instead of the
+        batch being rejected.
+        """
+        self._openai_paced = True
+        self._tpm_est = max(1, int(tokens_per_run))
+    
     def _compute_batch_hash(self, template_id: str, request: BatchRunRequest) -> str:
         """Compute deterministic hash for batch configuration"""
         batch_data = {
@@ -164,6 +312,13 @@ class BatchRunner:
             "replicates": request.replicates,
             "inputs": request.inputs or {}
         }
+        if request.adaptive:
+            batch_data["adaptive"] = {
+                "min_replicates": request.adaptive_min_replicates,
+                "max_replicates": request.adaptive_max_replicates,
+                "confidence": request.adaptive_confidence,
+                "brands": sorted(request.brands or [])
+            }
         return compute_sha256(batch_data)
     
     def _is_openai_model(self, model: str) -> bool:
@@ -211,6 +366,15 @@ class BatchRunner:
             self._next_slot_epoch = time.time() + self._stagger_seconds + random.uniform(0, 2)
             set_openai_next_slot_epoch(self._next_slot_epoch)
     
+    def openai_launch_spacing(self, q: float = 0.5) -> float:
+        """
+        Seconds between gated OpenAI launches at quantile q of the jitter,
+        as enforced by _await_openai_launch_slot (stagger + uniform(0, 2))
+        """
+        if self._stagger_seconds <= 0:
+            return 0.0
+        return self._stagger_seconds + 2.0 * q
+    
     @asynccontextmanager
     async def _openai_concurrency_context(self):
         """Context manager for OpenAI concurrency tracking"""
@@ -229,6 +393,103 @@ class BatchRunner:
             
             self._openai_sem.release()
     
+    async def _resolve_resume_batch(
+        self,
+        session: AsyncSession,
+        template_id: str,
+        request: BatchRunRequest,
+        batch_sha256: str
+    ) -> Optional[Batch]:
+        """
+        Find the batch a resume request merges into.
+        
+        An explicit resume_batch_id must exist for the template and share the
+        request's batch_sha256 (i.e. the same expansion); otherwise the most
+        recent batch with that hash is used, if any.
+        """
+        if request.resume_batch_id:
+            batch = await session.get(Batch, request.resume_batch_id)
+            if not batch or str(batch.template_id) != str(template_id):
+                raise BatchResumeError(f"Batch {request.resume_batch_id} not found for template {template_id}")
+            if batch.batch_sha256 != batch_sha256:
+                raise BatchResumeError(
+                    f"Batch {request.resume_batch_id} was created with a different configuration "
+                    f"(batch_sha256 {batch.batch_sha256} != {batch_sha256})"
+                )
+            return batch
+        
+        result = await session.execute(
+            select(Batch).where(
+                Batch.template_id == template_id,
+                Batch.batch_sha256 == batch_sha256
+            ).order_by(Batch.created_at.desc()).limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    async def _completed_cells(self, session: AsyncSession, batch_id) -> Dict[int, str]:
+        """Map run_index -> run_id for every cell of a batch that already succeeded"""
+        result = await session.execute(
+            select(Run.batch_run_index, Run.run_id).where(
+                Run.batch_id == batch_id,
+                Run.status == "succeeded"
+            )
+        )
+        return {index: str(run_id) for index, run_id in result.all() if index is not None}
+    
+    async def plan_batch(
+        self,
+        session: AsyncSession,
+        template_id: str,
+        request: BatchRunRequest,
+        org_id: str
+    ) -> BatchDryRunResponse:
+        """
+        Report which cells a batch-run request would execute, without running it.
+        
+        For resume requests, cells that already have a succeeded Run in the
+        resumed batch are reported as skipped.
+        """
+        result = await session.execute(
+            select(PromptTemplate).where(
+                PromptTemplate.template_id == template_id,
+                PromptTemplate.org_id == org_id
+            )
+        )
+        if not result.scalar_one_or_none():
+            raise ValueError(f"Template {template_id} not found")
+        
+        batch_sha256 = self._compute_batch_hash(template_id, request)
+        batch = await self._resolve_resume_batch(session, template_id, request, batch_sha256) if request.resume else None
+        completed_cells = await self._completed_cells(session, batch.batch_id) if batch else {}
+        
+        per_model = self._configurations_per_model(request)
+        cells = []
+        for model_position, model in enumerate(request.models):
+            run_index = model_position * per_model
+            for locale in request.locales:
+                for grounding_mode in request.grounding_modes:
+                    for replicate in range(request.replicates):
+                        if run_index not in completed_cells:
+                            cells.append(BatchCell(
+                                run_index=run_index,
+                                model=model,
+                                vendor=self._vendor_for_model(model),
+                                locale=locale,
+                                grounding_mode=grounding_mode,
+                                replicate=replicate + 1
+                            ))
+                        run_index += 1
+        
+        return BatchDryRunResponse(
+            template_id=template_id,
+            batch_sha256=batch_sha256,
+            resume_batch_id=batch.batch_id if batch else None,
+            total_runs=self.count_run_configurations(request),
+            skipped_runs=len(completed_cells),
+            pending_runs=len(cells),
+            cells=cells
+        )
+    
     async def execute_batch(
         self,
         session: AsyncSession,
@@ -263,65 +524,139 @@ class BatchRunner:
         if not template:
             raise ValueError(f"Template {template_id} not found")
         
-        # Generate run configurations
-        configurations = self._generate_run_configurations(request)
-        total_runs = len(configurations)
-        
-        # Create batch record
-        batch_id = uuid4()
+        # Size the batch without materialising the expansion
+        total_runs = self.count_run_configurations(request)
         batch_sha256 = self._compute_batch_hash(template_id, request)
         
-        batch = Batch(
+        if request.resume and request.adaptive:
+            raise BatchResumeError("Resume is not supported for adaptive batches")
+        
+        # Resume: merge into an earlier batch and skip its succeeded cells
+        batch = None
+        completed_cells: Dict[int, str] = {}
+        if request.resume:
+            batch = await self._resolve_resume_batch(session, template_id, request, batch_sha256)
+            if batch:
+                completed_cells = await self._completed_cells(session, batch.batch_id)
+                # Running again: status polling and progress streams must not
+                # see the previous attempt's terminal status
+                batch.status = "running"
+                batch.completed_at = None
+                await session.commit()
+        
+        if batch is None:
+            # Create batch record
+            batch = Batch(
+                batch_id=uuid4(),
+                template_id=template_id,
+                batch_sha256=batch_sha256,
+                parameters={
+                    "models": request.models,
+                    "locales": request.locales,
+                    "grounding_modes": request.grounding_modes,
+                    "replicates": request.replicates,
+                    "drift_policy": request.drift_policy,
+                    "inputs": request.inputs or {}
+                },
+                status="running",
+                created_at=datetime.utcnow(),
+                created_by=user_id
+            )
+            
+            session.add(batch)
+            await session.commit()
+            await session.refresh(batch)
+        
+        batch_id = batch.batch_id
+        max_parallel = min(request.max_parallel or 10, 20)  # Cap at 20
+        progress = BatchProgress(batch_id, total_runs, completed=len(completed_cells))
+        
+        if request.adaptive:
+            completed, total_runs, cell_summary = await self._execute_adaptive(
+                session, template_id, org_id, user_id, batch_id, request, max_parallel, progress
+            )
+            batch.cell_summary = cell_summary
+        else:
+            # Execute runs on per-vendor bulkheads fed by lazy vendor streams
+            completed = list(completed_cells.items())
+            cell_summary = None
+            await self._run_streams(
+                session, template_id, org_id, user_id, batch_id,
+                self._iter_vendor_streams(request, completed_cells.keys()),
+                max_parallel,
+                lambda config, response: completed.append((config["run_index"], response.run_id)),
+                progress
+            )
+        
+        # Report successful runs in expansion order
+        completed.sort()
+        successful_runs = [run_id for _, run_id in completed]
+        batch_status = "completed" if len(successful_runs) == total_runs else "partial"
+        
+        batch.status = batch_status
+        batch.completed_at = datetime.utcnow()
+        progress.total = total_runs
+        progress.status = batch_status
+        await progress.publish(session, force=True)
+        await session.commit()
+        
+        # Build response
+        response = BatchRunResponse(
             batch_id=batch_id,
             template_id=template_id,
             batch_sha256=batch_sha256,
-            parameters={
-                "models": request.models,
-                "locales": request.locales,
-                "grounding_modes": request.grounding_modes,
-                "replicates": request.replicates,
-                "drift_policy": request.drift_policy,
-                "inputs": request.inputs or {}
-            },
-            created_at=datetime.utcnow(),
-            created_by=user_id
+            status=batch_status,
+            total_runs=total_runs,
+            successful_runs=len(successful_runs),
+            failed_runs=total_runs - len(successful_runs),
+            created_at=batch.created_at,
+            run_ids=successful_runs,
+            cell_summary=cell_summary
         )
         
-        session.add(batch)
-        await session.commit()
-        await session.refresh(batch)
+        if request.webhook_url:
+            schedule_webhook(str(request.webhook_url), response.model_dump(mode="json"))
         
-        # Execute runs (with limited parallelism)
-        max_parallel = min(request.max_parallel or 10, 20)  # Cap at 20
-        semaphore = asyncio.Semaphore(max_parallel)
+        return response
+    
+    async def _run_streams(
+        self,
+        session: AsyncSession,
+        template_id: str,
+        org_id: str,
+        user_id: Optional[str],
+        batch_id,
+        streams: Dict[str, Tuple[int, Iterator[Dict[str, Any]]]],
+        max_parallel: int,
+        on_success: Callable[[Dict[str, Any], RunTemplateResponse], None],
+        progress: Optional[BatchProgress] = None
+    ) -> None:
+        """
+        Drain vendor streams on their bulkheads.
         
-        async def execute_single_run(config: Dict[str, Any]) -> str:
+        ``on_success`` is called with (config, response) for every run that
+        succeeded; failed runs are persisted by the template runner but not
+        reported. ``progress`` is updated and published as runs finish.
+        """
+        
+        async def execute_single_run(config: Dict[str, Any]) -> Optional[RunTemplateResponse]:
             """Execute a single run configuration"""
-            async with semaphore:
-                try:
-                    # Build run request
-                    run_request = RunTemplateRequest(
-                        variables=config["inputs"],
-                        model=config["model"],
-                        grounded=config["grounded"],
-                        json_mode=False,  # TODO: Support from template
-                        als_context=config["als_context"]
-                    )
-                    
-                    # Execute the run
-                    s = get_settings()
-                    if s.openai_gate_in_batch and self._is_openai_model(config["model"]):
-                        await self._await_openai_tpm_budget()
-                        await self._await_openai_launch_slot()
-                        async with self._openai_concurrency_context():
-                            response = await execute_template_run(
-                                session=session,
-                                template_id=template_id,
-                                request=run_request,
-                                org_id=org_id,
-                                user_id=user_id
-                            )
-                    else:
+            try:
+                # Build run request
+                run_request = RunTemplateRequest(
+                    variables=config["inputs"],
+                    model=config["model"],
+                    grounded=config["grounded"],
+                    json_mode=False,  # TODO: Support from template
+                    als_context=config["als_context"]
+                )
+                
+                # Execute the run
+                s = get_settings()
+                if (s.openai_gate_in_batch or self._openai_paced) and self._is_openai_model(config["model"]):
+                    await self._await_openai_tpm_budget()
+                    await self._await_openai_launch_slot()
+                    async with self._openai_concurrency_context():
                         response = await execute_template_run(
                             session=session,
                             template_id=template_id,
@@ -329,43 +664,172 @@ class BatchRunner:
                             org_id=org_id,
                             user_id=user_id
                         )
-                    
-                    # Update run with batch information
-                    from sqlalchemy import update
-                    await session.execute(
-                        update(Run).where(Run.run_id == response.run_id).values(
-                            batch_id=batch_id,
-                            batch_run_index=config['run_index'],
-                            grounding_mode=config['grounding_mode']
-                        )
+                else:
+                    response = await execute_template_run(
+                        session=session,
+                        template_id=template_id,
+                        request=run_request,
+                        org_id=org_id,
+                        user_id=user_id
                     )
-                    
-                    return response.run_id
-                    
-                except Exception as e:
-                    print(f"Failed to execute run {config['run_index']}: {e}")
+                
+                # Update run with batch information
+                from sqlalchemy import update
+                await session.execute(
+                    update(Run).where(Run.run_id == response.run_id).values(
+                        batch_id=batch_id,
+                        batch_run_index=config['run_index'],
+                        grounding_mode=config['grounding_mode']
+                    )
+                )
+                
+                # Failed executions are persisted too; only succeeded runs count
+                metadata = getattr(response, "metadata", None) or {}
+                if metadata.get("status", "succeeded") != "succeeded":
                     return None
+                
+                return response
+                
+            except Exception as e:
+                print(f"Failed to execute run {config['run_index']}: {e}")
+                return None
         
-        # Execute all runs concurrently
-        run_ids = await asyncio.gather(
-            *[execute_single_run(config) for config in configurations],
-            return_exceptions=True
-        )
+        async def worker(vendor: str, configurations: Iterator[Dict[str, Any]]) -> None:
+            # Workers of a bulkhead share one generator; next() never spans
+            # an await, so each configuration is handed to exactly one worker.
+            for config in configurations:
+                if progress:
+                    progress.started()
+                async with self._vendor_inflight(vendor):
+                    response = await execute_single_run(config)
+                if response is not None:
+                    on_success(config, response)
+                if progress:
+                    progress.finished(response is not None)
+                    await progress.publish(session)
+        
+        workers = []
+        for vendor, (vendor_runs, stream) in streams.items():
+            pool_size = min(self._bulkhead_size(vendor, max_parallel), vendor_runs)
+            workers.extend(worker(vendor, stream) for _ in range(pool_size))
+        await asyncio.gather(*workers)
+    
+    async def _execute_adaptive(
+        self,
+        session: AsyncSession,
+        template_id: str,
+        org_id: str,
+        user_id: Optional[str],
+        batch_id,
+        request: BatchRunRequest,
+        max_parallel: int,
+        progress: Optional[BatchProgress] = None
+    ) -> Tuple[List[Tuple[int, str]], int, List[Dict[str, Any]]]:
+        """
+        Run replicates in rounds and stop cells once their outputs are stable.
         
-        # Filter successful runs
-        successful_runs = [rid for rid in run_ids if rid and not isinstance(rid, Exception)]
+        A cell is one model×locale×grounding combination. Every cell first
+        gets adaptive_min_replicates runs. After each round a cell stops when
+        the share of replicates agreeing on the modal response_output_sha256
+        (or, with brands given, on the modal set of mentioned brands) reaches
+        adaptive_confidence. The replicate budget saved by stopped cells goes
+        to the least stable remaining cells, one replicate per cell per round,
+        until the budget or adaptive_max_replicates runs out.
         
-        await session.commit()
+        run_index is cell_position * adaptive_max_replicates + replicate, so
+        indices stay unique and deterministic however many replicates run.
         
-        # Build response
-        return BatchRunResponse(
-            batch_id=batch_id,
-            template_id=template_id,
-            batch_sha256=batch_sha256,
-            status="completed" if len(successful_runs) == total_runs else "partial",
-            total_runs=total_runs,
-            successful_runs=len(successful_runs),
-            failed_runs=total_runs - len(successful_runs),
-            created_at=batch.created_at,
-            run_ids=successful_runs
-        )
\ No newline at end of file
+        Returns (run_index, run_id) for succeeded runs, the number of runs
+        executed, and the per-cell summary stored on the Batch.
+        """
+        min_reps = min(request.adaptive_min_replicates, request.adaptive_max_replicates)
+        max_reps = request.adaptive_max_replicates
+        confidence = request.adaptive_confidence
+        brands = request.brands or []
+        mention_engine = MentionEngine({brand: () for brand in brands})
+        
+        cells = [
+            {
+                "model": model,
+                "locale": locale,
+                "grounding_mode": grounding_mode,
+                "replicates": 0,
+                "hashes": Counter(),
+                "brand_sets": Counter(),
+                "stopping_reason": None
+            }
+            for model in request.models
+            for locale in request.locales
+            for grounding_mode in request.grounding_modes
+        ]
+        budget = len(cells) * max(request.replicates, min_reps)
+        executed = 0
+        if progress:
+            progress.total = budget
+        completed: List[Tuple[int, str]] = []
+        
+        def record(config: Dict[str, Any], response: RunTemplateResponse) -> None:
+            cell = cells[config["cell_position"]]
+            # Agree on the hash persisted with the run, as recorded and reported
+            cell["hashes"][response.response_output_sha256] += 1
+            if brands:
+                cell["brand_sets"][_mentioned_brands(response.output_text or "", mention_engine)] += 1
+            completed.append((config["run_index"], response.run_id))
+        
+        round_plan = [(position, min_reps) for position in range(len(cells))]
+        while round_plan:
+            configs: Dict[str, List[Dict[str, Any]]] = {}
+            for position, count in round_plan:
+                cell = cells[position]
+                for _ in range(count):
+                    config = self._build_configuration(
+                        request, cell["model"], cell["locale"], cell["grounding_mode"],
+                        replicate=cell["replicates"] + 1,
+                        run_index=position * max_reps + cell["replicates"]
+                    )
+                    config["cell_position"] = position
+                    configs.setdefault(self._vendor_for_model(cell["model"]), []).append(config)
+                    cell["replicates"] += 1
+                    executed += 1
+            
+            await self._run_streams(
+                session, template_id, org_id, user_id, batch_id,
+                {vendor: (len(c), iter(c)) for vendor, c in configs.items()},
+                max_parallel,
+                record,
+                progress
+            )
+            
+            # Stop stable cells, then hand the remaining budget to the least stable ones
+            active = []
+            for position, cell in enumerate(cells):
+                if cell["stopping_reason"]:
+                    continue
+                reason = _stopping_reason(cell, min_reps, max_reps, confidence)
+                if reason:
+                    cell["stopping_reason"] = reason
+                else:
+                    active.append(position)
+            
+            remaining = budget - executed
+            active.sort(key=lambda position: _cell_stability(cells[position]))
+            for position in active[max(0, remaining):]:
+                cells[position]["stopping_reason"] = "budget_exhausted"
+            round_plan = [(position, 1) for position in active[:max(0, remaining)]]
+        
+        summary = []
+        for cell in cells:
+            succeeded = sum(cell["hashes"].values())
+            summary.append({
+                "model": cell["model"],
+                "locale": cell["locale"],
+                "grounding_mode": cell["grounding_mode"],
+                "replicates": cell["replicates"],
+                "succeeded": succeeded,
+                "distinct_outputs": len(cell["hashes"]),
+                "hash_agreement": _agreement(cell["hashes"]),
+                "brand_agreement": _agreement(cell["brand_sets"]) if brands else None,
+                "stopping_reason": cell["stopping_reason"]
+            })
+        
+        return completed, executed, summary
@@ -0,0 +1,442 @@
+"""
+Bulk export of runs and llm_telemetry as NDJSON or Parquet
+
+Feeds the BigQuery tables behind the Looker views (looker/, migrations/).
+Rows are read oldest first through a server-side cursor and written in
+chunks of export_chunk_size, so memory stays bounded by one chunk
+whatever the table size; the HTTP endpoint and scripts/export_data.py
+share this code.
+
+Exports are incremental per target: export_watermarks stores the
+(created_at, key) of the last row exported to a target, and the next
+export continues strictly after it. Rows younger than export_lag_seconds
+are left for the next export, so transactions that commit with an older
+created_at are not skipped.
+
+Parquet needs pyarrow; each chunk becomes a row group. llm_telemetry.meta
+is flattened to typed meta_* columns (META_FIELDS), keys not listed there
+go to meta_extra as JSON. NDJSON keeps meta as an object. Run payloads
+stored in run_blobs are hydrated on the way out.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import JSON, Boolean, DateTime, Integer, Numeric, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import get_settings
+from app.models.models import LLMTelemetry, Run
+from app.services.run_blobs import PAYLOAD_HASHES, decode_payload, load_blobs
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    HAS_PYARROW = True
+except ImportError:
+    pyarrow = None
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "parquet")
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+# Typed columns for llm_telemetry.meta (written by UnifiedLLMAdapter); "json"
+# values are nested objects kept as JSON text
+META_FIELDS: Dict[str, str] = {
+    "als_present": "bool",
+    "als_block_sha256": "str",
+    "als_variant_id": "str",
+    "seed_key_id": "str",
+    "als_country": "str",
+    "als_nfc_length": "int",
+    "grounding_mode_requested": "str",
+    "grounded_effective": "bool",
+    "tool_call_count": "int",
+    "why_not_grounded": "str",
+    "response_api": "str",
+    "provider_api_version": "str",
+    "region": "str",
+    "reasoning_effort": "str",
+    "reasoning_summary_requested": "bool",
+    "thinking_budget": "int",
+    "include_thoughts": "bool",
+    "reasoning_hint_dropped": "bool",
+    "thinking_hint_dropped": "bool",
+    "circuit_breaker_status": "str",
+    "circuit_breaker_open_count": "int",
+    "router_pacing_delay": "bool",
+    "vantage_policy_before": "str",
+    "vantage_policy_after": "str",
+    "proxies_normalized": "bool",
+    "model_fingerprint": "str",
+    "normalized_model": "str",
+    "model_adjusted_for_grounding": "bool",
+    "original_model": "str",
+    "feature_flags": "json",
+    "runtime_flags": "json",
+    "citations_count": "int",
+    "anchored_citations_count": "int",
+    "unlinked_sources_count": "int",
+    "required_pass_reason": "str",
+    "grounded_evidence_unavailable": "bool",
+    "web_search_count": "int",
+    "web_grounded": "bool",
+    "synthesis_step_used": "bool",
+    "extraction_path": "str",
+    "usage": "json",
+    "finish_reason": "str",
+    "thinking_budget_tokens": "int",
+    "output_json_valid": "bool",
+    "json_validation_outcome": "str",
+    "json_schema_sha256": "str",
+    "json_validation_ms": "float",
+}
+
+
+@dataclass(frozen=True)
+class ExportSource:
+    name: str
+    model: Any
+    key: str
+    # Columns left out of the export
+    exclude: Tuple[str, ...] = ()
+    flatten_meta: bool = False
+    hydrate_blobs: bool = False
+
+    @property
+    def columns(self) -> List[Any]:
+        return [c for c in self.model.__table__.columns if c.name not in self.exclude]
+
+
+SOURCES: Dict[str, ExportSource] = {
+    "runs": ExportSource("runs", Run, "run_id", exclude=("output_tsv",), hydrate_blobs=True),
+    "llm_telemetry": ExportSource("llm_telemetry", LLMTelemetry, "id", flatten_meta=True),
+}
+
+
+@dataclass
+class ExportPlan:
+    source: ExportSource
+    format: str
+    target: str
+    after: Optional[Tuple[datetime, str]]  # watermark the export continues from
+    upper: datetime  # rows created at or after this wait for the next export
+    chunk_size: int
+    commit: bool
+    # Filled in while streaming
+    rows: int = 0
+    last: Optional[Tuple[datetime, str]] = None
+    done: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.source.name,
+            "format": self.format,
+            "target": self.target,
+            "from": _watermark_dict(self.after),
+            "to": _watermark_dict(self.last or self.after),
+            "rows": self.rows,
+            "committed": self.commit and self.done
+        }
+
+
+def _watermark_dict(mark: Optional[Tuple[datetime, str]]) -> Optional[Dict[str, str]]:
+    return {"created_at": mark[0].isoformat(), "key": mark[1]} if mark else None
+
+
+async def load_watermark(engine: AsyncEngine, target: str) -> Optional[Tuple[datetime, str]]:
+    async with engine.begin() as conn:
+        row = (await conn.execute(
+            text("SELECT last_created_at, last_key FROM export_watermarks WHERE target = :target"),
+            {"target": target}
+        )).first()
+    return (row.last_created_at, row.last_key) if row else None
+
+
+async def save_watermark(engine: AsyncEngine, target: str, mark: Tuple[datetime, str], rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO export_watermarks (target, last_created_at, last_key, rows_exported, updated_at)
+            VALUES (:target, :created_at, :key, :rows, now())
+            ON CONFLICT (target) DO UPDATE SET
+                last_created_at = EXCLUDED.last_created_at,
+                last_key = EXCLUDED.last_key,
+                rows_exported = export_watermarks.rows_exported + EXCLUDED.rows_exported,
+                updated_at = now()
+        """), {"target": target, "created_at": mark[0], "key": mark[1], "rows": rows})
+
+
+async def acknowledge_export(
+    engine: AsyncEngine,
+    table: str,
+    mark: Tuple[datetime, str],
+    rows: int = 0,
+    target: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> bool:
+    """
+    Advance a target's watermark to mark, the (created_at, key) of the last
+    row a client has stored. The watermark never moves backwards, so a
+    stale or repeated acknowledgement changes nothing.
+
+    Returns True if the stored watermark is now mark.
+
+    Raises:
+        ValueError: For an unknown table or a mark inside the export lag window
+    """
+    if table not in SOURCES:
+        raise ValueError(f"Unknown export table {table!r}; expected one of {', '.join(SOURCES)}")
+    created_at, key = mark
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    if created_at >= now - timedelta(seconds=get_settings().export_lag_seconds):
+        raise ValueError("Watermark is newer than any exported row")
+
+    target = target or table
+    async with engine.begin() as conn:
+        advanced = (await conn.execute(text("""
+            INSERT INTO export_watermarks (target, last_created_at, last_key, rows_exported, updated_at)
+            VALUES (:target, :created_at, :key, :rows, now())
+            ON CONFLICT (target) DO UPDATE SET
+                last_created_at = EXCLUDED.last_created_at,
+                last_key = EXCLUDED.last_key,
+                rows_exported = export_watermarks.rows_exported + EXCLUDED.rows_exported,
+                updated_at = now()
+            WHERE export_watermarks.last_created_at <= EXCLUDED.last_created_at
+              AND (export_watermarks.last_created_at, export_watermarks.last_key)
+                  IS DISTINCT FROM (EXCLUDED.last_created_at, EXCLUDED.last_key)
+        """), {"target": target, "created_at": created_at, "key": key, "rows": rows})).rowcount == 1
+    return advanced or await load_watermark(engine, target) == (created_at, key)
+
+
+async def plan_export(
+    engine: AsyncEngine,
+    table: str,
+    fmt: str = "ndjson",
+    target: Optional[str] = None,
+    full: bool = False,
+    commit: bool = True,
+    chunk_size: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> ExportPlan:
+    """
+    Validate an export and read its starting watermark (target defaults to
+    the table name; full ignores the watermark).
+
+    Raises:
+        ValueError: For an unknown table or format, or parquet without pyarrow
+    """
+    settings = get_settings()
+    if table not in SOURCES:
+        raise ValueError(f"Unknown export table {table!r}; expected one of {', '.join(SOURCES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and not HAS_PYARROW:
+        raise ValueError("Parquet export needs the pyarrow package")
+    target = target or table
+    now = now or datetime.now(timezone.utc)
+    return ExportPlan(
+        source=SOURCES[table],
+        format=fmt,
+        target=target,
+        after=None if full else await load_watermark(engine, target),
+        upper=now - timedelta(seconds=settings.export_lag_seconds),
+        chunk_size=chunk_size or settings.export_chunk_size,
+        commit=commit
+    )
+
+
+def export_query(plan: ExportPlan):
+    """Rows of the plan's window, oldest first, in (created_at, key) order"""
+    model = plan.source.model
+    created_at, key = model.created_at, getattr(model, plan.source.key)
+    query = select(*plan.source.columns).where(created_at < plan.upper)
+    if plan.after is not None:
+        after_created_at, after_key = plan.after
+        query = query.where(tuple_(created_at, key) > tuple_(after_created_at, key.type.python_type(after_key)))
+    return query.order_by(created_at, key)
+
+
+def _coerce(kind: str, value: Any) -> Any:
+    if value is None:
+        return None
+    try:
+        if kind == "bool":
+            return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return float(value)
+        if kind == "json":
+            return json.dumps(value, sort_keys=True, default=str)
+        return value if isinstance(value, str) else str(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_meta(meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """meta -> {meta_<field>: typed value} for every META_FIELDS entry plus meta_extra"""
+    meta = meta if isinstance(meta, dict) else {}
+    flat = {f"meta_{name}": _coerce(kind, meta.get(name)) for name, kind in META_FIELDS.items()}
+    extra = {k: v for k, v in meta.items() if k not in META_FIELDS}
+    flat["meta_extra"] = json.dumps(extra, sort_keys=True, default=str) if extra else None
+    return flat
+
+
+async def _hydrate(engine: AsyncEngine, rows: List[Dict[str, Any]]) -> None:
+    """Replace NULL run payloads by their run_blobs content (one lookup per chunk)"""
+    wanted = [
+        (row, name, row[hash_name])
+        for row in rows for name, hash_name in PAYLOAD_HASHES.items()
+        if row.get(name) is None and row.get(hash_name)
+    ]
+    if not wanted:
+        return
+    # A separate connection: the export connection is busy with its cursor
+    async with engine.connect() as conn:
+        blobs = await load_blobs(conn, (sha for _, _, sha in wanted))
+    for row, name, sha in wanted:
+        if sha in blobs:
+            row[name] = decode_payload(name, blobs[sha])
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class NdjsonWriter:
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps(row, default=_json_default, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows
+        ).encode("utf-8")
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _Sink:
+    """Write-only file object that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_ARROW_KINDS = {"bool": "bool_", "int": "int64", "float": "float64", "str": "string", "json": "string"}
+
+
+def arrow_schema(source: ExportSource):
+    """Arrow schema of a source: typed table columns, JSON as text, then the flattened meta"""
+    fields = []
+    for column in source.columns:
+        if source.flatten_meta and column.name == "meta":
+            continue
+        if isinstance(column.type, Boolean):
+            kind = pyarrow.bool_()
+        elif isinstance(column.type, Integer):
+            kind = pyarrow.int64()
+        elif isinstance(column.type, Numeric):
+            kind = pyarrow.float64()
+        elif isinstance(column.type, DateTime):
+            kind = pyarrow.timestamp("us", tz="UTC")
+        else:
+            kind = pyarrow.string()
+        fields.append(pyarrow.field(column.name, kind))
+    if source.flatten_meta:
+        fields += [pyarrow.field(f"meta_{name}", getattr(pyarrow, _ARROW_KINDS[kind])()) for name, kind in META_FIELDS.items()]
+        fields.append(pyarrow.field("meta_extra", pyarrow.string()))
+    return pyarrow.schema(fields)
+
+
+class ParquetWriter:
+    """One row group per chunk; the footer is written by close()"""
+
+    def __init__(self, source: ExportSource):
+        self.source = source
+        self.schema = arrow_schema(source)
+        self._json_columns = {c.name for c in source.columns if isinstance(c.type, JSON)} - {"meta"}
+        self._sink = _Sink()
+        self._writer = pyarrow.parquet.ParquetWriter(self._sink, self.schema, compression="zstd")
+
+    def _record(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        record = {}
+        for name, value in row.items():
+            if name == "meta" and self.source.flatten_meta:
+                record.update(flatten_meta(value))
+            elif name in self._json_columns and value is not None:
+                record[name] = json.dumps(value, sort_keys=True, default=str)
+            elif value is not None and not isinstance(value, (bool, int, float, str, datetime)):
+                record[name] = str(value)  # UUID, Decimal
+            else:
+                record[name] = value
+        return record
+
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        table = pyarrow.Table.from_pylist([self._record(row) for row in rows], schema=self.schema)
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def make_writer(plan: ExportPlan):
+    return ParquetWriter(plan.source) if plan.format == "parquet" else NdjsonWriter()
+
+
+async def stream_export(engine: AsyncEngine, plan: ExportPlan) -> AsyncIterator[bytes]:
+    """
+    Encoded chunks of the export. The watermark is stored (when
+    plan.commit) after the last chunk has been produced; an export that is
+    interrupted leaves it where it was.
+    """
+    writer = make_writer(plan)
+    key = plan.source.key
+    async with engine.connect() as conn:
+        result = await conn.stream(export_query(plan).execution_options(yield_per=plan.chunk_size))
+        async for chunk in result.partitions(plan.chunk_size):
+            rows = [dict(row._mapping) for row in chunk]
+            if plan.source.hydrate_blobs:
+                await _hydrate(engine, rows)
+            plan.rows += len(rows)
+            plan.last = (rows[-1]["created_at"], str(rows[-1][key]))
+            data = writer.write(rows)
+            if data:
+                yield data
+    tail = writer.close()
+    if tail:
+        yield tail
+    if plan.commit and plan.last is not None:
+        await save_watermark(engine, plan.target, plan.last, plan.rows)
+    plan.done = True
+    logger.info(f"Export of {plan.source.name} to {plan.target}: {plan.rows} rows")
@@ -1,20 +1,53 @@
 """
 Idempotency key management for AI Ranker V2
+
+A key is reserved with a single INSERT ... ON CONFLICT statement, so two
+concurrent requests cannot both pass a check and insert. The first request
+stores its finished response in idempotency_keys.result in the same
+transaction as its work; a retry with the same body gets those exact bytes
+back instead of executing again, and a retry with a different body is a
+conflict.
+
+Recently committed keys are remembered in a small in-process LRU, so
+retries are answered without a database round trip. Expired keys are
+removed by sweep_expired (run periodically by run_sweeper), not on the
+request path; a reservation simply takes over an expired row.
 """
 
+import asyncio
 import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import Any, Dict
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 from app.models.models import IdempotencyKey
 from app.core.config import get_settings
 
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Reservation:
+    """A reserved key; replay holds the stored response when the request already ran"""
+    org_id: str
+    key: str
+    body_sha256: str
+    replay: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+
+
+# (org_id, key) -> (body_sha256, stored result, monotonic expiry)
+_recent: "OrderedDict[Tuple[str, str], Tuple[str, Optional[Dict[str, Any]], float]]" = OrderedDict()
 
 
 async def compute_body_hash(body: Dict[str, Any]) -> str:
@@ -23,37 +56,57 @@ async def compute_body_hash(body: Dict[str, Any]) -> str:
     return hashlib.sha256(body_str.encode()).hexdigest()
 
 
+def _remember(org_id: str, key: str, body_sha256: str, result: Optional[Dict[str, Any]], ttl_seconds: float) -> None:
+    if ttl_seconds <= 0 or settings.idempotency_cache_size <= 0:
+        return
+    _recent[(org_id, key)] = (body_sha256, result, time.monotonic() + ttl_seconds)
+    _recent.move_to_end((org_id, key))
+    while len(_recent) > settings.idempotency_cache_size:
+        _recent.popitem(last=False)
+
+
+def _recall(org_id: str, key: str) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+    entry = _recent.get((org_id, key))
+    if entry is None:
+        return None
+    if entry[2] <= time.monotonic():
+        del _recent[(org_id, key)]
+        return None
+    _recent.move_to_end((org_id, key))
+    return entry[0], entry[1]
+
+
+def _seconds_left(expires_at: Optional[datetime]) -> float:
+    if expires_at is None:
+        return float(settings.idempotency_ttl_seconds)
+    now = datetime.now(timezone.utc) if expires_at.tzinfo else datetime.utcnow()
+    return (expires_at - now).total_seconds()
+
+
 async def check_idempotency(
     session: AsyncSession,
     org_id: str,
     idempotency_key: str
 ) -> tuple[bool, str | None]:
     """
-    Check if idempotency key exists and return its body hash.
-    
+    Check if an unexpired idempotency key exists and return its body hash.
+
     Returns:
         (exists, body_sha256) where exists is True if key found
     """
-    # Clean up expired keys first
-    expire_cutoff = datetime.utcnow()
-    await session.execute(
-        delete(IdempotencyKey).where(
-            IdempotencyKey.expires_at < expire_cutoff
-        )
-    )
-    
-    # Check for existing key
+    cached = _recall(org_id, idempotency_key)
+    if cached is not None:
+        return True, cached[0]
+
     result = await session.execute(
-        select(IdempotencyKey).where(
+        select(IdempotencyKey.body_sha256).where(
             IdempotencyKey.org_id == org_id,
-            IdempotencyKey.key == idempotency_key
+            IdempotencyKey.key == idempotency_key,
+            IdempotencyKey.expires_at >= func.current_timestamp()
         )
     )
-    existing = result.scalar_one_or_none()
-    
-    if existing:
-        return True, existing.body_sha256
-    return False, None
+    body_sha256 = result.scalar_one_or_none()
+    return body_sha256 is not None, body_sha256
 
 
 async def reserve_idempotency(
@@ -61,33 +114,120 @@ async def reserve_idempotency(
     org_id: str,
     idempotency_key: str,
     body: Dict[str, Any]
-) -> None:
+) -> Reservation:
     """
     Reserve an idempotency key for the given request.
-    
+
+    Returns a Reservation; when its replay is set, the request already
+    completed and replay holds the stored response to send back.
+
     Raises:
         ValueError: If key already exists with different body
     """
     body_hash = await compute_body_hash(body)
-    
-    # Check if key exists
-    exists, existing_hash = await check_idempotency(session, org_id, idempotency_key)
-    
-    if exists:
-        if existing_hash != body_hash:
-            raise ValueError(f"Idempotency key already used with different request body")
-        # Same body, idempotent request - OK
-        return
-    
-    # Reserve the key
+    reservation = Reservation(org_id, idempotency_key, body_hash)
+
+    cached = _recall(org_id, idempotency_key)
+    if cached is not None:
+        if cached[0] != body_hash:
+            raise ValueError("Idempotency key already used with different request body")
+        if cached[1] is not None:
+            reservation.replay = cached[1]
+            return reservation
+
+    # Insert, or take over an expired row; a live row is left alone
     expires_at = datetime.utcnow() + timedelta(seconds=settings.idempotency_ttl_seconds)
-    
-    new_key = IdempotencyKey(
+    insert = pg_insert(IdempotencyKey).values(
         key=idempotency_key,
         org_id=org_id,
         body_sha256=body_hash,
         expires_at=expires_at
     )
-    
-    session.add(new_key)
-    await session.flush()
\ No newline at end of file
+    reserved = await session.execute(
+        insert.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key, IdempotencyKey.org_id],
+            set_={
+                "body_sha256": insert.excluded.body_sha256,
+                "result": None,
+                "created_at": func.current_timestamp(),
+                "expires_at": insert.excluded.expires_at
+            },
+            where=IdempotencyKey.expires_at < func.current_timestamp()
+        ).returning(IdempotencyKey.key)
+    )
+    if reserved.scalar_one_or_none() is not None:
+        return reservation
+
+    existing = (await session.execute(
+        select(IdempotencyKey.body_sha256, IdempotencyKey.result, IdempotencyKey.expires_at).where(
+            IdempotencyKey.org_id == org_id,
+            IdempotencyKey.key == idempotency_key
+        )
+    )).one()
+    _remember(org_id, idempotency_key, existing.body_sha256, existing.result, _seconds_left(existing.expires_at))
+
+    if existing.body_sha256 != body_hash:
+        raise ValueError("Idempotency key already used with different request body")
+    # Same body: replay the stored response; rows from before results were
+    # stored have none, and the request runs again as it used to
+    reservation.replay = existing.result
+    return reservation
+
+
+async def record_result(session: AsyncSession, reservation: Reservation, status_code: int, body: str) -> None:
+    """Store the response for a reserved key; call in the transaction that does the work"""
+    reservation.result = {"status_code": status_code, "body": body}
+    await session.execute(
+        update(IdempotencyKey).where(
+            IdempotencyKey.org_id == reservation.org_id,
+            IdempotencyKey.key == reservation.key
+        ).values(result=reservation.result)
+    )
+
+
+def remember(reservation: Reservation) -> None:
+    """Cache a reservation after its transaction committed"""
+    _remember(
+        reservation.org_id, reservation.key, reservation.body_sha256,
+        reservation.result, settings.idempotency_ttl_seconds
+    )
+
+
+def clear_cache() -> None:
+    _recent.clear()
+
+
+_SWEEP_BATCH = text("""
+    DELETE FROM idempotency_keys
+    WHERE ctid IN (
+        SELECT ctid FROM idempotency_keys
+        WHERE expires_at < CURRENT_TIMESTAMP
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+
+async def sweep_expired(engine: AsyncEngine, batch_size: int = 1000) -> int:
+    """Delete expired keys in short batches; returns the number removed"""
+    deleted = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(_SWEEP_BATCH, {"batch_size": batch_size})
+        count = result.rowcount or 0
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+async def run_sweeper(engine: AsyncEngine, interval_seconds: Optional[float] = None) -> None:
+    """Sweep expired keys every interval until cancelled"""
+    interval = interval_seconds or settings.idempotency_sweep_interval_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await sweep_expired(engine)
+            if deleted:
+                logger.info(f"Idempotency sweep removed {deleted} expired keys")
+        except Exception as e:
+            logger.warning(f"Idempotency sweep failed: {e}")
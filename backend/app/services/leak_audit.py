@@ -0,0 +1,168 @@
+"""
+Bulk ALS leakage audit over stored runs
+
+Walks succeeded runs in keyset batches of (created_at, run_id), scans each
+batch in worker processes with the cached leak scanners and records one
+run_leak_scans row per run plus its run_leak_findings. Runs already
+audited are skipped unless rescan is set, so an interrupted audit resumes
+where it stopped.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Run, RunLeakFinding, RunLeakScan
+from app.services.als.leakage import country_from_locale, scan_rows
+from app.services.run_blobs import output_texts
+
+logger = logging.getLogger(__name__)
+
+
+async def _scan(rows: List[tuple], pool: Optional[Executor], workers: int) -> List[tuple]:
+    if pool is None:
+        # A thread keeps the event loop free when auditing inside the API
+        return await asyncio.to_thread(scan_rows, rows)
+    loop = asyncio.get_running_loop()
+    size = -(-len(rows) // workers)
+    chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, scan_rows, chunk) for chunk in chunks))
+    return [item for chunk in results for item in chunk]
+
+
+async def _record(session: AsyncSession, batch: List[tuple], scanned: List[tuple], rescan: bool) -> int:
+    run_ids = [row[0] for row in batch]
+    if rescan:
+        await session.execute(delete(RunLeakFinding).where(RunLeakFinding.run_id.in_(run_ids)))
+
+    meta = {row[0]: (row[3], row[4]) for row in batch}
+    findings = [
+        {
+            "run_id": run_id, "kind": f.kind, "phrase": f.phrase[:255],
+            "occurrences": f.occurrences, "first_offset": f.first_offset
+        }
+        for run_id, run_findings in scanned for f in run_findings
+    ]
+    if findings:
+        await session.execute(insert(RunLeakFinding), findings)
+
+    scans = pg_insert(RunLeakScan).values([
+        {
+            "run_id": run_id, "als_block_sha256": meta[run_id][0],
+            "country": meta[run_id][1], "finding_count": len(run_findings)
+        }
+        for run_id, run_findings in scanned
+    ])
+    await session.execute(scans.on_conflict_do_update(
+        index_elements=[RunLeakScan.run_id],
+        set_={
+            "als_block_sha256": scans.excluded.als_block_sha256,
+            "country": scans.excluded.country,
+            "finding_count": scans.excluded.finding_count,
+            "scanned_at": datetime.utcnow()
+        }
+    ))
+    await session.commit()
+    return len(findings)
+
+
+async def audit_runs(
+    session: AsyncSession,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    template_id: Optional[UUID] = None,
+    batch_size: int = 2000,
+    workers: int = 2,
+    rescan: bool = False,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Audit runs for ALS leaks; workers=0 scans in a thread of this process.
+
+    Commits once per batch. Returns counts of runs scanned, runs with
+    findings and findings written.
+    """
+    summary = {"scanned": 0, "runs_with_leaks": 0, "findings": 0}
+    pool = None
+    if workers > 0:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    audited = select(RunLeakScan.run_id).where(RunLeakScan.run_id == Run.run_id).exists()
+    cursor = None
+    try:
+        while limit is None or summary["scanned"] < limit:
+            query = select(
+                Run.run_id, Run.output_text, Run.response_output_sha256, Run.als_block_text,
+                Run.als_block_sha256, Run.locale_selected, Run.created_at
+            ).where(Run.status == "succeeded")
+            if since is not None:
+                query = query.where(Run.created_at >= since)
+            if until is not None:
+                query = query.where(Run.created_at < until)
+            if template_id is not None:
+                query = query.where(Run.template_id == template_id)
+            if not rescan:
+                query = query.where(~audited)
+            if cursor is not None:
+                query = query.where(or_(
+                    Run.created_at > cursor[0],
+                    and_(Run.created_at == cursor[0], Run.run_id > cursor[1])
+                ))
+            take = batch_size if limit is None else min(batch_size, limit - summary["scanned"])
+            rows = (await session.execute(query.order_by(Run.created_at, Run.run_id).limit(take))).all()
+            if not rows:
+                break
+
+            batch = [
+                (row.run_id, output_text, row.als_block_text, row.als_block_sha256,
+                 country_from_locale(row.locale_selected))
+                for row, output_text in zip(rows, await output_texts(session, rows))
+            ]
+            scanned = await _scan(batch, pool, workers)
+            summary["findings"] += await _record(session, batch, scanned, rescan)
+            summary["scanned"] += len(rows)
+            summary["runs_with_leaks"] += sum(1 for _, findings in scanned if findings)
+            cursor = (rows[-1].created_at, rows[-1].run_id)
+            logger.info(f"Leak audit: {summary['scanned']} runs, {summary['runs_with_leaks']} with leaks")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    return summary
+
+
+async def audit_runs_in_background(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    template_id: Optional[UUID],
+    limit: int,
+    rescan: bool = False
+) -> None:
+    """
+    Audit queued from the API: its own session, no worker processes.
+    Bulk audits of the full history belong in scripts/audit_als_leaks.py.
+    """
+    from app.db.database import async_session
+
+    try:
+        async with async_session() as session:
+            summary = await audit_runs(session, since, until, template_id, workers=0, rescan=rescan, limit=limit)
+        logger.info(f"Queued leak audit done: {summary}")
+    except Exception:
+        logger.exception("Queued leak audit failed")
+
+
+async def run_findings(session: AsyncSession, run_id: UUID) -> List[Dict[str, Any]]:
+    rows = (await session.execute(
+        select(RunLeakFinding).where(RunLeakFinding.run_id == run_id).order_by(RunLeakFinding.first_offset)
+    )).scalars().all()
+    return [
+        {"kind": f.kind, "phrase": f.phrase, "occurrences": f.occurrences, "first_offset": f.first_offset}
+        for f in rows
+    ]
@@ -0,0 +1,338 @@
+"""
+Brand and competitor mention detection
+
+All brand, alias and competitor patterns of a client are compiled once into
+a single Aho-Corasick automaton over casefolded text. One scan yields every
+whole-word mention with its position, per-entity counts and the sentence it
+falls in, so a response is read once regardless of how many names are
+tracked.
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from app.core.canonicalization import compute_sha256
+
+BRAND = "brand"
+COMPETITOR = "competitor"
+CUE = "cue"
+
+# Phrases that introduce competitors; used when a client has no competitor list
+COMPETITOR_CUES = (
+    "competitor", "competitors", "alternative", "alternatives",
+    "rival", "rivals", "competes with", "similar to",
+)
+
+_SENTENCE_END = re.compile(r"[.!?。！？]+(?=\s|$)|\n+")
+_NEEDS_FOLDING = re.compile(r"[^\x20-\x7e]|\s{2,}")
+
+
+@dataclass(frozen=True)
+class Mention:
+    """One whole-word match; start/end index the scanned text"""
+    entity: str
+    alias: str
+    kind: str
+    start: int
+    end: int
+    sentence: int
+
+
+@dataclass
+class MentionReport:
+    """Everything found in one text"""
+    mentions: List[Mention]
+    sentences: List[Tuple[int, int]]
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def mentioned(self, entity: str) -> bool:
+        return self.counts.get(entity, 0) > 0
+
+    def entities(self, kind: str) -> List[str]:
+        """Entities of a kind in order of first appearance"""
+        return list(dict.fromkeys(m.entity for m in self.mentions if m.kind == kind))
+
+    def sentence_texts(self, text: str, kind: Optional[str] = None) -> List[str]:
+        """Distinct sentences holding a mention (of a kind), in text order"""
+        indexes = sorted({m.sentence for m in self.mentions if kind is None or m.kind == kind})
+        return [text[self.sentences[i][0]:self.sentences[i][1]] for i in indexes]
+
+
+def _is_word_char(ch: str) -> bool:
+    # Scripts written without spaces have no word boundaries to check
+    if not ch.isalnum():
+        return ch == "_"
+    cp = ord(ch)
+    return not (0x3040 <= cp <= 0x30FF or 0x3400 <= cp <= 0x9FFF or 0xF900 <= cp <= 0xFAFF or 0x20000 <= cp <= 0x2FFFF)
+
+
+def _fold(text: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    Casefold with whitespace runs collapsed to one space.
+
+    Returns the folded text and, when lengths differ, the index in text of
+    each folded character (None means identity).
+    """
+    if not _NEEDS_FOLDING.search(text):
+        return text.lower(), None
+
+    parts: List[str] = []
+    origin: List[int] = []
+    in_space = False
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if not in_space:
+                parts.append(" ")
+                origin.append(i)
+            in_space = True
+            continue
+        in_space = False
+        folded = ch.casefold()
+        parts.append(folded)
+        origin.extend([i] * len(folded))
+    return "".join(parts), origin
+
+
+def _nfc(text: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    NFC-normalize text.
+
+    Returns the normalized text and, when it differs, the index in text at
+    which each normalized character's composition segment starts, plus one
+    trailing entry for len(text) (None means identity). Segments are cut
+    only where normalizing the two sides separately gives the same result,
+    so every segment maps as a unit.
+    """
+    if unicodedata.is_normalized("NFC", text):
+        return text, None
+
+    parts: List[str] = []
+    origin: List[int] = []
+
+    def flush(seg_start: int, seg_end: int) -> None:
+        normalized = unicodedata.normalize("NFC", text[seg_start:seg_end])
+        parts.append(normalized)
+        origin.extend([seg_start] * len(normalized))
+
+    seg_start = 0
+    i = 1
+    while i <= len(text):
+        # Next candidate boundary: the next starter (combining class 0)
+        while i < len(text) and unicodedata.combining(text[i]):
+            i += 1
+        if i == len(text):
+            break
+        j = i + 1
+        while j < len(text) and unicodedata.combining(text[j]):
+            j += 1
+        left, right = text[seg_start:i], text[i:j]
+        if unicodedata.normalize("NFC", left + right) == (
+            unicodedata.normalize("NFC", left) + unicodedata.normalize("NFC", right)
+        ):
+            flush(seg_start, i)
+            seg_start = i
+        i = j
+    flush(seg_start, len(text))
+    origin.append(len(text))
+    return "".join(parts), origin
+
+
+def _to_original(origin: List[int], start: int, end: int) -> Tuple[int, int]:
+    """Span of normalized text as a span of the text it came from"""
+    if end < len(origin) - 1 and origin[end] == origin[end - 1]:
+        # Ends inside a segment: widen to the whole segment
+        end = next((k for k in range(end, len(origin)) if origin[k] != origin[end - 1]), len(origin) - 1)
+    return origin[start], origin[end]
+
+
+def normalize_alias(alias: str) -> str:
+    """Pattern form of an alias: NFC, casefolded, single-spaced"""
+    return _fold(unicodedata.normalize("NFC", " ".join(alias.split())))[0]
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of each sentence, split on terminal punctuation and newlines"""
+    spans = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if text[start:match.start()].strip():
+            spans.append((start, match.end() if match.group()[0] != "\n" else match.start()))
+        start = match.end()
+    if text[start:].strip():
+        spans.append((start, len(text)))
+
+    # Trim leading whitespace so spans start on the first character
+    trimmed = []
+    for s, e in spans:
+        while s < e and text[s].isspace():
+            s += 1
+        trimmed.append((s, e))
+    return trimmed
+
+
+class MentionEngine:
+    """
+    Compiled brand, alias and competitor patterns for one client.
+
+    Args:
+        brands: entity name -> aliases (the name itself is always a pattern)
+        competitors: same shape, for competitor entities
+        cues: extra phrases reported with kind 'cue'
+
+    Overlapping matches resolve leftmost-longest, so "Apple Watch" wins
+    over "Apple" when both are tracked.
+    """
+
+    def __init__(
+        self,
+        brands: Mapping[str, Iterable[str]],
+        competitors: Optional[Mapping[str, Iterable[str]]] = None,
+        cues: Iterable[str] = ()
+    ):
+        self._patterns: List[Tuple[str, str, str, int]] = []  # entity, alias, kind, folded length
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[int]] = [[]]
+        seen = set()
+
+        groups = [(BRAND, brands), (COMPETITOR, competitors or {}), (CUE, {c: () for c in cues})]
+        for kind, entities in groups:
+            for entity, aliases in entities.items():
+                for alias in (entity, *aliases):
+                    folded = normalize_alias(alias)
+                    if not folded or folded in seen:
+                        continue
+                    seen.add(folded)
+                    self._add(folded, (entity, alias, kind, len(folded)))
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _add(self, folded: str, pattern: Tuple[str, str, str, int]) -> None:
+        state = 0
+        for ch in folded:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._out.append([])
+            state = nxt
+        self._out[state].append(len(self._patterns))
+        self._patterns.append(pattern)
+
+    def _build_failure_links(self) -> None:
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0) if self._goto[f].get(ch) != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _candidates(self, folded: str) -> Iterator[Tuple[int, int]]:
+        """(folded end index, pattern id) for every raw match"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for j, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                yield j, pid
+
+    def scan(self, text: str) -> MentionReport:
+        """
+        Find every whole-word mention in text.
+
+        Matching runs on the NFC form of text, but mention and sentence
+        spans always index text as given.
+        """
+        original = text or ""
+        text, nfc_origin = _nfc(original)
+        folded, origin = _fold(text)
+
+        found = []
+        for j, pid in self._candidates(folded):
+            length = self._patterns[pid][3]
+            fs = j - length + 1
+            if origin is None:
+                start, end = fs, j + 1
+            else:
+                # Reject matches that start or end inside an expanded character (ß -> ss)
+                if fs > 0 and origin[fs - 1] == origin[fs]:
+                    continue
+                if j + 1 < len(origin) and origin[j + 1] == origin[j]:
+                    continue
+                start, end = origin[fs], origin[j] + 1
+            if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                continue
+            if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                continue
+            found.append((start, -end, pid))
+
+        sentences = sentence_spans(original)
+        sentence_starts = [s for s, _ in sentences]
+        mentions: List[Mention] = []
+        counts: Dict[str, int] = {}
+        last_end = -1
+        for start, neg_end, pid in sorted(found):
+            if start < last_end:
+                continue
+            last_end = -neg_end
+            entity, alias, kind, _ = self._patterns[pid]
+            span = (start, last_end) if nfc_origin is None else _to_original(nfc_origin, start, last_end)
+            sentence = max(0, bisect.bisect_right(sentence_starts, span[0]) - 1)
+            mentions.append(Mention(entity, alias, kind, span[0], span[1], sentence))
+            counts[entity] = counts.get(entity, 0) + 1
+        return MentionReport(mentions=mentions, sentences=sentences, counts=counts)
+
+    def scan_many(self, texts: Iterable[str]) -> List[MentionReport]:
+        """Scan a batch of texts with the compiled automaton"""
+        return [self.scan(t) for t in texts]
+
+    def rescore(self, outputs: Iterable[Tuple[object, str]]) -> Iterator[Tuple[object, MentionReport]]:
+        """Re-score stored outputs lazily: (key, text) in, (key, report) out"""
+        for key, text in outputs:
+            yield key, self.scan(text)
+
+
+_engines: "OrderedDict[Tuple[str, str], MentionEngine]" = OrderedDict()
+_engines_lock = threading.Lock()
+_MAX_ENGINES = 128
+
+
+def engine_for(
+    client_id: str,
+    brands: Mapping[str, Sequence[str]],
+    competitors: Optional[Mapping[str, Sequence[str]]] = None,
+    cues: Sequence[str] = ()
+) -> MentionEngine:
+    """
+    Compiled engine for a client, rebuilt only when its pattern set changes.
+    """
+    fingerprint = compute_sha256({
+        "brands": {k: list(v) for k, v in brands.items()},
+        "competitors": {k: list(v) for k, v in (competitors or {}).items()},
+        "cues": list(cues)
+    })
+    key = (client_id, fingerprint)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            _engines.move_to_end(key)
+            return engine
+    engine = MentionEngine(brands, competitors, cues)
+    with _engines_lock:
+        _engines[key] = engine
+        while len(_engines) > _MAX_ENGINES:
+            _engines.popitem(last=False)
+    return engine
@@ -0,0 +1,258 @@
+"""
+Near-duplicate prompt detection with MinHash and LSH
+
+A prompt is reduced to character shingles of its normalized text (casefolded,
+punctuation and whitespace collapsed) and summarized by a MinHash signature
+of NUM_PERM values; the fraction of equal positions between two signatures
+estimates the Jaccard similarity of their shingle sets. Signatures are cut
+into BANDS bands of ROWS values and each band is hashed to a bucket, so
+candidates are found by bucket lookups instead of comparing against every
+template. With 32 bands of 4 rows a pair at Jaccard 0.6 shares a bucket
+with probability ~0.99, at 0.5 ~0.87 and at 0.2 ~0.05.
+
+MinHashIndex is the in-memory index; the database index lives in
+prompt_template_minhash (signature per template) and prompt_template_lsh
+(brand, bucket, template) next to prompt_templates.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import struct
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+DEFAULT_THRESHOLD = 0.6
+
+# Shingle hashes are 32-bit and a, b < p, so a*x + b fits in 64 bits (numpy path)
+_MERSENNE_PRIME = (1 << 31) - 1
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+# Fixed seed: stored signatures must stay comparable across processes
+_rng = random.Random(0x6D696E68)
+_PERMUTATIONS = tuple(
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)
+)
+if HAS_NUMPY:
+    _A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+
+Signature = Tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class NearDuplicate:
+    key: Hashable
+    jaccard: float
+
+
+def _hash(data: bytes, size: int = 8) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=size).digest(), "little")
+
+
+def normalize(prompt_text: Optional[str]) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", (prompt_text or "").casefold()).split())
+
+
+def shingles(prompt_text: Optional[str], size: int = SHINGLE_SIZE) -> Set[int]:
+    """Hashed character shingles of the normalized text"""
+    normalized = normalize(prompt_text)
+    if len(normalized) <= size:
+        grams = {normalized}
+    else:
+        grams = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+    return {_hash(gram.encode("utf-8"), 4) for gram in grams}
+
+
+def signature(prompt_text: Optional[str]) -> Signature:
+    """MinHash signature: per permutation, the minimum (a*x + b) mod p over the shingles"""
+    values = shingles(prompt_text)
+    p = _MERSENNE_PRIME
+    if HAS_NUMPY:
+        x = np.fromiter(values, dtype=np.uint64, count=len(values))[None, :]
+        return tuple(((_A * x + _B) % p).min(axis=1).tolist())
+    return tuple(min((a * x + b) % p for x in values) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def band_buckets(sig: Sequence[int]) -> List[int]:
+    """One signed 64-bit bucket per band (the band number is part of the hash)"""
+    buckets = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS]
+        value = _hash(struct.pack(f"<H{ROWS}I", band, *rows))
+        buckets.append(value - (1 << 64) if value >= 1 << 63 else value)
+    return buckets
+
+
+def pack_signature(sig: Sequence[int]) -> bytes:
+    return array("I", sig).tobytes()
+
+
+def unpack_signature(data: bytes) -> Signature:
+    values = array("I")
+    values.frombytes(bytes(data))
+    return tuple(values)
+
+
+class MinHashIndex:
+    """In-memory LSH index over prompt signatures"""
+
+    def __init__(self):
+        self._signatures: Dict[Hashable, Signature] = {}
+        self._buckets: Dict[int, Set[Hashable]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: Hashable, prompt_text: str) -> None:
+        self.remove(key)
+        sig = signature(prompt_text)
+        self._signatures[key] = sig
+        for bucket in band_buckets(sig):
+            self._buckets[bucket].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        sig = self._signatures.pop(key, None)
+        if sig is None:
+            return
+        for bucket in band_buckets(sig):
+            members = self._buckets.get(bucket)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._buckets[bucket]
+
+    def _candidates(self, sig: Signature) -> Set[Hashable]:
+        found: Set[Hashable] = set()
+        for bucket in band_buckets(sig):
+            found |= self._buckets.get(bucket, set())
+        return found
+
+    def query(self, prompt_text: str, k: int = 5, threshold: float = DEFAULT_THRESHOLD) -> List[NearDuplicate]:
+        """Top-k indexed prompts with estimated Jaccard >= threshold, most similar first"""
+        sig = signature(prompt_text)
+        return _top_k(((key, self._signatures[key]) for key in self._candidates(sig)), sig, k, threshold)
+
+    def groups(self, threshold: float = DEFAULT_THRESHOLD) -> List[List[Hashable]]:
+        """Clusters of near-duplicate keys (connected components), in insertion order"""
+        parent = {key: key for key in self._signatures}
+
+        def root(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key, sig in self._signatures.items():
+            for other in self._candidates(sig):
+                if other != key and jaccard(sig, self._signatures[other]) >= threshold:
+                    parent[root(other)] = root(key)
+
+        clusters: Dict[Hashable, List[Hashable]] = {}
+        for key in self._signatures:
+            clusters.setdefault(root(key), []).append(key)
+        return [members for members in clusters.values() if len(members) > 1]
+
+
+def _top_k(candidates: Iterable[Tuple[Hashable, Sequence[int]]], sig: Signature, k: int, threshold: float) -> List[NearDuplicate]:
+    scored = [NearDuplicate(key, jaccard(sig, other)) for key, other in candidates]
+    scored = [d for d in scored if d.jaccard >= threshold]
+    scored.sort(key=lambda d: -d.jaccard)
+    return scored[:k]
+
+
+async def index_template(conn: AsyncConnection, template_id: int, brand_name: str, prompt_text: str) -> None:
+    """(Re)index one prompt_templates row; call in the transaction that writes it"""
+    sig = signature(prompt_text)
+    await conn.execute(text("""
+        INSERT INTO prompt_template_minhash (template_id, brand_name, signature)
+        VALUES (:id, :brand, :signature)
+        ON CONFLICT (template_id) DO UPDATE SET
+            brand_name = EXCLUDED.brand_name, signature = EXCLUDED.signature, updated_at = CURRENT_TIMESTAMP
+    """), {"id": template_id, "brand": brand_name, "signature": pack_signature(sig)})
+    await conn.execute(text("DELETE FROM prompt_template_lsh WHERE template_id = :id"), {"id": template_id})
+    await conn.execute(
+        text("INSERT INTO prompt_template_lsh (brand_name, bucket, template_id) VALUES (:brand, :bucket, :id)"),
+        [{"brand": brand_name, "bucket": bucket, "id": template_id} for bucket in set(band_buckets(sig))]
+    )
+
+
+async def unindex_template(conn: AsyncConnection, template_id: int) -> None:
+    await conn.execute(text("DELETE FROM prompt_template_lsh WHERE template_id = :id"), {"id": template_id})
+    await conn.execute(text("DELETE FROM prompt_template_minhash WHERE template_id = :id"), {"id": template_id})
+
+
+async def find_near_duplicates(
+    conn: AsyncConnection,
+    brand_name: str,
+    prompt_text: str,
+    k: int = 5,
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Top-k active templates of a brand whose prompt is a near duplicate.
+
+    One primary-key range lookup per band bucket on prompt_template_lsh;
+    candidates are then scored on their stored signatures.
+    """
+    sig = signature(prompt_text)
+    rows = (await conn.execute(text("""
+        SELECT t.id, t.template_name, t.model_name, t.countries, t.grounding_modes, t.prompt_hash, s.signature,
+            t.prompt_text
+        FROM (
+            SELECT DISTINCT template_id FROM prompt_template_lsh
+            WHERE brand_name = :brand AND bucket = ANY(:buckets)
+        ) c
+        JOIN prompt_template_minhash s ON s.template_id = c.template_id
+        JOIN prompt_templates t ON t.id = c.template_id AND t.is_active = TRUE
+    """), {"brand": brand_name, "buckets": band_buckets(sig)})).fetchall()
+
+    by_id = {row.id: row for row in rows}
+    matches = _top_k(((row.id, unpack_signature(row.signature)) for row in rows), sig, k, threshold)
+    return [{"row": by_id[m.key], "jaccard": round(m.jaccard, 3)} for m in matches]
+
+
+async def reindex_all(engine: AsyncEngine, batch_size: int = 500, brand_name: Optional[str] = None) -> int:
+    """Rebuild signatures and buckets for all templates (or one brand), one transaction per batch"""
+    indexed = 0
+    after = 0
+    brand_filter = "AND brand_name = :brand" if brand_name else ""
+    while True:
+        async with engine.begin() as conn:
+            rows = (await conn.execute(text(f"""
+                SELECT id, brand_name, prompt_text FROM prompt_templates
+                WHERE id > :after {brand_filter}
+                ORDER BY id
+                LIMIT :batch_size
+            """), {"after": after, "batch_size": batch_size, "brand": brand_name})).fetchall()
+            if not rows:
+                return indexed
+            for row in rows:
+                await index_template(conn, row.id, row.brand_name, row.prompt_text)
+        indexed += len(rows)
+        after = rows[-1].id
+        logger.info(f"Near-duplicate index: {indexed} templates")
@@ -0,0 +1,287 @@
+"""
+Monthly partitions of runs and llm_telemetry
+
+Both tables are range-partitioned on created_at (alembic
+20261018_partition_runs_telemetry). Rows written before the conversion
+live in one <table>_legacy partition that ends at the first monthly
+boundary; after that each month has a <table>_pYYYY_MM partition, so a
+query with a created_at predicate only scans the months it covers.
+
+maintain() is meant to run daily (scripts/maintain_partitions.py):
+
+1. creates partitions for the next partition_months_ahead months,
+2. recomputes the daily rollups (runs_daily, llm_telemetry_daily) for the
+   last few days,
+3. for every partition that lies entirely before the retention cutoff,
+   rolls it up completely and then detaches it: the table is moved to the
+   archive schema, or dropped when partition_detach_action is 'drop'.
+
+There is no default partition: an insert beyond the newest partition
+fails, so the maintenance job must run at least once per
+partition_months_ahead months.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import get_settings
+from app.services.run_blobs import release_partition
+
+logger = logging.getLogger(__name__)
+
+DETACH_ACTIONS = ("archive", "drop")
+ROLLUP_RECENT_DAYS = 2
+
+
+@dataclass(frozen=True)
+class PartitionedTable:
+    name: str
+    retention_setting: str
+    rollup_table: str
+    rollup_sql: str
+    # Tables keyed by run_id whose rows go with a detached partition
+    dependents: Tuple[str, ...] = ()
+    # Rows reference run_blobs, released when a partition is dropped
+    blob_refs: bool = False
+
+
+# Rollups are recomputed for whole days: delete the days, insert them again
+_TELEMETRY_ROLLUP = """
+    INSERT INTO llm_telemetry_daily
+        (day, vendor, model, grounded_effective, calls, failures,
+         latency_ms_sum, latency_ms_max, prompt_tokens, completion_tokens, total_tokens)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, vendor, model, grounded_effective,
+           count(*), count(*) FILTER (WHERE NOT success),
+           coalesce(sum(latency_ms), 0), max(latency_ms),
+           coalesce(sum(prompt_tokens), 0), coalesce(sum(completion_tokens), 0), coalesce(sum(total_tokens), 0)
+    FROM llm_telemetry
+    WHERE created_at >= :lower AND created_at < :upper
+    GROUP BY 1, 2, 3, 4
+"""
+_RUNS_ROLLUP = """
+    INSERT INTO runs_daily
+        (day, template_id, vendor, model, status, runs, grounded_effective,
+         latency_ms_sum, tokens_input, tokens_output, tokens_reasoning)
+    SELECT (created_at AT TIME ZONE 'UTC')::date,
+           coalesce(template_id, '00000000-0000-0000-0000-000000000000'::uuid),
+           coalesce(vendor, ''), coalesce(model, ''), status,
+           count(*), count(*) FILTER (WHERE grounded_effective),
+           coalesce(sum(latency_ms), 0), coalesce(sum(tokens_input), 0),
+           coalesce(sum(tokens_output), 0), coalesce(sum(tokens_reasoning), 0)
+    FROM runs
+    WHERE created_at >= :lower AND created_at < :upper
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+TABLES: Dict[str, PartitionedTable] = {
+    "llm_telemetry": PartitionedTable(
+        "llm_telemetry", "telemetry_retention_months", "llm_telemetry_daily", _TELEMETRY_ROLLUP
+    ),
+    "runs": PartitionedTable(
+        "runs", "runs_retention_months", "runs_daily", _RUNS_ROLLUP,
+        dependents=("run_brand_ranks", "run_leak_findings", "run_leak_scans"), blob_refs=True
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    lower: Optional[datetime]  # None = MINVALUE
+    upper: Optional[datetime]  # None = MAXVALUE
+
+
+@dataclass
+class MaintenanceReport:
+    created: List[str] = field(default_factory=list)
+    rolled_up_days: int = 0
+    detached: List[str] = field(default_factory=list)
+    dry_run: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "created": self.created,
+            "rolled_up_days": self.rolled_up_days,
+            "detached": self.detached,
+            "dry_run": self.dry_run
+        }
+
+
+def month_start(day: date) -> datetime:
+    return datetime(day.year, day.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(start: datetime, months: int) -> datetime:
+    index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y_%m}"
+
+
+_BOUND = re.compile(r"FROM \((?P<lower>[^)]*)\) TO \((?P<upper>[^)]*)\)")
+
+
+def parse_bound(expression: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Range of a pg_get_expr(relpartbound) string; None for MINVALUE/MAXVALUE"""
+    match = _BOUND.search(expression)
+    if match is None:
+        raise ValueError(f"Not a range partition bound: {expression!r}")
+
+    def value(raw: str) -> Optional[datetime]:
+        raw = raw.strip().strip("'")
+        if raw.upper() in ("MINVALUE", "MAXVALUE"):
+            return None
+        parsed = datetime.fromisoformat(raw.replace(" ", "T"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    return value(match.group("lower")), value(match.group("upper"))
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> List[Partition]:
+    """Attached partitions of table, oldest first"""
+    rows = (await conn.execute(text("""
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": table})).fetchall()
+    partitions = [Partition(row.name, *parse_bound(row.bound)) for row in rows]
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    return sorted(partitions, key=lambda p: p.lower or epoch)
+
+
+async def create_partitions(conn: AsyncConnection, table: str, today: date, months_ahead: int) -> List[str]:
+    """Create missing monthly partitions from the newest existing one through months_ahead"""
+    partitions = await list_partitions(conn, table)
+    uppers = [p.upper for p in partitions if p.upper is not None]
+    start = max(uppers) if uppers else month_start(today)
+    end = add_months(month_start(today), months_ahead + 1)
+    created = []
+    while start < end:
+        upper = add_months(start, 1)
+        name = partition_name(table, start)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        created.append(name)
+        start = upper
+    return created
+
+
+async def rollup_range(conn: AsyncConnection, spec: PartitionedTable, lower: datetime, upper: datetime) -> int:
+    """Recompute the daily rollup for the UTC days overlapping [lower, upper); returns the number of days"""
+    lower = lower.astimezone(timezone.utc)
+    first, last = lower.date(), (upper.astimezone(timezone.utc) - timedelta(microseconds=1)).date()
+    lower = datetime(first.year, first.month, first.day, tzinfo=timezone.utc)
+    await conn.execute(
+        text(f"DELETE FROM {spec.rollup_table} WHERE day >= :first AND day <= :last"),
+        {"first": first, "last": last}
+    )
+    await conn.execute(text(spec.rollup_sql), {"lower": lower, "upper": upper})
+    return (last - first).days + 1
+
+
+async def _oldest_row(conn: AsyncConnection, partition: Partition) -> Optional[datetime]:
+    return (await conn.execute(text(f"SELECT min(created_at) FROM {partition.name}"))).scalar()
+
+
+async def detach_partition(engine: AsyncEngine, spec: PartitionedTable, partition: Partition, action: str) -> None:
+    """
+    Detach a partition whose rows are already rolled up, then archive or drop it.
+
+    DETACH ... CONCURRENTLY cannot run in a transaction, so this uses an
+    autocommit connection; dependent rows (run ranks, leak findings) of the
+    partition's runs are deleted first. A dropped partition's run_blobs
+    references are released in the transaction that drops it; archived
+    runs keep theirs.
+    """
+    settings = get_settings()
+    async with engine.connect() as conn:
+        for dependent in spec.dependents:
+            await conn.execute(text(
+                f"DELETE FROM {dependent} WHERE run_id IN (SELECT run_id FROM {partition.name})"
+            ))
+        await conn.commit()
+
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"ALTER TABLE {spec.name} DETACH PARTITION {partition.name} CONCURRENTLY"))
+        if action == "drop":
+            async with engine.begin() as tx:
+                if spec.blob_refs:
+                    deleted = await release_partition(tx, partition.name)
+                    logger.info(f"Partition {partition.name}: {deleted} unreferenced blobs deleted")
+                await tx.execute(text(f"DROP TABLE {partition.name}"))
+        else:
+            schema = settings.partition_archive_schema
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+            await conn.execute(text(f"ALTER TABLE {partition.name} SET SCHEMA {schema}"))
+
+
+async def maintain(
+    engine: AsyncEngine,
+    today: Optional[date] = None,
+    months_ahead: Optional[int] = None,
+    retention_months: Optional[Dict[str, int]] = None,
+    action: Optional[str] = None,
+    tables: Optional[List[str]] = None,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Create future partitions, refresh rollups and retire expired partitions.
+
+    Retention is counted in whole months: with 12 months, on 2026-10-18
+    partitions ending on or before 2025-10-01 are detached.
+
+    Raises:
+        ValueError: For an unknown table or detach action
+    """
+    settings = get_settings()
+    today = today or datetime.now(timezone.utc).date()
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    action = action or settings.partition_detach_action
+    if action not in DETACH_ACTIONS:
+        raise ValueError(f"Unknown detach action {action!r}; expected one of {', '.join(DETACH_ACTIONS)}")
+    names = tables or list(TABLES)
+    unknown = [name for name in names if name not in TABLES]
+    if unknown:
+        raise ValueError(f"Not a partitioned table: {', '.join(unknown)}")
+
+    reports: Dict[str, Any] = {}
+    recent_upper = datetime(today.year, today.month, today.day, tzinfo=timezone.utc)
+    recent_lower = recent_upper - timedelta(days=ROLLUP_RECENT_DAYS)
+    for name in names:
+        spec = TABLES[name]
+        report = MaintenanceReport(dry_run=dry_run)
+        retention = (retention_months or {}).get(name, getattr(settings, spec.retention_setting))
+        cutoff = add_months(month_start(today), -retention)
+
+        async with engine.begin() as conn:
+            partitions = await list_partitions(conn, name)
+            expired = [p for p in partitions if p.upper is not None and p.upper <= cutoff]
+            if dry_run:
+                report.detached = [p.name for p in expired]
+                reports[name] = report.as_dict()
+                continue
+            report.created = await create_partitions(conn, name, today, months_ahead)
+            report.rolled_up_days += await rollup_range(conn, spec, recent_lower, recent_upper)
+
+        for partition in expired:
+            async with engine.begin() as conn:
+                lower = partition.lower or await _oldest_row(conn, partition)
+                if lower is not None:
+                    report.rolled_up_days += await rollup_range(conn, spec, lower, partition.upper)
+            await detach_partition(engine, spec, partition, action)
+            report.detached.append(partition.name)
+            logger.info(f"Partition {partition.name} rolled up and detached ({action})")
+
+        reports[name] = report.as_dict()
+    return reports
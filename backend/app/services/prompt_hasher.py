@@ -7,6 +7,8 @@ import hashlib
 import json
 from typing import Optional, Iterable, List
 
+from app.services.near_duplicates import MinHashIndex
+
 def _normalize_prompt_text(s: Optional[str]) -> str:
     """Normalize prompt text for consistent hashing."""
     if not s:
@@ -195,35 +197,39 @@ def detect_prompt_modification(
             "warning": "Integrity check failed - prompt may have been altered"
         }
 
-def find_duplicate_prompts(prompts: list[dict]) -> dict:
+def find_duplicate_prompts(prompts: list[dict], threshold: float = 1.0) -> dict:
     """
-    Find duplicate prompts based on hash.
+    Find duplicate prompts, exact (by hash) or near (MinHash estimated Jaccard).
     
     Args:
         prompts: List of dicts with 'id' and 'prompt_text' keys
+        threshold: 1.0 (default) groups prompts with the same prompt hash;
+            below 1.0 groups by estimated Jaccard similarity, e.g. 0.6 also
+            catches trivial rewordings
         
     Returns:
-        Dictionary mapping hash to list of duplicate prompt IDs
+        Dictionary mapping the hash of each group's first prompt to the
+        group's prompt IDs (groups of one are omitted)
     """
-    hash_map = {}
+    if threshold >= 1.0:
+        # MinHash compares shingle sets, so repeated phrases would estimate
+        # 1.0 against different text; identical means identical hashes
+        hash_map = {}
+        for prompt in prompts:
+            prompt_hash = calculate_prompt_hash(prompt.get('prompt_text', ''))
+            hash_map.setdefault(prompt_hash, []).append(prompt.get('id'))
+        return {hash_val: ids for hash_val, ids in hash_map.items() if len(ids) > 1}
     
-    for prompt in prompts:
-        prompt_id = prompt.get('id')
-        prompt_text = prompt.get('prompt_text', '')
-        prompt_hash = calculate_prompt_hash(prompt_text)
-        
-        if prompt_hash not in hash_map:
-            hash_map[prompt_hash] = []
-        hash_map[prompt_hash].append(prompt_id)
+    index = MinHashIndex()
+    texts = {}
+    for position, prompt in enumerate(prompts):
+        texts[position] = prompt.get('prompt_text', '')
+        index.add(position, texts[position])
     
-    # Filter to only show duplicates
-    duplicates = {
-        hash_val: ids 
-        for hash_val, ids in hash_map.items() 
-        if len(ids) > 1
+    return {
+        calculate_prompt_hash(texts[group[0]]): [prompts[position].get('id') for position in group]
+        for group in index.groups(threshold)
     }
-    
-    return duplicates
 
 # Export the normalize functions for use in other modules
 __all__ = [
@@ -0,0 +1,232 @@
+"""
+Ranked-brand extraction from run outputs
+
+Turns an answer into an ordered (position, brand, alias) list: items of the
+answer's main list first (numbered, else top-level bullets), then brands
+only mentioned in prose, in order of first appearance. Known brands and
+aliases come from a MentionEngine; list items naming no known brand are
+ranked under their cleaned heading so unknown brands still get a position.
+
+Rows are stored in run_brand_ranks, denormalized with the run's locale,
+model and created_at so rank-trend queries never touch runs.output_text.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Run, RunBrandRank
+from app.services.mention_engine import BRAND, COMPETITOR, MentionEngine, engine_for
+from app.services.run_blobs import output_texts
+
+logger = logging.getLogger(__name__)
+
+LIST = "list"
+PROSE = "prose"
+
+_LIST_ITEM = re.compile(r"^(?P<indent>[ \t]*)(?:#{1,6}[ \t]*)?(?:(?P<number>\d{1,3})[.)]|(?P<bullet>[-*•+]))[ \t]+(?P<body>\S.*)$")
+_MD_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_MD_EMPHASIS = re.compile(r"\*\*|__|`")
+_HEAD_SEPARATOR = re.compile(r"\s*(?::|\s[–—-]\s|\(|,\s|\.\s|\.$)")
+_MAX_HEAD_WORDS = 6
+_MAX_HEAD_CHARS = 60
+
+
+@dataclass(frozen=True)
+class RankedBrand:
+    """One ranked brand; alias is the form found in the text"""
+    position: int
+    brand: str
+    alias: str
+    source: str  # list|prose
+
+
+def brand_engine(brands: Union[Mapping[str, Sequence[str]], Sequence[str], None]) -> Optional[MentionEngine]:
+    """Compiled (and cached) engine for a template's 'brands': names, or name -> aliases"""
+    if not brands:
+        return None
+    if not isinstance(brands, Mapping):
+        brands = {name: () for name in brands}
+    return engine_for("rank_extraction", brands)
+
+
+def _item_head(body: str) -> Optional[str]:
+    """Leading name of a list item ('**Tru Niagen** - NR supplement' -> 'Tru Niagen')"""
+    cleaned = _MD_EMPHASIS.sub("", _MD_LINK.sub(r"\1", body)).strip()
+    head = _HEAD_SEPARATOR.split(cleaned, maxsplit=1)[0].strip(" *_#")
+    if not head or len(head) > _MAX_HEAD_CHARS or len(head.split()) > _MAX_HEAD_WORDS:
+        return None
+    return head
+
+
+def _main_list(text: str) -> List[tuple]:
+    """(start, end, body) of the items of the answer's ranked list"""
+    numbered, bullets = [], []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        match = _LIST_ITEM.match(line.rstrip("\r\n"))
+        if match:
+            item = (offset, offset + len(line), match.group("body"), len(match.group("indent").expandtabs(4)))
+            (numbered if match.group("number") else bullets).append(item)
+        offset += len(line)
+
+    items = numbered or bullets
+    if not items:
+        return []
+    # Nested items are details of the entry above, not ranks
+    top = min(indent for *_, indent in items)
+    return [(start, end, body) for start, end, body, indent in items if indent == top]
+
+
+def extract_ranked_brands(text: str, engine: Optional[MentionEngine] = None) -> List[RankedBrand]:
+    """Ordered brands of one answer; each brand appears once at its best position"""
+    text = text or ""
+    ranked: List[RankedBrand] = []
+    seen = set()
+
+    def add(brand: str, alias: str, source: str) -> None:
+        key = brand.casefold()
+        if key not in seen:
+            seen.add(key)
+            ranked.append(RankedBrand(len(ranked) + 1, brand, alias, source))
+
+    # Mention spans index text as given (not its NFC form), like the list line offsets
+    report = engine.scan(text) if engine is not None else None
+    known = [m for m in report.mentions if m.kind in (BRAND, COMPETITOR)] if report else []
+
+    items = _main_list(text)
+    for start, end, body in items:
+        in_item = [m for m in known if start <= m.start < end]
+        if in_item:
+            add(in_item[0].entity, in_item[0].alias, LIST)
+            continue
+        head = _item_head(body)
+        if head:
+            add(head, head, LIST)
+
+    # Known brands outside the list, by first appearance
+    for mention in known:
+        if not any(start <= mention.start < end for start, end, _ in items):
+            add(mention.entity, mention.alias, PROSE)
+    return ranked
+
+
+def rank_rows(run: Run, ranks: Iterable[RankedBrand]) -> List[RunBrandRank]:
+    return [
+        RunBrandRank(
+            run_id=run.run_id,
+            position=r.position,
+            brand=r.brand[:255],
+            alias=r.alias[:255],
+            source=r.source,
+            locale=run.locale_selected,
+            model=run.model,
+            created_at=run.created_at or datetime.utcnow()
+        )
+        for r in ranks
+    ]
+
+
+def add_run_ranks(session: AsyncSession, run: Run, engine: Optional[MentionEngine] = None) -> int:
+    """Extract ranks for a new run and add them to the session (same transaction as the run)"""
+    if run.status != "succeeded" or not run.output_text:
+        return 0
+    rows = rank_rows(run, extract_ranked_brands(run.output_text, engine))
+    session.add_all(rows)
+    return len(rows)
+
+
+async def backfill_ranks(
+    session: AsyncSession,
+    engine: Optional[MentionEngine] = None,
+    since: Optional[datetime] = None,
+    template_id=None,
+    batch_size: int = 500,
+    replace: bool = False
+) -> int:
+    """
+    Extract ranks over history in keyset batches of (created_at, run_id).
+
+    Runs that already have ranks are skipped unless replace is set (use
+    after changing the brand list). Commits once per batch. Returns the
+    number of runs processed.
+    """
+    processed = 0
+    cursor = None
+    has_ranks = select(RunBrandRank.run_id).where(RunBrandRank.run_id == Run.run_id).exists()
+    while True:
+        query = select(
+            Run.run_id, Run.output_text, Run.response_output_sha256, Run.locale_selected,
+            Run.model, Run.created_at, Run.status
+        ).where(Run.status == "succeeded")
+        if since is not None:
+            query = query.where(Run.created_at >= since)
+        if template_id is not None:
+            query = query.where(Run.template_id == template_id)
+        if not replace:
+            query = query.where(~has_ranks)
+        if cursor is not None:
+            query = query.where(or_(
+                Run.created_at > cursor[0],
+                and_(Run.created_at == cursor[0], Run.run_id > cursor[1])
+            ))
+        rows = (await session.execute(
+            query.order_by(Run.created_at, Run.run_id).limit(batch_size)
+        )).all()
+        if not rows:
+            return processed
+
+        if replace:
+            await session.execute(delete(RunBrandRank).where(RunBrandRank.run_id.in_([r.run_id for r in rows])))
+        for row, output_text in zip(rows, await output_texts(session, rows)):
+            session.add_all(rank_rows(row, extract_ranked_brands(output_text, engine)))
+        await session.commit()
+        processed += len(rows)
+        cursor = (rows[-1].created_at, rows[-1].run_id)
+        logger.info(f"Rank backfill: {processed} runs")
+
+
+async def rank_trend(
+    session: AsyncSession,
+    brand: str,
+    locale: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: str = "day"
+) -> List[Dict[str, Any]]:
+    """
+    Rank of a brand over time: per bucket, the average and best position
+    and how many runs ranked it. Served from idx_run_brand_ranks_lookup.
+    """
+    period = func.date_trunc(bucket, RunBrandRank.created_at).label("period")
+    query = select(
+        period,
+        func.avg(RunBrandRank.position).label("avg_position"),
+        func.min(RunBrandRank.position).label("best_position"),
+        func.count().label("appearances")
+    ).where(RunBrandRank.brand == brand)
+    if locale is not None:
+        query = query.where(RunBrandRank.locale == locale)
+    if model is not None:
+        query = query.where(RunBrandRank.model == model)
+    if since is not None:
+        query = query.where(RunBrandRank.created_at >= since)
+    if until is not None:
+        query = query.where(RunBrandRank.created_at < until)
+
+    rows = (await session.execute(query.group_by(period).order_by(period))).all()
+    return [
+        {
+            "period": row.period.isoformat() if row.period else None,
+            "avg_position": round(float(row.avg_position), 2),
+            "best_position": row.best_position,
+            "appearances": row.appearances
+        }
+        for row in rows
+    ]
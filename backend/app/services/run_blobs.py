@@ -0,0 +1,317 @@
+"""
+Content-addressed storage for run payloads
+
+request_json, response_json and output_text are large and heavily
+duplicated (replicates, cached responses), so payloads of at least
+run_blob_min_bytes are stored once in run_blobs, keyed by the SHA-256 of
+their bytes and compressed (zstd when installed, zlib otherwise). The run
+keeps only the hash: request_sha256, response_sha256 and, for the output,
+the existing response_output_sha256. The inline column is NULL then.
+
+Each blob counts the run references to it; dropping a runs partition
+releases its references and deletes blobs nobody references.
+
+Readers call hydrate_runs (ORM rows) or output_texts (column rows) to get
+the payloads back; values still stored inline are used as they are.
+"""
+
+import json
+import logging
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.canonicalization import compute_sha256
+from app.core.config import get_settings
+from app.models.models import Run
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    zstandard = None
+    HAS_ZSTD = False
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+CODEC_NONE = "none"
+
+# Payload attribute -> attribute holding its blob hash
+PAYLOAD_HASHES = {
+    "request_json": "request_sha256",
+    "response_json": "response_sha256",
+    "output_text": "response_output_sha256",
+}
+
+
+@dataclass(frozen=True)
+class Blob:
+    sha256: str
+    codec: str
+    raw_bytes: int
+    data: bytes
+
+
+def encode_payload(value: Any) -> bytes:
+    """Bytes a payload is hashed and stored as (text as UTF-8, JSON compact with sorted keys)"""
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def decode_payload(field: str, data: bytes) -> Any:
+    raw = data.decode("utf-8")
+    return raw if field == "output_text" else json.loads(raw)
+
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """(codec, stored bytes); stored uncompressed when compression does not help"""
+    if HAS_ZSTD:
+        codec, packed = CODEC_ZSTD, zstandard.ZstdCompressor(level=get_settings().run_blob_zstd_level).compress(data)
+    else:
+        codec, packed = CODEC_ZLIB, zlib.compress(data, 6)
+    return (codec, packed) if len(packed) < len(data) else (CODEC_NONE, data)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    data = bytes(data)
+    if codec == CODEC_NONE:
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if not HAS_ZSTD:
+            raise RuntimeError("Blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown blob codec {codec!r}")
+
+
+def make_blob(value: Any) -> Blob:
+    data = encode_payload(value)
+    codec, packed = compress(data)
+    return Blob(compute_sha256(data), codec, len(data), packed)
+
+
+def externalize(run: Run, min_bytes: Optional[int] = None) -> List[Blob]:
+    """
+    Move a new run's large payloads to blobs: sets the hash attributes and
+    clears the inline ones. Returns the blobs to store with put_blobs.
+    """
+    min_bytes = get_settings().run_blob_min_bytes if min_bytes is None else min_bytes
+    blobs = []
+    for field, hash_field in PAYLOAD_HASHES.items():
+        value = getattr(run, field)
+        if value is None or len(encode_payload(value)) < min_bytes:
+            continue
+        blob = make_blob(value)
+        blobs.append(blob)
+        setattr(run, hash_field, blob.sha256)
+        setattr(run, field, None)
+    return blobs
+
+
+async def store_run_payloads(session: AsyncSession, run: Run) -> None:
+    """Externalize a run before it is flushed; its search vector is computed from the text here"""
+    output_text = run.output_text
+    blobs = externalize(run)
+    if run.output_text is None and output_text:
+        run.output_tsv = func.to_tsvector(func.run_search_config(run.locale_selected), output_text)
+    await put_blobs(session, blobs)
+
+
+async def put_blobs(conn, blobs: Iterable[Blob]) -> Dict[str, bool]:
+    """
+    Store blobs, adding one reference per occurrence (a blob listed twice
+    gets two). Returns sha256 -> True when the blob was new.
+    """
+    refs = Counter(blob.sha256 for blob in blobs)
+    unique = list({blob.sha256: blob for blob in blobs}.values())
+    if not unique:
+        return {}
+    rows = (await conn.execute(text("""
+        INSERT INTO run_blobs (sha256, codec, raw_bytes, stored_bytes, data, refcount)
+        SELECT * FROM unnest(
+            CAST(:shas AS varchar[]), CAST(:codecs AS varchar[]), CAST(:raw AS integer[]),
+            CAST(:stored AS integer[]), CAST(:data AS bytea[]), CAST(:refs AS integer[])
+        )
+        ON CONFLICT (sha256) DO UPDATE SET refcount = run_blobs.refcount + EXCLUDED.refcount
+        RETURNING sha256, (xmax = 0) AS inserted
+    """), {
+        "shas": [b.sha256 for b in unique],
+        "codecs": [b.codec for b in unique],
+        "raw": [b.raw_bytes for b in unique],
+        "stored": [len(b.data) for b in unique],
+        "data": [b.data for b in unique],
+        "refs": [refs[b.sha256] for b in unique]
+    })).fetchall()
+    return {row.sha256: bool(row.inserted) for row in rows}
+
+
+async def load_blobs(conn, shas: Iterable[str]) -> Dict[str, bytes]:
+    """Decompressed bytes of the given blobs (missing hashes are left out)"""
+    wanted = sorted({sha for sha in shas if sha})
+    if not wanted:
+        return {}
+    rows = (await conn.execute(
+        text("SELECT sha256, codec, data FROM run_blobs WHERE sha256 = ANY(:shas)"), {"shas": wanted}
+    )).fetchall()
+    return {row.sha256: decompress(row.codec, row.data) for row in rows}
+
+
+async def hydrate_runs(session: AsyncSession, runs: Sequence[Run], fields: Sequence[str] = tuple(PAYLOAD_HASHES)) -> None:
+    """
+    Fill externalized payloads of loaded runs in place (one query for the
+    whole list). Values are set as loaded state, so nothing is written back.
+    """
+    missing = [
+        (run, field, getattr(run, PAYLOAD_HASHES[field]))
+        for run in runs for field in fields
+        if getattr(run, field) is None and getattr(run, PAYLOAD_HASHES[field])
+    ]
+    blobs = await load_blobs(session, (sha for _, _, sha in missing))
+    for run, field, sha in missing:
+        if sha in blobs:
+            set_committed_value(run, field, decode_payload(field, blobs[sha]))
+        else:
+            logger.warning(f"Run {run.run_id}: blob {sha} for {field} is missing")
+
+
+async def output_texts(session: AsyncSession, rows: Sequence[Any]) -> List[str]:
+    """Output text per row of (output_text, response_output_sha256) columns"""
+    blobs = await load_blobs(session, (row.response_output_sha256 for row in rows if row.output_text is None))
+    return [
+        row.output_text if row.output_text is not None
+        else decode_payload("output_text", blobs.get(row.response_output_sha256, b""))
+        for row in rows
+    ]
+
+
+async def release_blobs(conn, refs: Dict[str, int]) -> int:
+    """Drop references; deletes blobs left without any. Returns the number deleted."""
+    if not refs:
+        return 0
+    await conn.execute(text("""
+        UPDATE run_blobs b SET refcount = b.refcount - r.n
+        FROM unnest(CAST(:shas AS varchar[]), CAST(:counts AS integer[])) AS r(sha256, n)
+        WHERE b.sha256 = r.sha256
+    """), {"shas": list(refs), "counts": list(refs.values())})
+    result = await conn.execute(
+        text("DELETE FROM run_blobs WHERE sha256 = ANY(:shas) AND refcount <= 0"), {"shas": list(refs)}
+    )
+    return result.rowcount or 0
+
+
+async def release_partition(conn, partition: str) -> int:
+    """Release every blob reference held by the runs of one (detached or detaching) partition"""
+    rows = (await conn.execute(text(f"""
+        SELECT sha256, count(*) AS n FROM (
+            SELECT request_sha256 AS sha256 FROM {partition} WHERE request_json IS NULL
+            UNION ALL SELECT response_sha256 FROM {partition} WHERE response_json IS NULL
+            UNION ALL SELECT response_output_sha256 FROM {partition} WHERE output_text IS NULL
+        ) refs
+        WHERE sha256 IS NOT NULL
+        GROUP BY sha256
+    """))).fetchall()
+    return await release_blobs(conn, {row.sha256: row.n for row in rows})
+
+
+@dataclass
+class DedupReport:
+    runs: int = 0
+    payloads: int = 0
+    blobs_created: int = 0
+    inline_bytes: int = 0  # on-disk size of the inline values removed
+    raw_bytes: int = 0  # their uncompressed size
+    stored_bytes: int = 0  # size of the blobs created for them
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.inline_bytes - self.stored_bytes
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "runs": self.runs,
+            "payloads": self.payloads,
+            "blobs_created": self.blobs_created,
+            "inline_bytes": self.inline_bytes,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "bytes_saved": self.bytes_saved
+        }
+
+
+_EXTERNALIZE = text("""
+    UPDATE runs SET
+        request_json = CASE WHEN CAST(:request_sha256 AS varchar) IS NULL THEN request_json END,
+        request_sha256 = coalesce(CAST(:request_sha256 AS varchar), request_sha256),
+        response_json = CASE WHEN CAST(:response_sha256 AS varchar) IS NULL THEN response_json END,
+        response_sha256 = coalesce(CAST(:response_sha256 AS varchar), response_sha256),
+        output_tsv = CASE WHEN CAST(:output_sha256 AS varchar) IS NULL THEN output_tsv
+            ELSE coalesce(output_tsv, to_tsvector(run_search_config(locale_selected), coalesce(output_text, ''))) END,
+        output_text = CASE WHEN CAST(:output_sha256 AS varchar) IS NULL THEN output_text END,
+        response_output_sha256 = coalesce(CAST(:output_sha256 AS varchar), response_output_sha256)
+    WHERE run_id = :run_id AND created_at = :created_at
+""")
+
+
+async def dedup_existing(engine: AsyncEngine, batch_size: int = 500, min_bytes: Optional[int] = None) -> DedupReport:
+    """
+    Move inline payloads of existing runs into run_blobs, one transaction
+    per batch of runs (rows locked by a writer are skipped; rerun to pick
+    them up). Values below min_bytes stay inline.
+    """
+    min_bytes = get_settings().run_blob_min_bytes if min_bytes is None else min_bytes
+    report = DedupReport()
+    after = None
+    sizes = [func.pg_column_size(getattr(Run, field)).label(f"{field}_size") for field in PAYLOAD_HASHES]
+    while True:
+        query = select(Run.run_id, Run.created_at, *(getattr(Run, f) for f in PAYLOAD_HASHES), *sizes).where(
+            or_(*(getattr(Run, field).is_not(None) for field in PAYLOAD_HASHES))
+        )
+        if after is not None:
+            query = query.where(Run.run_id > after)
+        query = query.order_by(Run.run_id).limit(batch_size).with_for_update(skip_locked=True)
+
+        async with engine.begin() as conn:
+            rows = (await conn.execute(query)).fetchall()
+            if not rows:
+                return report
+            blobs: List[Blob] = []
+            updates = []
+            for row in rows:
+                hashes = {}
+                for field, hash_field in PAYLOAD_HASHES.items():
+                    value = getattr(row, field)
+                    if value is None or len(encode_payload(value)) < min_bytes:
+                        hashes[hash_field] = None
+                        continue
+                    blob = make_blob(value)
+                    blobs.append(blob)
+                    hashes[hash_field] = blob.sha256
+                    report.payloads += 1
+                    report.raw_bytes += blob.raw_bytes
+                    report.inline_bytes += getattr(row, f"{field}_size") or 0
+                if any(hashes.values()):
+                    report.runs += 1
+                    updates.append({
+                        "run_id": row.run_id,
+                        "created_at": row.created_at,
+                        "request_sha256": hashes["request_sha256"],
+                        "response_sha256": hashes["response_sha256"],
+                        "output_sha256": hashes["response_output_sha256"]
+                    })
+            created = await put_blobs(conn, blobs)
+            by_sha = {blob.sha256: blob for blob in blobs}
+            report.blobs_created += sum(created.values())
+            report.stored_bytes += sum(len(by_sha[sha].data) for sha, new in created.items() if new)
+            if updates:
+                await conn.execute(_EXTERNALIZE, updates)
+        after = rows[-1].run_id
+        logger.info(f"Payload dedup: {report.runs} runs, {report.bytes_saved} bytes saved so far")
@@ -0,0 +1,108 @@
+"""
+Run listing: keyset pagination, projected columns and cheap totals
+
+Listings are newest first and continue from an opaque cursor on
+(created_at, run_id), the same cursor format as run search, so page N
+costs the same as page 1 (an index range scan on
+idx_runs_created_keyset / idx_template_runs_keyset) instead of growing
+with OFFSET.
+
+List items never need the large request/response payloads, so they are
+deferred with raiseload: touching one on a listed row raises instead of
+quietly issuing a query per row.
+
+Totals are optional: exact runs COUNT(*) over the filtered rows,
+approximate reads the planner's row estimate from EXPLAIN, which is
+instant but can be off by a wide margin for selective filters.
+"""
+
+import json
+from typing import Any, List, Literal, Optional, Tuple, get_args
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from app.models.models import Run
+from app.services.run_search import decode_cursor, encode_cursor
+
+TotalMode = Literal["exact", "approximate", "none"]
+TOTAL_MODES = get_args(TotalMode)
+
+# Columns a list item never renders
+PAYLOAD_COLUMNS = (Run.request_json, Run.response_json, Run.output_text, Run.als_block_text)
+
+
+def list_query(*criteria, include_payloads: bool = False):
+    """select(Run) filtered by criteria, with payload columns deferred unless asked for"""
+    query = select(Run).where(*criteria)
+    if not include_payloads:
+        query = query.options(*(defer(column, raiseload=True) for column in PAYLOAD_COLUMNS))
+    return query
+
+
+def check_page_param(page: Optional[int], cursor: Optional[str]) -> None:
+    """
+    Reject the removed page parameter instead of silently serving page 1.
+
+    page=1 without a cursor is still the first page and is accepted.
+
+    Raises:
+        ValueError: If page asks for anything else
+    """
+    if page is None or (page == 1 and not cursor):
+        return
+    raise ValueError("page is no longer supported; follow the next cursor from the previous response instead")
+
+
+def keyset_page(query, cursor: Optional[str], limit: int):
+    """
+    Newest-first page of query after cursor, fetching limit + 1 rows to detect a next page.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor:
+        query = query.where(tuple_(Run.created_at, Run.run_id) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(Run.created_at.desc(), Run.run_id.desc()).limit(limit + 1)
+
+
+async def fetch_page(
+    session: AsyncSession,
+    query,
+    cursor: Optional[str] = None,
+    limit: int = 50
+) -> Tuple[List[Run], Optional[str]]:
+    """(runs, next_cursor) for one page; next_cursor is None on the last page"""
+    runs = list((await session.execute(keyset_page(query, cursor, limit))).scalars().all())
+    if len(runs) <= limit:
+        return runs, None
+    runs = runs[:limit]
+    return runs, encode_cursor(runs[-1].created_at, runs[-1].run_id)
+
+
+async def count_runs(session: AsyncSession, *criteria, mode: str = "exact") -> Optional[int]:
+    """
+    Number of runs matching criteria: exact, the planner's estimate, or None.
+
+    Raises:
+        ValueError: If mode is not one of TOTAL_MODES
+    """
+    if mode not in TOTAL_MODES:
+        raise ValueError(f"Unknown total mode {mode!r}; expected one of {', '.join(TOTAL_MODES)}")
+    if mode == "none":
+        return None
+    query = select(func.count()).select_from(Run).where(*criteria)
+    if mode == "exact":
+        return (await session.execute(query)).scalar() or 0
+    return await estimate_rows(session, select(Run.run_id).where(*criteria))
+
+
+async def estimate_rows(session: AsyncSession, query) -> int:
+    """Planner row estimate for query (EXPLAIN only, nothing is executed)"""
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan: Any = (await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
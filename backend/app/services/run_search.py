@@ -0,0 +1,217 @@
+"""
+Full-text search over run outputs
+
+runs.output_tsv holds to_tsvector(run_search_config(locale_selected),
+output_text), maintained by a trigger and backed by a GIN index. Each run
+is indexed with the text search config of its locale's language, so a
+query is parsed with that config when the search is filtered by locale and
+with every configured language (OR-ed) otherwise.
+
+Results are newest first and paginated by keyset on (created_at, run_id);
+snippets are built with ts_headline for the returned page only. Outputs
+stored in run_blobs are compressed, so their snippets are built from the
+decompressed text in a second query.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Integer, String, Text, cast, column, func, literal, select, text, tuple_, values
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.models.models import Run
+from app.services.run_blobs import load_blobs
+
+logger = logging.getLogger(__name__)
+
+# Language subtag -> Postgres text search config; anything else uses 'simple'.
+# Keep in sync with run_search_config() (alembic 20261018_run_output_search).
+SEARCH_CONFIGS = {
+    "da": "danish", "de": "german", "en": "english", "es": "spanish", "fi": "finnish",
+    "fr": "french", "it": "italian", "nl": "dutch", "no": "norwegian", "pt": "portuguese",
+    "ru": "russian", "sv": "swedish", "tr": "turkish",
+}
+DEFAULT_CONFIG = "simple"
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter= … "
+
+
+def search_config(locale: Optional[str]) -> str:
+    """Text search config for a locale ('de-DE' -> 'german')"""
+    language = (locale or "").replace("_", "-").split("-", 1)[0].lower()
+    return SEARCH_CONFIGS.get(language, DEFAULT_CONFIG)
+
+
+def encode_cursor(created_at: datetime, run_id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(run_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, run_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), UUID(run_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _tsquery(q: str, locale: Optional[str]):
+    configs = [search_config(locale)] if locale else sorted(set(SEARCH_CONFIGS.values()) | {DEFAULT_CONFIG})
+    query = None
+    for config in configs:
+        part = func.websearch_to_tsquery(cast(literal(config), REGCONFIG), q)
+        query = part if query is None else query.op("||")(part)
+    return query
+
+
+def build_search_query(
+    q: str,
+    template_id: Optional[UUID] = None,
+    batch_id: Optional[UUID] = None,
+    model: Optional[str] = None,
+    locale: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+):
+    """
+    Statement for one page (limit + 1 rows, to detect a next page).
+
+    The inner query finds matching run ids through the GIN index; the outer
+    one computes snippets for those rows only.
+    """
+    tsquery = _tsquery(q, locale)
+    page = select(Run.run_id, Run.created_at).where(Run.output_tsv.bool_op("@@")(tsquery))
+    if template_id is not None:
+        page = page.where(Run.template_id == template_id)
+    if batch_id is not None:
+        page = page.where(Run.batch_id == batch_id)
+    if model is not None:
+        page = page.where(Run.model == model)
+    if locale is not None:
+        page = page.where(Run.locale_selected == locale)
+    if since is not None:
+        page = page.where(Run.created_at >= since)
+    if until is not None:
+        page = page.where(Run.created_at < until)
+    if cursor:
+        page = page.where(tuple_(Run.created_at, Run.run_id) < tuple_(*decode_cursor(cursor)))
+    page = page.order_by(Run.created_at.desc(), Run.run_id.desc()).limit(limit + 1).subquery("page")
+
+    snippet = func.ts_headline(
+        func.run_search_config(Run.locale_selected, type_=REGCONFIG), Run.output_text, tsquery, HEADLINE_OPTIONS
+    )
+    return (
+        select(
+            Run.run_id, Run.template_id, Run.batch_id, Run.model, Run.locale_selected,
+            Run.status, Run.created_at, snippet.label("snippet"),
+            Run.output_text.is_(None).label("output_in_blob"), Run.response_output_sha256
+        )
+        .join(page, page.c.run_id == Run.run_id)
+        .order_by(Run.created_at.desc(), Run.run_id.desc())
+    )
+
+
+async def search_runs(session: AsyncSession, q: str, limit: int = 20, **filters) -> Dict[str, Any]:
+    """
+    One page of runs whose output matches q (web search syntax: quoted
+    phrases, OR, -exclusion). Pass the returned next_cursor to continue.
+    """
+    rows = (await session.execute(build_search_query(q, limit=limit, **filters))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    blob_snippets = await _blob_snippets(session, q, filters.get("locale"), rows)
+    return {
+        "results": [
+            {
+                "run_id": str(row.run_id),
+                "template_id": str(row.template_id) if row.template_id else None,
+                "batch_id": str(row.batch_id) if row.batch_id else None,
+                "model": row.model,
+                "locale": row.locale_selected,
+                "status": row.status,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "snippet": blob_snippets.get(row.run_id, row.snippet)
+            }
+            for row in rows
+        ],
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].run_id) if has_more else None
+    }
+
+
+async def _blob_snippets(session: AsyncSession, q: str, locale: Optional[str], rows) -> Dict[UUID, str]:
+    """Snippets for the rows whose output is in run_blobs, in one ts_headline query"""
+    rows = [row for row in rows if row.output_in_blob and row.response_output_sha256]
+    blobs = await load_blobs(session, (row.response_output_sha256 for row in rows))
+    outputs = [
+        (i, row.locale_selected, blobs[row.response_output_sha256].decode("utf-8"))
+        for i, row in enumerate(rows) if row.response_output_sha256 in blobs
+    ]
+    if not outputs:
+        return {}
+    texts = values(
+        column("i", Integer), column("locale", String), column("body", Text), name="outputs"
+    ).data(outputs)
+    snippet = func.ts_headline(
+        func.run_search_config(texts.c.locale, type_=REGCONFIG), texts.c.body, _tsquery(q, locale), HEADLINE_OPTIONS
+    )
+    result = (await session.execute(select(texts.c.i, snippet.label("snippet")))).all()
+    return {rows[row.i].run_id: row.snippet for row in result}
+
+
+_BACKFILL_BATCH = text("""
+    WITH batch AS (
+        SELECT run_id FROM runs
+        WHERE output_tsv IS NULL AND (CAST(:after AS uuid) IS NULL OR run_id > :after)
+        ORDER BY run_id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE runs r
+    SET output_tsv = to_tsvector(run_search_config(r.locale_selected), coalesce(r.output_text, ''))
+    FROM batch
+    WHERE r.run_id = batch.run_id
+    RETURNING r.run_id
+""")
+
+
+async def backfill_search_vectors(
+    engine: AsyncEngine,
+    batch_size: int = 1000,
+    lock_timeout_ms: int = 2000,
+    pause_seconds: float = 0.0
+) -> int:
+    """
+    Fill output_tsv for rows written before the trigger existed.
+
+    Walks run_id in batches, one short transaction each; rows locked by a
+    concurrent writer are skipped (a rerun picks them up) and a batch gives
+    up after lock_timeout_ms instead of queueing behind other locks.
+    Returns the number of rows updated.
+    """
+    updated = 0
+    after: Optional[UUID] = None
+    while True:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            ids: List[UUID] = [
+                row.run_id for row in (await conn.execute(
+                    _BACKFILL_BATCH, {"after": after, "batch_size": batch_size}
+                )).fetchall()
+            ]
+        if not ids:
+            return updated
+        updated += len(ids)
+        after = max(ids)
+        logger.info(f"Search backfill: {updated} runs indexed")
+        if pause_seconds:
+            await asyncio.sleep(pause_seconds)
@@ -18,8 +18,11 @@ from app.llm.types import LLMRequest
 from app.llm.unified_llm_adapter import UnifiedLLMAdapter
 from app.schemas.templates import RunTemplateRequest, RunTemplateResponse
 from app.core.canonicalization import compute_sha256
+from app.core.json_validation import schema_from_envelope
 from app.services.als_constants import get_system_prompt, ALS_SYSTEM_PROMPT
 from app.services.als.als_builder import ALSBuilder
+from app.services.rank_extraction import add_run_ranks, brand_engine
+from app.services.run_blobs import store_run_payloads
 
 # Initialize adapter
 adapter = UnifiedLLMAdapter()
@@ -49,6 +52,19 @@ def render_template(template: PromptTemplate, variables: Dict[str, Any]) -> Dict
     return rendered_messages
 
 
+def schema_meta(json_schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    request.meta for a template's json_schema, always in envelope form.
+    Templates may store the {"name", "schema"} envelope or a bare schema;
+    adapters and output validation then see the same schema either way.
+    """
+    schema = schema_from_envelope(json_schema)
+    if schema is None:
+        return None
+    name = json_schema.get("name") if schema is not json_schema else None
+    return {"json_schema": {"name": name or "Output", "schema": schema}}
+
+
 async def execute_template_run(
     session: AsyncSession,
     template_id: str,
@@ -144,6 +160,7 @@ async def execute_template_run(
         als_context={},  # Don't pass ALS context since we've already injected it in messages
         temperature=canonical.get("temperature", 0.7),
         max_tokens=canonical.get("max_tokens", 6000),
+        meta=schema_meta(canonical.get("json_schema")),
         template_id=str(template_id),
         run_id=str(run_id)
     )
@@ -166,6 +183,9 @@ async def execute_template_run(
         tokens_output = usage.get("completion_tokens", 0) or usage.get("output_tokens", 0)
         tokens_reasoning = usage.get("reasoning_tokens", 0)
         
+        # Set by the adapter when json_mode or a template schema applies
+        output_json_valid = (llm_response.metadata or {}).get("output_json_valid")
+        
         status = "succeeded"
         error_message = None
         
@@ -178,6 +198,7 @@ async def execute_template_run(
         tokens_input = 0
         tokens_output = 0
         tokens_reasoning = 0
+        output_json_valid = None
         status = "failed"
         error_message = str(e)
     
@@ -234,11 +255,14 @@ async def execute_template_run(
         grounded_effective=grounded_effective,
         json_mode=request.json_mode,
         grounding_mode="GR" if request.grounded else "UN",
+        locale_selected=als_context_dict.get("locale"),
+        als_block_text=als_context_dict.get("als_block"),
+        als_block_sha256=compute_sha256(als_context_dict["als_block"]) if als_context_dict.get("als_block") else None,
         request_json=request_json,
         output_text=output_text,
         response_json=response_json,
         response_output_sha256=compute_sha256(output_text) if output_text else None,
-        output_json_valid=None,  # TODO: Validate if json_mode
+        output_json_valid=output_json_valid,
         usage=usage,
         latency_ms=latency_ms,
         tokens_input=tokens_input,
@@ -256,8 +280,10 @@ async def execute_template_run(
     if error_message:
         run.why_not_grounded = error_message
     
-    # Save to database
+    # Save to database, with the run's ranked brands in the same transaction
     session.add(run)
+    add_run_ranks(session, run, brand_engine(canonical.get("brands")))
+    await store_run_payloads(session, run)
     await session.commit()
     await session.refresh(run)
     
@@ -265,7 +291,8 @@ async def execute_template_run(
     return RunTemplateResponse(
         run_id=str(run.run_id),
         template_id=str(run.template_id),
-        output_text=run.output_text or "",
+        output_text=output_text,
+        response_output_sha256=run.response_output_sha256,
         grounded_requested=run.grounded_requested,
         grounded_effective=run.grounded_effective or False,
         vendor=run.vendor,
@@ -43,9 +43,12 @@ CREATE TABLE runs (
     json_mode BOOLEAN NOT NULL DEFAULT FALSE,
     
     -- Request/Response tracking
-    request_json JSONB NOT NULL DEFAULT '{}'::jsonb,
-    output_text TEXT NOT NULL DEFAULT '',
-    response_json JSONB NOT NULL DEFAULT '{}'::jsonb,
+    -- A NULL payload is stored in run_blobs under its hash
+    request_json JSONB DEFAULT '{}'::jsonb,
+    request_sha256 VARCHAR(64),
+    output_text TEXT DEFAULT '',
+    response_json JSONB DEFAULT '{}'::jsonb,
+    response_sha256 VARCHAR(64),
     response_output_sha256 VARCHAR(64),
     output_json_valid BOOLEAN,
     
@@ -83,6 +86,17 @@ CREATE TABLE runs (
     completed_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Run payloads, content-addressed and compressed (app/services/run_blobs.py)
+CREATE TABLE run_blobs (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    codec VARCHAR(10) NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Batches table
 CREATE TABLE batches (
     batch_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -151,7 +165,8 @@ CREATE TABLE llm_telemetry (
 );
 
 -- Indexes
-CREATE INDEX idx_template_runs ON runs(template_id, created_at DESC);
+CREATE INDEX idx_template_runs_keyset ON runs(template_id, created_at DESC, run_id DESC);
+CREATE INDEX idx_runs_created_keyset ON runs(created_at DESC, run_id DESC);
 CREATE INDEX idx_runs_model_created ON runs(model, created_at DESC);
 CREATE INDEX idx_runs_vendor_created ON runs(vendor, created_at DESC);
 CREATE INDEX idx_output_hash ON runs(response_output_sha256);
@@ -14,9 +14,12 @@ CREATE TABLE runs (
     json_mode BOOLEAN NOT NULL DEFAULT FALSE,
     
     -- Request/Response tracking
-    request_json JSONB NOT NULL DEFAULT '{}'::jsonb,
-    output_text TEXT NOT NULL DEFAULT '',
-    response_json JSONB NOT NULL DEFAULT '{}'::jsonb,
+    -- A NULL payload is stored in run_blobs under its hash
+    request_json JSONB DEFAULT '{}'::jsonb,
+    request_sha256 VARCHAR(64),
+    output_text TEXT DEFAULT '',
+    response_json JSONB DEFAULT '{}'::jsonb,
+    response_sha256 VARCHAR(64),
     response_output_sha256 VARCHAR(64),
     output_json_valid BOOLEAN,
     
@@ -55,7 +58,8 @@ CREATE TABLE runs (
 );
 
 -- Create indexes
-CREATE INDEX idx_template_runs ON runs(template_id, created_at DESC);
+CREATE INDEX idx_template_runs_keyset ON runs(template_id, created_at DESC, run_id DESC);
+CREATE INDEX idx_runs_created_keyset ON runs(created_at DESC, run_id DESC);
 CREATE INDEX idx_runs_model_created ON runs(model, created_at DESC);
 CREATE INDEX idx_runs_vendor_created ON runs(vendor, created_at DESC);
 CREATE INDEX idx_output_hash ON runs(response_output_sha256);
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Audit stored runs for ALS leakage and record findings in run_leak_findings.
+
+Runs already audited are skipped, so the audit can be interrupted and
+resumed; --rescan re-checks them (after changing the leak patterns).
+
+Usage:
+    python scripts/audit_als_leaks.py [--since 2026-01-01] [--until 2026-02-01]
+        [--template-id UUID] [--workers 8] [--batch-size 2000] [--rescan]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import async_session, engine  # noqa: E402
+from app.services.leak_audit import audit_runs  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--template-id", type=UUID, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--rescan", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        async with async_session() as session:
+            summary = await audit_runs(
+                session, args.since, args.until, args.template_id,
+                args.batch_size, args.workers, args.rescan
+            )
+        print(f"scanned {summary['scanned']} runs: {summary['runs_with_leaks']} with leaks, "
+              f"{summary['findings']} findings")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Extract ranked brands for historical runs into run_brand_ranks.
+
+Runs that already have ranks are skipped; --replace re-extracts them (after
+a brand list change).
+
+Usage:
+    python scripts/backfill_brand_ranks.py [--brands "AVEA,Tru Niagen"] [--since 2026-01-01]
+        [--template-id UUID] [--batch-size 500] [--replace]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import async_session, engine  # noqa: E402
+from app.services.rank_extraction import backfill_ranks, brand_engine  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--brands", default="", help="Comma-separated known brands")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--template-id", type=UUID, default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--replace", action="store_true")
+    args = parser.parse_args()
+
+    brands = [b.strip() for b in args.brands.split(",") if b.strip()]
+    try:
+        async with async_session() as session:
+            processed = await backfill_ranks(
+                session, brand_engine(brands), args.since, args.template_id, args.batch_size, args.replace
+            )
+        print(f"extracted ranks for {processed} runs")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Fill runs.output_tsv for runs written before full-text search existed.
+
+Runs in short batches (one transaction each) so writers are never blocked
+for long; safe to interrupt and rerun.
+
+Usage:
+    python scripts/backfill_run_search.py [--batch-size 1000] [--lock-timeout-ms 2000] [--pause 0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine  # noqa: E402
+from app.services.run_search import backfill_search_vectors  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--lock-timeout-ms", type=int, default=2000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+
+    try:
+        updated = await backfill_search_vectors(engine, args.batch_size, args.lock_timeout_ms, args.pause)
+        print(f"indexed {updated} runs")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for batch expansion and execution.
+
+Compares the legacy strategy (materialise every configuration, create one
+coroutine per configuration, gather them all) against the lazy expansion
+feeding BatchRunner's bounded worker pool. LLM calls are replaced by a
+no-op so only expansion/scheduling overhead is measured.
+
+Usage:
+    SECRET_KEY=x python scripts/bench_batch_memory.py [--runs 50000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.schemas.templates import BatchRunRequest  # noqa: E402
+from app.services.batch_runner import BatchRunner  # noqa: E402
+
+LOCALES = ["de-DE", "en-US", "fr-FR", "it-IT", "en-GB"]
+
+
+def build_request(runs: int) -> BatchRunRequest:
+    # 5 locales x 2 modes x 10 replicates = 100 runs per model
+    models = [f"model-{i}" for i in range(max(1, runs // 100))]
+    return BatchRunRequest(
+        models=models,
+        locales=LOCALES,
+        grounding_modes=["UNGROUNDED", "REQUIRED"],
+        replicate_count=10,
+        max_parallel=20,
+    )
+
+
+async def fake_run(session, template_id, request, org_id, user_id=None):
+    await asyncio.sleep(0)
+    return SimpleNamespace(run_id="r")
+
+
+class FakeSession:
+    """Minimal session stand-in; mocks would record every call and skew memory"""
+
+    _result = SimpleNamespace(scalar_one_or_none=lambda: SimpleNamespace(template_id="t"))
+
+    def add(self, obj):
+        pass
+
+    async def execute(self, statement, params=None):
+        return self._result
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+async def legacy_strategy(runner: BatchRunner, request: BatchRunRequest) -> int:
+    configurations = runner._generate_run_configurations(request)
+    semaphore = asyncio.Semaphore(20)
+
+    async def one(config):
+        async with semaphore:
+            return await fake_run(None, None, None, None)
+
+    results = await asyncio.gather(*[one(c) for c in configurations])
+    return len(results)
+
+
+async def pooled_strategy(runner: BatchRunner, request: BatchRunRequest) -> int:
+    with patch("app.services.batch_runner.execute_template_run", new=fake_run):
+        response = await runner.execute_batch(
+            session=FakeSession(),
+            template_id="00000000-0000-0000-0000-000000000001",
+            request=request,
+            org_id="bench",
+        )
+    return response.total_runs
+
+
+def measure(name: str, coro_factory) -> None:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    total = asyncio.run(coro_factory())
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} runs={total:>6}  peak={peak / 1e6:8.2f} MB  time={elapsed:6.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=50000)
+    args = parser.parse_args()
+
+    runner = BatchRunner()
+    request = build_request(args.runs)
+    print(f"Expansion size: {runner.count_run_configurations(request)}")
+
+    measure("legacy", lambda: legacy_strategy(runner, request))
+    measure("pooled", lambda: pooled_strategy(runner, request))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Scheduling simulation for batch execution.
+
+Runs a batch over one OpenAI and one Gemini model against a fake adapter
+in which each provider serves a limited number of concurrent requests with
+a fixed latency. Reports total makespan for the legacy schedule (one global
+semaphore over the model-major expansion) and for BatchRunner's per-vendor
+bulkheads.
+
+Usage:
+    SECRET_KEY=x python scripts/bench_batch_scheduling.py [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.schemas.templates import BatchRunRequest  # noqa: E402
+from app.services.batch_runner import BatchRunner  # noqa: E402
+
+
+class FakeAdapter:
+    """Provider capacity is modelled as a per-vendor semaphore"""
+
+    def __init__(self, runner: BatchRunner, capacity: dict, latency: dict):
+        self.runner = runner
+        self.latency = latency
+        self.slots = {vendor: asyncio.Semaphore(n) for vendor, n in capacity.items()}
+
+    async def run(self, session, template_id, request, org_id, user_id=None):
+        vendor = self.runner._vendor_for_model(request.model)
+        async with self.slots[vendor]:
+            await asyncio.sleep(self.latency[vendor])
+        return SimpleNamespace(run_id=str(id(request)))
+
+
+class FakeSession:
+    _result = SimpleNamespace(scalar_one_or_none=lambda: SimpleNamespace(template_id="t"))
+
+    def add(self, obj):
+        pass
+
+    async def execute(self, statement, params=None):
+        return self._result
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+async def legacy_schedule(runner: BatchRunner, adapter: FakeAdapter, request: BatchRunRequest) -> None:
+    semaphore = asyncio.Semaphore(request.max_parallel)
+
+    async def one(config):
+        async with semaphore:
+            await adapter.run(None, None, SimpleNamespace(model=config["model"]), None)
+
+    await asyncio.gather(*[one(c) for c in runner._iter_run_configurations(request)])
+
+
+async def bulkhead_schedule(runner: BatchRunner, adapter: FakeAdapter, request: BatchRunRequest) -> None:
+    with patch("app.services.batch_runner.execute_template_run", new=adapter.run):
+        await runner.execute_batch(
+            session=FakeSession(),
+            template_id="00000000-0000-0000-0000-000000000001",
+            request=request,
+            org_id="bench",
+        )
+
+
+def measure(name: str, schedule, capacity: dict, latency: dict, request: BatchRunRequest) -> float:
+    runner = BatchRunner()
+
+    async def go():
+        adapter = FakeAdapter(runner, capacity, latency)
+        t0 = time.perf_counter()
+        await schedule(runner, adapter, request)
+        return time.perf_counter() - t0
+
+    makespan = asyncio.run(go())
+    print(f"{name:<10} makespan={makespan:7.3f}s")
+    return makespan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-call latency in seconds")
+    parser.add_argument("--replicates", type=int, default=10)
+    args = parser.parse_args()
+
+    request = BatchRunRequest(
+        models=["gpt-5", "gemini-2.5-pro"],
+        locales=["de-DE", "en-US", "fr-FR", "it-IT"],
+        grounding_modes=["UNGROUNDED", "REQUIRED"],
+        replicate_count=args.replicates,
+        max_parallel=10,
+    )
+    capacity = {"openai": 3, "gemini_direct": 8}
+    latency = {"openai": args.latency, "gemini_direct": args.latency}
+
+    print(f"Runs: {BatchRunner().count_run_configurations(request)}  capacity={capacity}")
+    legacy = measure("legacy", legacy_schedule, capacity, latency, request)
+    bulkhead = measure("bulkhead", bulkhead_schedule, capacity, latency, request)
+    print(f"speedup    {legacy / bulkhead:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
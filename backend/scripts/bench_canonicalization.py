@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Canonicalization throughput on large JSON outputs.
+
+Builds synthetic structured outputs (ranked entities with prose, scores and
+nested sources) and times compute_output_hash on JSON text and on parsed
+objects, plus compute_template_hash, with the pure-Python backend and, when
+installed, the orjson backend.
+
+Usage:
+    SECRET_KEY=x python scripts/bench_canonicalization.py [--entities 2000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.core import canonicalization  # noqa: E402
+from app.core.canonicalization import compute_output_hash, compute_template_hash  # noqa: E402
+
+WORDS = "longevity supplement brand clinical trial nad resveratrol über café 长寿 analysis".split()
+
+
+def build_output(entities: int, with_floats: bool, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    items = []
+    for rank in range(1, entities + 1):
+        item = {
+            "rank": rank,
+            "name": f"Brand {rng.randint(1, 10 ** 6)}",
+            "summary": " ".join(rng.choice(WORDS) for _ in range(40)),
+            "tags": [rng.choice(WORDS) for _ in range(5)],
+            "sources": [
+                {"url": f"https://example.com/{rng.randint(1, 10 ** 9)}", "title": " ".join(rng.choice(WORDS) for _ in range(6))}
+                for _ in range(3)
+            ],
+        }
+        if with_floats:
+            item["score"] = round(rng.random() * 100, rng.randint(1, 8))
+            item["confidence"] = rng.random()
+        items.append(item)
+    return {"query": "top longevity brands", "items": items, "model": "gpt-5"}
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = ["python"] + (["orjson"] if canonicalization.HAS_ORJSON else [])
+    orjson_module = canonicalization.orjson
+
+    for with_floats in (False, True):
+        doc = build_output(args.entities, with_floats)
+        text = json.dumps(doc, ensure_ascii=False)
+        mb = len(text.encode("utf-8")) / 1e6
+        print(f"\n{'with' if with_floats else 'without'} floats: {mb:.2f} MB")
+
+        digests = set()
+        for backend in backends:
+            canonicalization.orjson = orjson_module if backend == "orjson" else None
+            digests.add(compute_output_hash(text))
+            for name, fn in (
+                ("output_hash(str)", lambda: compute_output_hash(text)),
+                ("output_hash(obj)", lambda: compute_output_hash(doc)),
+                ("template_hash", lambda: compute_template_hash(doc)),
+            ):
+                seconds = timed(fn, args.repeat)
+                print(f"  {backend:<7} {name:<17} {seconds * 1000:8.1f} ms  {mb / seconds:7.1f} MB/s")
+        canonicalization.orjson = orjson_module
+        print(f"  digests identical across backends: {len(digests) == 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Move inline run payloads into the content-addressed run_blobs table.
+
+Data migration for alembic 20261018_run_blobs: walks runs in short
+batches, stores each request/response/output payload once (compressed)
+and replaces it by its hash. Safe to rerun; only inline payloads are
+touched. Prints a report with the bytes saved.
+
+Usage:
+    python scripts/dedup_run_payloads.py [--batch-size 500] [--min-bytes 256]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine  # noqa: E402
+from app.services.run_blobs import HAS_ZSTD, dedup_existing  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--min-bytes", type=int, default=None, help="Payloads smaller than this stay inline")
+    args = parser.parse_args()
+
+    try:
+        report = await dedup_existing(engine, batch_size=args.batch_size, min_bytes=args.min_bytes)
+        print(json.dumps({**report.as_dict(), "codec": "zstd" if HAS_ZSTD else "zlib"}, indent=2))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
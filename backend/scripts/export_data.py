@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Export runs or llm_telemetry incrementally to NDJSON or Parquet.
+
+Continues after the target's stored watermark and advances it once the
+output file is complete, so a cron job can load each file into BigQuery.
+Memory is bounded by --chunk-size rows.
+
+Usage:
+    python scripts/export_data.py --table llm_telemetry --format parquet --output telemetry.parquet
+        [--target bigquery_telemetry] [--full] [--no-commit] [--chunk-size 5000]
+    python scripts/export_data.py --table runs > runs.ndjson
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine  # noqa: E402
+from app.services.exports import FORMATS, SOURCES, plan_export, save_watermark, stream_export  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--table", choices=sorted(SOURCES), required=True)
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--output", help="File to write (default: stdout, ndjson only)")
+    parser.add_argument("--target", default=None, help="Watermark name (defaults to the table)")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export everything")
+    parser.add_argument("--no-commit", action="store_true", help="Do not advance the watermark")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+    if args.format == "parquet" and not args.output:
+        parser.error("--output is required for parquet")
+
+    try:
+        # The watermark is saved here, after the file is closed
+        plan = await plan_export(
+            engine, args.table, fmt=args.format, target=args.target, full=args.full,
+            commit=False, chunk_size=args.chunk_size
+        )
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            async for data in stream_export(engine, plan):
+                out.write(data)
+        finally:
+            if args.output:
+                out.close()
+        committed = not args.no_commit and plan.last is not None
+        if committed:
+            await save_watermark(engine, plan.target, plan.last, plan.rows)
+        print(json.dumps({**plan.as_dict(), "committed": committed}, indent=2), file=sys.stderr)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
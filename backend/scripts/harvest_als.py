@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Harvest civic terms for ALS templates (offline, for manual review).
+
+Searches run concurrently and raw results are cached on disk per
+(query, country, date). --dry-run uses a local stub search backend
+(optionally fed from --fixtures) and leaves the cache untouched.
+
+Usage:
+    python scripts/harvest_als.py [--countries DE,CH] [--out harvested.json]
+        [--concurrency 4] [--cache-dir .cache/als_harvest] [--dry-run [--fixtures results.json]]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.als.als_harvester import ALSHarvester, StubSearchBackend  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--countries", default="", help="Comma-separated country codes (default: all)")
+    parser.add_argument("--out", default=None, help="Write harvested data to this JSON file")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--dry-run", action="store_true", help="Use the local stub search backend")
+    parser.add_argument("--fixtures", default=None, help="Stub results: {\"<COUNTRY>|<query>\": [results]}")
+    args = parser.parse_args()
+
+    backend = StubSearchBackend(fixtures_path=args.fixtures) if args.dry_run else None
+    harvester = ALSHarvester(
+        backend=backend, cache_dir=args.cache_dir, max_concurrency=args.concurrency, dry_run=args.dry_run
+    )
+    countries = [c.strip().upper() for c in args.countries.split(",") if c.strip()] or None
+    harvested = await harvester.refresh_all_templates(save_to_file=args.out, countries=countries)
+    if not args.out:
+        print(json.dumps(harvested, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Create upcoming monthly partitions and retire expired ones for runs and llm_telemetry.
+
+Meant to run daily (cron). Refreshes the runs_daily / llm_telemetry_daily
+rollups for the last days, and fully rolls up every partition older than
+the retention period before detaching it (archived or dropped).
+
+Usage:
+    python scripts/maintain_partitions.py [--table runs] [--months-ahead 3]
+        [--runs-retention 12] [--telemetry-retention 6] [--action archive|drop] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine  # noqa: E402
+from app.services.partitions import DETACH_ACTIONS, TABLES, maintain  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--table", action="append", choices=sorted(TABLES), help="Limit to a table (repeatable)")
+    parser.add_argument("--months-ahead", type=int, default=None)
+    parser.add_argument("--runs-retention", type=int, default=None, help="Months of runs to keep attached")
+    parser.add_argument("--telemetry-retention", type=int, default=None, help="Months of llm_telemetry to keep attached")
+    parser.add_argument("--action", choices=DETACH_ACTIONS, default=None, help="What to do with detached partitions")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the partitions that would be detached")
+    args = parser.parse_args()
+
+    retention = {}
+    if args.runs_retention is not None:
+        retention["runs"] = args.runs_retention
+    if args.telemetry_retention is not None:
+        retention["llm_telemetry"] = args.telemetry_retention
+
+    try:
+        report = await maintain(
+            engine,
+            months_ahead=args.months_ahead,
+            retention_months=retention,
+            action=args.action,
+            tables=args.table,
+            dry_run=args.dry_run
+        )
+        print(json.dumps(report, indent=2))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Rebuild the near-duplicate (MinHash/LSH) index for prompt templates.
+
+Needed once after the migration, and after changing the shingle or
+signature parameters in app/services/near_duplicates.py.
+
+Usage:
+    python scripts/reindex_template_minhash.py [--brand AVEA] [--batch-size 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine  # noqa: E402
+from app.services.near_duplicates import reindex_all  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--brand", default=None, help="Only reindex this brand's templates")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    try:
+        indexed = await reindex_all(engine, args.batch_size, args.brand)
+        print(f"indexed {indexed} templates")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Catch up the prompt tracking analytics rollups.
+
+Folds finished prompt_runs above the stored watermark into
+prompt_analytics_daily. Safe to run alongside the API: runs already counted
+when their result was written are skipped via the rollup ledger. Run once
+(cron) or with --interval to keep sweeping.
+
+Usage:
+    python scripts/rollup_prompt_analytics.py [--batch-size 5000] [--interval 60]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine  # noqa: E402
+from app.services.analytics_rollup import catch_up  # noqa: E402
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--stale-after-hours", type=int, default=24)
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between sweeps; omit to run once")
+    args = parser.parse_args()
+
+    try:
+        while True:
+            scanned = await catch_up(engine, args.batch_size, args.stale_after_hours)
+            print(f"scanned {scanned} run ids")
+            if args.interval is None:
+                break
+            await asyncio.sleep(args.interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+-- Before/after plans for the hot meta fields of llm_telemetry
+-- Run with psql after alembic 20261018_telemetry_meta_columns:
+--     psql "$DATABASE_SYNC_URL" -f sql/explain_telemetry_meta.sql
+--
+-- Each query is explained twice: "before" reads the field from meta (the
+-- pre-migration form, still valid since meta is kept) and "after" uses the
+-- typed column and its index. Compare Execution Time and shared buffers.
+--
+-- What to expect on a 24h window:
+--   * before: the created_at index (or a partition Seq Scan) feeds every
+--     row of the window to a Filter/HashAggregate that detoasts meta and
+--     parses it once per referenced key;
+--   * after, queries 4 and finish reason: Index Only Scan on
+--     idx_llm_telemetry_vendor_api_created (which INCLUDEs grounded for
+--     query 4) / _finish_reason_created (run VACUUM first so the
+--     visibility map is current);
+--   * after, query 9: Index Only Scan on idx_llm_telemetry_required_failures,
+--     which holds REQUIRED failures only;
+--   * after, query 8: Index Scan on idx_llm_telemetry_grounded_citations,
+--     heap fetches only for the anchored/unlinked counts still read from meta;
+--   * after, ALS country filter: Index Scan on
+--     idx_llm_telemetry_als_country_created instead of scanning the window.
+-- Partitions outside the window are pruned in both cases.
+
+\timing on
+VACUUM (ANALYZE) llm_telemetry;
+
+-- ============================================================================
+-- Query 4: response API distribution
+-- ============================================================================
+\echo 'query 4 before'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, grounded, meta->>'response_api' AS response_api, COUNT(*)
+FROM llm_telemetry
+WHERE created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor, grounded, meta->>'response_api';
+
+\echo 'query 4 after'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, grounded, response_api, COUNT(*)
+FROM llm_telemetry
+WHERE created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor, grounded, response_api;
+
+-- ============================================================================
+-- Query 6: ALS country split, and a dashboard filter on one country
+-- ============================================================================
+\echo 'query 6 before'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, COUNT(DISTINCT meta->>'als_country')
+FROM llm_telemetry
+WHERE created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor;
+
+\echo 'query 6 after'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, COUNT(DISTINCT als_country)
+FROM llm_telemetry
+WHERE created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor;
+
+\echo 'country filter before'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT COUNT(*), AVG(latency_ms)
+FROM llm_telemetry
+WHERE meta->>'als_country' = 'DE'
+    AND created_at > NOW() - INTERVAL '7 days';
+
+\echo 'country filter after'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT COUNT(*), AVG(latency_ms)
+FROM llm_telemetry
+WHERE als_country = 'DE'
+    AND created_at > NOW() - INTERVAL '7 days';
+
+-- ============================================================================
+-- Query 8: citation extraction effectiveness
+-- ============================================================================
+\echo 'query 8 before'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor,
+    AVG((meta->>'tool_call_count')::int),
+    AVG((meta->>'citations_count')::int),
+    COUNT(*) FILTER (WHERE (meta->>'tool_call_count')::int > 0 AND (meta->>'citations_count')::int = 0)
+FROM llm_telemetry
+WHERE grounded_effective = TRUE
+    AND created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor;
+
+\echo 'query 8 after'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor,
+    AVG(tool_call_count),
+    AVG(citations_count),
+    COUNT(*) FILTER (WHERE tool_call_count > 0 AND citations_count = 0)
+FROM llm_telemetry
+WHERE grounded_effective
+    AND created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor;
+
+-- ============================================================================
+-- Query 9: REQUIRED mode failure analysis
+-- ============================================================================
+\echo 'query 9 before'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, meta->>'why_not_grounded', COUNT(*)
+FROM llm_telemetry
+WHERE grounded = TRUE
+    AND grounded_effective = FALSE
+    AND meta->>'grounding_mode_requested' = 'REQUIRED'
+    AND created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor, meta->>'why_not_grounded';
+
+\echo 'query 9 after'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, why_not_grounded, COUNT(*)
+FROM llm_telemetry
+WHERE grounded
+    AND NOT grounded_effective
+    AND grounding_mode_requested = 'REQUIRED'
+    AND created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor, why_not_grounded;
+
+-- ============================================================================
+-- Finish reasons per vendor
+-- ============================================================================
+\echo 'finish reason before'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, meta->>'finish_reason', COUNT(*)
+FROM llm_telemetry
+WHERE meta->>'finish_reason' IS NOT NULL
+    AND created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor, meta->>'finish_reason';
+
+\echo 'finish reason after'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT vendor, finish_reason, COUNT(*)
+FROM llm_telemetry
+WHERE finish_reason IS NOT NULL
+    AND created_at > NOW() - INTERVAL '24 hours'
+GROUP BY vendor, finish_reason;
@@ -1,5 +1,10 @@
 -- Query to verify telemetry meta persistence
 -- Run after deploying the migration to check data is flowing
+--
+-- Hot meta fields are read from their typed columns (als_country,
+-- grounding_mode_requested, response_api, finish_reason, why_not_grounded,
+-- citations_count, tool_call_count; alembic 20261018_telemetry_meta_columns).
+-- sql/explain_telemetry_meta.sql compares the plans with the meta->> forms.
 
 -- ============================================================================
 -- 1. Check if meta column exists and has data
@@ -23,10 +28,10 @@ SELECT
     success,
     latency_ms,
     total_tokens,
-    meta->>'response_api' AS response_api,
-    meta->>'grounding_mode_requested' AS grounding_mode,
-    meta->>'tool_call_count' AS tool_calls,
-    meta->>'citations_count' AS citations,
+    response_api,
+    grounding_mode_requested AS grounding_mode,
+    tool_call_count AS tool_calls,
+    citations_count AS citations,
     meta->>'als_present' AS als_present,
     meta->>'model_adjusted_for_grounding' AS model_adjusted,
     created_at
@@ -58,11 +63,11 @@ GROUP BY vendor;
 SELECT 
     vendor,
     grounded,
-    meta->>'response_api' AS response_api,
+    response_api,
     COUNT(*) AS call_count
 FROM llm_telemetry
 WHERE created_at > NOW() - INTERVAL '24 hours'
-GROUP BY vendor, grounded, meta->>'response_api'
+GROUP BY vendor, grounded, response_api
 ORDER BY vendor, grounded, response_api;
 
 -- ============================================================================
@@ -71,7 +76,7 @@ ORDER BY vendor, grounded, response_api;
 SELECT 
     meta->'feature_flags'->>'citation_extractor_v2' AS citation_extractor_version,
     COUNT(*) AS call_count,
-    AVG((meta->>'citations_count')::int) AS avg_citations
+    AVG(citations_count) AS avg_citations
 FROM llm_telemetry
 WHERE created_at > NOW() - INTERVAL '24 hours'
     AND grounded = TRUE
@@ -86,7 +91,7 @@ SELECT
     COUNT(*) AS total_calls,
     COUNT(*) FILTER (WHERE (meta->>'als_present')::boolean = TRUE) AS als_present,
     COUNT(DISTINCT meta->>'als_variant_id') AS unique_variants,
-    COUNT(DISTINCT meta->>'als_country') AS unique_countries
+    COUNT(DISTINCT als_country) AS unique_countries
 FROM llm_telemetry
 WHERE created_at > NOW() - INTERVAL '24 hours'
 GROUP BY vendor;
@@ -113,12 +118,11 @@ ORDER BY model, grounded;
 -- ============================================================================
 SELECT 
     vendor,
-    AVG((meta->>'tool_call_count')::int) AS avg_tool_calls,
-    AVG((meta->>'citations_count')::int) AS avg_citations,
+    AVG(tool_call_count) AS avg_tool_calls,
+    AVG(citations_count) AS avg_citations,
     AVG((meta->>'anchored_citations_count')::int) AS avg_anchored,
     AVG((meta->>'unlinked_sources_count')::int) AS avg_unlinked,
-    COUNT(*) FILTER (WHERE (meta->>'tool_call_count')::int > 0 
-                       AND (meta->>'citations_count')::int = 0) AS tools_no_citations
+    COUNT(*) FILTER (WHERE tool_call_count > 0 AND citations_count = 0) AS tools_no_citations
 FROM llm_telemetry
 WHERE grounded_effective = TRUE
     AND created_at > NOW() - INTERVAL '24 hours'
@@ -129,14 +133,14 @@ GROUP BY vendor;
 -- ============================================================================
 SELECT 
     vendor,
-    meta->>'why_not_grounded' AS failure_reason,
+    why_not_grounded AS failure_reason,
     COUNT(*) AS failure_count
 FROM llm_telemetry
-WHERE grounded = TRUE
-    AND grounded_effective = FALSE
-    AND meta->>'grounding_mode_requested' = 'REQUIRED'
+WHERE grounded
+    AND NOT grounded_effective
+    AND grounding_mode_requested = 'REQUIRED'
     AND created_at > NOW() - INTERVAL '24 hours'
-GROUP BY vendor, meta->>'why_not_grounded'
+GROUP BY vendor, why_not_grounded
 ORDER BY failure_count DESC;
 
 -- ============================================================================
@@ -0,0 +1,80 @@
+"""
+Tests for the concurrent ALS harvester
+"""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.services.als.als_harvester import ALSHarvester, StubSearchBackend
+
+
+class _SlowBackend(StubSearchBackend):
+    def __init__(self, delay=0.02):
+        super().__init__()
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def search(self, query, country, include_domains):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return await super().search(query, country, include_domains)
+
+
+@pytest.mark.asyncio
+async def test_refresh_runs_all_searches_concurrently_within_bound():
+    backend = _SlowBackend()
+    harvester = ALSHarvester(backend=backend, max_concurrency=5, dry_run=True)
+
+    harvested = await harvester.refresh_all_templates()
+
+    total = sum(len(q) for q in ALSHarvester.HARVEST_QUERIES.values())
+    assert len(backend.calls) == total
+    assert backend.peak == 5
+    assert set(harvested) == set(ALSHarvester.CIVIC_DOMAINS)
+    assert harvested["DE"]["agencies"] == ["bund.de"]
+
+
+@pytest.mark.asyncio
+async def test_results_cached_per_query_country_and_day(tmp_path):
+    day = date(2026, 10, 18)
+    first = StubSearchBackend()
+    await ALSHarvester(backend=first, cache_dir=str(tmp_path), today=day).harvest_country("DE")
+    assert len(first.calls) == 4
+
+    again = StubSearchBackend()
+    cached = await ALSHarvester(backend=again, cache_dir=str(tmp_path), today=day).harvest_country("DE")
+    assert again.calls == []
+    assert cached["agencies"] == ["bund.de"]
+
+    next_day = StubSearchBackend()
+    await ALSHarvester(backend=next_day, cache_dir=str(tmp_path), today=date(2026, 10, 19)).harvest_country("DE")
+    assert len(next_day.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_extraction_collects_terms_agencies_and_formats_across_results():
+    query = ALSHarvester.HARVEST_QUERIES["DE"][0]
+    backend = StubSearchBackend(fixtures={f"DE|{query}": [
+        {"url": "https://www.bund.de/a", "highlights": ["Ihren Personalausweis beantragen Sie im Bürgeramt 10115 Berlin."]},
+        {"url": "https://www.elster.de/b", "text": "Gebühr 37,00 € für den Antrag. Telefon +49 30 1234 5678"},
+        {"url": "https://shop.example.com/c", "highlights": ["Passport covers 9,99 €"]},
+    ]})
+    harvested = await ALSHarvester(backend=backend, dry_run=True).harvest_country("DE")
+
+    assert harvested["agencies"] == ["bund.de", "elster.de"]
+    assert "Personalausweis beantragen Sie im" in harvested["civic_terms"]
+    assert "Antrag. Telefon +49 30" in harvested["civic_terms"]
+    assert harvested["formatting"]["postal"] == ["10115 Berlin"]
+    assert harvested["formatting"]["currency"] == ["37,00 €", "9,99 €"]
+
+
+@pytest.mark.asyncio
+async def test_without_backend_returns_nothing():
+    harvester = ALSHarvester(cache_dir="")
+    harvester.backend = None
+    assert await harvester.harvest_country("DE") == {}
@@ -0,0 +1,139 @@
+"""
+Tests for the ALS leakage scanner and bulk audit
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import UUID
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Select
+
+from app.services.als import als_service
+from app.services.als.leakage import (
+    ALS_PHRASE,
+    CONTEXT_CUE,
+    COUNTRY_TERM,
+    country_from_locale,
+    scan_leaks,
+    scan_rows,
+    scanner_for,
+)
+from app.services.leak_audit import audit_runs
+
+ALS_BLOCK = """Ambient Context (localization only; do not cite):
+- 18.10.2026 23:58, UTC+02:00
+- Bundesportal — "Kindergeld Antrag"
+- 10115 Berlin • +49 30 xxx xx xx • 12,90 €"""
+
+
+def kinds(findings):
+    return [(f.kind, f.phrase, f.occurrences) for f in findings]
+
+
+def test_als_phrases_match_case_and_punctuation_insensitively():
+    response = "You could file a KINDERGELD-ANTRAG online. Kindergeld antrag forms vary."
+    assert kinds(scan_leaks(response, ALS_BLOCK)) == [(ALS_PHRASE, "kindergeld antrag", 2)]
+
+
+def test_scaffolding_and_numeric_phrases_are_not_leaks():
+    response = "Do not worry, localization only matters a bit. Prices went up 10% in 2026 at 23:58."
+    assert scan_leaks(response, ALS_BLOCK) == []
+
+
+def test_country_terms_whole_token_and_context_cues():
+    response = "Definitely, in Germany (DE) the location context suggests... de facto"
+    assert kinds(scan_leaks(response, None, "DE")) == [
+        (COUNTRY_TERM, "Germany", 1),
+        (COUNTRY_TERM, "DE", 1),
+        (CONTEXT_CUE, "location context", 1),
+    ]
+
+
+def test_scanner_cached_by_block_sha_and_country():
+    assert scanner_for(ALS_BLOCK, "DE") is scanner_for(ALS_BLOCK, "DE")
+    assert scanner_for(ALS_BLOCK, "DE") is not scanner_for(ALS_BLOCK, "CH")
+
+
+def test_detect_leakage_reports_als_phrases_only():
+    leaked = als_service.detect_leakage(ALS_BLOCK, "In Germany, 10115 Berlin has a Bundesportal too.")
+    assert leaked == ["10115 berlin"]
+
+
+def test_detect_leakage_keeps_substring_matching():
+    # Unlike the scanner, the public helper matches raw substrings and keeps numeric n-grams
+    leaked = als_service.detect_leakage(ALS_BLOCK, "Dial +49 30 for 10115 Berliners.")
+    assert sorted(leaked) == ["+49 30", "10115 berlin"]
+
+
+def test_country_from_locale():
+    assert country_from_locale("de-DE") == "DE"
+    assert country_from_locale("en_GB") == "GB"
+    assert country_from_locale("ja-JP") is None
+    assert country_from_locale(None) is None
+
+
+def test_scan_rows_ignores_sha_without_block():
+    rows = [("a", "Kindergeld Antrag", ALS_BLOCK, "sha-x", None), ("b", "Kindergeld Antrag", None, "sha-x", None)]
+    result = dict(scan_rows(rows))
+    assert [f.phrase for f in result["a"]] == ["kindergeld antrag"]
+    assert result["b"] == []
+
+
+@pytest.mark.asyncio
+async def test_audit_runs_records_scans_and_findings_per_batch():
+    created = datetime(2026, 10, 1)
+    batches = [
+        [
+            SimpleNamespace(run_id=UUID(int=1), output_text="Kindergeld Antrag in Germany", als_block_text=ALS_BLOCK,
+                            als_block_sha256="s1", locale_selected="de-DE", created_at=created),
+            SimpleNamespace(run_id=UUID(int=2), output_text="Nothing to see", als_block_text=ALS_BLOCK,
+                            als_block_sha256="s1", locale_selected="de-DE", created_at=created),
+        ],
+        [],
+    ]
+    writes = []
+
+    async def execute(statement, params=None):
+        if isinstance(statement, Select):
+            return MagicMock(all=MagicMock(return_value=batches.pop(0)))
+        writes.append((statement, params))
+        return MagicMock()
+
+    session = MagicMock(execute=AsyncMock(side_effect=execute), commit=AsyncMock())
+    summary = await audit_runs(session, workers=0)
+
+    assert summary == {"scanned": 2, "runs_with_leaks": 1, "findings": 2}
+    findings = writes[0][1]
+    assert {(f["run_id"], f["kind"], f["phrase"]) for f in findings} == {
+        (UUID(int=1), ALS_PHRASE, "kindergeld antrag"),
+        (UUID(int=1), COUNTRY_TERM, "Germany"),
+    }
+    assert "ON CONFLICT (run_id) DO UPDATE" in str(writes[1][0].compile(dialect=postgresql.dialect()))
+    session.commit.assert_awaited_once()
+
+
+def test_leak_audit_route_queues_the_audit(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.routes import runs as runs_routes
+
+    queued = []
+
+    async def record(*args):
+        queued.append(args)
+
+    monkeypatch.setattr(runs_routes, "audit_runs_in_background", record)
+    app = FastAPI()
+    app.include_router(runs_routes.router)
+    client = TestClient(app)
+
+    response = client.post("/api/runs/leak-audit", params={"limit": 500, "rescan": True})
+    assert response.status_code == 202
+    assert response.json() == {"status": "queued", "limit": 500}
+    assert queued == [(None, None, None, 500, True)]
+
+    assert client.post("/api/runs/leak-audit", params={"limit": 100000}).status_code == 422
@@ -0,0 +1,141 @@
+"""
+Tests for prompt tracking analytics rollups
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Integer
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.services.analytics_rollup import brand_analytics, catch_up, record_run
+from tests.util.fake_db import FakeConnection, fake_engine
+
+
+def _rollup_row(country, mode, **counters):
+    values = dict(
+        runs_total=0, runs_completed=0, runs_failed=0, join_rows=0, mentioned_rows=0,
+        mention_count_sum=0, mention_count_n=0, confidence_sum=0.0, confidence_n=0,
+        completed_rows=0, completed_mentioned_rows=0
+    )
+    values.update(counters)
+    return SimpleNamespace(country_code=country, grounding_mode=mode, **values)
+
+
+@pytest.mark.asyncio
+async def test_brand_analytics_from_rollups():
+    rows = [
+        _rollup_row("US", "none", runs_total=4, runs_completed=3, runs_failed=1, join_rows=4, mentioned_rows=2,
+                    mention_count_sum=5, mention_count_n=3, confidence_sum=1.9, confidence_n=3,
+                    completed_rows=3, completed_mentioned_rows=2),
+        _rollup_row("DE", "web", runs_total=2, runs_completed=2, join_rows=2, mentioned_rows=0,
+                    mention_count_sum=0, mention_count_n=2, confidence_sum=0.6, confidence_n=2,
+                    completed_rows=2, completed_mentioned_rows=0),
+    ]
+    conn = FakeConnection(lambda sql, params: rows)
+    result = await brand_analytics(conn, "AVEA", days=30)
+
+    sql, params = conn.statements[0]
+    assert "FROM prompt_analytics_daily" in sql and "prompt_runs" not in sql
+    assert params == {"brand": "AVEA", "days": 30}
+
+    stats = result["statistics"]
+    assert (stats["total_runs"], stats["successful_runs"], stats["failed_runs"]) == (6, 5, 1)
+    assert stats["mention_rate"] == pytest.approx(100 * 2 / 6)
+    assert stats["avg_mentions_per_response"] == pytest.approx(1.0)
+    assert stats["avg_confidence"] == pytest.approx(50.0)
+    assert result["grounding_comparison"]["none"] == {"run_count": 3, "mention_rate": pytest.approx(200 / 3)}
+    assert result["country_comparison"]["DE"] == {"run_count": 2, "mention_rate": 0}
+
+
+@pytest.mark.asyncio
+async def test_brand_analytics_window_is_a_typed_integer():
+    conn = FakeConnection(lambda sql, params: [])
+    await brand_analytics(conn, "AVEA", days="7")
+
+    statement = conn.executed[0]
+    # asyncpg sends the parameter as an integer, so this is date - integer
+    compiled = statement.compile(dialect=asyncpg.dialect())
+    assert "day > CURRENT_DATE - CAST($2::INTEGER AS integer)" in str(compiled)
+    assert isinstance(compiled.binds["days"].type, Integer)
+    assert conn.statements[0][1]["days"] == 7
+
+    await brand_analytics(conn, "AVEA")
+    assert "days" not in str(conn.executed[1]) and conn.statements[1][1] == {"brand": "AVEA"}
+
+
+@pytest.mark.asyncio
+async def test_record_run_is_ledger_guarded():
+    conn = FakeConnection(lambda sql, params: [])
+    await record_run(conn, 42)
+    sql, params = conn.statements[0]
+    assert params == {"run_id": 42}
+    assert "INSERT INTO prompt_rollup_ledger" in sql and "ON CONFLICT DO NOTHING" in sql
+    assert "runs_total = prompt_analytics_daily.runs_total + EXCLUDED.runs_total" in sql
+
+
+@pytest.mark.asyncio
+async def test_catch_up_stops_below_first_open_run():
+    state = {"watermark": 10}
+    ranges = []
+
+    def responder(sql, params):
+        if "FROM prompt_rollup_state" in sql:
+            return [SimpleNamespace(watermark=state["watermark"])]
+        if "MAX(id)" in sql:
+            return [SimpleNamespace(max_id=100, first_open=26)]
+        if "id > :after AND id <= :upto" in sql:
+            ranges.append((params["after"], params["upto"]))
+        if "INSERT INTO prompt_rollup_state" in sql:
+            state["watermark"] = params["upto"]
+        return []
+
+    conn = FakeConnection(responder)
+
+    scanned = await catch_up(fake_engine(conn), batch_size=10)
+    assert ranges == [(10, 20), (20, 25)]
+    assert state["watermark"] == 25
+    assert scanned == 15
+
+
+@pytest.mark.asyncio
+async def test_rescore_refolds_counted_runs(monkeypatch):
+    from app.api import prompt_tracking
+
+    # run 1 is counted in the rollups, run 2 is not yet
+    results = {10: {"run_id": 1, "mentioned": False, "text": "AVEA is great"},
+               11: {"run_id": 2, "mentioned": False, "text": "AVEA again"}}
+    ledger = {1}
+    rollup = {"mentioned_rows": 0, "join_rows": 1}
+
+    def fold(params, sign):
+        for res in results.values():
+            if res["run_id"] in params["run_ids"] and res["run_id"] in ledger:
+                rollup["mentioned_rows"] += sign * res["mentioned"]
+
+    def responder(sql, params):
+        if "FROM prompt_results res" in sql:
+            return [SimpleNamespace(id=i, run_id=r["run_id"], model_response=r["text"])
+                    for i, r in results.items() if i > params["after"]]
+        if "UPDATE prompt_results" in sql:
+            for update in params:
+                results[update["id"]]["mentioned"] = update["mentioned"]
+        if "prompt_rollup_ledger WHERE run_id IN" in sql:
+            fold(params, -1 if "-runs_total" in sql else 1)
+        return []
+
+    conn = FakeConnection(responder)
+
+    monkeypatch.setattr(prompt_tracking, "engine", fake_engine(conn))
+    response = await prompt_tracking.rescore_results(prompt_tracking.RescoreRequest(brand_name="AVEA"))
+
+    assert response["rescored"] == 2
+    assert rollup == {"mentioned_rows": 1, "join_rows": 1}
+    # Take out, rewrite, fold back in, all in the batch transaction
+    kinds = [
+        "unfold" if "-runs_total" in sql else "refold" if "prompt_rollup_ledger" in sql
+        else "update" if "UPDATE" in sql else "select"
+        for sql, _ in conn.statements
+    ]
+    assert kinds == ["select", "unfold", "update", "refold", "select"]
+    assert conn.statements[1][1] == {"run_ids": [1, 2]}
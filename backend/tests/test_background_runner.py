@@ -0,0 +1,100 @@
+"""
+Tests for the bounded background task pool
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.background_runner import BackgroundTaskRunner, TaskRejected
+
+
+class _MemoryStore:
+    def __init__(self):
+        self.records = {}
+        self.swept = 0
+
+    async def save(self, task_id, record, ttl_seconds):
+        self.records[task_id] = dict(record)
+
+    async def load(self, task_id):
+        return self.records.get(task_id)
+
+    async def delete_expired(self):
+        self.swept += 1
+        return 0
+
+
+@pytest.mark.asyncio
+async def test_pool_runs_at_most_workers_tasks_at_once():
+    runner = BackgroundTaskRunner(workers=3, queue_size=20, store=_MemoryStore())
+    state = {"in_flight": 0, "peak": 0}
+
+    async def job(i):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return i
+
+    ids = [await runner.submit(job, i) for i in range(10)]
+    await runner.shutdown()
+
+    assert state["peak"] == 3
+    statuses = [await runner.get_task_status(task_id) for task_id in ids]
+    assert [s["status"] for s in statuses] == ["completed"] * 10
+    assert [s["result"] for s in statuses] == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions():
+    runner = BackgroundTaskRunner(workers=1, queue_size=2, store=_MemoryStore())
+    gate = asyncio.Event()
+
+    async def blocked():
+        await gate.wait()
+
+    await runner.submit(blocked)
+    await asyncio.sleep(0)  # the worker takes the first task off the queue
+    await runner.submit(blocked)
+    await runner.submit(blocked)
+    with pytest.raises(TaskRejected):
+        await runner.submit(blocked)
+
+    gate.set()
+    await runner.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_failed_task_records_error():
+    runner = BackgroundTaskRunner(workers=1, queue_size=5, store=_MemoryStore())
+
+    async def boom():
+        raise RuntimeError("provider down")
+
+    task_id = await runner.submit(boom)
+    await runner.shutdown()
+
+    status = await runner.get_task_status(task_id)
+    assert status["status"] == "failed"
+    assert status["error"] == "provider down"
+
+
+@pytest.mark.asyncio
+async def test_finished_statuses_expire_from_memory_but_stay_in_store():
+    store = _MemoryStore()
+    runner = BackgroundTaskRunner(workers=1, queue_size=5, status_ttl_seconds=1, store=store)
+
+    async def job():
+        return "ok"
+
+    task_id = await runner.submit(job)
+    await runner.shutdown()
+    assert task_id in runner.get_all_tasks()
+
+    runner._expiry[task_id] = 0  # pretend the TTL has passed
+    assert runner.get_all_tasks() == {}
+
+    status = await runner.get_task_status(task_id)
+    assert status["status"] == "completed"
+    assert (await runner.get_task_status("missing"))["status"] == "not_found"
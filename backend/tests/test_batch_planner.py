@@ -0,0 +1,172 @@
+"""
+Tests for the telemetry-based batch planner
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import UUID
+
+import pytest
+
+from app.schemas.templates import BatchRunRequest
+from app.services.batch_planner import BatchPlanner, CellStats, simulate_schedule
+from app.services.batch_runner import BatchRunner
+
+TEMPLATE_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def _request(**overrides) -> BatchRunRequest:
+    params = {
+        "models": ["gpt-5", "gemini-2.5-pro"],
+        "locales": ["de-DE", "en-US"],
+        "grounding_modes": ["UNGROUNDED", "REQUIRED"],
+        "replicate_count": 5,
+        "max_parallel": 10,
+    }
+    params.update(overrides)
+    return BatchRunRequest(**params)
+
+
+class TestSimulateSchedule:
+    """Discrete-event schedule simulation"""
+
+    def test_concurrency_bounds_makespan(self):
+        est = simulate_schedule({"vertex": [(100, 10.0)] * 8}, {"vertex": 4})
+        assert est.makespan_seconds == 20.0
+        assert est.tpm_deferrals == 0
+
+    def test_vendors_run_in_parallel(self):
+        est = simulate_schedule(
+            {"openai": [(100, 10.0)] * 4, "vertex": [(100, 30.0)] * 2},
+            {"openai": 2, "vertex": 2},
+        )
+        assert est.vendor_makespan_seconds == {"openai": 20.0, "vertex": 30.0}
+        assert est.makespan_seconds == 30.0
+
+    def test_tpm_budget_spreads_launches(self):
+        est = simulate_schedule(
+            {"openai": [(4000, 5.0)] * 6},
+            {"openai": 6},
+            {"openai": 10000},
+        )
+        # Two cells fit per minute window -> launches at 0, 60 and 120s
+        assert est.makespan_seconds == 125.0
+        assert est.peak_tpm == 8000
+        assert est.tpm_deferrals > 0
+
+    def test_oversized_cell_does_not_stall(self):
+        est = simulate_schedule({"openai": [(50000, 1.0)] * 2}, {"openai": 2}, {"openai": 10000})
+        assert est.makespan_seconds == 61.0
+
+    def test_launch_spacing_serializes_launches(self):
+        est = simulate_schedule(
+            {"openai": [(100, 5.0)] * 4, "vertex": [(100, 5.0)] * 4},
+            {"openai": 4, "vertex": 4},
+            launch_spacing={"openai": 16.0},
+        )
+        # Free workers do not help: launches at 0, 16, 32 and 48s
+        assert est.vendor_makespan_seconds == {"openai": 53.0, "vertex": 5.0}
+
+
+class TestBatchPlanner:
+    """Plan assembly from resolved stats"""
+
+    @staticmethod
+    def _stats(key, tokens_in, tokens_out, latency_ms, source="template"):
+        vendor, model, grounded = key
+        return CellStats(
+            vendor=vendor, model=model, grounded=grounded, source=source, samples=50,
+            input_tokens_p50=tokens_in, input_tokens_p90=tokens_in * 2,
+            output_tokens_p50=tokens_out, output_tokens_p90=tokens_out * 2,
+            latency_ms_p50=latency_ms, latency_ms_p90=latency_ms * 2,
+        )
+
+    def test_cell_keys_are_closed_form(self):
+        planner = BatchPlanner(BatchRunner())
+        counts = planner._cell_keys(_request())
+        assert counts == {
+            ("openai", "gpt-5", False): 10,
+            ("openai", "gpt-5", True): 10,
+            ("gemini_direct", "gemini-2.5-pro", False): 10,
+            ("gemini_direct", "gemini-2.5-pro", True): 10,
+        }
+
+    @pytest.mark.asyncio
+    async def test_plan_uses_percentiles_and_flags_spreading(self):
+        planner = BatchPlanner(BatchRunner())
+        request = _request()
+        stats = {
+            key: self._stats(key, 500, 1500, 20000)
+            for key in planner._cell_keys(request)
+        }
+
+        with patch.object(planner, "load_cell_stats", AsyncMock(return_value=stats)), \
+             patch.object(planner, "_tpm_budget", return_value=25000):
+            plan = await planner.plan(MagicMock(), TEMPLATE_ID, request)
+
+        assert plan.template_id == UUID(TEMPLATE_ID)
+        assert plan.total_runs == 40
+        assert plan.openai_runs == 20
+        assert plan.openai_est_tokens == 20 * 2000
+        assert plan.openai_max_tokens_per_run == 4000
+        assert plan.est_input_tokens == 40 * 500
+        assert plan.spread_over_time is True
+        assert plan.feasible is True
+        assert plan.peak_tpm <= 25000 + 20 * 2000
+        assert plan.est_makespan_seconds_p90 >= plan.est_makespan_seconds
+        assert plan.est_cost_cents > 0
+        assert plan.est_cost_cents_p90 > plan.est_cost_cents
+
+    @pytest.mark.asyncio
+    async def test_paced_plan_includes_launch_stagger(self):
+        runner = BatchRunner()
+        planner = BatchPlanner(runner)
+        request = _request(models=["gpt-5"])
+        stats = {key: self._stats(key, 500, 1500, 20000) for key in planner._cell_keys(request)}
+
+        async def plan_with_budget(budget):
+            with patch.object(planner, "load_cell_stats", AsyncMock(return_value=stats)), \
+                 patch.object(planner, "_tpm_budget", return_value=budget):
+                return await planner.plan(MagicMock(), TEMPLATE_ID, request)
+
+        unpaced = await plan_with_budget(10 ** 9)
+        paced = await plan_with_budget(25000)
+
+        assert not unpaced.spread_over_time and paced.spread_over_time
+        # 20 launches, one per stagger slot at best; bulkheads alone would allow far fewer rounds
+        spacing = runner.openai_launch_spacing()
+        assert spacing > runner._stagger_seconds
+        assert paced.est_makespan_seconds >= 19 * spacing + 20.0
+        assert unpaced.est_makespan_seconds < 19 * spacing
+        assert paced.est_makespan_seconds_p90 >= 19 * runner.openai_launch_spacing(0.9) + 40.0
+
+    @pytest.mark.asyncio
+    async def test_plan_infeasible_when_single_run_exceeds_budget(self):
+        planner = BatchPlanner(BatchRunner())
+        request = _request(models=["gpt-5"])
+        stats = {key: self._stats(key, 5000, 5000, 1000) for key in planner._cell_keys(request)}
+
+        with patch.object(planner, "load_cell_stats", AsyncMock(return_value=stats)), \
+             patch.object(planner, "_tpm_budget", return_value=15000):
+            plan = await planner.plan(MagicMock(), TEMPLATE_ID, request)
+
+        assert plan.feasible is False
+
+    @pytest.mark.asyncio
+    async def test_stats_fall_back_from_template_to_global_to_default(self):
+        planner = BatchPlanner(BatchRunner())
+        keys = list(planner._cell_keys(_request()))
+        template_row = (5, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+        async def query(session, missing, scope):
+            if scope is not None:
+                return {keys[0]: template_row}
+            return {keys[1]: template_row} if keys[1] in missing else {}
+
+        with patch.object(planner, "_query_stats", side_effect=query):
+            stats = await planner.load_cell_stats(MagicMock(), TEMPLATE_ID, keys)
+
+        assert stats[keys[0]].source == "template"
+        assert stats[keys[0]].latency_ms_p90 == 6.0
+        assert stats[keys[1]].source == "global"
+        assert stats[keys[2]].source == "default"
+        assert stats[keys[3]].samples == 0
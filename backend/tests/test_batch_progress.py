@@ -0,0 +1,352 @@
+"""
+Tests for batch progress events and completion webhooks
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import socket
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services.batch_progress import (
+    BatchProgress,
+    BatchProgressListener,
+    WebhookURLError,
+    check_webhook_url,
+    deliver_webhook,
+    format_sse,
+    stream_batch_events,
+)
+
+BATCH_ID = "00000000-0000-0000-0000-00000000b001"
+
+
+def _session(execute):
+    """Session mock whose savepoints record how they ended"""
+    session = MagicMock(execute=execute)
+    session.savepoints = []
+
+    @asynccontextmanager
+    async def begin_nested():
+        try:
+            yield
+        except Exception:
+            session.savepoints.append("rolled back")
+            raise
+        session.savepoints.append("released")
+
+    session.begin_nested = begin_nested
+    return session
+
+
+class TestBatchProgress:
+    """Counters, ETA and NOTIFY publishing"""
+
+    def test_counts_and_event(self):
+        progress = BatchProgress(BATCH_ID, total=4)
+        progress.started()
+        progress.started()
+        progress.finished(True)
+        progress.finished(False)
+        event = progress.event()
+        assert event["completed"] == 1
+        assert event["failed"] == 1
+        assert event["in_flight"] == 0
+        assert event["eta_seconds"] is not None
+
+    def test_eta_unknown_until_first_run_and_zero_when_done(self):
+        progress = BatchProgress(BATCH_ID, total=2, completed=1)
+        assert progress.eta_seconds() is None
+        progress.finished(True)
+        assert progress.eta_seconds() == 0.0
+
+    @pytest.mark.asyncio
+    async def test_publish_notifies_and_throttles(self):
+        session = _session(AsyncMock())
+        progress = BatchProgress(BATCH_ID, total=10)
+        progress._min_interval = 60
+
+        await progress.publish(session)
+        await progress.publish(session)
+        assert session.execute.await_count == 1
+        statement, params = session.execute.await_args.args
+        assert "pg_notify" in str(statement)
+        assert params["channel"] == "batch_progress"
+        assert json.loads(params["payload"])["batch_id"] == BATCH_ID
+
+        await progress.publish(session, force=True)
+        assert session.execute.await_count == 2
+        assert session.savepoints == ["released", "released"]
+
+    @pytest.mark.asyncio
+    async def test_failed_notify_only_rolls_back_its_savepoint(self):
+        session = _session(AsyncMock(side_effect=RuntimeError("no db")))
+        await BatchProgress(BATCH_ID, total=1).publish(session, force=True)
+        assert session.savepoints == ["rolled back"]
+        session.rollback.assert_not_called()
+
+
+class TestProgressStream:
+    """Listener fan-out and SSE framing"""
+
+    @pytest.mark.asyncio
+    async def test_dispatch_reaches_only_subscribers_of_the_batch(self):
+        listener = BatchProgressListener()
+        with patch.object(listener, "_ensure_listening", AsyncMock()):
+            queue = await listener.subscribe(BATCH_ID)
+            other = await listener.subscribe("other")
+        listener.dispatch({"batch_id": BATCH_ID, "completed": 3})
+        assert queue.get_nowait()["completed"] == 3
+        assert other.empty()
+
+        listener.unsubscribe(BATCH_ID, queue)
+        listener.dispatch({"batch_id": BATCH_ID})
+        assert queue.empty()
+
+    def test_dispatch_keeps_latest_for_slow_consumers(self):
+        listener = BatchProgressListener()
+        queue = asyncio.Queue(maxsize=2)
+        listener._subscribers[BATCH_ID] = {queue}
+        for i in range(5):
+            listener.dispatch({"batch_id": BATCH_ID, "completed": i})
+        assert [queue.get_nowait()["completed"] for _ in range(2)] == [3, 4]
+
+    @pytest.mark.asyncio
+    async def test_stream_ends_on_terminal_event_with_heartbeat(self):
+        listener = BatchProgressListener()
+        snapshot = {"batch_id": BATCH_ID, "status": "running", "completed": 0}
+
+        with patch("app.services.batch_progress.listener", listener), \
+             patch.object(listener, "_ensure_listening", AsyncMock()):
+            stream = stream_batch_events(BATCH_ID, AsyncMock(return_value=snapshot), heartbeat_seconds=0.01)
+            frames = [await stream.__anext__(), await stream.__anext__()]
+            listener.dispatch({"batch_id": BATCH_ID, "status": "completed", "completed": 5})
+            frames += [frame async for frame in stream]
+
+        assert frames[0] == format_sse(snapshot)
+        assert frames[1] == ": keep-alive\n\n"
+        assert json.loads(frames[-1].split("data: ", 1)[1])["status"] == "completed"
+        assert BATCH_ID not in listener._subscribers
+
+    @pytest.mark.asyncio
+    async def test_stream_of_finished_batch_ends_after_snapshot(self):
+        listener = BatchProgressListener()
+        snapshot = {"batch_id": BATCH_ID, "status": "partial"}
+        with patch("app.services.batch_progress.listener", listener), \
+             patch.object(listener, "_ensure_listening", AsyncMock()):
+            frames = [frame async for frame in stream_batch_events(BATCH_ID, AsyncMock(return_value=snapshot))]
+        assert frames == [format_sse(snapshot)]
+        assert BATCH_ID not in listener._subscribers
+
+    @pytest.mark.asyncio
+    async def test_event_sent_while_snapshot_is_read_is_not_lost(self):
+        listener = BatchProgressListener()
+
+        async def load_snapshot():
+            # The batch finishes after the snapshot query saw it running
+            listener.dispatch({"batch_id": BATCH_ID, "status": "completed", "completed": 5})
+            return {"batch_id": BATCH_ID, "status": "running", "completed": 4}
+
+        with patch("app.services.batch_progress.listener", listener), \
+             patch.object(listener, "_ensure_listening", AsyncMock()):
+            stream = stream_batch_events(BATCH_ID, load_snapshot, heartbeat_seconds=0.01)
+            frames = [frame async for frame in stream]
+
+        assert len(frames) == 2
+        assert json.loads(frames[-1].split("data: ", 1)[1])["status"] == "completed"
+
+
+def _resolves_to(*addresses):
+    return patch("app.services.batch_progress._resolve", AsyncMock(return_value=list(addresses)))
+
+
+class _Driver:
+    """asyncpg connection stand-in for the LISTEN connection"""
+
+    def __init__(self):
+        self.listeners = []
+        self.on_terminate = []
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners.append(channel)
+
+    def add_termination_listener(self, callback):
+        self.on_terminate.append(callback)
+
+    def is_closed(self):
+        return self.closed
+
+    async def execute(self, query):
+        if self.closed:
+            raise ConnectionError("connection is closed")
+
+
+class _ListenEngine:
+    def __init__(self):
+        self.drivers = []
+
+    async def connect(self):
+        driver = _Driver()
+        self.drivers.append(driver)
+        raw = MagicMock(driver_connection=driver)
+        return MagicMock(get_raw_connection=AsyncMock(return_value=raw), invalidate=AsyncMock(), close=AsyncMock())
+
+
+class TestListenConnection:
+    """A dropped LISTEN connection is replaced"""
+
+    @pytest.mark.asyncio
+    async def test_termination_reconnects_and_listens_again(self):
+        engine = _ListenEngine()
+        listener = BatchProgressListener()
+        with patch("app.db.database.engine", engine):
+            await listener.subscribe(BATCH_ID)
+            assert listener.generation == 1
+
+            first = engine.drivers[0]
+            first.closed = True
+            for callback in first.on_terminate:
+                callback(first)
+            await asyncio.gather(*listener._tasks)
+
+        assert listener.generation == 2
+        assert engine.drivers[1].listeners == ["batch_progress"]
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_probe_replaces_a_dead_connection(self):
+        engine = _ListenEngine()
+        listener = BatchProgressListener()
+        with patch("app.db.database.engine", engine):
+            await listener.subscribe(BATCH_ID)
+            # Half-open: no termination callback, but queries fail
+            engine.drivers[0].closed = True
+            engine.drivers[0].is_closed = lambda: False
+            await listener._ensure_listening(probe_after=0)
+        assert listener.generation == 2 and len(engine.drivers) == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_resends_snapshot_after_reconnect(self):
+        listener = BatchProgressListener()
+        snapshots = [
+            {"batch_id": BATCH_ID, "status": "running", "completed": 1},
+            {"batch_id": BATCH_ID, "status": "completed", "completed": 5},
+        ]
+
+        async def reconnect(probe_after=None):
+            if probe_after is not None:
+                listener.generation += 1
+
+        with patch("app.services.batch_progress.listener", listener), \
+             patch.object(listener, "_ensure_listening", AsyncMock(side_effect=reconnect)):
+            stream = stream_batch_events(BATCH_ID, AsyncMock(side_effect=snapshots), heartbeat_seconds=0.01)
+            frames = [frame async for frame in stream]
+
+        # The terminal NOTIFY was missed while disconnected; the re-read snapshot ends the stream
+        assert frames == [format_sse(snapshots[0]), format_sse(snapshots[1])]
+
+
+class TestWebhookDelivery:
+    """Signed POST with retry and backoff"""
+
+    @pytest.fixture(autouse=True)
+    def public_host(self):
+        with _resolves_to("93.184.215.14"):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors_then_succeeds(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(503 if len(calls) < 3 else 200)
+
+        payload = {"batch_id": BATCH_ID, "status": "completed"}
+        with patch("app.services.batch_progress.asyncio.sleep", AsyncMock()) as sleep:
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                assert await deliver_webhook("https://hooks.example/batch", payload, client=client) is True
+
+        assert len(calls) == 3
+        assert [c.args[0] for c in sleep.await_args_list] == [
+            get_settings().batch_webhook_backoff_base_seconds,
+            get_settings().batch_webhook_backoff_base_seconds * 2,
+        ]
+        expected = hmac.new(get_settings().secret_key.encode(), calls[0].content, hashlib.sha256).hexdigest()
+        assert calls[0].headers["X-Contestra-Signature"] == f"sha256={expected}"
+        assert json.loads(calls[0].content) == payload
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(410)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            assert await deliver_webhook("https://hooks.example/batch", {}, client=client) is False
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_host_that_turns_internal_is_not_posted_to(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with _resolves_to("169.254.169.254"):
+                assert await deliver_webhook("https://hooks.example/batch", {}, client=client) is False
+        assert calls == []
+
+
+class TestWebhookTargets:
+    """SSRF guard on client-supplied webhook URLs"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("address", [
+        "127.0.0.1", "10.1.2.3", "192.168.0.10", "169.254.169.254", "100.64.0.1", "::1", "fe80::1",
+        "::ffff:127.0.0.1",
+    ])
+    async def test_internal_addresses_are_refused(self, address):
+        with _resolves_to("93.184.215.14", address), pytest.raises(WebhookURLError):
+            await check_webhook_url("https://hooks.example/batch")
+
+    @pytest.mark.asyncio
+    async def test_public_https_host_is_allowed(self):
+        with _resolves_to("93.184.215.14", "2606:2800:21f:cb07:6820:80da:af6b:8b2c"):
+            await check_webhook_url("https://hooks.example/batch")
+
+    @pytest.mark.asyncio
+    async def test_scheme_allowlist_and_resolution(self, monkeypatch):
+        with _resolves_to("93.184.215.14"):
+            with pytest.raises(WebhookURLError):
+                await check_webhook_url("http://hooks.example/batch")
+            monkeypatch.setattr(get_settings(), "batch_webhook_allowed_hosts", ["hooks.example"])
+            await check_webhook_url("https://HOOKS.example/batch")
+            with pytest.raises(WebhookURLError):
+                await check_webhook_url("https://other.example/batch")
+
+        with patch("app.services.batch_progress._resolve", AsyncMock(side_effect=socket.gaierror)):
+            with pytest.raises(WebhookURLError):
+                await check_webhook_url("https://hooks.example/batch")
+
+    def test_request_schema_requires_https(self):
+        from pydantic import ValidationError
+
+        from app.schemas.templates import BatchRunRequest
+
+        with pytest.raises(ValidationError):
+            BatchRunRequest(models=["gpt-5"], locales=["US"], webhook_url="http://hooks.example/batch")
+        with pytest.raises(ValidationError):
+            BatchRunRequest(models=["gpt-5"], locales=["US"], webhook_url="not a url")
+        request = BatchRunRequest(models=["gpt-5"], locales=["US"], webhook_url="https://hooks.example/batch")
+        assert str(request.webhook_url) == "https://hooks.example/batch"
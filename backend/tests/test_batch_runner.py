@@ -0,0 +1,395 @@
+"""
+Tests for BatchRunner expansion and execution pool
+"""
+
+import asyncio
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import UUID
+
+import pytest
+
+from app.core.canonicalization import compute_sha256
+from app.schemas.templates import BatchRunRequest
+from app.services.batch_runner import BatchResumeError, BatchRunner
+
+BATCH_ID = UUID("00000000-0000-0000-0000-0000000000b1")
+
+
+def _request(**overrides) -> BatchRunRequest:
+    params = {
+        "models": ["gpt-5", "gemini-2.5-pro"],
+        "locales": ["de-DE", "en-US", "fr-FR"],
+        "grounding_modes": ["UNGROUNDED", "REQUIRED"],
+        "replicate_count": 3,
+    }
+    params.update(overrides)
+    return BatchRunRequest(**params)
+
+
+def _fake_session() -> MagicMock:
+    session = MagicMock()
+    template_result = MagicMock()
+    template_result.scalar_one_or_none.return_value = SimpleNamespace(template_id="t-1")
+    session.execute = AsyncMock(return_value=template_result)
+    session.commit = AsyncMock()
+    session.refresh = AsyncMock()
+    return session
+
+
+class TestBatchExpansion:
+    """Lazy expansion must match the historical materialised order"""
+
+    def test_iterator_matches_materialised_order(self):
+        runner = BatchRunner()
+        request = _request()
+
+        lazy = [
+            (c["run_index"], c["model"], c["locale"], c["grounding_mode"], c["replicate"])
+            for c in runner._iter_run_configurations(request)
+        ]
+        eager = [
+            (c["run_index"], c["model"], c["locale"], c["grounding_mode"], c["replicate"])
+            for c in runner._generate_run_configurations(request)
+        ]
+
+        assert lazy == eager
+        assert [idx for idx, *_ in lazy] == list(range(len(lazy)))
+
+    def test_iterator_is_lazy(self):
+        runner = BatchRunner()
+        with patch.object(runner, "_build_als_context", wraps=runner._build_als_context) as build:
+            configs = runner._iter_run_configurations(_request())
+            assert build.call_count == 0
+            next(configs)
+            assert build.call_count == 1
+
+    def test_vendor_streams_keep_run_indices(self):
+        runner = BatchRunner()
+        request = _request(models=["gpt-5", "gemini-2.5-pro", "gpt-4o"])
+
+        streams = runner._iter_vendor_streams(request)
+
+        assert list(streams) == ["openai", "gemini_direct"]
+        indices = {
+            vendor: [c["run_index"] for c in stream]
+            for vendor, (count, stream) in streams.items()
+        }
+        per_model = 18
+        assert indices["openai"] == list(range(per_model)) + list(range(2 * per_model, 3 * per_model))
+        assert indices["gemini_direct"] == list(range(per_model, 2 * per_model))
+        assert streams["openai"][0] == 2 * per_model
+
+    def test_closed_form_counts(self):
+        runner = BatchRunner()
+        request = _request(models=["gpt-5", "gpt-4o", "gemini-2.5-pro"])
+
+        configs = runner._generate_run_configurations(request)
+
+        assert runner.count_run_configurations(request) == len(configs)
+        assert runner.count_openai_runs(request) == sum(
+            1 for c in configs if runner._is_openai_model(c["model"])
+        )
+
+    def test_expansion_memory_is_flat(self):
+        runner = BatchRunner()
+        small = _request(replicate_count=1)
+        large = _request(models=[f"gpt-{i}" for i in range(100)], replicate_count=10)
+
+        def peak_bytes(request: BatchRunRequest) -> int:
+            tracemalloc.start()
+            try:
+                for _ in runner._iter_run_configurations(request):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        # 500x more configurations must not grow the peak proportionally
+        assert peak_bytes(large) < peak_bytes(small) * 4
+
+
+class TestBatchExecutionPool:
+    """Bounded worker pool behaviour of execute_batch"""
+
+    @pytest.mark.asyncio
+    async def test_bulkheads_bound_concurrency_per_vendor(self):
+        runner = BatchRunner()
+        request = _request(max_parallel=4)
+        in_flight = {}
+        peak = {}
+        overlap = False
+
+        async def fake_run(session, template_id, request, org_id, user_id=None):
+            nonlocal overlap
+            vendor = runner._vendor_for_model(request.model)
+            in_flight[vendor] = in_flight.get(vendor, 0) + 1
+            peak[vendor] = max(peak.get(vendor, 0), in_flight[vendor])
+            overlap = overlap or len([v for v in in_flight.values() if v]) > 1
+            await asyncio.sleep(0)
+            in_flight[vendor] -= 1
+            return SimpleNamespace(run_id=f"run-{request.model}-{id(request)}")
+
+        with patch("app.services.batch_runner.execute_template_run", side_effect=fake_run), \
+             patch.object(runner, "_bulkhead_size", side_effect=lambda v, mp: {"openai": 2}.get(v, mp)):
+            response = await runner.execute_batch(
+                session=_fake_session(),
+                template_id="00000000-0000-0000-0000-000000000001",
+                request=request,
+                org_id="org",
+            )
+
+        assert peak == {"openai": 2, "gemini_direct": 4}
+        # Both vendors run simultaneously instead of model-major
+        assert overlap
+        assert response.total_runs == runner.count_run_configurations(request)
+        assert response.successful_runs == response.total_runs
+        assert response.status == "completed"
+        # Run IDs are still reported in expansion (model-major) order
+        models = [rid.split("-", 1)[1].rsplit("-", 1)[0] for rid in response.run_ids]
+        half = len(models) // 2
+        assert set(models[:half]) == {"gpt-5"}
+        assert set(models[half:]) == {"gemini-2.5-pro"}
+
+    @pytest.mark.asyncio
+    async def test_failed_runs_are_counted(self):
+        runner = BatchRunner()
+        request = _request(models=["gpt-5"], locales=["de-DE"], grounding_modes=["UNGROUNDED"])
+        calls = 0
+
+        async def flaky_run(session, template_id, request, org_id, user_id=None):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                raise RuntimeError("boom")
+            return SimpleNamespace(run_id=f"run-{calls}")
+
+        with patch("app.services.batch_runner.execute_template_run", side_effect=flaky_run):
+            response = await runner.execute_batch(
+                session=_fake_session(),
+                template_id="00000000-0000-0000-0000-000000000001",
+                request=request,
+                org_id="org",
+            )
+
+        assert response.status == "partial"
+        assert response.successful_runs == 2
+        assert response.failed_runs == 1
+
+
+class TestBatchResume:
+    """Resume mode skips cells that already succeeded"""
+
+    @staticmethod
+    def _existing_batch(runner: BatchRunner, request: BatchRunRequest, template_id: str):
+        return SimpleNamespace(
+            batch_id=BATCH_ID,
+            template_id=template_id,
+            batch_sha256=runner._compute_batch_hash(template_id, request),
+            created_at=datetime.utcnow(),
+            status="failed",
+            completed_at=datetime.utcnow(),
+        )
+
+    @pytest.mark.asyncio
+    async def test_resume_executes_only_missing_cells(self):
+        runner = BatchRunner()
+        template_id = "00000000-0000-0000-0000-000000000001"
+        request = _request(resume=True)
+        batch = self._existing_batch(runner, request, template_id)
+        done = {0: "old-0", 5: "old-5", 20: "old-20"}
+        executed = []
+
+        seen_status = []
+
+        async def fake_run(session, template_id, request, org_id, user_id=None):
+            executed.append(request.model)
+            seen_status.append((batch.status, batch.completed_at))
+            return SimpleNamespace(run_id=f"new-{len(executed)}")
+
+        session = _fake_session()
+        with patch("app.services.batch_runner.execute_template_run", side_effect=fake_run), \
+             patch.object(runner, "_resolve_resume_batch", AsyncMock(return_value=batch)), \
+             patch.object(runner, "_completed_cells", AsyncMock(return_value=done)):
+            response = await runner.execute_batch(
+                session=session,
+                template_id=template_id,
+                request=request,
+                org_id="org",
+            )
+
+        total = runner.count_run_configurations(request)
+        assert len(executed) == total - len(done)
+        session.add.assert_not_called()
+        assert response.batch_id == BATCH_ID
+        assert response.successful_runs == total
+        assert response.status == "completed"
+        assert batch.status == "completed"
+        assert response.run_ids[0] == "old-0"
+        assert response.run_ids[5] == "old-5"
+        # Reopened (and committed) before the remaining cells ran
+        assert set(seen_status) == {("running", None)}
+        assert session.commit.await_count >= 2
+
+    @pytest.mark.asyncio
+    async def test_failed_status_is_not_counted_as_success(self):
+        runner = BatchRunner()
+        request = _request(models=["gpt-5"], locales=["de-DE"], grounding_modes=["UNGROUNDED"], replicate_count=2)
+        statuses = iter(["succeeded", "failed"])
+
+        async def fake_run(session, template_id, request, org_id, user_id=None):
+            return SimpleNamespace(run_id="r", metadata={"status": next(statuses)})
+
+        with patch("app.services.batch_runner.execute_template_run", side_effect=fake_run):
+            response = await runner.execute_batch(
+                session=_fake_session(),
+                template_id="00000000-0000-0000-0000-000000000001",
+                request=request,
+                org_id="org",
+            )
+
+        assert response.successful_runs == 1
+        assert response.status == "partial"
+
+    @pytest.mark.asyncio
+    async def test_dry_run_reports_pending_cells(self):
+        runner = BatchRunner()
+        template_id = "00000000-0000-0000-0000-000000000001"
+        request = _request(resume=True)
+        batch = self._existing_batch(runner, request, template_id)
+
+        with patch.object(runner, "_resolve_resume_batch", AsyncMock(return_value=batch)), \
+             patch.object(runner, "_completed_cells", AsyncMock(return_value={1: "a", 19: "b"})):
+            plan = await runner.plan_batch(_fake_session(), template_id, request, "org")
+
+        assert plan.total_runs == 36
+        assert plan.skipped_runs == 2
+        assert plan.pending_runs == 34
+        assert plan.resume_batch_id == BATCH_ID
+        indices = [c.run_index for c in plan.cells]
+        assert 1 not in indices and 19 not in indices
+        assert plan.cells[0].vendor == "openai"
+        assert plan.cells[-1].vendor == "gemini_direct"
+
+    @pytest.mark.asyncio
+    async def test_resume_rejects_different_configuration(self):
+        runner = BatchRunner()
+        template_id = "00000000-0000-0000-0000-000000000001"
+        other = self._existing_batch(runner, _request(replicate_count=1), template_id)
+        session = _fake_session()
+        session.get = AsyncMock(return_value=other)
+        request = _request(resume=True, resume_batch_id="00000000-0000-0000-0000-0000000000aa")
+
+        with pytest.raises(BatchResumeError):
+            await runner._resolve_resume_batch(
+                session, template_id, request, runner._compute_batch_hash(template_id, request)
+            )
+
+
+class TestAdaptiveReplicates:
+    """Adaptive mode stops stable cells and redirects their budget"""
+
+    @staticmethod
+    async def _run(runner, request, output_for, hash_for=compute_sha256):
+        calls = []
+
+        async def fake_run(session, template_id, request, org_id, user_id=None):
+            calls.append(request)
+            output = output_for(request, len(calls))
+            return SimpleNamespace(
+                run_id=f"run-{len(calls)}",
+                output_text=output,
+                response_output_sha256=hash_for(output),
+            )
+
+        with patch("app.services.batch_runner.execute_template_run", side_effect=fake_run):
+            response = await runner.execute_batch(
+                session=_fake_session(),
+                template_id="00000000-0000-0000-0000-000000000001",
+                request=request,
+                org_id="org",
+            )
+        return response, calls
+
+    @pytest.mark.asyncio
+    async def test_stable_cells_stop_and_budget_moves_to_unstable(self):
+        runner = BatchRunner()
+        request = _request(
+            models=["gpt-5"], locales=["de-DE", "en-US"], grounding_modes=["UNGROUNDED"],
+            replicate_count=4, adaptive=True, adaptive_min_replicates=2, adaptive_max_replicates=10,
+        )
+
+        # de-DE is deterministic, en-US never repeats
+        def output_for(req, n):
+            return "same answer" if req.als_context.get("locale") == "de-DE" else f"answer {n}"
+
+        response, calls = await self._run(runner, request, output_for)
+        cells = {c["locale"]: c for c in response.cell_summary}
+
+        assert cells["de-DE"]["replicates"] == 2
+        assert cells["de-DE"]["stopping_reason"] == "identical_outputs"
+        # Budget is 2 cells x 4 replicates; the stable cell's savings go to en-US
+        assert cells["en-US"]["replicates"] == 6
+        assert cells["en-US"]["stopping_reason"] == "budget_exhausted"
+        assert len(calls) == response.total_runs == 8
+        assert response.successful_runs == 8
+
+    @pytest.mark.asyncio
+    async def test_brand_agreement_stops_cell(self):
+        runner = BatchRunner()
+        request = _request(
+            models=["gpt-5"], locales=["de-DE"], grounding_modes=["REQUIRED"],
+            replicate_count=5, adaptive=True, adaptive_min_replicates=3,
+            brands=["AVEA", "Thorne"],
+        )
+
+        response, calls = await self._run(
+            runner, request, lambda req, n: f"Reply {n}: Avea and thorne lead; AVEAX does not."
+        )
+        cell = response.cell_summary[0]
+
+        assert len(calls) == 3
+        assert cell["stopping_reason"] == "brand_agreement"
+        assert cell["brand_agreement"] == 1.0
+        assert cell["distinct_outputs"] == 3
+
+    @pytest.mark.asyncio
+    async def test_unstable_cell_capped_by_max_replicates(self):
+        runner = BatchRunner()
+        request = _request(
+            models=["gpt-5"], locales=["de-DE", "en-US"], grounding_modes=["UNGROUNDED"],
+            replicate_count=10, adaptive=True, adaptive_min_replicates=2, adaptive_max_replicates=5,
+        )
+
+        response, _ = await self._run(runner, request, lambda req, n: f"answer {n}")
+
+        assert {c["stopping_reason"] for c in response.cell_summary} == {"max_replicates"}
+        assert {c["replicates"] for c in response.cell_summary} == {5}
+        assert response.total_runs == 10
+
+    @pytest.mark.asyncio
+    async def test_agreement_uses_the_stored_output_hash(self):
+        runner = BatchRunner()
+        request = _request(
+            models=["gpt-5"], locales=["de-DE"], grounding_modes=["UNGROUNDED"],
+            replicate_count=4, adaptive=True, adaptive_min_replicates=2, adaptive_max_replicates=4,
+        )
+
+        # Texts differ but the runs were persisted with the same output hash
+        response, calls = await self._run(
+            runner, request, lambda req, n: f"answer {n}", hash_for=lambda output: "a" * 64
+        )
+
+        cell = response.cell_summary[0]
+        assert len(calls) == 2
+        assert cell["stopping_reason"] == "identical_outputs"
+        assert cell["distinct_outputs"] == 1
+
+    def test_adaptive_changes_batch_hash(self):
+        runner = BatchRunner()
+        fixed = _request()
+        adaptive = _request(adaptive=True)
+        template_id = "00000000-0000-0000-0000-000000000001"
+        assert runner._compute_batch_hash(template_id, fixed) != runner._compute_batch_hash(template_id, adaptive)
@@ -0,0 +1,99 @@
+"""
+Golden-vector conformance for the canonicalization engine.
+
+tests/fixtures/canonicalization_golden.json was generated with the original
+recursive implementation. Every vector must reproduce byte-for-byte (or
+raise the same error) with and without the orjson backend.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from app.core import canonicalization
+from app.core.canonicalization import (
+    _canonical_dump_str,
+    canonicalize_json,
+    canonicalize_json_schema,
+    compute_output_hash,
+    compute_sha256,
+    compute_template_hash,
+)
+
+GOLDEN = json.loads(
+    (Path(__file__).parent / "fixtures" / "canonicalization_golden.json").read_text(encoding="utf-8")
+)["vectors"]
+
+BACKENDS = ["python"] + (["orjson"] if canonicalization.HAS_ORJSON else [])
+
+
+def _evaluate(vector):
+    kind = vector["kind"]
+    value = vector["input"] if "input" in vector else json.loads(vector["input_json"])
+    if kind == "template_dump":
+        return _canonical_dump_str(canonicalize_json(value, for_hashing=True))
+    if kind == "output_dump":
+        return _canonical_dump_str(canonicalize_json(value, for_hashing=False))
+    if kind == "template_hash":
+        return compute_template_hash(value)
+    if kind == "sha256":
+        return compute_sha256(value)
+    if kind == "output_hash":
+        return compute_output_hash(value, vector.get("output_type"))
+    if kind == "schema_dump":
+        return _canonical_dump_str(canonicalize_json_schema(value))
+    raise AssertionError(f"unknown vector kind {kind}")
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(canonicalization, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("vector", GOLDEN, ids=[v["name"] for v in GOLDEN])
+def test_golden_vector(vector, backend):
+    if "error" in vector:
+        with pytest.raises(Exception) as exc_info:
+            _evaluate(vector)
+        assert type(exc_info.value).__name__ == vector["error"]
+    else:
+        assert _evaluate(vector) == vector["expected"]
+
+
+def test_output_hash_parses_string_once(monkeypatch):
+    calls = []
+    real_loads = canonicalization._loads
+
+    def counting_loads(s):
+        calls.append(s)
+        return real_loads(s)
+
+    monkeypatch.setattr(canonicalization, "_loads", counting_loads)
+    compute_output_hash('{"a": [1, 2]}')
+    assert len(calls) == 1
+
+
+def test_canonicalize_json_does_not_recurse():
+    deep = current = {}
+    for _ in range(5000):
+        current["a"] = {}
+        current = current["a"]
+    canonical = canonicalize_json(deep, for_hashing=False)
+    assert _canonical_dump_str(canonical).count("{") == 5001
+
+
+def test_schema_canonicalization_leaves_input_untouched():
+    schema = {"type": "object", "required": ["b", "a"], "properties": {"a": {"type": "string"}}}
+    snapshot = json.dumps(schema)
+    assert canonicalize_json_schema(schema)["required"] == ["a", "b"]
+    assert json.dumps(schema) == snapshot
+
+
+def test_output_hash_treats_unparseable_digit_runs_as_text(backend):
+    digits = "7" * 5000
+    expected = compute_output_hash(digits, "text")
+    assert compute_output_hash(digits) == expected
+    assert compute_output_hash(digits.encode()) == expected
@@ -0,0 +1,171 @@
+"""
+Tests for streaming bulk exports
+"""
+
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import exports
+from app.services.exports import export_query, flatten_meta, plan_export, stream_export
+from app.services.run_blobs import make_blob
+from tests.util.fake_db import FakeConnection, FakeResult, fake_engine
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _export_db(rows=(), watermark=None, blobs=None):
+    """
+    FakeConnection that streams fixed rows and keeps blobs in memory, and
+    the list of watermarks it was asked to save
+    """
+    rows = [SimpleNamespace(_mapping=row) for row in rows]
+    blobs = blobs or {}
+    saved = []
+
+    def responder(sql, params):
+        if sql.startswith("SELECT last_created_at"):
+            return [SimpleNamespace(last_created_at=watermark[0], last_key=watermark[1])] if watermark else []
+        if sql.startswith("INSERT INTO export_watermarks"):
+            saved.append(params)
+            return None
+        if sql.startswith("SELECT sha256, codec, data FROM run_blobs"):
+            return [
+                SimpleNamespace(sha256=sha, codec=blobs[sha].codec, data=blobs[sha].data)
+                for sha in params["shas"] if sha in blobs
+            ]
+        if sql.startswith("SELECT"):
+            return rows
+        return None
+
+    return FakeConnection(responder), saved
+
+
+def _engine(**kwargs):
+    return fake_engine(_export_db(**kwargs)[0])
+
+
+def test_flatten_meta_types_known_fields_and_keeps_the_rest():
+    flat = flatten_meta({
+        "als_present": True, "tool_call_count": "3", "json_validation_ms": 1, "region": None,
+        "usage": {"prompt_tokens": 10}, "new_flag": "x"
+    })
+    assert flat["meta_als_present"] is True
+    assert flat["meta_tool_call_count"] == 3
+    assert flat["meta_json_validation_ms"] == 1.0
+    assert flat["meta_region"] is None
+    assert flat["meta_usage"] == '{"prompt_tokens": 10}'
+    assert flat["meta_extra"] == '{"new_flag": "x"}'
+    assert len(flat) == len(exports.META_FIELDS) + 1
+    assert flatten_meta(None)["meta_extra"] is None
+
+
+@pytest.mark.asyncio
+async def test_plan_continues_after_the_watermark_and_lags_behind_now():
+    mark = (datetime(2026, 10, 1, tzinfo=timezone.utc), str(UUID(int=5)))
+    plan = await plan_export(_engine(watermark=mark), "llm_telemetry", now=NOW)
+    assert plan.after == mark and plan.target == "llm_telemetry"
+
+    sql = compiled(export_query(plan))
+    assert "(llm_telemetry.created_at, llm_telemetry.id) > ('2026-10-01 00:00:00+00:00'" in sql
+    assert "llm_telemetry.created_at < '2026-10-18 11:59:00+00:00'" in sql
+    assert sql.endswith("ORDER BY llm_telemetry.created_at, llm_telemetry.id")
+
+    full = await plan_export(_engine(watermark=mark), "runs", full=True, now=NOW)
+    assert full.after is None and "output_tsv" not in compiled(export_query(full)).split(" FROM ")[0]
+
+    with pytest.raises(ValueError):
+        await plan_export(_engine(), "users")
+    with pytest.raises(ValueError):
+        await plan_export(_engine(), "runs", fmt="csv")
+
+
+@pytest.mark.asyncio
+async def test_parquet_needs_pyarrow(monkeypatch):
+    monkeypatch.setattr(exports, "HAS_PYARROW", False)
+    with pytest.raises(ValueError, match="pyarrow"):
+        await plan_export(_engine(), "runs", fmt="parquet")
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_streams_chunks_hydrates_blobs_and_commits_watermark():
+    blob = make_blob("stored output " * 50)
+    rows = [
+        {"run_id": UUID(int=i), "created_at": datetime(2026, 10, i, tzinfo=timezone.utc),
+         "output_text": None if i == 2 else f"out {i}", "response_output_sha256": blob.sha256 if i == 2 else None,
+         "request_json": {"i": i}, "request_sha256": None, "response_json": {}, "response_sha256": None}
+        for i in (1, 2, 3)
+    ]
+    conn, saved = _export_db(rows=rows, blobs={blob.sha256: blob})
+    engine = fake_engine(conn)
+    plan = await plan_export(engine, "runs", chunk_size=2, now=NOW)
+
+    chunks = [data async for data in stream_export(engine, plan)]
+
+    assert len(chunks) == 2
+    lines = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+    assert [line["output_text"] for line in lines] == ["out 1", "stored output " * 50, "out 3"]
+    assert lines[0]["run_id"] == str(UUID(int=1)) and lines[0]["created_at"].startswith("2026-10-01")
+    assert saved == [{
+        "target": "runs", "created_at": rows[-1]["created_at"], "key": str(UUID(int=3)), "rows": 3
+    }]
+    assert plan.as_dict()["committed"] is True
+
+
+def _watermark_db(stored=None):
+    """FakeConnection keeping one export watermark, with the ack's no-rewind rule"""
+    state = {"mark": stored}
+
+    def responder(sql, params):
+        if sql.startswith("SELECT last_created_at"):
+            mark = state["mark"]
+            return [SimpleNamespace(last_created_at=mark[0], last_key=mark[1])] if mark else []
+        if sql.startswith("INSERT INTO export_watermarks"):
+            mark, new = state["mark"], (params["created_at"], params["key"])
+            if mark is None or (mark[0] <= new[0] and mark != new):
+                state["mark"] = new
+                return FakeResult(rowcount=1)
+            return FakeResult(rowcount=0)
+        if sql.startswith("SELECT"):
+            return [SimpleNamespace(_mapping={"id": UUID(int=6), "created_at": NOW, "meta": None})]
+        return None
+
+    return FakeConnection(responder), state
+
+
+def test_get_is_side_effect_free_and_ack_advances_the_watermark(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.routes import exports as export_routes
+
+    old = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    conn, state = _watermark_db(stored=(old, str(UUID(int=5))))
+    monkeypatch.setattr(export_routes, "engine", fake_engine(conn))
+    app = FastAPI()
+    app.include_router(export_routes.router)
+    client = TestClient(app)
+
+    response = client.get("/api/exports/llm_telemetry")
+    assert response.status_code == 200 and response.headers["X-Export-Key"] == "id"
+    assert not any(sql.startswith("INSERT") for sql in conn.sql)
+    assert client.get("/api/exports/llm_telemetry", params={"commit": "true"}).status_code == 400
+
+    ack = {"to": {"created_at": "2026-10-02T00:00:00+00:00", "key": str(UUID(int=9))}, "rows": 4}
+    assert client.post("/api/exports/llm_telemetry/ack", json=ack).json()["committed"] is True
+    assert state["mark"] == (datetime(2026, 10, 2, tzinfo=timezone.utc), str(UUID(int=9)))
+    # A retried ack is accepted; an older one cannot rewind the watermark
+    assert client.post("/api/exports/llm_telemetry/ack", json=ack).status_code == 200
+    stale = {"to": {"created_at": old.isoformat(), "key": str(UUID(int=5))}}
+    assert client.post("/api/exports/llm_telemetry/ack", json=stale).status_code == 409
+    future = {"to": {"created_at": datetime.now(timezone.utc).isoformat(), "key": str(UUID(int=1))}}
+    assert client.post("/api/exports/llm_telemetry/ack", json=future).status_code == 400
+    assert state["mark"][1] == str(UUID(int=9))
@@ -0,0 +1,98 @@
+"""
+Tests for idempotency key reservation and replay
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import idempotency
+from tests.util.fake_db import FakeConnection, FakeResult, fake_engine
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    idempotency.clear_cache()
+    yield
+    idempotency.clear_cache()
+
+
+def _session(*results):
+    """Session answering each statement with the next of results"""
+    pending = list(results)
+    return FakeConnection(lambda sql, params: pending.pop(0))
+
+
+def _row(body_sha256, stored=None):
+    return FakeResult([SimpleNamespace(
+        body_sha256=body_sha256, result=stored, expires_at=datetime.utcnow() + timedelta(hours=1)
+    )])
+
+
+BODY = {"canonical": {"messages": []}, "template_name": "t"}
+
+
+@pytest.mark.asyncio
+async def test_new_key_is_reserved_with_one_upsert():
+    session = _session(FakeResult(scalar="key-1"))
+
+    reservation = await idempotency.reserve_idempotency(session, "org", "key-1", BODY)
+
+    assert reservation.replay is None
+    assert len(session.executed) == 1
+    sql = compiled(session.executed[0])
+    assert "ON CONFLICT (key, org_id) DO UPDATE" in sql
+    assert "WHERE idempotency_keys.expires_at < CURRENT_TIMESTAMP" in sql
+    assert "DELETE" not in sql
+
+
+@pytest.mark.asyncio
+async def test_duplicate_replays_stored_response_then_hits_cache():
+    body_hash = await idempotency.compute_body_hash(BODY)
+    stored = {"status_code": 201, "body": '{"template_id":"x","is_new":true}'}
+    session = _session(FakeResult(), _row(body_hash, stored))
+
+    first = await idempotency.reserve_idempotency(session, "org", "key-1", BODY)
+    again = await idempotency.reserve_idempotency(session, "org", "key-1", BODY)
+
+    assert first.replay == stored and again.replay == stored
+    assert len(session.executed) == 2  # the second retry never reached the database
+
+
+@pytest.mark.asyncio
+async def test_different_body_conflicts():
+    session = _session(FakeResult(), _row("other-hash"))
+
+    with pytest.raises(ValueError):
+        await idempotency.reserve_idempotency(session, "org", "key-1", BODY)
+    with pytest.raises(ValueError):
+        await idempotency.reserve_idempotency(session, "org", "key-1", BODY)
+    assert len(session.executed) == 2
+
+
+@pytest.mark.asyncio
+async def test_recorded_result_is_cached_after_commit():
+    session = _session(FakeResult(scalar="key-1"), FakeResult())
+    reservation = await idempotency.reserve_idempotency(session, "org", "key-1", BODY)
+    await idempotency.record_result(session, reservation, 201, '{"a":1}')
+    assert "UPDATE idempotency_keys SET result" in compiled(session.executed[-1])
+
+    idempotency.remember(reservation)
+    replayed = await idempotency.reserve_idempotency(_session(), "org", "key-1", BODY)
+    assert replayed.replay == {"status_code": 201, "body": '{"a":1}'}
+    assert await idempotency.check_idempotency(_session(), "org", "key-1") == (True, reservation.body_sha256)
+
+
+@pytest.mark.asyncio
+async def test_sweep_deletes_in_batches_until_short_batch():
+    counts = iter([2, 2, 1])
+    conn = FakeConnection(lambda sql, params: FakeResult(rowcount=next(counts)))
+
+    assert await idempotency.sweep_expired(fake_engine(conn), batch_size=2) == 5
+    assert all("FOR UPDATE SKIP LOCKED" in sql for sql in conn.sql)
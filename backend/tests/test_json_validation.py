@@ -0,0 +1,147 @@
+"""
+Tests for structured output validation and the compiled validator cache
+"""
+
+import json
+import pytest
+
+from app.core import json_validation
+from app.core.json_validation import (
+    ValidatorCache,
+    strict_schema,
+    validate_output,
+    validate_output_async,
+)
+from app.llm.adapters.openai_adapter import OpenAIAdapter
+from app.llm.types import LLMRequest
+from app.services.template_runner import schema_meta
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"brand": {"type": "string"}, "rank": {"type": "integer"}},
+    "required": ["brand", "rank"],
+}
+
+pytestmark = pytest.mark.skipif(not json_validation.HAS_JSONSCHEMA, reason="jsonschema not installed")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = ValidatorCache(maxsize=2)
+    monkeypatch.setattr(json_validation, "validator_cache", cache)
+    return cache
+
+
+class TestValidateOutput:
+    """Outcomes for parse-only and schema validation"""
+
+    def test_valid_and_invalid(self):
+        ok = validate_output('{"brand": "A", "rank": 1}', SCHEMA)
+        assert ok.valid is True and ok.schema_sha256
+
+        bad = validate_output('{"brand": "A", "rank": "first", "extra": 1}', SCHEMA)
+        assert bad.valid is False
+        assert bad.outcome == "invalid"
+        assert any(e.startswith("$.rank") for e in bad.errors)
+        # Strict by default: root additionalProperties is false
+        assert any("extra" in e for e in bad.errors)
+
+    def test_without_schema_only_parsing_matters(self):
+        assert validate_output('[1, 2]').valid is True
+        result = validate_output('{"brand": ')
+        assert result.valid is False and result.outcome == "unparseable"
+
+    def test_bad_schema_is_not_a_failed_output(self):
+        result = validate_output("{}", {"type": "nonsense"})
+        assert result.valid is None and result.outcome == "schema_error"
+
+    def test_skipped_without_jsonschema(self, monkeypatch):
+        monkeypatch.setattr(json_validation, "HAS_JSONSCHEMA", False)
+        assert validate_output("{}", SCHEMA).valid is None
+
+
+class TestValidatorCache:
+    """Compile once per schema, LRU eviction"""
+
+    def test_equivalent_schemas_share_a_validator(self, fresh_cache):
+        reordered = {"required": ["brand", "rank"], "properties": SCHEMA["properties"], "type": "object"}
+        validate_output("{}", SCHEMA)
+        validate_output("{}", reordered)
+        assert (fresh_cache.misses, fresh_cache.hits, len(fresh_cache)) == (1, 1, 1)
+
+    def test_array_order_tells_schemas_apart(self, fresh_cache):
+        string_first = {"type": "array", "prefixItems": [{"type": "string"}, {"type": "integer"}], "items": False}
+        integer_first = {"type": "array", "prefixItems": [{"type": "integer"}, {"type": "string"}], "items": False}
+        assert validate_output('["AVEA", 1]', string_first).valid is True
+        assert validate_output('["AVEA", 1]', integer_first).valid is False
+        assert (fresh_cache.misses, fresh_cache.hits) == (2, 0)
+
+    def test_least_recently_used_is_evicted(self, fresh_cache):
+        schemas = [{"type": "object", "title": t} for t in "abc"]
+        key_a, _ = fresh_cache.get(schemas[0])
+        fresh_cache.get(schemas[1])
+        fresh_cache.get(schemas[0])
+        fresh_cache.get(schemas[2])
+        assert fresh_cache.evictions == 1
+        assert key_a in fresh_cache._validators
+        fresh_cache.get(schemas[1])
+        assert fresh_cache.misses == 4
+
+
+class TestSchemaNotMutated:
+    """Callers' schemas stay as they were"""
+
+    def test_validation_and_openai_payload_leave_schema_alone(self):
+        snapshot = json.dumps(SCHEMA)
+        validate_output('{"brand": "A", "rank": 1}', SCHEMA)
+        assert strict_schema(SCHEMA)["additionalProperties"] is False
+
+        meta = {"json_schema": {"name": "Ranking", "schema": SCHEMA}}
+        request = LLMRequest(
+            vendor="openai", model="gpt-5", messages=[{"role": "user", "content": "hi"}],
+            json_mode=True, meta=meta
+        )
+        # Payload building needs no client
+        payload = OpenAIAdapter.__new__(OpenAIAdapter)._build_payload(request, is_grounded=False)
+        assert payload["text"]["format"]["schema"]["additionalProperties"] is False
+        assert json.dumps(SCHEMA) == snapshot
+
+    def test_bare_template_schema_reaches_the_provider(self):
+        # Templates may store a bare schema rather than the envelope
+        for stored in (SCHEMA, {"name": "Ranking", "schema": SCHEMA}):
+            request = LLMRequest(
+                vendor="openai", model="gpt-5", messages=[{"role": "user", "content": "hi"}],
+                json_mode=True, meta=schema_meta(stored)
+            )
+            payload = OpenAIAdapter.__new__(OpenAIAdapter)._build_payload(request, is_grounded=False)
+            sent = payload["text"]["format"]["schema"]
+            assert sent == {**SCHEMA, "additionalProperties": False}
+            assert payload["text"]["format"]["name"] == ("Ranking" if "schema" in stored else "Output")
+
+        # The adapter also accepts a bare schema put directly in meta
+        request = LLMRequest(
+            vendor="openai", model="gpt-5", messages=[{"role": "user", "content": "hi"}],
+            json_mode=True, meta={"json_schema": SCHEMA}
+        )
+        payload = OpenAIAdapter.__new__(OpenAIAdapter)._build_payload(request, is_grounded=False)
+        assert payload["text"]["format"]["schema"]["properties"] == SCHEMA["properties"]
+        assert schema_meta(None) is None and schema_meta({}) is None
+
+
+class TestOffload:
+    """Large outputs validate in a worker thread"""
+
+    @pytest.mark.asyncio
+    async def test_large_outputs_use_a_thread(self, monkeypatch):
+        monkeypatch.setattr(json_validation.get_settings(), "json_validation_offload_bytes", 64)
+        calls = []
+
+        async def fake_to_thread(fn, *args):
+            calls.append(fn)
+            return fn(*args)
+
+        monkeypatch.setattr(json_validation.asyncio, "to_thread", fake_to_thread)
+        small = await validate_output_async('{"brand": "A", "rank": 1}', SCHEMA)
+        large = await validate_output_async(json.dumps({"brand": "A" * 100, "rank": 2}), SCHEMA)
+        assert small.valid and large.valid
+        assert calls == [validate_output]
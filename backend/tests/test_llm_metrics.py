@@ -0,0 +1,112 @@
+"""
+Tests for LLM metrics sketches and their Prometheus export
+"""
+
+import json
+import random
+import sys
+
+import pytest
+
+from app.llm.observability import LLMMetrics
+from app.llm.sketches import DDSketch
+from app.prometheus_metrics import REGISTRY
+
+
+def _footprint(sketch):
+    """Bytes held by a sketch's buckets"""
+    bins = (sketch._positive, sketch._negative)
+    return sum(sys.getsizeof(b) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in b.items()) for b in bins)
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_stay_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(6, 1.5) for _ in range(50_000)] + [0.0] * 500 + [-5.0] * 10
+    sketch = DDSketch()
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.0, 0.01, 0.5, 0.9, 0.99, 1.0):
+        exact = _exact(values, q)
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.01, abs=1e-9)
+    assert sketch.count == len(values) and sketch.sum == pytest.approx(sum(values))
+    assert DDSketch().quantile(0.5) is None
+
+
+def test_sketches_merge_across_workers_like_one_sketch():
+    rng = random.Random(11)
+    values = [rng.expovariate(1 / 800) for _ in range(30_000)]
+    workers = [LLMMetrics() for _ in range(3)]
+    combined = LLMMetrics()
+    for i, value in enumerate(values):
+        workers[i % 3].record("latency.total_ms", value)
+        combined.record("latency.total_ms", value)
+    workers[0].counters["errors.timeout"] = 2
+    workers[2].counters["errors.timeout"] = 3
+
+    # Ship state as JSON, as a worker would
+    merged = LLMMetrics.from_dict(json.loads(json.dumps(workers[0].to_dict())))
+    for worker in workers[1:]:
+        merged.merge(LLMMetrics.from_dict(json.loads(json.dumps(worker.to_dict()))))
+
+    summary = merged.get_summary()
+    latency = summary["histograms"]["latency.total_ms"]
+    assert latency == pytest.approx(combined.get_summary()["histograms"]["latency.total_ms"])
+    assert latency["p99"] == pytest.approx(_exact(values, 0.99), rel=0.01)
+    assert summary["counters"]["errors.timeout"] == 5
+
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.02))
+
+
+def test_counters_are_exported_through_the_registry():
+    def sample():
+        return REGISTRY.get_sample_value(
+            "contestra_llm_metric_events_total", {"metric": "adapter.citations.anchored"}
+        ) or 0
+
+    before = sample()
+    metrics = LLMMetrics()
+    metrics.increment("adapter.citations.anchored", 4)
+    metrics.increment("adapter.citations.anchored")
+    metrics.increment("not.a.counter")
+    assert sample() - before == 5
+    assert metrics.counters["adapter.citations.anchored"] == 5
+
+
+def test_bucket_count_is_bounded():
+    values = [mantissa * 10.0 ** exponent for exponent in range(-6, 12) for mantissa in range(1, 100)]
+    sketch = DDSketch(max_bins=64)
+    for value in values:
+        sketch.add(value)
+    assert len(sketch) == 64
+    # Collapsing only touches the low end
+    assert sketch.quantile(1.0) == sketch.max
+    assert sketch.quantile(0.99) == pytest.approx(_exact(values, 0.99), rel=0.01)
+
+
+@pytest.mark.slow
+def test_memory_stays_flat_over_ten_million_observations():
+    metrics = LLMMetrics()
+    rng = random.Random(3)
+    sample = rng.random
+    record = metrics.record
+    # Occupy the buckets the workload will use before measuring
+    for _ in range(10_000):
+        record("latency.total_ms", 100 + sample() * 60_000)
+
+    sketch = metrics.histograms["latency.total_ms"]
+    start = _footprint(sketch)
+    for _ in range(10_000_000):
+        record("latency.total_ms", 100 + sample() * 60_000)
+
+    # A list would have grown by ~80 MB; the sketch may add a few new buckets
+    assert _footprint(sketch) - start < 16 * 1024
+    assert len(sketch) <= sketch.max_bins
+    assert metrics.histograms["latency.total_ms"].count == 10_010_000
+    assert metrics.get_summary()["histograms"]["latency.total_ms"]["p50"] == pytest.approx(30_100, rel=0.02)
@@ -0,0 +1,98 @@
+"""
+Tests for the multi-pattern brand and competitor mention engine
+"""
+
+import pytest
+
+from app.services.mention_engine import (
+    BRAND,
+    COMPETITOR,
+    COMPETITOR_CUES,
+    CUE,
+    MentionEngine,
+    engine_for,
+    sentence_spans,
+)
+
+
+@pytest.fixture
+def engine():
+    return MentionEngine(
+        {"AVEA": ["Avea Life"], "Apple Watch": [], "Apple": []},
+        {"Tru Niagen": ["Niagen"], "Straße": []},
+    )
+
+
+def spans(text, report):
+    return [text[m.start:m.end] for m in report.mentions]
+
+
+class TestScan:
+    """Matching rules"""
+
+    def test_whole_words_only(self, engine):
+        text = "AVEA, not AVEAX or XAVEA. Apples are not Apple."
+        report = engine.scan(text)
+        assert spans(text, report) == ["AVEA", "Apple"]
+        assert report.counts == {"AVEA": 1, "Apple": 1}
+
+    def test_casefold_and_whitespace(self, engine):
+        text = "avea  LIFE\nand STRASSE or straße"
+        report = engine.scan(text)
+        assert [(m.entity, m.alias) for m in report.mentions] == [
+            ("AVEA", "Avea Life"), ("Straße", "Straße"), ("Straße", "Straße")
+        ]
+        assert spans(text, report) == ["avea  LIFE", "STRASSE", "straße"]
+
+    def test_leftmost_longest(self, engine):
+        text = "The Apple Watch beat Apple."
+        report = engine.scan(text)
+        assert [m.entity for m in report.mentions] == ["Apple Watch", "Apple"]
+
+    def test_kinds_and_sentences(self, engine):
+        text = "AVEA leads. Tru Niagen follows!\nNiagen again"
+        report = engine.scan(text)
+        assert report.entities(BRAND) == ["AVEA"]
+        assert report.entities(COMPETITOR) == ["Tru Niagen"]
+        assert report.counts["Tru Niagen"] == 2
+        assert [m.sentence for m in report.mentions] == [0, 1, 2]
+        assert report.sentence_texts(text, COMPETITOR) == ["Tru Niagen follows!", "Niagen again"]
+
+    def test_scripts_without_spaces(self):
+        text = "长寿AVEA品牌"
+        assert MentionEngine({"AVEA": []}).scan(text).counts == {"AVEA": 1}
+
+    def test_cues(self):
+        engine = MentionEngine({"AVEA": []}, cues=COMPETITOR_CUES)
+        text = "Good alternatives exist. AVEA is similar to others."
+        report = engine.scan(text)
+        assert report.sentence_texts(text, CUE) == ["Good alternatives exist.", "AVEA is similar to others."]
+
+    def test_spans_index_decomposed_input(self):
+        engine = MentionEngine({"Caf\u00e9": []}, cues=COMPETITOR_CUES)
+        text = "Cafe\u0301 is the brand. A rival is Nestle\u0301 and Cafe\u0301 again"
+        report = engine.scan(text)
+        assert spans(text, report) == ["Cafe\u0301", "rival", "Cafe\u0301"]
+        assert report.sentence_texts(text, CUE) == ["A rival is Nestle\u0301 and Cafe\u0301 again"]
+        assert [m.sentence for m in report.mentions] == [0, 1, 1]
+
+        # Hangul jamo compose across starters; the syllable maps back whole
+        report = MentionEngine({"\uac01": []}).scan("x \u1100\u1161\u11a8 y")
+        assert [(m.start, m.end) for m in report.mentions] == [(2, 5)]
+
+
+def test_sentence_spans_keep_decimals_and_domains():
+    text = "Score 4.5 at avea.com. Next line\n\nLast"
+    assert [text[s:e] for s, e in sentence_spans(text)] == ["Score 4.5 at avea.com.", "Next line", "Last"]
+
+
+def test_engine_for_compiles_once_per_pattern_set():
+    a = engine_for("client-1", {"AVEA": ["Avea Life"]})
+    assert engine_for("client-1", {"AVEA": ["Avea Life"]}) is a
+    assert engine_for("client-1", {"AVEA": ["Avea"]}) is not a
+
+
+def test_rescore_batch(engine):
+    rows = [(1, "AVEA"), (2, "nothing here"), (3, "Niagen and AVEA")]
+    scored = {key: report.counts for key, report in engine.rescore(rows)}
+    assert scored == {1: {"AVEA": 1}, 2: {}, 3: {"Tru Niagen": 1, "AVEA": 1}}
@@ -0,0 +1,135 @@
+"""
+Tests for MinHash/LSH near-duplicate prompt detection
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import near_duplicates
+from app.services.near_duplicates import (
+    BANDS,
+    MinHashIndex,
+    band_buckets,
+    find_near_duplicates,
+    index_template,
+    jaccard,
+    pack_signature,
+    signature,
+    unpack_signature,
+)
+from app.services.prompt_hasher import find_duplicate_prompts
+from tests.util.fake_db import FakeConnection, fake_engine
+
+PROMPT = "What are the best longevity supplements available in 2025? List the top 10 brands."
+REWORDED = "What are the top longevity supplements available in 2025? List the top 10 brands."
+UNRELATED = "Which NAD+ boosters do doctors recommend for healthy aging?"
+
+
+def test_signature_is_normalized_and_backend_independent(monkeypatch):
+    sig = signature(PROMPT)
+    assert signature("  " + PROMPT.upper().replace("?", " ?!") + "\n") == sig
+    monkeypatch.setattr(near_duplicates, "HAS_NUMPY", False)
+    assert signature(PROMPT) == sig
+    assert unpack_signature(pack_signature(sig)) == sig
+
+
+def test_jaccard_estimates_separate_rewording_from_unrelated():
+    assert jaccard(signature(PROMPT), signature(REWORDED)) > 0.7
+    assert jaccard(signature(PROMPT), signature(UNRELATED)) < 0.2
+
+
+def test_index_returns_ranked_top_k_and_forgets_removed():
+    index = MinHashIndex()
+    index.add("a", PROMPT)
+    index.add("b", REWORDED)
+    index.add("c", UNRELATED)
+
+    matches = index.query(PROMPT, k=2)
+    assert [m.key for m in matches] == ["a", "b"]
+    assert matches[0].jaccard == 1.0 and 0.7 < matches[1].jaccard < 1.0
+
+    index.remove("a")
+    assert [m.key for m in index.query(PROMPT)] == ["b"]
+    assert len(index) == 2
+
+
+def test_find_duplicate_prompts_wraps_index():
+    prompts = [
+        {"id": 1, "prompt_text": PROMPT},
+        {"id": 2, "prompt_text": UNRELATED},
+        {"id": 3, "prompt_text": PROMPT + "  "},
+        {"id": 4, "prompt_text": REWORDED},
+    ]
+    assert list(find_duplicate_prompts(prompts).values()) == [[1, 3]]
+    assert list(find_duplicate_prompts(prompts, threshold=0.6).values()) == [[1, 3, 4]]
+
+
+def test_repeated_phrases_are_not_identical_prompts():
+    prompts = [
+        {"id": 1, "prompt_text": "best shoes best shoes best shoes"},
+        {"id": 2, "prompt_text": "best shoes best shoes"},
+    ]
+    # Same shingle set, so MinHash estimates 1.0, but the texts differ
+    assert jaccard(signature(prompts[0]["prompt_text"]), signature(prompts[1]["prompt_text"])) == 1.0
+    assert find_duplicate_prompts(prompts) == {}
+    assert list(find_duplicate_prompts(prompts, threshold=0.9).values()) == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_index_template_writes_signature_and_buckets():
+    conn = FakeConnection()
+    await index_template(conn, 7, "AVEA", PROMPT)
+    upsert, delete, insert = conn.statements
+    assert "ON CONFLICT (template_id)" in upsert[0] and upsert[1]["signature"] == pack_signature(signature(PROMPT))
+    assert "DELETE FROM prompt_template_lsh" in delete[0]
+    assert sorted(p["bucket"] for p in insert[1]) == sorted(set(band_buckets(signature(PROMPT))))
+    assert len(insert[1]) == BANDS
+
+
+@pytest.mark.asyncio
+async def test_find_near_duplicates_scores_bucket_candidates():
+    def row(template_id, prompt_text):
+        return SimpleNamespace(
+            id=template_id, template_name=f"t{template_id}", prompt_text=prompt_text,
+            signature=pack_signature(signature(prompt_text))
+        )
+
+    rows = [row(1, UNRELATED), row(2, REWORDED), row(3, PROMPT)]
+    conn = FakeConnection(lambda sql, params: rows)
+    matches = await find_near_duplicates(conn, "AVEA", PROMPT, k=5, threshold=0.6)
+
+    sql, params = conn.statements[0]
+    assert "bucket = ANY(:buckets)" in sql and params["buckets"] == band_buckets(signature(PROMPT))
+    assert [(m["row"].id, m["jaccard"] == 1.0) for m in matches] == [(3, True), (2, False)]
+
+
+@pytest.mark.asyncio
+async def test_check_duplicate_same_text_means_same_prompt_hash(monkeypatch):
+    from collections import namedtuple
+    from app.api import prompt_tracking
+
+    repeated = "best shoes best shoes best shoes"
+    # The route reads rows both by position and by name
+    Row = namedtuple("Row", "id template_name model_name countries grounding_modes prompt_hash signature prompt_text")
+
+    def row(template_id, prompt_text):
+        return Row(
+            template_id, f"t{template_id}", "gemini", '["US"]', '["none"]', None,
+            pack_signature(signature(prompt_text)), prompt_text
+        )
+
+    candidates = [row(1, "best shoes best shoes"), row(2, repeated + " ")]
+
+    def responder(sql, params):
+        # No exact hash match; every template comes back as an LSH candidate
+        return None if "prompt_hash = :hash" in sql else candidates
+
+    monkeypatch.setattr(prompt_tracking, "engine", fake_engine(FakeConnection(responder)))
+    response = await prompt_tracking.check_duplicate(
+        prompt_tracking.DuplicateCheckRequest(brand_name="AVEA", prompt_text=repeated)
+    )
+
+    labels = {item["template_id"]: (item["similarity"], item["jaccard"]) for item in response["closest"]}
+    assert labels == {1: ("near_duplicate", 1.0), 2: ("same_prompt", 1.0)}
+    assert response["same_text_diff_config"] is True
@@ -0,0 +1,120 @@
+"""
+Tests for runs/llm_telemetry partition maintenance
+"""
+
+import importlib.util
+from datetime import date, datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_mock_engine
+
+from app.models import models
+from app.services.partitions import TABLES, add_months, maintain, parse_bound, partition_name
+from tests.util.fake_db import FakeConnection, FakeResult, fake_engine
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def _catalog(partitions):
+    """FakeConnection over a fixed pg_inherits listing"""
+
+    def responder(sql, params):
+        if "FROM pg_inherits" in sql:
+            return [SimpleNamespace(name=n, bound=b) for n, b in partitions[params["table"]]]
+        if sql.startswith("SELECT min(created_at)"):
+            return FakeResult(scalar=utc(2024, 3, 14, 9))
+        return None
+
+    return FakeConnection(responder)
+
+
+def test_bounds_and_month_arithmetic():
+    assert parse_bound("FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00+00')") == (None, utc(2026, 11, 1))
+    assert parse_bound("FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')") == (
+        utc(2026, 12, 1), utc(2027, 1, 1)
+    )
+    with pytest.raises(ValueError):
+        parse_bound("DEFAULT")
+    assert add_months(utc(2026, 11, 1), 2) == utc(2027, 1, 1)
+    assert add_months(utc(2026, 1, 1), -13) == utc(2024, 12, 1)
+    assert partition_name("runs", utc(2027, 1, 1)) == "runs_p2027_01"
+
+
+@pytest.mark.asyncio
+async def test_maintain_creates_ahead_and_retires_expired_partitions_after_rollup():
+    partitions = {"runs": [
+        ("runs_legacy", "FOR VALUES FROM (MINVALUE) TO ('2025-10-01 00:00:00+00')"),
+        ("runs_p2025_10", "FOR VALUES FROM ('2025-10-01 00:00:00+00') TO ('2025-11-01 00:00:00+00')"),
+        ("runs_p2026_11", "FOR VALUES FROM ('2026-11-01 00:00:00+00') TO ('2026-12-01 00:00:00+00')"),
+    ]}
+    conn = _catalog(partitions)
+
+    report = await maintain(fake_engine(conn), today=date(2026, 10, 18), months_ahead=2, tables=["runs"],
+                            retention_months={"runs": 12}, action="archive")
+    log = conn.sql
+
+    assert report["runs"]["created"] == ["runs_p2026_12"]
+    assert report["runs"]["detached"] == ["runs_legacy"]
+    creates = [s for s in log if s.startswith("CREATE TABLE")]
+    assert creates == ["CREATE TABLE IF NOT EXISTS runs_p2026_12 PARTITION OF runs "
+                       "FOR VALUES FROM ('2026-12-01T00:00:00+00:00') TO ('2027-01-01T00:00:00+00:00')"]
+
+    detach_at = log.index("ALTER TABLE runs DETACH PARTITION runs_legacy CONCURRENTLY")
+    rollups = [i for i, s in enumerate(log) if s.startswith("INSERT INTO runs_daily")]
+    assert len(rollups) == 2 and rollups[-1] < detach_at  # recent days, then the whole legacy partition
+    deletes = [s for s in log[:detach_at] if "WHERE run_id IN (SELECT run_id FROM runs_legacy)" in s]
+    assert len(deletes) == 3
+    assert "OPTIONS {'isolation_level': 'AUTOCOMMIT'}" in log[:detach_at]
+    assert log[-1] == "ALTER TABLE runs_legacy SET SCHEMA archive"
+
+
+@pytest.mark.asyncio
+async def test_dry_run_only_lists_expired_partitions():
+    partitions = {"llm_telemetry": [
+        ("llm_telemetry_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-03-01 00:00:00+00')"),
+        ("llm_telemetry_p2026_03", "FOR VALUES FROM ('2026-03-01 00:00:00+00') TO ('2026-04-01 00:00:00+00')"),
+        ("llm_telemetry_p2026_04", "FOR VALUES FROM ('2026-04-01 00:00:00+00') TO ('2026-05-01 00:00:00+00')"),
+    ]}
+    conn = _catalog(partitions)
+
+    report = await maintain(fake_engine(conn), today=date(2026, 10, 18), tables=["llm_telemetry"],
+                            retention_months={"llm_telemetry": 6}, dry_run=True)
+    log = conn.sql
+
+    assert report["llm_telemetry"]["detached"] == ["llm_telemetry_legacy", "llm_telemetry_p2026_03"]
+    assert not any(s.startswith(("CREATE", "ALTER", "DELETE", "INSERT")) for s in log)
+
+
+@pytest.mark.asyncio
+async def test_maintain_rejects_unknown_inputs():
+    engine = fake_engine(_catalog({}))
+    with pytest.raises(ValueError):
+        await maintain(engine, action="truncate")
+    with pytest.raises(ValueError):
+        await maintain(engine, tables=["batches"])
+
+
+def test_run_deletes_remove_dependent_rows():
+    path = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "20261018_run_dependents_cleanup.py"
+    spec = importlib.util.spec_from_file_location("run_dependents_cleanup", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    dependents = set(models.RUN_DEPENDENT_TABLES)
+    assert set(migration.RUN_DEPENDENTS) == dependents == set(TABLES["runs"].dependents)
+
+    statements = []
+    engine = create_mock_engine(
+        "postgresql://", lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=engine.dialect)))
+    )
+    models.Run.__table__.create(engine)
+
+    ddl = "\n".join(statements)
+    assert ddl.index("CREATE TABLE runs") < ddl.index("CREATE TRIGGER runs_delete_dependents")
+    assert "AFTER DELETE ON runs\nFOR EACH ROW EXECUTE FUNCTION runs_delete_dependents()" in ddl
+    for table in dependents:
+        assert f"DELETE FROM {table} WHERE run_id = OLD.run_id;" in ddl
+        assert f"DELETE FROM {table} WHERE run_id = OLD.run_id;" in migration._deletes()
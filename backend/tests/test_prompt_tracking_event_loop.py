@@ -0,0 +1,136 @@
+"""
+Prompt tracking handlers must not block the event loop on database access
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.engine import Engine as SyncEngine
+from sqlalchemy.orm import Session
+
+from app.api import prompt_tracking
+from tests.util.fake_db import FakeResult
+
+SLOW_QUERY_SECONDS = 0.4
+
+
+def _rows(sql):
+    if "FROM prompt_analytics_daily" in sql:
+        return [SimpleNamespace(
+            country_code="US", grounding_mode="none", runs_total=10, runs_completed=9, runs_failed=1,
+            join_rows=10, mentioned_rows=5, mention_count_sum=15, mention_count_n=10,
+            confidence_sum=5.5, confidence_n=10, completed_rows=9, completed_mentioned_rows=5
+        )]
+    if "FROM prompt_templates" in sql:
+        return [SimpleNamespace(
+            id=1, brand_name="AVEA", template_name="t", prompt_text="p", prompt_type="custom",
+            countries='["US"]', grounding_modes='["none"]', is_active=True,
+            created_at=None, updated_at=None, model_name="gemini", prompt_hash=None
+        )]
+    return []
+
+
+def _query_seconds(sql):
+    return SLOW_QUERY_SECONDS if "FROM prompt_analytics_daily" in sql else 0.0
+
+
+class _Connection:
+    """Async connection: a slow query waits without holding the loop, like asyncpg"""
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        await asyncio.sleep(_query_seconds(sql))
+        return FakeResult(_rows(sql))
+
+
+class _BlockingConnection:
+    """Sync connection: a slow query holds the thread, like the old sync engine"""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.calls.append(sql)
+        time.sleep(_query_seconds(sql) or 0.05)
+        return FakeResult(_rows(sql))
+
+
+class _Engine:
+    """
+    Serves both the async protocol the handlers should use and the sync one
+    they used before; sync access blocks the event loop for real.
+    """
+
+    def __init__(self):
+        self.blocking_calls = []
+
+    def connect(self):
+        engine = self
+
+        class _Context:
+            async def __aenter__(self):
+                return _Connection()
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __enter__(self):
+                return _BlockingConnection(engine.blocking_calls)
+
+            def __exit__(self, *exc):
+                return False
+
+        return _Context()
+
+    begin = connect
+
+
+async def _max_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - t0 - interval)
+    return worst
+
+
+@pytest.mark.asyncio
+async def test_long_analytics_query_does_not_stall_other_requests(monkeypatch):
+    engine = _Engine()
+    monkeypatch.setattr(prompt_tracking, "engine", engine)
+    # Any ORM session or sync engine use would also block the loop
+    sync_calls = []
+
+    def blocking(name):
+        def call(*args, **kwargs):
+            sync_calls.append(name)
+            time.sleep(SLOW_QUERY_SECONDS)
+            raise AssertionError(f"{name} used from an async handler")
+        return call
+
+    monkeypatch.setattr(Session, "execute", blocking("Session.execute"))
+    monkeypatch.setattr(SyncEngine, "connect", blocking("Engine.connect"))
+
+    stop = asyncio.Event()
+    lag_probe = asyncio.create_task(_max_loop_lag(stop))
+
+    analytics = asyncio.create_task(prompt_tracking.get_brand_analytics("AVEA", days=30))
+    await asyncio.sleep(0.05)  # let the slow query start
+
+    t0 = time.perf_counter()
+    templates = await prompt_tracking.get_templates("AVEA")
+    concurrent_latency = time.perf_counter() - t0
+
+    assert not analytics.done()
+    stats = (await analytics)["statistics"]
+    stop.set()
+    lag = await lag_probe
+
+    assert templates["templates"][0]["countries"] == ["US"]
+    assert stats["total_runs"] == 10
+    assert engine.blocking_calls == [] and sync_calls == []
+    assert concurrent_latency < SLOW_QUERY_SECONDS / 4
+    assert lag < SLOW_QUERY_SECONDS / 4
@@ -0,0 +1,100 @@
+"""
+Tests for ranked-brand extraction and rank-trend queries
+"""
+
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+
+from app.models.models import Run
+from app.services.rank_extraction import (
+    LIST,
+    PROSE,
+    add_run_ranks,
+    brand_engine,
+    extract_ranked_brands,
+    rank_trend,
+)
+
+ANSWER = """Here are the top longevity brands:
+
+1. **Tru Niagen** - NR supplement
+   - backed by clinical trials
+2. [AVEA](https://avea-life.com): Swiss brand
+3. Elysium Basis (NR + pterostilbene)
+4. This item is a long explanation of the market rather than a brand name.
+
+Also worth noting: Thorne and avea are popular."""
+
+
+def as_tuples(ranks):
+    return [(r.position, r.brand, r.alias, r.source) for r in ranks]
+
+
+class TestExtraction:
+    """List and prose parsing"""
+
+    def test_numbered_list_then_prose(self):
+        engine = brand_engine({"AVEA": ["Avea Life"], "Thorne": [], "Tru Niagen": ["Niagen"]})
+        assert as_tuples(extract_ranked_brands(ANSWER, engine)) == [
+            (1, "Tru Niagen", "Tru Niagen", LIST),
+            (2, "AVEA", "AVEA", LIST),
+            (3, "Elysium Basis", "Elysium Basis", LIST),
+            (4, "Thorne", "Thorne", PROSE),
+        ]
+
+    def test_unknown_brands_ranked_by_heading(self):
+        assert [r.brand for r in extract_ranked_brands(ANSWER)] == ["Tru Niagen", "AVEA", "Elysium Basis"]
+
+    def test_top_level_bullets_when_unnumbered(self):
+        text = "- Thorne: broad range\n  - nested detail\n- Niagen, by ChromaDex"
+        engine = brand_engine(["Thorne", "Tru Niagen"])
+        assert as_tuples(extract_ranked_brands(text, engine)) == [
+            (1, "Thorne", "Thorne", LIST),
+            (2, "Niagen", "Niagen", LIST),
+        ]
+
+    def test_decomposed_text_keeps_brands_on_their_line(self):
+        # Four combining accents in item 1 would shift normalized offsets of item 2 into it
+        head = "Ge\u0301ne\u0301rale\u0301 Sante\u0301"
+        text = f"1. {head}\n2. AVEA\n3. Thorne"
+        engine = brand_engine(["AVEA", "Thorne"])
+        assert as_tuples(extract_ranked_brands(text, engine)) == [
+            (1, head, head, LIST),
+            (2, "AVEA", "AVEA", LIST),
+            (3, "Thorne", "Thorne", LIST),
+        ]
+
+    def test_aliases_map_to_brand_once(self):
+        engine = brand_engine({"Tru Niagen": ["Niagen"]})
+        text = "1. Niagen\n2. Tru Niagen again\n\nNiagen is mentioned in prose too."
+        assert as_tuples(extract_ranked_brands(text, engine)) == [(1, "Tru Niagen", "Niagen", LIST)]
+
+
+def test_add_run_ranks_only_for_succeeded_runs():
+    session = MagicMock()
+    run = Run(run_id=uuid4(), status="succeeded", output_text=ANSWER, model="gpt-5",
+              locale_selected="de-DE", created_at=datetime(2026, 10, 1))
+    assert add_run_ranks(session, run) == 3
+    rows = session.add_all.call_args.args[0]
+    assert {(r.locale, r.model, r.run_id) for r in rows} == {("de-DE", "gpt-5", run.run_id)}
+
+    run.status = "failed"
+    assert add_run_ranks(session, run) == 0
+
+
+@pytest.mark.asyncio
+async def test_rank_trend_query_uses_lookup_columns():
+    session = MagicMock()
+    result = MagicMock()
+    result.all.return_value = [MagicMock(period=datetime(2026, 10, 12), avg_position=2.5, best_position=1, appearances=4)]
+    session.execute = AsyncMock(return_value=result)
+
+    points = await rank_trend(session, "AVEA", locale="de-DE", since=datetime(2026, 10, 1), bucket="week")
+
+    sql = str(session.execute.await_args.args[0])
+    assert "date_trunc" in sql and "run_brand_ranks.brand" in sql and "run_brand_ranks.locale" in sql
+    assert "runs" not in sql.replace("run_brand_ranks", "")
+    assert points == [{"period": "2026-10-12T00:00:00", "avg_position": 2.5, "best_position": 1, "appearances": 4}]
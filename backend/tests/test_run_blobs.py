@@ -0,0 +1,125 @@
+"""
+Tests for content-addressed run payload storage
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+
+from app.core.canonicalization import compute_sha256
+from app.models.models import Run
+from app.services.run_blobs import (
+    CODEC_NONE,
+    compress,
+    decompress,
+    dedup_existing,
+    externalize,
+    hydrate_runs,
+    make_blob,
+    output_texts,
+    put_blobs,
+)
+from tests.util.fake_db import FakeConnection, fake_engine
+
+LONG_TEXT = "1. Avea Vitamin D3 – well absorbed and widely available. " * 40
+
+
+def _blob_store(runs=()):
+    """FakeConnection over an in-memory run_blobs dict, and that dict"""
+    blobs = {}
+    pending = list(runs)
+
+    def responder(sql, params):
+        if sql.startswith("INSERT INTO run_blobs"):
+            rows = []
+            for sha, codec, data, refs in zip(params["shas"], params["codecs"], params["data"], params["refs"]):
+                inserted = sha not in blobs
+                blob = blobs.setdefault(sha, {"codec": codec, "data": data, "refcount": 0})
+                blob["refcount"] += refs
+                rows.append(SimpleNamespace(sha256=sha, inserted=inserted))
+            return rows
+        if sql.startswith("SELECT sha256, codec, data FROM run_blobs"):
+            return [
+                SimpleNamespace(sha256=sha, codec=blobs[sha]["codec"], data=blobs[sha]["data"])
+                for sha in params["shas"] if sha in blobs
+            ]
+        if sql.startswith("SELECT runs.run_id"):
+            rows = pending[:]
+            pending.clear()
+            return rows
+        return None
+
+    return FakeConnection(responder), blobs
+
+
+def test_blob_hash_matches_output_hash_and_round_trips():
+    blob = make_blob(LONG_TEXT)
+    assert blob.sha256 == compute_sha256(LONG_TEXT)
+    assert len(blob.data) < blob.raw_bytes
+    assert decompress(blob.codec, blob.data).decode("utf-8") == LONG_TEXT
+
+    # Incompressible payloads are stored as they are
+    codec, data = compress(b"x")
+    assert (codec, data) == (CODEC_NONE, b"x")
+
+
+def test_externalize_moves_only_large_payloads():
+    run = Run(
+        request_json={"messages": [{"role": "user", "content": LONG_TEXT}]},
+        response_json={"model": "gpt-5"},
+        output_text=LONG_TEXT,
+        response_output_sha256=compute_sha256(LONG_TEXT)
+    )
+    blobs = externalize(run, min_bytes=256)
+
+    assert len(blobs) == 2
+    assert run.request_json is None and run.output_text is None
+    assert run.request_sha256 == blobs[0].sha256
+    assert run.response_output_sha256 == compute_sha256(LONG_TEXT)
+    assert run.response_json == {"model": "gpt-5"} and run.response_sha256 is None
+
+
+@pytest.mark.asyncio
+async def test_shared_payloads_are_stored_once_and_hydrated():
+    conn, blobs = _blob_store()
+    first, second = Run(output_text=LONG_TEXT), Run(output_text=LONG_TEXT, request_json={"k": LONG_TEXT})
+    created = await put_blobs(conn, externalize(first, 256) + externalize(second, 256))
+    assert len(created) == 2 and all(created.values())
+    assert blobs[compute_sha256(LONG_TEXT)]["refcount"] == 2
+
+    await hydrate_runs(conn, [first, second])
+    assert first.output_text == second.output_text == LONG_TEXT
+    assert second.request_json == {"k": LONG_TEXT}
+    # One lookup for the whole list
+    assert sum(sql.startswith("SELECT sha256") for sql, _ in conn.statements) == 1
+
+    rows = [
+        SimpleNamespace(output_text="inline", response_output_sha256=None),
+        SimpleNamespace(output_text=None, response_output_sha256=compute_sha256(LONG_TEXT)),
+    ]
+    assert await output_texts(conn, rows) == ["inline", LONG_TEXT]
+
+
+@pytest.mark.asyncio
+async def test_dedup_existing_reports_bytes_saved():
+    created = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    rows = [
+        SimpleNamespace(
+            run_id=UUID(int=i), created_at=created, request_json={"k": "small"}, response_json=None,
+            output_text=LONG_TEXT, request_json_size=20, response_json_size=None, output_text_size=1500
+        )
+        for i in (1, 2, 3)
+    ]
+    conn, blobs = _blob_store(runs=rows)
+
+    report = await dedup_existing(fake_engine(conn), batch_size=10, min_bytes=256)
+
+    assert report.runs == 3 and report.payloads == 3 and report.blobs_created == 1
+    assert report.inline_bytes == 4500
+    assert report.bytes_saved == 4500 - len(make_blob(LONG_TEXT).data)
+    assert blobs[compute_sha256(LONG_TEXT)]["refcount"] == 3
+    updates = next(params for sql, params in conn.statements if sql.startswith("UPDATE runs"))
+    assert [u["output_sha256"] for u in updates] == [compute_sha256(LONG_TEXT)] * 3
+    assert all(u["request_sha256"] is None for u in updates)
@@ -0,0 +1,124 @@
+"""
+Tests for keyset run listings
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.models import Run
+from app.services.run_listing import count_runs, fetch_page, keyset_page, list_query
+from app.services.run_search import decode_cursor, encode_cursor
+from tests.util.fake_db import FakeConnection, FakeResult
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _session(*results):
+    """Session answering each statement with the next of results"""
+    pending = list(results)
+    return FakeConnection(lambda sql, params: pending.pop(0))
+
+
+def test_list_query_leaves_payload_columns_out():
+    sql = compiled(list_query(Run.template_id == UUID(int=1)))
+    select_list = sql.split(" FROM ")[0]
+    assert "runs.run_id" in select_list and "runs.created_at" in select_list
+    for column in ("request_json", "response_json", "output_text", "als_block_text", "output_tsv"):
+        assert f"runs.{column}" not in select_list
+    assert "runs.output_text" in compiled(list_query(include_payloads=True)).split(" FROM ")[0]
+
+
+def test_keyset_page_orders_and_seeks_without_offset():
+    cursor = encode_cursor(datetime(2026, 10, 1, tzinfo=timezone.utc), UUID(int=7))
+    sql = compiled(keyset_page(list_query(), cursor, 20))
+    assert "(runs.created_at, runs.run_id) < (" in sql
+    assert "ORDER BY runs.created_at DESC, runs.run_id DESC" in sql
+    assert "LIMIT 21" in sql and "OFFSET" not in sql
+    with pytest.raises(ValueError):
+        keyset_page(list_query(), "garbage", 20)
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_returns_cursor_only_when_more_rows_exist():
+    start = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(run_id=UUID(int=i), created_at=start - timedelta(minutes=i)) for i in range(3)]
+    runs, cursor = await fetch_page(_session(FakeResult(rows)), list_query(), None, 2)
+    assert runs == rows[:2]
+    assert decode_cursor(cursor) == (rows[1].created_at, rows[1].run_id)
+
+    runs, cursor = await fetch_page(_session(FakeResult(rows[:2])), list_query(), None, 2)
+    assert len(runs) == 2 and cursor is None
+
+
+@pytest.mark.asyncio
+async def test_count_modes():
+    session = _session(FakeResult(scalar=12))
+    assert await count_runs(session, Run.locale_selected == "de-DE", mode="exact") == 12
+    assert "count(*)" in compiled(session.executed[0])
+
+    session = _session(FakeResult(scalar=[{"Plan": {"Node Type": "Index Only Scan", "Plan Rows": 4200}}]))
+    assert await count_runs(session, Run.locale_selected == "de-DE", mode="approximate") == 4200
+    sql = str(session.executed[0])
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT runs.run_id") and "'de-DE'" in sql
+
+    assert await count_runs(_session(), mode="none") is None
+    with pytest.raises(ValueError):
+        await count_runs(_session(), mode="sometimes")
+
+
+def test_removed_page_parameter_is_rejected_through_the_route():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.routes import runs as runs_routes
+    from app.db.database import get_session
+
+    session = FakeConnection()
+
+    app = FastAPI()
+    app.include_router(runs_routes.router)
+    app.dependency_overrides[get_session] = lambda: session
+    client = TestClient(app)
+
+    response = client.get("/api/runs", params={"page": 3})
+    assert response.status_code == 400
+    assert response.json()["detail"]["code"] == "INVALID_PAGINATION"
+    assert "cursor" in response.json()["detail"]["detail"]
+    assert session.executed == []
+
+    # page=1 is the first page; payload columns are left out by default
+    assert client.get("/api/runs", params={"page": 1}).json() == []
+    select_list = compiled(session.executed[0]).split(" FROM ")[0]
+    assert "runs.output_text" not in select_list
+
+
+def test_template_listing_counts_exactly_unless_an_estimate_is_asked_for():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.routes import templates as template_routes
+    from app.db.database import get_session
+
+    sessions = []
+
+    def session():
+        sessions.append(_session(FakeResult(), FakeResult(scalar=7)))
+        return sessions[-1]
+
+    app = FastAPI()
+    app.include_router(template_routes.router)
+    app.dependency_overrides[get_session] = session
+    client = TestClient(app)
+    url, headers = f"/v1/templates/{UUID(int=1)}/runs", {"X-Organization-Id": "org"}
+
+    body = client.get(url, headers=headers).json()
+    assert (body["total"], body["total_is_estimate"]) == (7, False)
+    assert "count(*)" in compiled(sessions[-1].executed[1])
+
+    assert client.get(url, headers=headers, params={"total": "sometimes"}).status_code == 422
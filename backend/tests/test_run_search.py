@@ -0,0 +1,83 @@
+"""
+Tests for full-text search over run outputs
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.run_search import (
+    backfill_search_vectors,
+    build_search_query,
+    decode_cursor,
+    encode_cursor,
+    search_config,
+    search_runs,
+)
+from tests.util.fake_db import FakeConnection, fake_engine
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_search_config_by_language():
+    assert search_config("de-DE") == "german"
+    assert search_config("pt_BR") == "portuguese"
+    assert search_config("ja-JP") == "simple"
+    assert search_config(None) == "simple"
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    created_at, run_id = datetime(2026, 10, 1, 12, tzinfo=timezone.utc), uuid4()
+    assert decode_cursor(encode_cursor(created_at, run_id)) == (created_at, run_id)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_locale_filter_uses_single_config():
+    sql = compiled(build_search_query("vitamin d", locale="de-DE", model="gpt-5", limit=10))
+    assert "websearch_to_tsquery(CAST('german' AS REGCONFIG)" in sql and "'english'" not in sql
+    assert "runs.output_tsv @@" in sql
+    assert "runs.locale_selected = 'de-DE'" in sql and "runs.model = 'gpt-5'" in sql
+    assert "LIMIT 11" in sql
+    assert "ts_headline(run_search_config(runs.locale_selected)" in sql
+
+
+def test_unfiltered_query_ors_every_config_and_applies_cursor():
+    cursor = encode_cursor(datetime(2026, 10, 1, tzinfo=timezone.utc), UUID(int=7))
+    sql = compiled(build_search_query("avea", cursor=cursor))
+    assert "|| websearch_to_tsquery(CAST('english' AS REGCONFIG), 'avea')" in sql
+    assert "|| websearch_to_tsquery(CAST('simple' AS REGCONFIG), 'avea')" in sql
+    assert "(runs.created_at, runs.run_id) < (" in sql
+
+
+@pytest.mark.asyncio
+async def test_search_runs_pages_with_next_cursor():
+    created = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    rows = [
+        SimpleNamespace(run_id=UUID(int=i), template_id=None, batch_id=None, model="m", locale_selected="en-US",
+                        status="succeeded", created_at=created, snippet=f"<mark>hit</mark> {i}",
+                        output_in_blob=False, response_output_sha256=None)
+        for i in (3, 2, 1)
+    ]
+    session = FakeConnection(lambda sql, params: rows)
+
+    page = await search_runs(session, "hit", limit=2)
+    assert [r["snippet"] for r in page["results"]] == ["<mark>hit</mark> 3", "<mark>hit</mark> 2"]
+    assert decode_cursor(page["next_cursor"]) == (created, UUID(int=2))
+
+
+@pytest.mark.asyncio
+async def test_backfill_walks_batches_in_short_transactions():
+    batches = [[UUID(int=1), UUID(int=2)], [UUID(int=3)], []]
+    conn = FakeConnection(lambda sql, params: [SimpleNamespace(run_id=i) for i in batches.pop(0)] if params else None)
+
+    assert await backfill_search_vectors(fake_engine(conn), batch_size=2, lock_timeout_ms=500) == 3
+    calls = conn.statements
+    assert calls[0][0] == "SET LOCAL lock_timeout = 500"
+    assert [p["after"] for _, p in calls if p] == [None, UUID(int=2), UUID(int=3)]
+    assert "FOR UPDATE SKIP LOCKED" in calls[1][0]
@@ -0,0 +1,58 @@
+"""
+Tests for the typed llm_telemetry meta columns and their indexes
+"""
+
+import importlib.util
+from pathlib import Path
+
+from sqlalchemy import create_mock_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.models import models
+from app.models.models import LLMTelemetry
+
+MIGRATION = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "20261018_telemetry_meta_columns.py"
+
+
+def _migration():
+    spec = importlib.util.spec_from_file_location("telemetry_meta_columns", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_model_columns_and_indexes_match_the_migration():
+    migration = _migration()
+    columns = LLMTelemetry.__table__.columns
+    assert isinstance(columns["meta"].type, postgresql.JSONB)
+    for field in migration.TEXT_FIELDS + migration.INT_FIELDS:
+        assert field in columns
+
+    indexes = {
+        index.name: str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        for index in LLMTelemetry.__table__.indexes
+    }
+    for name, (cols, include, where) in migration.INDEXES.items():
+        tail = (f" INCLUDE ({include})" if include else "") + (f" WHERE {where}" if where else "")
+        assert indexes[name] == f"CREATE INDEX {name} ON llm_telemetry ({cols}){tail}"
+
+
+def test_create_all_installs_the_meta_columns_trigger():
+    migration = _migration()
+    assert models.TELEMETRY_META_TEXT_FIELDS == migration.TEXT_FIELDS
+    assert models.TELEMETRY_META_INT_FIELDS == migration.INT_FIELDS
+
+    statements = []
+    engine = create_mock_engine(
+        "postgresql://", lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=engine.dialect)))
+    )
+    LLMTelemetry.__table__.create(engine)
+
+    ddl = "\n".join(statements)
+    assert ddl.index("CREATE TABLE llm_telemetry") < ddl.index("CREATE TRIGGER llm_telemetry_meta_columns")
+    assert "BEFORE INSERT OR UPDATE OF meta ON llm_telemetry" in ddl
+    for field in migration.TEXT_FIELDS:
+        assert f"NEW.{field} := NULLIF(NEW.meta->>'{field}', '')" in ddl
+    for field in migration.INT_FIELDS:
+        assert f"NEW.{field} := {migration._int(field)}" in ddl
@@ -0,0 +1,105 @@
+"""
+In-memory stand-ins for SQLAlchemy async connections, sessions and engines.
+
+Service tests hand a FakeConnection a responder, ``responder(sql, params)``,
+that answers each statement with rows (or a FakeResult, or None for no rows).
+The connection records every statement so tests can assert on the SQL sent.
+These only check the statements a service builds; they do not run them
+against Postgres.
+"""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+
+def normalize_sql(statement) -> str:
+    """Statement text with runs of whitespace collapsed to single spaces"""
+    return " ".join(str(statement).split())
+
+
+class FakeResult:
+    """The parts of a SQLAlchemy Result / AsyncResult the services use"""
+
+    def __init__(self, rows: Iterable = (), scalar: Any = None, rowcount: int = -1):
+        self._rows = list(rows)
+        self._scalar = scalar
+        self.rowcount = rowcount
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def fetchall(self):
+        return list(self._rows)
+
+    all = fetchall
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    first = fetchone
+
+    def one(self):
+        if len(self._rows) != 1:
+            raise AssertionError(f"expected one row, got {len(self._rows)}")
+        return self._rows[0]
+
+    def scalar(self):
+        return self._scalar
+
+    scalar_one_or_none = scalar
+
+    def scalars(self):
+        return FakeResult(self._rows)
+
+    async def partitions(self, size):
+        for i in range(0, len(self._rows), size):
+            yield self._rows[i:i + size]
+
+
+class FakeConnection:
+    """
+    Async connection (or session) that answers statements with responder.
+
+    ``statements`` holds (normalized sql, params) per call, ``executed`` the
+    statement objects themselves, for compiling against a dialect.
+    """
+
+    def __init__(self, responder: Optional[Callable[[str, Any], Any]] = None):
+        self.responder = responder or (lambda sql, params: None)
+        self.statements: List[Tuple[str, Any]] = []
+        self.executed: List[Any] = []
+
+    @property
+    def sql(self) -> List[str]:
+        return [sql for sql, _ in self.statements]
+
+    def _answer(self, statement, params):
+        sql = normalize_sql(statement)
+        self.executed.append(statement)
+        self.statements.append((sql, params))
+        answer = self.responder(sql, params if params is not None else {})
+        return answer if isinstance(answer, FakeResult) else FakeResult(answer or ())
+
+    async def execute(self, statement, params=None):
+        return self._answer(statement, params)
+
+    async def stream(self, statement, params=None):
+        return self._answer(statement, params)
+
+    async def commit(self):
+        self.statements.append(("COMMIT", None))
+
+    async def execution_options(self, **options):
+        self.statements.append((f"OPTIONS {options}", None))
+        return self
+
+
+def fake_engine(conn: FakeConnection) -> SimpleNamespace:
+    """Engine whose begin() and connect() both yield conn"""
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    return SimpleNamespace(begin=connection, connect=connection)